@@ -0,0 +1,113 @@
+"""
+Misura del tempo di avvio a freddo dell'analisi della periodicità dei Blazar
+
+Autore: Valenti Alessandra
+
+Ogni scenario viene eseguito in un nuovo processo python e viene registrato il minimo su più ripetizioni.
+I risultati vengono aggiunti allo storico locale avvio_blazar.csv (data, commit, scenario, secondi), in modo da
+poter seguire l'andamento del tempo di avvio nel tempo; se uno scenario peggiora più della tolleranza rispetto
+all'ultima misura registrata viene segnalato. Lo storico dipende dalla macchina e non viene versionato; le misure
+prese con modifiche non ancora registrate vengono etichettate con il commit seguito da "+modifiche".
+
+Utilizzo:
+    python3 benchmark/avvio_blazar.py [--ripetizioni 5] [--tolleranza 0.2] [--non-salvare]
+
+"""
+import argparse
+import csv
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+CARTELLA_PROGETTO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FILE_STORICO      = os.path.join(os.path.dirname(os.path.abspath(__file__)), "avvio_blazar.csv")
+
+# nome dello scenario : argomenti dell'interprete python
+SCENARI = {
+    "import_numerico"   : ["-c", "import modulo_funzioni_blazar"],
+    "import_grafici"    : ["-c", "import modulo_funzioni_plot_blazar"],
+    "import_pyplot"     : ["-c", "import modulo_funzioni_plot_blazar as b; b.modalita_headless(); b.carica_pyplot()"],
+    "cli_periodo_fonte" : ["periodicità_blazar.py", "--period", "--fonte", "1M", "--headless"],
+}
+
+
+def misura_scenario(argomenti, ripetizioni):
+    """
+    Restituisce il tempo minimo (in secondi) di esecuzione di un nuovo processo python con gli argomenti indicati
+    """
+    tempi = []
+
+    for i in range(0, ripetizioni):
+        t0 = time.perf_counter()
+        subprocess.run([sys.executable] + argomenti, cwd = CARTELLA_PROGETTO, stdout = subprocess.DEVNULL, check = True)
+        tempi.append(time.perf_counter() - t0)
+
+    return min(tempi)
+
+
+def ultime_misure():
+    """
+    Restituisce un dizionario {scenario : secondi} con l'ultima misura registrata nello storico per ogni scenario
+    """
+    ultime = {}
+
+    if os.path.exists(FILE_STORICO):
+        with open(FILE_STORICO, newline = "") as f:
+            for riga in csv.DictReader(f):
+                ultime[riga["scenario"]] = float(riga["secondi"])
+
+    return ultime
+
+
+def commit_corrente():
+    """
+    Restituisce il commit corrente, seguito da "+modifiche" se l'albero di lavoro contiene modifiche non registrate
+    """
+    try:
+        r = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd = CARTELLA_PROGETTO, capture_output = True, text = True)
+        s = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd = CARTELLA_PROGETTO, capture_output = True, text = True)
+        return r.stdout.strip() + ("+modifiche" if s.stdout.strip() else "")
+    except OSError:
+        return ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "Misura del tempo di avvio a freddo")
+    parser.add_argument("--ripetizioni", type = int, default = 5, help = "numero di ripetizioni per scenario")
+    parser.add_argument("--tolleranza", type = float, default = 0.2, help = "peggioramento relativo oltre il quale viene segnalata una regressione")
+    parser.add_argument("--non-salvare", action = "store_true", help = "non aggiunge le misure allo storico")
+    args = parser.parse_args()
+
+    precedenti = ultime_misure()
+    misure = {nome : misura_scenario(argomenti, args.ripetizioni) for nome, argomenti in SCENARI.items()}
+
+    regressioni = 0
+
+    print(" Scenario             | Avvio [s] | Precedente [s]")
+    print("----------------------|-----------|---------------")
+    for nome, secondi in misure.items():
+        prec = precedenti.get(nome)
+        nota = ""
+        if prec is not None and secondi > prec * (1 + args.tolleranza):
+            nota = "  <-- REGRESSIONE"
+            regressioni += 1
+        print(" {:<20} | {:>9.3f} | {:>14}{}".format(nome, secondi, "-" if prec is None else "{:.3f}".format(prec), nota))
+
+    if not args.non_salvare:
+        nuovo = not os.path.exists(FILE_STORICO)
+        with open(FILE_STORICO, "a", newline = "") as f:
+            scrittore = csv.writer(f)
+            if nuovo:
+                scrittore.writerow(["data", "commit", "scenario", "secondi"])
+            data = datetime.now().strftime("%Y-%m-%d %H:%M")
+            commit = commit_corrente()
+            for nome, secondi in misure.items():
+                scrittore.writerow([data, commit, nome, "{:.4f}".format(secondi)])
+
+    sys.exit(1 if regressioni > 0 else 0)
+
+
+if __name__ == "__main__":
+    main()
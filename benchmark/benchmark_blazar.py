@@ -0,0 +1,435 @@
+"""
+Benchmark delle funzioni di analisi della periodicità dei Blazar
+
+Autore: Valenti Alessandra
+
+
+Il benchmark esegue ogni funzione pubblica di modulo_funzioni_blazar su curve di luce sintetiche con 10^2 - 10^5 bin,
+con una frazione controllata di buchi (bin mancanti) e di upper limit, e le funzioni delle curve sintetiche
+con un numero di realizzazioni N da 10^3 a 10^6. Viene eseguito anche il flusso completo di periodicità_blazar.py.
+Per ogni stadio vengono misurati il tempo (mediana su più ripetizioni) e il picco di memoria allocata (tracemalloc),
+e i risultati vengono confrontati con quelli salvati in baseline_blazar.json per segnalare le regressioni.
+
+Profili:
+    rapido   : 10^2 e 10^3 bin, N = 10^3, flusso completo solo per --period (pochi secondi)
+    completo : 10^2 - 10^5 bin, N = 10^3 - 10^6 (le combinazioni con N * n_bin oltre MAX_ELEMENTI_MC vengono saltate, circa 5 minuti)
+
+Utilizzo:
+    python3 benchmark/benchmark_blazar.py [--profilo rapido|completo] [--salva-baseline] [--tolleranza 0.5]
+
+Note:
+    - se una funzione supera il tempo limite ad una dimensione, le dimensioni maggiori vengono saltate
+      (alcune funzioni hanno un costo quadratico nel numero di bin)
+    - le misure dipendono dalla macchina: la baseline va salvata sulla macchina su cui si confrontano i risultati.
+      baseline_blazar.json contiene la descrizione della macchina su cui è stata misurata (chiave "macchina") e, se la
+      macchina corrente è diversa, il confronto viene comunque eseguito ma viene stampato un avviso
+    - prima delle misure di ogni stadio la funzione viene eseguita una volta alla dimensione minima, senza essere misurata,
+      in modo che i costi della prima chiamata (import ritardati, ad esempio scipy.optimize in fit_pwsp) non vengano
+      conteggiati anche con --ripetizioni 1
+    - una misura viene segnalata come regressione solo se supera la baseline sia della tolleranza relativa sia di una
+      differenza assoluta minima (MINIMO_TEMPO, MINIMO_MEMORIA): le funzioni che durano pochi millisecondi variano tra
+      un'esecuzione e l'altra ben oltre il 30% e senza il minimo assoluto verrebbero segnalate di continuo
+
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+CARTELLA_BENCHMARK = os.path.dirname(os.path.abspath(__file__))
+CARTELLA_PROGETTO  = os.path.dirname(CARTELLA_BENCHMARK)
+FILE_BASELINE      = os.path.join(CARTELLA_BENCHMARK, "baseline_blazar.json")
+
+sys.path.insert(0, CARTELLA_PROGETTO)
+import modulo_funzioni_blazar as fbl
+import modulo_parallelo_blazar as ppbl
+
+
+PROFILI = {
+    "rapido"   : {"n_bin" : [10**2, 10**3],                      "N" : [10**3],                             "cli" : ["--period"]},
+    "completo" : {"n_bin" : [10**2, 10**3, 10**4, 10**5],        "N" : [10**3, 10**4, 10**5, 10**6],        "cli" : ["--period", "--fit", "--sint"]},
+}
+
+FRAZIONE_BUCHI       = 0.05     # frazione di bin mancanti nelle curve sintetiche
+FRAZIONE_UPPER_LIMIT = 0.10     # frazione di bin che sono upper limit
+DT_SETTIMANA         = 604800   # s
+MAX_ELEMENTI_MC      = 2 * 10**7  # limite di N * n_bin per le funzioni delle curve sintetiche
+TEMPO_LIMITE         = 20.0     # s, oltre questo tempo le dimensioni maggiori vengono saltate
+FREQUENZA_TAGLIO     = 1e-8
+MINIMO_TEMPO         = 0.05     # s, differenza minima rispetto alla baseline per segnalare una regressione di tempo
+MINIMO_MEMORIA       = 0.5      # MB, differenza minima rispetto alla baseline per segnalare una regressione di memoria
+
+
+                                      ###########################################
+                                      #     Curve di luce sintetiche            #
+                                      ###########################################
+
+def genera_colonne(n_bin, frazione_buchi = FRAZIONE_BUCHI, frazione_ul = FRAZIONE_UPPER_LIMIT, dt = DT_SETTIMANA, seme = 0):
+    """
+    Genera le colonne di una curva di luce sintetica nello stesso formato restituito da fbl.leggi_csv()
+
+    Parametri:
+    -------------
+    n_bin (int)             : numero di bin della curva (prima di togliere i buchi)
+    frazione_buchi (float)  : frazione di bin rimossi (mai il primo e l'ultimo)
+    frazione_ul (float)     : frazione di bin che diventano upper limit ("< valore" e errore "-")
+    dt (int)                : durata di un bin in secondi
+    seme (int)              : seme del generatore di numeri casuali
+
+    Restituisce:
+    -------------
+    colonne (dictionary) : con le colonne del MET, del flusso e del suo errore
+
+    """
+    rng = np.random.default_rng(seme)
+
+    tempo = 239889601 + dt * np.arange(0, n_bin)
+    t = np.arange(0, n_bin)
+
+    # rumore rosso (random walk) più una componente periodica, in scala logaritmica come i flussi reali
+    log_flusso = -7 + 0.02 * np.cumsum(rng.normal(size = n_bin)) + 0.2 * np.sin(2 * np.pi * t / 100)
+    flusso = 10**log_flusso
+    errore = 0.15 * flusso
+
+    interni = np.arange(1, n_bin - 1)
+    buchi = rng.choice(interni, size = int(frazione_buchi * n_bin), replace = False)
+    tieni = np.ones(n_bin, dtype = bool)
+    tieni[buchi] = False
+
+    tempo, flusso, errore = tempo[tieni], flusso[tieni], errore[tieni]
+
+    flusso_str = np.array(["{:.3e}".format(f) for f in flusso], dtype = object)
+    errore_str = np.array(["{:.3e}".format(e) for e in errore], dtype = object)
+
+    ul = rng.random(len(flusso)) < frazione_ul
+    ul[0] = False
+    flusso_str[ul] = ["< {:.3e}".format(f) for f in flusso[ul]]
+    errore_str[ul] = "-"
+
+    return {
+        "MET"                                         : tempo,
+        "Photon Flux [0.1-100 GeV](photons cm-2 s-1)" : flusso_str,
+        "Photon Flux Error(photons cm-2 s-1)"         : errore_str,
+    }
+
+
+def scrivi_csv(colonne, nome_file):
+    """
+    Scrive le colonne di una curva sintetica in un file CSV con lo stesso formato del Fermi LAT Light Curve Repository
+    """
+    nomi = list(colonne)
+    with open(nome_file, "w") as f:
+        f.write(",".join('"{}"'.format(n) for n in nomi) + "\n")
+        for i in range(0, len(colonne["MET"])):
+            f.write(",".join('"{}"'.format(colonne[n][i]) for n in nomi) + "\n")
+
+
+def diz_grezzo(n_bin):
+    return fbl.crea_dizionario_fonte(genera_colonne(n_bin), "sintetica")
+
+
+def diz_float(n_bin):
+    diz = diz_grezzo(n_bin)
+    fbl.agg_upper_limit(diz)
+    fbl.converti_to_float(diz)
+    return diz
+
+
+def diz_interpolato(n_bin):
+    diz = diz_float(n_bin)
+    fbl.interpolazione(diz)
+    return diz
+
+
+def diz_spettro(n_bin):
+    diz = diz_interpolato(n_bin)
+    fbl.fft_diz(diz)
+    fbl.fft_diz(diz, interp = True)
+    return diz
+
+
+                                      ###########################################
+                                      #           Stadi del benchmark           #
+                                      ###########################################
+
+# Ogni stadio è (nome, preparazione(n_bin, N) -> argomenti, funzione(argomenti), usa_N).
+# La preparazione non viene misurata; la funzione riceve argomenti nuovi ad ogni ripetizione.
+
+def _prep_csv(n, N):
+    f = tempfile.NamedTemporaryFile(suffix = ".csv", delete = False)
+    f.close()
+    scrivi_csv(genera_colonne(n), f.name)
+    return f.name
+
+def _prep_str(n, N):
+    diz = diz_grezzo(n)
+    return diz
+
+def _prep_sintetiche(n, N):
+    return diz_interpolato(n), N
+
+def _prep_fft_sintetiche(n, N):
+    return fbl.curve_sintetiche_diz(diz_interpolato(n), N)
+
+def _prep_picchi_sintetici(n, N):
+    return fbl.fft_curve_sintetiche_diz(fbl.curve_sintetiche_diz(diz_interpolato(n), N))
+
+def _prep_significatività(n, N):
+    diz = diz_spettro(n)
+    picchi = fbl.ar_picchi_sintetici(fbl.fft_curve_sintetiche_diz(fbl.curve_sintetiche_diz(diz, N)), FREQUENZA_TAGLIO)
+    return picchi, fbl.picco_periodo(diz, FREQUENZA_TAGLIO)[1]
+
+def _prep_blocco(n, N):
+    diz = diz_interpolato(n)
+    freq = np.fft.fftfreq(len(diz["flussi completi"]), d = fbl.dt_moda(diz["tempi completi"]))
+    return diz["flussi completi"], freq, N
+
+def _prep_picchi_blocco(n, N):
+    flusso, freq, N = _prep_blocco(n, N)
+    return fbl.curve_sintetiche_blocco(flusso, N, 0), freq
+
+def _prep_affina(n, N):
+    curve, freq = _prep_picchi_blocco(n, N)
+    return curve, 1/(len(freq)*freq[1]), fbl.picco_periodo_blocco(curve, freq, FREQUENZA_TAGLIO)[0]
+
+def _prep_colonne(n, N):
+    # colonne aggiuntive come nei file del Fermi LAT: indice di fotone costante, TS casuale, distanza dal Sole annuale
+    diz = diz_float(n)
+    rng = np.random.default_rng(1)
+    t = diz["tempo"].astype(float)
+    diz["colonne"] = {"indice" : np.full(len(t), 2.0), "ts" : rng.exponential(100, len(t)),
+                      "sole" : 90 + 80*np.sin(2*np.pi*t/31557600)}
+    return diz
+
+def _prep_incertezza(n, N):
+    diz = diz_spettro(n)
+    return diz, fbl.picco_periodo(diz, FREQUENZA_TAGLIO, interp = True)[0], N
+
+def _prep_spettri_blocco(n, N):
+    curve, freq = _prep_picchi_blocco(n, N)
+    return np.fft.rfft(curve, axis = 1), freq
+
+def _prep_preelabora(n, N):
+    flusso, freq, N = _prep_blocco(n, N)
+    return fbl.curve_sintetiche_blocco(flusso, N, 0), diz_interpolato(n)["tempi completi"]
+
+def _esegui_csv(nome_file):
+    try:
+        fbl.leggi_csv(nome_file)
+    finally:
+        os.remove(nome_file)
+
+
+STADI = [
+    ("leggi_csv"                 , _prep_csv                                        , _esegui_csv                                                       , False),
+    ("crea_dizionario_fonte"     , lambda n, N : genera_colonne(n)                  , lambda c : fbl.crea_dizionario_fonte(c, "sintetica")             , False),
+    ("flusso_to_float"           , lambda n, N : diz_grezzo(n)["flusso"]            , fbl.flusso_to_float                                               , False),
+    ("flusso_err_to_float"       , lambda n, N : diz_grezzo(n)["flusso_err"]        , fbl.flusso_err_to_float                                           , False),
+    ("trova_upper_limit"         , lambda n, N : diz_grezzo(n)                      , lambda d : fbl.trova_upper_limit(d["flusso"], d["tempo"])         , False),
+    ("agg_upper_limit"           , _prep_str                                        , fbl.agg_upper_limit                                               , False),
+    ("converti_to_float"         , _prep_str                                        , fbl.converti_to_float                                             , False),
+    ("MET_to_data_array"         , lambda n, N : diz_float(n)["tempo"]              , fbl.MET_to_data_array                                             , False),
+    ("MET_to_data_diz"           , lambda n, N : diz_float(n)                       , fbl.MET_to_data_diz                                               , False),
+    ("dt_control_bool"           , lambda n, N : diz_float(n)["tempo"]              , fbl.dt_control_bool                                               , False),
+    ("dt_medio"                  , lambda n, N : diz_float(n)["tempo"]              , fbl.dt_medio                                                      , False),
+    ("dt_moda"                   , lambda n, N : diz_float(n)["tempo"]              , fbl.dt_moda                                                       , False),
+    ("interpolazione"            , lambda n, N : diz_float(n)                       , fbl.interpolazione                                                , False),
+    ("fft_diz"                   , lambda n, N : diz_float(n)                       , fbl.fft_diz                                                       , False),
+    ("fft_diz_interp"            , lambda n, N : diz_interpolato(n)                 , lambda d : fbl.fft_diz(d, interp = True)                          , False),
+    ("fit_pwsp"                  , lambda n, N : diz_spettro(n)                     , lambda d : fbl.fit_pwsp(d, fbl.fit, [1e-9, 0.9], interp = True)   , False),
+    ("picco_periodo"             , lambda n, N : diz_spettro(n)                     , lambda d : fbl.picco_periodo(d, FREQUENZA_TAGLIO, interp = True)  , False),
+    ("curve_sintetiche_diz"      , _prep_sintetiche                                 , lambda a : fbl.curve_sintetiche_diz(*a)                           , True),
+    ("fft_curve_sintetiche_diz"  , _prep_fft_sintetiche                             , fbl.fft_curve_sintetiche_diz                                      , True),
+    ("ar_picchi_sintetici"       , _prep_picchi_sintetici                           , lambda d : fbl.ar_picchi_sintetici(d, FREQUENZA_TAGLIO)           , True),
+    ("curve_sintetiche_blocco"   , _prep_blocco                                     , lambda a : fbl.curve_sintetiche_blocco(a[0], a[2], 0)             , True),
+    ("picchi_sintetici_blocco"   , _prep_picchi_blocco                              , lambda a : fbl.picchi_sintetici_blocco(*a, FREQUENZA_TAGLIO)      , True),
+    ("picchi_sintetici_paralleli", _prep_blocco                                     , lambda a : ppbl.picchi_sintetici_paralleli(a[0], a[1], a[2], FREQUENZA_TAGLIO, seme = 0), True),
+    ("affina_picchi"             , _prep_affina                                     , lambda a : fbl.affina_picchi(*a, 16)                             , True),
+    ("picchi_paralleli_float32"  , _prep_blocco                                     , lambda a : ppbl.picchi_sintetici_paralleli(a[0].astype(np.float32), a[1], a[2], FREQUENZA_TAGLIO, seme = 0), True),
+    ("picchi_multipli"           , _prep_spettri_blocco                             , lambda a : fbl.picchi_multipli(*a, FREQUENZA_TAGLIO, 5)          , True),
+    ("preelabora_polinomio"      , _prep_preelabora                                 , lambda a : fbl.preelabora(*a, detrend = "polinomio", grado = 2, finestra = "hann"), True),
+    ("preelabora_loess"          , _prep_preelabora                                 , lambda a : fbl.preelabora(*a, clip = 3, detrend = "loess")       , True),
+    ("ribinna_curva"             , lambda n, N : diz_float(n)                       , lambda d : fbl.ribinna_curva(d, 4)                                , False),
+    ("spettri_colonne"           , _prep_colonne                                    , lambda d : fbl.spettri_colonne(d, f_taglio = FREQUENZA_TAGLIO)    , False),
+    ("incertezza_periodo"        , _prep_incertezza                                 , lambda a : fbl.incertezza_periodo(a[0], a[1], n = a[2], metodo = "blocchi", seme = 0), True),
+    ("istogramma_significatività", _prep_significatività                            , lambda a : fbl.istogramma_significatività(*a, 100)                , True),
+    ("significatività_int"       , _prep_significatività                            , lambda a : fbl.significatività_int(*a, 100)                       , True),
+]
+
+
+                                      ###########################################
+                                      #              Misure                     #
+                                      ###########################################
+
+def misura(preparazione, funzione, n, N, ripetizioni):
+    """
+    Restituisce il tempo mediano (s) e il picco minimo di memoria allocata (MB) dell'esecuzione di funzione
+    """
+    tempi  = []
+    picchi = []
+
+    for i in range(0, ripetizioni):
+        argomenti = preparazione(n, N)
+
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        funzione(argomenti)
+        tempi.append(time.perf_counter() - t0)
+        picchi.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    # la mediana è meno sensibile del minimo alle singole esecuzioni fortunate o disturbate
+    return float(np.median(tempi)), min(picchi) / 2**20
+
+
+def misura_cli(opzione, ripetizioni):
+    """
+    Esegue il flusso completo di periodicità_blazar.py in un nuovo processo e restituisce il tempo mediano (s)
+    e il picco di memoria residente (MB)
+    """
+    # il picco di memoria residente è VmHWM del processo, che riparte da zero con il nuovo programma; ru_maxrss invece
+    # viene ereditato attraverso fork ed exec e riporterebbe il picco del benchmark stesso (GB con le curve sintetiche)
+    codice = ("import runpy, resource, sys; sys.argv = ['periodicità_blazar.py', '{}', '--headless'];"
+              "runpy.run_path('periodicità_blazar.py', run_name = '__main__');"
+              "righe = [r for r in open('/proc/self/status') if r.startswith('VmHWM')] if sys.platform == 'linux' else [];"
+              "sys.stderr.write(righe[0].split()[1] if righe else str(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss))").format(opzione)
+    tempi = []
+    picco = 0
+
+    for i in range(0, ripetizioni):
+        t0 = time.perf_counter()
+        r = subprocess.run([sys.executable, "-c", codice], cwd = CARTELLA_PROGETTO, stdout = subprocess.DEVNULL,
+                           stderr = subprocess.PIPE, text = True, check = True)
+        tempi.append(time.perf_counter() - t0)
+        picco = max(picco, int(r.stderr.strip().splitlines()[-1]) / 1024)
+
+    return float(np.median(tempi)), picco
+
+
+def chiave_risultato(nome, n, N):
+    return "{}|{}|{}".format(nome, n, N)
+
+
+def esegui_benchmark(profilo, ripetizioni, filtro = None):
+    """
+    Esegue tutti gli stadi del profilo e restituisce il dizionario {chiave : {"tempo", "memoria", ...}}
+    """
+    risultati = {}
+    par = PROFILI[profilo]
+
+    for nome, preparazione, funzione, usa_N in STADI:
+        if filtro is not None and filtro not in nome:
+            continue
+
+        valori_N = par["N"] if usa_N else [None]
+
+        # chiamata di riscaldamento, non misurata, alla dimensione minima
+        funzione(preparazione(par["n_bin"][0], valori_N[0]))
+
+        for N in valori_N:
+            saltato = False
+
+            for n in par["n_bin"]:
+                chiave = chiave_risultato(nome, n, N)
+
+                if saltato or (usa_N and N * n > MAX_ELEMENTI_MC):
+                    continue
+
+                rip = 1 if (usa_N and N * n > 10**6) else ripetizioni
+                tempo, memoria = misura(preparazione, funzione, n, N, rip)
+                risultati[chiave] = {"stadio" : nome, "n_bin" : n, "N" : N, "tempo" : tempo, "memoria" : memoria}
+                print(" {:<28} n_bin = {:<7} N = {:<8} {:>10.4f} s {:>10.2f} MB".format(nome, n, "-" if N is None else N, tempo, memoria), flush = True)
+
+                if tempo > TEMPO_LIMITE:
+                    saltato = True
+
+    for opzione in par["cli"]:
+        nome = "main" + opzione.replace("--", "_")
+        if filtro is not None and filtro not in nome:
+            continue
+        tempo, memoria = misura_cli(opzione, ripetizioni = 1 if opzione == "--sint" else ripetizioni)
+        risultati[chiave_risultato(nome, None, None)] = {"stadio" : nome, "n_bin" : None, "N" : None, "tempo" : tempo, "memoria" : memoria}
+        print(" {:<28} {:<30} {:>10.4f} s {:>10.2f} MB (RSS)".format(nome, "dati 4FGL", tempo, memoria), flush = True)
+
+    return risultati
+
+
+def confronta(risultati, baseline, tolleranza, minimi = None):
+    """
+    Confronta i risultati con la baseline e restituisce la lista delle regressioni (tempo o memoria oltre la tolleranza
+    relativa e oltre la differenza assoluta minima della grandezza)
+    """
+    regressioni = []
+    if minimi is None:
+        minimi = {"tempo" : MINIMO_TEMPO, "memoria" : MINIMO_MEMORIA}
+
+    for chiave, r in risultati.items():
+        if chiave not in baseline:
+            continue
+        b = baseline[chiave]
+
+        for grandezza in ("tempo", "memoria"):
+            if r[grandezza] > b[grandezza] * (1 + tolleranza) and r[grandezza] - b[grandezza] > minimi[grandezza]:
+                regressioni.append((chiave, grandezza, b[grandezza], r[grandezza]))
+
+    return regressioni
+
+
+NOTA_BASELINE = ("Tempi e memoria misurati sulla sola macchina descritta in 'macchina': i valori sono validi come riferimento "
+                 "solo su quella macchina, su un'altra macchina la baseline va salvata di nuovo con --salva-baseline")
+
+
+def macchina_corrente():
+    return {"python" : platform.python_version(), "numpy" : np.__version__, "sistema" : platform.platform(),
+            "processore" : platform.processor(), "cpu" : os.cpu_count()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "Benchmark dell'analisi della periodicità dei Blazar")
+    parser.add_argument("--profilo", choices = list(PROFILI), default = "rapido")
+    parser.add_argument("--ripetizioni", type = int, default = 5)
+    parser.add_argument("--stadio", default = None, help = "esegue solo gli stadi il cui nome contiene questa stringa")
+    parser.add_argument("--tolleranza", type = float, default = 0.5, help = "peggioramento relativo oltre il quale viene segnalata una regressione")
+    parser.add_argument("--salva-baseline", action = "store_true", help = "salva (aggiorna) la baseline con i risultati ottenuti")
+    args = parser.parse_args()
+
+    risultati = esegui_benchmark(args.profilo, args.ripetizioni, args.stadio)
+
+    baseline, macchina_baseline = {}, None
+    if os.path.exists(FILE_BASELINE):
+        with open(FILE_BASELINE) as f:
+            dati = json.load(f)
+        baseline, macchina_baseline = dati["risultati"], dati.get("macchina")
+
+    regressioni = confronta(risultati, baseline, args.tolleranza)
+
+    if len(baseline) > 0 and macchina_baseline != macchina_corrente():
+        print("\033[93mAttenzione: la baseline è stata misurata su un'altra macchina ({}), i confronti non sono affidabili\033[0m".format(
+              ", ".join("{} {}".format(k, v) for k, v in macchina_baseline.items())))
+
+    print("")
+    if len(regressioni) == 0:
+        print("Nessuna regressione rispetto alla baseline ({} misure confrontate)".format(len([k for k in risultati if k in baseline])))
+    else:
+        print("\033[91mRegressioni rispetto alla baseline:\033[0m")
+        for chiave, grandezza, prima, dopo in regressioni:
+            print("  {:<45} {:<8} {:.4g} -> {:.4g} ({:+.0f}%)".format(chiave, grandezza, prima, dopo, (dopo / prima - 1) * 100))
+
+    if args.salva_baseline:
+        baseline.update(risultati)
+        with open(FILE_BASELINE, "w") as f:
+            json.dump({"nota" : NOTA_BASELINE, "macchina" : macchina_corrente(), "risultati" : baseline}, f, indent = 1, ensure_ascii = False)
+        print("Baseline salvata in {}".format(FILE_BASELINE))
+
+    sys.exit(1 if len(regressioni) > 0 else 0)
+
+
+if __name__ == "__main__":
+    main()
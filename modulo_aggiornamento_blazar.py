@@ -0,0 +1,328 @@
+"""
+Modulo per l'aggiornamento incrementale delle fonti con i nuovi bin delle curve di luce
+
+Autore: Valenti Alessandra
+
+
+I file del Fermi LAT Light Curve Repository crescono di un bin alla settimana (o al mese). Per non rileggere l'intero
+file ad ogni aggiornamento, i risultati di ogni fonte vengono salvati in un archivio (un file .npz per fonte) insieme
+alle curve misurate e alla posizione nel file CSV fino a cui sono stati letti i dati. Ad ogni aggiornamento:
+     - vengono lette e convertite solo le righe aggiunte al file (con MET successivo all'ultimo archiviato)
+     - le curve archiviate vengono estese con le righe nuove e diventano lo stadio "float" di uno stato della pipeline
+     - interpolazione, preelaborazione, trasformata (sulla griglia di frequenze della curva estesa), picco, periodo
+       e fit vengono ricalcolati come nell'analisi completa, con lo stesso risultato
+Gli stadi che richiedono un ricalcolo completo (curve sintetiche e significatività, oppure un cambio del passo
+temporale) vengono ricalcolati con modulo_pipeline_blazar solo per le fonti che hanno nuovi dati; dopo
+PARAMETRI["max_aggiornamenti"] aggiornamenti incrementali il file viene riletto completamente, in modo da includere
+anche le eventuali nuove elaborazioni dei bin già archiviati.
+
+Elenco delle funzioni:
+     - archivio_da_stato .................. crea l'archivio di una fonte dagli stadi calcolati con la pipeline
+     - salva_archivio / carica_archivio ... scrittura e lettura dell'archivio .npz di una fonte
+     - righe_nuove ........................ legge e converte le righe aggiunte al file CSV dall'ultimo aggiornamento
+     - aggiorna_archivio .................. estende l'archivio con le righe nuove aggiornando spettro, periodo e fit
+     - aggiorna_fonti ..................... aggiorna l'archivio di un insieme di fonti
+     - stati_archivio ..................... stati delle fonti per la tabella dei risultati (modulo_risultati_blazar)
+
+"""
+import modulo_funzioni_blazar as fbl
+import modulo_pipeline_blazar as pbl
+import numpy as np
+import os, time
+
+
+                                      ###########################################
+                                      #          Archivio delle fonti           #
+                                      ###########################################
+
+def _file_csv(chiave, parametri):
+    return os.path.join(parametri["cartella"], pbl.FONTI[chiave]["file"])
+
+#------------------------------------------------------------------------------------------------------------
+
+def archivio_da_stato(stato):
+    """
+    Funzione che crea l'archivio di una fonte a partire dagli stadi calcolati con modulo_pipeline_blazar
+
+    Parametri:
+    -------------
+    stato (dictionary) : stato della fonte in cui sono stati calcolati almeno gli stadi fit e periodo
+
+    Restituisce:
+    -------------
+    archivio (dictionary) : con le chiavi
+                            ["chiave"], ["byte"] (dimensione del file CSV letto), ["tempo"], ["flusso"], ["flusso_err"],
+                            ["upper_lim_tempo"], ["upper_lim_flusso"], ["flussi completi"], ["tempi completi"], ["dt"],
+                            ["griglia"] e ["ck_griglia"] (frequenze e trasformata della curva interpolata),
+                            ["params fit"], ["params covariance fit"], ["periodo"] (frequenza e valore complesso del picco),
+                            ["p_value"] e ["n_realizzazioni"] (nan e 0 se la significatività non è stata calcolata),
+                            ["aggiornamenti"] (numero di aggiornamenti incrementali dall'ultima analisi completa)
+
+    """
+    diz = stato["stadi"]["fft_interp"]
+
+    archivio = {
+        "chiave"                : stato["chiave"],
+        "byte"                  : os.path.getsize(_file_csv(stato["chiave"], stato["parametri"])),
+        "tempo"                 : diz["tempo"].astype(float),
+        "flusso"                : diz["flusso"],
+        "flusso_err"            : diz["flusso_err"],
+        "upper_lim_tempo"       : diz["upper_lim_tempo"].astype(float),
+        "upper_lim_flusso"      : diz["upper_lim_flusso"],
+        "flussi completi"       : diz["flussi completi"],
+        "tempi completi"        : diz["tempi completi"].astype(float),
+        "dt"                    : fbl.dt_moda(diz["tempo"]),
+        "griglia"               : diz["frequenza interp"],
+        "ck_griglia"            : diz["ck interp"],
+        "params fit"            : diz["params fit"],
+        "params covariance fit" : diz["params covariance fit"],
+        "periodo"               : np.array(stato["stadi"]["periodo"], dtype = complex),
+        "p_value"               : np.nan,
+        "n_realizzazioni"       : 0,
+        "aggiornamenti"         : 0,
+    }
+
+    if "significatività" in stato["stadi"]:
+        archivio["p_value"]         = float(stato["stadi"]["significatività"])
+        archivio["n_realizzazioni"] = stato["stadi"]["istogramma"]["n_realizzazioni"]
+
+    return archivio
+
+#------------------------------------------------------------------------------------------------------------
+
+def salva_archivio(archivio, cartella):
+    """
+    Funzione che salva l'archivio di una fonte nel file <cartella>/<chiave>.npz (la cartella viene creata se non esiste)
+    """
+    os.makedirs(cartella, exist_ok = True)
+
+    nome_file = os.path.join(cartella, archivio["chiave"] + ".npz")
+    temporaneo = nome_file + ".tmp.npz"
+
+    # scrittura su un file temporaneo e sostituzione, per non lasciare un archivio incompleto in caso di interruzione
+    np.savez(temporaneo, **archivio)
+    os.replace(temporaneo, nome_file)
+
+
+def carica_archivio(cartella, chiave):
+    """
+    Funzione che carica l'archivio di una fonte, restituisce None se l'archivio non esiste
+    """
+    nome_file = os.path.join(cartella, chiave + ".npz")
+
+    if not os.path.exists(nome_file):
+        return None
+
+    with np.load(nome_file) as dati:
+        archivio = {nome : dati[nome] for nome in dati.files}
+
+    for nome in ("chiave",):
+        archivio[nome] = str(archivio[nome])
+    for nome in ("byte", "n_realizzazioni", "aggiornamenti"):
+        archivio[nome] = int(archivio[nome])
+    for nome in ("dt", "p_value"):
+        archivio[nome] = float(archivio[nome])
+
+    return archivio
+
+
+                                      ###########################################
+                                      #        Aggiornamento incrementale       #
+                                      ###########################################
+
+def righe_nuove(archivio, nome_file):
+    """
+    Funzione che legge le righe aggiunte al file CSV dopo l'ultimo aggiornamento dell'archivio
+
+    Parametri:
+    -------------
+    archivio (dictionary) : archivio della fonte
+    nome_file (string)    : file CSV della fonte
+
+    Restituisce:
+    -------------
+    nuove (dictionary) : dizionario della fonte (come negli stadi carica, upper_limit e float) con le sole righe nuove
+                         e la chiave ["byte"] con la nuova dimensione del file;
+                         None se il file non è stato modificato
+
+    Note:
+    -----------
+    - vengono mantenute solo le righe con MET successivo all'ultimo tempo archiviato
+    - se il file è più corto di quello archiviato (ad esempio perché riscritto) viene sollevato un ValueError,
+      in questo caso è necessaria l'analisi completa della fonte
+
+    """
+    byte = os.path.getsize(nome_file)
+
+    if byte < archivio["byte"]:
+        raise ValueError("Il file {} è più corto di quello archiviato".format(nome_file))
+
+    if byte == archivio["byte"]:
+        return None
+
+    colonne = fbl.leggi_csv(nome_file, dal_byte = archivio["byte"])
+
+    mask = colonne["MET"] > archivio["tempo"][-1]
+    colonne = {nome : ar[mask] for nome, ar in colonne.items()}
+
+    nuove = fbl.crea_dizionario_fonte(colonne, pbl.FONTI[archivio["chiave"]]["nome"])
+    nuove["byte"] = byte
+
+    if len(nuove["tempo"]) > 0:
+        fbl.agg_upper_limit(nuove)
+        fbl.converti_to_float(nuove)
+
+    return nuove
+
+#------------------------------------------------------------------------------------------------------------
+
+@fbl.profila
+def aggiorna_archivio(archivio, nuove, parametri):
+    """
+    Funzione che estende l'archivio di una fonte con le righe nuove, aggiornando spettro, periodo e fit
+
+    Parametri:
+    -------------
+    archivio (dictionary)  : archivio della fonte (viene modificato)
+    nuove (dictionary)     : righe nuove restituite da righe_nuove()
+    parametri (dictionary) : parametri dell'analisi (come modulo_pipeline_blazar.PARAMETRI)
+
+    Restituisce:
+    -------------
+    True se l'aggiornamento incrementale è stato effettuato, False se è necessaria l'analisi completa
+    (cambio del passo temporale delle curve)
+
+    Note:
+    -----------
+    - le curve archiviate, estese con le righe nuove, sostituiscono lo stadio "float" di uno stato della pipeline e
+      gli stadi fit e periodo vengono ricalcolati: interpolazione, preelaborazione, griglia di frequenze (che si
+      allunga con la curva) e trasformata sono quelle dell'analisi completa, per cui i risultati coincidono con
+      quelli ottenuti rileggendo tutto il file; l'aggiornamento evita solo la lettura e la conversione delle righe
+      già archiviate
+    - il valore-p archiviato non vale più per la curva estesa e viene annullato (nan)
+
+    """
+    tempo = np.concatenate([archivio["tempo"], nuove["tempo"].astype(float)])
+
+    if fbl.dt_moda(tempo) != archivio["dt"]:
+        return False
+
+    stato = pbl.crea_stato(archivio["chiave"], **parametri)
+    stato["stadi"]["float"] = {
+        "nome"             : nuove["nome"],
+        "tempo"            : tempo,
+        "flusso"           : np.concatenate([archivio["flusso"], nuove["flusso"]]),
+        "flusso_err"       : np.concatenate([archivio["flusso_err"], nuove["flusso_err"]]),
+        "upper_lim_tempo"  : np.concatenate([archivio["upper_lim_tempo"], np.asarray(nuove.get("upper_lim_tempo", []), dtype = float)]),
+        "upper_lim_flusso" : np.concatenate([archivio["upper_lim_flusso"], np.asarray(nuove.get("upper_lim_flusso", []), dtype = float)]),
+    }
+
+    for stadio in ("fit", "periodo"):
+        pbl.esegui_stadio(stato, stadio)
+
+    aggiornamenti = archivio["aggiornamenti"]
+
+    archivio.update(archivio_da_stato(stato))
+    archivio["byte"]          = nuove["byte"]
+    archivio["aggiornamenti"] = aggiornamenti + 1
+
+    return True
+
+#------------------------------------------------------------------------------------------------------------
+
+def _analisi_completa(chiave, parametri, significatività):
+    stato = pbl.crea_stato(chiave, **parametri)
+
+    for stadio in ("fit", "periodo") + (("significatività",) if significatività else ()):
+        pbl.esegui_stadio(stato, stadio)
+
+    return archivio_da_stato(stato)
+
+
+def aggiorna_fonti(chiavi, cartella_archivio, significatività = False, **parametri):
+    """
+    Funzione che aggiorna l'archivio di un insieme di fonti
+
+    Parametri:
+    -------------
+    chiavi (list)             : chiavi delle fonti da aggiornare
+    cartella_archivio (string): cartella dell'archivio
+    significatività (boolean) : se True la significatività viene ricalcolata (analisi completa) per le fonti con nuovi dati
+                                e per quelle che non la hanno ancora in archivio
+    **parametri               : parametri dell'analisi che sostituiscono quelli di modulo_pipeline_blazar.PARAMETRI
+
+    Restituisce:
+    -------------
+    esiti (dictionary) : {chiave : {"archivio" : ..., "esito" : ..., "righe" : ..., "tempo" : ...}} dove esito è
+                         "invariata" (nessuna riga nuova), "incrementale" o "completa", righe il numero di righe nuove
+                         e tempo la durata dell'aggiornamento in secondi
+
+    """
+    par = dict(pbl.PARAMETRI)
+    par.update(parametri)
+
+    esiti = {}
+
+    for chiave in chiavi:
+        t_0 = time.perf_counter()
+
+        with fbl.stadio_profilo("aggiorna", fonte = chiave):
+            archivio = carica_archivio(cartella_archivio, chiave)
+            esito, righe, nuove = "completa", None, None
+
+            if archivio is not None:
+                try:
+                    nuove = righe_nuove(archivio, _file_csv(chiave, par))
+                except ValueError:
+                    # file riscritto: analisi completa
+                    archivio = None
+
+            if archivio is not None:
+                righe = 0 if nuove is None else len(nuove["tempo"])
+
+                if righe == 0:
+                    esito = "invariata"
+                elif (not significatività and archivio["aggiornamenti"] < par["max_aggiornamenti"]
+                      and aggiorna_archivio(archivio, nuove, par)):
+                    esito = "incrementale"
+
+                if esito == "invariata" and significatività and np.isnan(archivio["p_value"]):
+                    esito = "completa"
+
+                if nuove is not None:
+                    archivio["byte"] = nuove["byte"]
+
+            if esito == "completa":
+                archivio = _analisi_completa(chiave, par, significatività)
+
+            if esito != "invariata" or nuove is not None:
+                salva_archivio(archivio, cartella_archivio)
+
+        esiti[chiave] = {"archivio" : archivio, "esito" : esito, "righe" : righe, "tempo" : time.perf_counter() - t_0}
+
+    return esiti
+
+#------------------------------------------------------------------------------------------------------------
+
+def stati_archivio(esiti):
+    """
+    Funzione che crea, dagli archivi aggiornati, gli stati delle fonti con i soli stadi utilizzati
+    da modulo_risultati_blazar.raccogli_risultati() (fit, periodo e significatività)
+    """
+    stati = {}
+
+    for chiave, esito in esiti.items():
+        archivio = esito["archivio"]
+
+        stadi = {
+            "fit"     : {"params fit" : archivio["params fit"], "params covariance fit" : archivio["params covariance fit"]},
+            "periodo" : [archivio["periodo"][0].real, archivio["periodo"][1]],
+        }
+
+        if not np.isnan(archivio["p_value"]):
+            stadi["significatività"] = archivio["p_value"]
+            stadi["istogramma"]      = {"n_realizzazioni" : archivio["n_realizzazioni"]}
+
+        stati[chiave] = {"chiave" : chiave, "parametri" : pbl.PARAMETRI, "stadi" : stadi}
+
+    return stati
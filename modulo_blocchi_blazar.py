@@ -0,0 +1,222 @@
+"""
+Modulo per la segmentazione delle curve di luce in blocchi bayesiani (Bayesian Blocks)
+
+Autore: Valenti Alessandra
+
+
+La curva di luce misurata viene suddivisa nella sequenza di blocchi a flusso costante che massimizza la somma delle
+fitness dei blocchi meno un costo ncp_prior per ogni blocco (Scargle et al. 2013). Per misure con errori gaussiani la
+fitness di un blocco è b^2/(4a), con a = sum 1/(2 sigma^2) e b = sum x/sigma^2, e il flusso del blocco è la media pesata
+b/(2a); il trattamento degli upper limit è quello di modulo_periodogramma_blazar.dati_pesati().
+
+La programmazione dinamica considera, per ogni ultimo punto R, tutti gli inizi r dell'ultimo blocco: a e b di tutti
+i blocchi [r, R] sono differenze delle somme cumulative, per cui il ciclo interno è un'unica operazione vettoriale.
+Con la potatura (PELT, Killick et al. 2012) gli inizi r per cui best[r-1] + fitness(r, R) < best[R] vengono scartati:
+poiché suddividere un blocco non riduce mai la fitness totale, r non può più essere l'inizio ottimale per nessun R
+successivo e il risultato è identico a quello senza potatura, con un numero di candidati che in pratica resta limitato.
+
+Elenco delle funzioni:
+     - prior_punti ........................ costo ncp_prior di un blocco in funzione del falso positivo p0
+     - blocchi_bayesiani .................. segmentazione ottimale in blocchi di una curva di luce misurata
+     - blocchi_fonte ...................... segmentazione della curva di una fonte (stadio "float" della pipeline)
+     - blocchi_catalogo ................... segmentazione delle curve di più fonti in un pool di processi
+     - tabella_blocchi .................... testo della tabella dei blocchi e del blocco più luminoso
+
+"""
+import modulo_funzioni_blazar as fbl
+import modulo_periodogramma_blazar as pgbl
+import numpy as np
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+
+                                      ###########################################
+                                      #            Blocchi bayesiani            #
+                                      ###########################################
+
+def prior_punti(n, p0 = 0.05):
+    """
+    Funzione che restituisce il costo ncp_prior di un blocco per n misure, calibrato in modo che la probabilità
+    di un falso cambiamento sia p0 (Scargle et al. 2013, eq. 21)
+    """
+    return 4 - np.log(73.53 * p0 * n**(-0.478))
+
+#------------------------------------------------------------------------------------------------------------
+
+@fbl.profila
+def blocchi_bayesiani(tempo, flusso, pesi, p0 = 0.05, potatura = True):
+    """
+    Funzione che suddivide una curva di luce misurata nei blocchi bayesiani a flusso costante
+
+    Parametri:
+    -------------
+    tempo, flusso, pesi (array) : tempi [s], flussi e pesi 1/sigma^2 delle misure (vedi pgbl.dati_pesati())
+    p0 (float)                  : probabilità di falso positivo per ogni cambiamento (vedi prior_punti())
+    potatura (boolean)          : se True gli inizi dei blocchi che non possono più essere ottimali vengono scartati (PELT)
+
+    Restituisce:
+    -------------
+    blocchi (dictionary) : con le chiavi
+                           ["tempo"], ["flusso"], ["errore"] : misure segmentate (errore = 1/sqrt(pesi))
+                           ["inizi"]       : indici della prima misura di ogni blocco
+                           ["bordi"]       : bordi temporali [s] dei blocchi (n_blocchi + 1), a metà tra le misure
+                           ["flussi"]      : flusso di ogni blocco (media pesata)
+                           ["errori"]      : errore sul flusso di ogni blocco
+                           ["n_blocchi"]   : numero di blocchi
+                           ["valutazioni"] : numero totale di inizi valutati (n(n+1)/2 senza potatura)
+
+    """
+    tempo  = np.asarray(tempo, dtype = float)
+    flusso = np.asarray(flusso, dtype = float)
+    n = len(tempo)
+
+    ncp_prior = prior_punti(n, p0)
+
+    # somme cumulative di a e b: per il blocco [r, R] a = A[R+1] - A[r], b = B[R+1] - B[r]
+    A = np.concatenate(([0.0], np.cumsum(pesi / 2)))
+    B = np.concatenate(([0.0], np.cumsum(flusso * pesi)))
+
+    best   = np.zeros(n + 1)            # best[R+1]: fitness ottimale delle prime R+1 misure (best[0] = 0)
+    ultimo = np.empty(n, dtype = int)   # inizio dell'ultimo blocco della segmentazione ottimale delle prime R+1 misure
+
+    candidati = np.empty(0, dtype = int)
+    valutazioni = 0
+
+    for R in range(n):
+        candidati = np.append(candidati, R)
+
+        a = A[R + 1] - A[candidati]
+        b = B[R + 1] - B[candidati]
+        valori = best[candidati] + b**2 / (4 * a) - ncp_prior
+
+        i = np.argmax(valori)
+        best[R + 1], ultimo[R] = valori[i], candidati[i]
+        valutazioni += len(candidati)
+
+        if potatura:
+            candidati = candidati[valori + ncp_prior >= best[R + 1]]
+
+    # ricostruzione all'indietro degli inizi dei blocchi
+    inizi = []
+    R = n
+    while R > 0:
+        R = ultimo[R - 1]
+        inizi.append(R)
+
+    inizi = np.array(inizi[::-1])
+    fini  = np.append(inizi[1:], n)
+
+    bordi_misure = np.concatenate((tempo[:1], (tempo[1:] + tempo[:-1]) / 2, tempo[-1:]))
+    a = A[fini] - A[inizi]
+
+    blocchi = {
+        "tempo"       : tempo,
+        "flusso"      : flusso,
+        "errore"      : 1 / np.sqrt(pesi),
+        "inizi"       : inizi,
+        "bordi"       : bordi_misure[np.append(inizi, n)],
+        "flussi"      : (B[fini] - B[inizi]) / (2 * a),
+        "errori"      : 1 / np.sqrt(2 * a),
+        "n_blocchi"   : len(inizi),
+        "valutazioni" : valutazioni,
+    }
+
+    return blocchi
+
+#------------------------------------------------------------------------------------------------------------
+
+def blocchi_fonte(diz, p0 = 0.05, upper_limit = "escludi", potatura = True):
+    """
+    Funzione che suddivide in blocchi bayesiani la curva di luce misurata di una fonte
+
+    Parametri:
+    -------------
+    diz (dictionary)     : dizionario della fonte con flusso ed errore convertiti in float (stadio "float" della pipeline)
+    p0 (float)           : probabilità di falso positivo per ogni cambiamento
+    upper_limit (string) : trattamento degli upper limit, "escludi" oppure "metà" (vedi pgbl.dati_pesati())
+    potatura (boolean)   : vedi blocchi_bayesiani()
+
+    Restituisce:
+    -------------
+    blocchi (dictionary) : risultato di blocchi_bayesiani() con la chiave aggiuntiva ["nome"]
+
+    """
+    blocchi = blocchi_bayesiani(*pgbl.dati_pesati(diz, upper_limit), p0 = p0, potatura = potatura)
+    blocchi["nome"] = diz["nome"]
+
+    return blocchi
+
+
+def _blocchi_compito(compito):
+    # segmentazione di una fonte in un processo del pool: vengono inviati solo tempi, flussi e pesi
+    nome, tempo, flusso, pesi, p0, potatura = compito
+
+    blocchi = blocchi_bayesiani(tempo, flusso, pesi, p0 = p0, potatura = potatura)
+    blocchi["nome"] = nome
+
+    return blocchi
+
+#------------------------------------------------------------------------------------------------------------
+
+@fbl.profila
+def blocchi_catalogo(contenitori, p0 = 0.05, upper_limit = "escludi", potatura = True, n_processi = None):
+    """
+    Funzione che suddivide in blocchi bayesiani le curve di luce di più fonti, una fonte per processo
+
+    Parametri:
+    -------------
+    contenitori (dictionary) : {chiave : dizionario della fonte} (stadio "float" della pipeline)
+    p0, upper_limit, potatura: vedi blocchi_fonte()
+    n_processi (int)         : numero di processi del pool (default: numero di CPU), con n_processi = 1
+                               le fonti vengono segmentate nel processo principale
+
+    Restituisce:
+    -------------
+    risultati (dictionary) : {chiave : risultato di blocchi_fonte()}, nell'ordine di contenitori
+
+    Note:
+    -------------
+    - la segmentazione è deterministica, per cui il risultato non dipende dal numero di processi
+
+    """
+    if n_processi is None:
+        n_processi = os.cpu_count()
+
+    compiti = [(diz["nome"], *pgbl.dati_pesati(diz, upper_limit), p0, potatura) for diz in contenitori.values()]
+
+    if n_processi == 1 or len(compiti) == 1:
+        return {chiave : _blocchi_compito(compito) for chiave, compito in zip(contenitori, compiti)}
+
+    # le fonti più lunghe vengono inviate per prime, in modo da bilanciare il carico dei processi
+    ordine = sorted(range(len(compiti)), key = lambda i: -len(compiti[i][1]))
+
+    with ProcessPoolExecutor(max_workers = min(n_processi, len(compiti))) as pool:
+        blocchi = dict(zip(ordine, pool.map(_blocchi_compito, [compiti[i] for i in ordine])))
+
+    return {chiave : blocchi[i] for i, chiave in enumerate(contenitori)}
+
+#------------------------------------------------------------------------------------------------------------
+
+def tabella_blocchi(risultati):
+    """
+    Funzione che restituisce il testo della tabella dei blocchi bayesiani, con il blocco più luminoso di ogni fonte
+
+    Parametri:
+    -------------
+    risultati (dictionary) : {chiave della fonte : risultato di blocchi_fonte()}
+
+    """
+    testo = ["\033[95m     Tabella dei blocchi bayesiani   \033[0m",
+             "",
+             " Fonte | n. blocchi | durata media [gg] | blocco più luminoso (inizio - fine) | flusso del blocco"]
+
+    for chiave, b in risultati.items():
+        i = np.argmax(b["flussi"])
+        inizio, fine = fbl.MET_to_data_array(b["bordi"][i:i + 2])
+
+        testo.append("-------|------------|-------------------|-------------------------------------|------------------")
+        testo.append(" {:<6}| {:<11}| {:<18.1f}| {:<36}| {:.3e} ± {:.1e}".format(chiave, b["n_blocchi"],
+                     (b["bordi"][-1] - b["bordi"][0])/(b["n_blocchi"]*86400),
+                     "{:%d/%m/%Y} - {:%d/%m/%Y}".format(inizio, fine), b["flussi"][i], b["errori"][i]))
+
+    return "\n".join(testo)
@@ -0,0 +1,320 @@
+"""
+Modulo per la correlazione incrociata tra le curve di luce di fonti e basi temporali diverse
+
+Autore: Valenti Alessandra
+
+
+Per ogni coppia di curve (a, b), comprese le curve mensile e settimanale della stessa fonte, vengono calcolate:
+    - DCF (Edelson & Krolik 1988) : correlazione discreta sui dati misurati, con medie e varianze globali corrette per gli errori
+    - ZDCF (Alexander 1997)       : correlazione di Pearson entro bin di ritardo di uguale popolazione, con errori dalla
+                                    trasformata z di Fisher (senza la regola che esclude le misure ripetute nello stesso bin)
+    - CCF                         : correlazione delle curve interpolate, riportate ad un passo comune, calcolata con la FFT
+
+Per DCF e ZDCF tutte le somme di un bin di ritardo k sono somme sulle coppie di misure (i, j) con t_j - t_i nel bin:
+con le misure di b ordinate nel tempo le coppie di ogni bin e di ogni misura di a sono un intervallo di indici j
+(np.searchsorted sui bordi dei bin), per cui le matrici (bin, misure di a) dei conteggi, delle somme di b e di b^2 sono
+differenze di somme cumulative, senza matrici (misure di a, misure di b). Le somme delle curve sintetiche (permutazioni
+del flusso di a) sono prodotti matriciali di queste matrici per la matrice delle curve. La significatività del picco |r|
+della coppia è calcolata con l'istogramma dei picchi delle curve sintetiche; le coppie vengono distribuite in un pool
+di processi.
+
+Elenco delle funzioni:
+     - bordi_ritardi ...................... bordi dei bin di ritardo (uniformi per la DCF, di uguale popolazione per la ZDCF)
+     - correlazione_coppia ................ correlazione in funzione del ritardo, picco e valore-p di una coppia di curve
+     - correlazioni ....................... correlazioni di tutte le coppie di curve, in parallelo
+     - tabella_correlazioni ............... testo della tabella dei picchi di correlazione
+
+"""
+import modulo_funzioni_blazar as fbl
+import numpy as np
+import os
+import itertools
+from scipy import fft
+from concurrent.futures import ProcessPoolExecutor
+
+
+METODI = ("dcf", "zdcf", "ccf")
+
+# stato dei processi del pool: curve delle fonti e parametri delle correlazioni (impostati una sola volta per processo)
+_processo = {}
+
+
+                                      ###########################################
+                                      #        Correlazione di una coppia       #
+                                      ###########################################
+
+def bordi_ritardi(tempo_a, tempo_b, ritardo_max, n_ritardi, metodo = "dcf"):
+    """
+    Funzione che restituisce i bordi dei bin di ritardo t_b - t_a [s] tra -ritardo_max e ritardo_max: uniformi
+    per la DCF, quantili dei ritardi di tutte le coppie di misure per la ZDCF (bin di uguale popolazione; con dati
+    equispaziati i ritardi si ripetono, per cui i bordi coincidenti vengono uniti)
+    """
+    if metodo == "dcf":
+        return np.linspace(-ritardo_max, ritardo_max, n_ritardi + 1)
+
+    # solo i ritardi delle coppie entro ritardo_max: per ogni misura di a l'intervallo delle misure di b
+    # (ordinate nel tempo) viene trovato con np.searchsorted, senza la matrice di tutti i ritardi
+    tempo_b = np.sort(tempo_b)
+    inizi = np.searchsorted(tempo_b, tempo_a - ritardo_max, side = "left")
+    conteggi = np.searchsorted(tempo_b, tempo_a + ritardo_max, side = "right") - inizi
+
+    posizioni = np.concatenate(([0], np.cumsum(conteggi)))
+    ritardi = np.empty(posizioni[-1])
+
+    for i in range(len(tempo_a)):
+        ritardi[posizioni[i]:posizioni[i + 1]] = tempo_b[inizi[i]:inizi[i] + conteggi[i]] - tempo_a[i]
+
+    return np.unique(np.quantile(ritardi, np.linspace(0, 1, n_ritardi + 1), overwrite_input = True))
+
+
+def _matrici_ritardi(tempo_a, tempo_b, flusso_b, bordi):
+    # conteggi, somme di b e di b^2 delle coppie (i, j) per bin di ritardo e misura di a, matrici (bin, misure di a):
+    # con le misure di b ordinate nel tempo le coppie di un bin sono un intervallo di indici j, i cui estremi sono
+    # trovati con np.searchsorted per ogni bordo, e le somme sono differenze di somme cumulative (memoria O(bin * N_a))
+    ordine = np.argsort(tempo_b, kind = "stable")
+    tempo_b, flusso_b = tempo_b[ordine], flusso_b[ordine]
+
+    # indici [k, i] della prima misura di b con t_b - t_a[i] >= bordi[k], per cui il bin k è bordi[k] <= ritardo < bordi[k + 1]
+    indici = np.searchsorted(tempo_b, tempo_a[None, :] + bordi[:, None], side = "left")
+
+    def somme(valori):
+        cumulate = np.concatenate(([0], np.cumsum(valori)))
+        return np.diff(cumulate[indici], axis = 0)
+
+    D = np.diff(indici, axis = 0).astype(float)
+    C = somme(flusso_b)
+    E = somme(flusso_b**2)
+
+    # somma dei ritardi del bin: somma dei t_b meno il numero di coppie per t_a, rispetto al primo tempo per la precisione
+    origine = tempo_b[0] if len(tempo_b) > 0 else 0
+    ritardi = somme(tempo_b - origine) - D*(tempo_a - origine)[None, :]
+
+    n = np.sum(D, axis = 1)
+    centri = np.sum(ritardi, axis = 1)/np.maximum(n, 1)
+
+    return D, C, E, centri
+
+
+def _correlazioni_ritardi(curve, flusso_b, matrici, metodo, varianze):
+    # correlazione (curve, bin) delle righe di curve con b dalle matrici di _matrici_ritardi()
+    D, C, E = matrici
+    n, Sb, Sbb = np.sum(D, axis = 1), np.sum(C, axis = 1), np.sum(E, axis = 1)
+
+    Sa, Saa, Sab = curve @ D.T, (curve**2) @ D.T, curve @ C.T
+
+    with np.errstate(divide = "ignore", invalid = "ignore"):
+        if metodo == "dcf":
+            ma, mb = np.mean(curve, axis = 1, keepdims = True), np.mean(flusso_b)
+            return (Sab - ma*Sb - mb*Sa + n*ma*mb)/(n*np.sqrt(varianze[0]*varianze[1]))
+
+        return (n*Sab - Sa*Sb)/np.sqrt((n*Saa - Sa**2)*(n*Sbb - Sb**2))
+
+
+def _varianza_dcf(flusso, flusso_err):
+    # varianza corretta per gli errori di misura (Edelson & Krolik), o varianza del flusso se gli errori sono maggiori
+    varianza = np.var(flusso, ddof = 1)
+    corretta = varianza - np.mean(flusso_err**2)
+
+    return corretta if corretta > 0 else varianza
+
+
+def _ccf(curve, flusso_b, n_max):
+    # correlazione delle righe di curve con b per i ritardi -n_max ... n_max passi, con un'unica trasformata zero-padded
+    n  = curve.shape[1]
+    n2 = fft.next_fast_len(2*n)
+
+    a = curve - np.mean(curve, axis = 1, keepdims = True)
+    b = flusso_b - np.mean(flusso_b)
+
+    c = fft.irfft(np.conj(fft.rfft(a, n2, axis = 1))*fft.rfft(b, n2), n2, axis = 1)
+    c = np.concatenate([c[:, n2 - n_max:], c[:, :n_max + 1]], axis = 1)
+
+    return c/(n*np.std(a[0])*np.std(b))
+
+#------------------------------------------------------------------------------------------------------------
+
+def correlazione_coppia(diz_a, diz_b, metodo = "dcf", ritardo_max = 730*86400, n_ritardi = 51, N = 1000, n_bins = 1000,
+                        seme = None, n_min = 11):
+    """
+    Funzione che calcola la correlazione incrociata di due curve di luce in funzione del ritardo, il suo picco
+    e la significatività del picco rispetto a N curve sintetiche
+
+    Parametri:
+    -------------
+    diz_a, diz_b (dictionary) : curve di luce, con le chiavi ["tempo"], ["flusso"], ["flusso_err"] e, per la CCF,
+                                ["tempi completi"] e ["flussi completi"] (stadio "interpolazione" della pipeline)
+    metodo (string)           : "dcf", "zdcf" o "ccf"
+    ritardo_max (float)       : ritardo massimo [s]
+    n_ritardi (int)           : numero di bin di ritardo (DCF, ZDCF)
+    N (int)                   : numero di curve sintetiche (permutazioni del flusso di a); con N = 0 il valore-p non viene calcolato
+    n_bins (int)              : numero di bin dell'istogramma della significatività
+    seme                      : seme delle permutazioni (int, np.random.SeedSequence o None)
+    n_min (int)               : numero minimo di coppie di misure in un bin di ritardo perché il bin venga considerato
+
+    Restituisce:
+    -------------
+    risultato (dictionary) : con le chiavi
+                             ["ritardi"]      : ritardi t_b - t_a [s] (media dei ritardi del bin per DCF e ZDCF)
+                             ["correlazione"] : correlazione per ogni ritardo (nan nei bin con meno di n_min coppie)
+                             ["errore"]       : errore sulla correlazione
+                             ["n_coppie"]     : numero di coppie di misure per ritardo (punti della griglia comune per la CCF)
+                             ["picco"]        : [ritardo, correlazione] del massimo di |correlazione|
+                             ["p"]            : valore-p del picco (None con N = 0)
+                             ["metodo"]
+
+    Note:
+    -------------
+    - un ritardo positivo indica che la curva b segue la curva a
+    - le curve sintetiche permutano i flussi di a sugli stessi tempi: per DCF e ZDCF le matrici dei bin di ritardo
+      sono quindi le stesse della curva originale
+    - per la CCF le curve interpolate vengono riportate con np.interp al passo maggiore delle due sull'intervallo comune
+
+    """
+    if metodo == "ccf":
+        dt = max(fbl.dt_moda(diz_a["tempi completi"]), fbl.dt_moda(diz_b["tempi completi"]))
+        tempo = np.arange(max(diz_a["tempi completi"][0], diz_b["tempi completi"][0]),
+                          min(diz_a["tempi completi"][-1], diz_b["tempi completi"][-1]), dt)
+
+        flusso_a = np.interp(tempo, diz_a["tempi completi"], diz_a["flussi completi"])
+        flusso_b = np.interp(tempo, diz_b["tempi completi"], diz_b["flussi completi"])
+
+        n_max = min(int(ritardo_max//dt), len(tempo) - 1)
+
+        calcola = lambda curve: _ccf(curve, flusso_b, n_max)
+        correlazione = calcola(flusso_a[None, :])[0]
+
+        ritardi  = np.arange(-n_max, n_max + 1)*dt
+        n_coppie = len(tempo) - np.abs(np.arange(-n_max, n_max + 1))
+        errore   = 1/np.sqrt(n_coppie)
+
+    else:
+        flusso_a, flusso_b = diz_a["flusso"], diz_b["flusso"]
+
+        bordi = bordi_ritardi(diz_a["tempo"], diz_b["tempo"], ritardo_max, n_ritardi, metodo)
+        D, C, E, ritardi = _matrici_ritardi(diz_a["tempo"], diz_b["tempo"], flusso_b, bordi)
+
+        varianze = (_varianza_dcf(flusso_a, diz_a["flusso_err"]), _varianza_dcf(flusso_b, diz_b["flusso_err"]))
+        n_coppie = np.sum(D, axis = 1)
+
+        calcola = lambda curve: _correlazioni_ritardi(curve, flusso_b, (D, C, E), metodo, varianze)
+        correlazione = calcola(flusso_a[None, :])[0]
+
+        with np.errstate(divide = "ignore", invalid = "ignore"):
+            if metodo == "dcf":
+                # somma di UDCF^2 = (a_i - media_a)^2 (b_j - media_b)^2 / varianze sulle coppie del bin
+                mb = np.mean(flusso_b)
+                somma_quadrati = ((flusso_a - np.mean(flusso_a))**2 @ (E - 2*mb*C + mb**2*D).T)/(varianze[0]*varianze[1])
+                errore = np.sqrt(np.maximum(somma_quadrati - n_coppie*correlazione**2, 0))/(n_coppie - 1)
+            else:
+                errore = (1 - correlazione**2)/np.sqrt(n_coppie - 3)
+
+    validi = n_coppie >= n_min
+    correlazione = np.where(validi, correlazione, np.nan)
+
+    i_picco = np.nanargmax(np.abs(correlazione))
+
+    risultato = {
+        "ritardi"      : ritardi,
+        "correlazione" : correlazione,
+        "errore"       : errore,
+        "n_coppie"     : n_coppie,
+        "picco"        : [ritardi[i_picco], correlazione[i_picco]],
+        "p"            : None,
+        "metodo"       : metodo,
+    }
+
+    if N > 0:
+        sintetiche = calcola(fbl.curve_sintetiche_blocco(flusso_a, N, seme))
+        picchi = np.max(np.abs(sintetiche[:, validi]), axis = 1)
+
+        risultato["p"] = fbl.valore_p_istogramma(fbl.istogramma_significatività(picchi, correlazione[i_picco], n_bins))
+
+    return risultato
+
+
+                                      ###########################################
+                                      #       Correlazioni di tutte le coppie   #
+                                      ###########################################
+
+def _inizializza_processo(contenitori, parametri):
+    _processo.update({"contenitori" : contenitori, "parametri" : parametri})
+
+
+def _esegui_coppia(compito):
+    chiave_a, chiave_b, seme = compito
+    c = _processo["contenitori"]
+
+    return correlazione_coppia(c[chiave_a], c[chiave_b], seme = seme, **_processo["parametri"])
+
+#------------------------------------------------------------------------------------------------------------
+
+def correlazioni(contenitori, metodo = "dcf", ritardo_gg = 730, n_ritardi = 51, N = 1000, n_bins = 1000, seme = None,
+                 n_processi = None, coppie = None):
+    """
+    Funzione che calcola la correlazione incrociata di tutte le coppie di curve di luce
+
+    Parametri:
+    -------------
+    contenitori (dictionary) : {chiave : dizionario della curva} (ad esempio modulo_pipeline_blazar.esegui(stati, "interpolazione"))
+    metodo (string)          : "dcf", "zdcf" o "ccf"
+    ritardo_gg (float)       : ritardo massimo [giorni]
+    n_ritardi, N, n_bins     : vedi correlazione_coppia()
+    seme                     : seme delle curve sintetiche (int o None); i semi delle coppie sono ricavati con
+                               np.random.SeedSequence.spawn(), per cui il risultato non dipende dal numero di processi
+    n_processi (int)         : numero di processi del pool (default: numero di CPU), con n_processi = 1
+                               le coppie vengono calcolate nel processo principale
+    coppie (list)            : coppie di chiavi (a, b) da calcolare (default: tutte le coppie di chiavi distinte)
+
+    Restituisce:
+    -------------
+    risultati (dictionary) : {(chiave a, chiave b) : risultato di correlazione_coppia()}
+
+    """
+    if coppie is None:
+        coppie = list(itertools.combinations(contenitori, 2))
+
+    if n_processi is None:
+        n_processi = os.cpu_count()
+
+    chiavi_curva = ("tempo", "flusso", "flusso_err", "tempi completi", "flussi completi")
+    contenitori = {chiave : {k : diz[k] for k in chiavi_curva if k in diz} for chiave, diz in contenitori.items()}
+
+    parametri = {"metodo" : metodo, "ritardo_max" : ritardo_gg*86400, "n_ritardi" : n_ritardi, "N" : N, "n_bins" : n_bins}
+
+    semi = np.random.SeedSequence(seme).spawn(len(coppie))
+    compiti = [(a, b, s) for (a, b), s in zip(coppie, semi)]
+
+    if n_processi == 1 or len(compiti) == 1:
+        _inizializza_processo(contenitori, parametri)
+        risultati = [_esegui_coppia(compito) for compito in compiti]
+        _processo.clear()
+    else:
+        with ProcessPoolExecutor(max_workers = n_processi, initializer = _inizializza_processo,
+                                 initargs = (contenitori, parametri)) as pool:
+            risultati = list(pool.map(_esegui_coppia, compiti, chunksize = max(len(compiti)//(4*n_processi), 1)))
+
+    return dict(zip(coppie, risultati))
+
+#------------------------------------------------------------------------------------------------------------
+
+def tabella_correlazioni(risultati):
+    """
+    Funzione che restituisce il testo della tabella dei picchi di correlazione delle coppie di curve
+
+    Parametri:
+    -------------
+    risultati (dictionary) : risultato di correlazioni()
+
+    """
+    testo = ["\033[95m     Tabella dei picchi di correlazione incrociata   \033[0m",
+             "",
+             " Coppia   | Metodo | Ritardo [gg] | Correlazione | p-value"]
+
+    for (chiave_a, chiave_b), r in risultati.items():
+        p = "  -" if r["p"] is None else "{:.5f}".format(r["p"])
+
+        testo.append("----------|--------|--------------|--------------|---------")
+        testo.append(" {:<9}| {:<7}| {:<13.1f}| {:<13.3f}| {}".format(chiave_a + "-" + chiave_b, r["metodo"].upper(),
+                     r["picco"][0]/86400, r["picco"][1], p))
+
+    return "\n".join(testo)
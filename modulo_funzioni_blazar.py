@@ -8,59 +8,382 @@ Nel seguente modulo sono contenute tutte le funzioni utilizzate per lo studio de
 
 Elenco delle funzioni contenute per categoria di utilizzo:
 
+0) Profilazione:
+     - attiva_profilo.................... r.123
+     - disattiva_profilo................. r.133
+     - stadio_profilo.................... r.144
+     - profila........................... r.197
+     - tabella_profilo................... r.226
+     - salva_trace_chrome................ r.271
+
 1) Analisi preliminare dei dati:
-     - crea_dizionario_fonte............. r.58             
-     - flusso_to_float................... r.98                        
-     - flusso_err_to_float............... r.120             
-     - trova_upper_limit................. r.144                
-     - agg_upper_limit................... r.182                 
-     - converti_to_float................. r.217                   
-     - MET_to_data_array................. r.243         
-     - MET_to_data_diz................... r.268           
+     - leggi_csv......................... r.316
+     - crea_dizionario_fonte............. r.381             
+     - flusso_to_float................... r.424                        
+     - flusso_err_to_float............... r.446             
+     - colonna_to_float.................. r.470
+     - trova_upper_limit................. r.493                
+     - agg_upper_limit................... r.532                 
+     - converti_to_float................. r.568                   
+     - ribinna_curva..................... r.594
+     - MET_to_data_array................. r.679         
+     - MET_to_data_diz................... r.704           
      
 2) Analisi di Fourier delle curve di luce                      
-     - dt_control_bool.................. r.294          
-     - dt_medio......................... r.321                  
-     - dt_moda ......................... r.350                         
-     - interpolazione................... r.373                       
-     - fft_diz.......................... r.447                          
+     - dt_control_bool.................. r.730          
+     - dt_medio......................... r.757                  
+     - dt_moda ......................... r.786                         
+     - interpolazione................... r.810                       
+     - interpolazione_blocco............ r.834
+     - preelabora....................... r.924
+     - fft_diz.......................... r.1006                          
              
 3) Fit dei dati
-    - fit    .......................... r. 494                                                              
-    - fit_pwsp ........................ r. 514                
+    - fit    .......................... r. 1053                                                              
+    - fit_pwsp ........................ r. 1074                
 
 4) Periodicità
-    - picco_periodo ................... r. 562            
+    - picco_periodo ................... r. 1138            
+    - picco_periodo_blocco ............ r. 1185
+    - picco_potenza_blocco ............ r. 1217
+    - picchi_multipli ................. r. 1249
+    - ricampiona_curva ................ r. 1315
+    - incertezza_periodo .............. r. 1376
+    - affina_picchi ................... r. 1455
+    - affina_picco .................... r. 1529
+    - spettri_colonne ................. r. 1552
 
 5) Curve sintetiche e significatività
-    - curve_sintetiche_diz .............. r.612                
-    - fft_curve_sintetiche_diz........... r.650 
-    - picco_periodo_sint................. r.702    
-    - ar_picchi_sintetici................ r.742   
-    - significatività_int................ r.776            
+    - curve_sintetiche_diz .............. r.1645                
+    - fft_curve_sintetiche_diz........... r.1684 
+    - picco_periodo_sint................. r.1736    
+    - ar_picchi_sintetici................ r.1777   
+    - picchi_sintetici_tagli............. r.1810
+    - picchi_sintetici_taglio............ r.1849
+    - curve_sintetiche_blocco............ r.1863
+    - picchi_sintetici_blocco............ r.1893
+    - istogramma_significatività......... r.1923
+    - valore_p_istogramma................ r.1960
+    - valori_p_istogramma................ r.1991
+    - significatività_int................ r.2025
 
 """
 import numpy as np
-import matplotlib.pyplot as plt
-import pandas as pd
-import scipy as sc
-import math
-from scipy import  fft, optimize
-from scipy.stats import mode
+from scipy import  fft
 from datetime import datetime, timedelta
-import matplotlib.dates as mdates
+from contextlib import contextmanager
+from functools import wraps
+import json, os, sys, time
+
+try:
+    import resource
+except ImportError:   # non disponibile su Windows: l'aumento del RSS non viene registrato
+    resource = None
+
+# Il modulo non importa matplotlib, pandas e scipy.optimize: in questo modo l'analisi numerica può essere
+# eseguita anche su macchine senza display e con un tempo di avvio ridotto.
+# scipy.optimize viene importato solo al primo utilizzo in fit_pwsp().
+
+
+                                      ###########################################
+                                      #        Profilazione delle funzioni      #
+                                      ###########################################
+
+# Lo stato della profilazione è un unico dizionario a livello di modulo: quando la profilazione non è attiva
+# le funzioni decorate con profila() e i blocchi stadio_profilo() si limitano a controllare _profilo["attivo"],
+# per cui possono restare nel codice anche durante le analisi normali.
+
+_profilo = {"attivo" : False, "eventi" : [], "fonte" : None, "t0" : 0.0}
+
+
+def _rss_massimo():
+    # massimo RSS del processo in kB (ru_maxrss è in kB su Linux e in byte su macOS), 0 se non disponibile
+    if resource is None:
+        return 0
+
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    return rss // 1024 if sys.platform == "darwin" else rss
+
+
+def _dimensione(oggetto):
+    # dimensione di un argomento: numero di elementi per gli array, numero di punti del flusso o di chiavi per i dizionari
+    if isinstance(oggetto, np.ndarray):
+        return oggetto.size
+
+    if isinstance(oggetto, dict):
+        if "flusso" in oggetto:
+            return len(oggetto["flusso"])
+        return len(oggetto)
+
+    return None
+
+#-------------------------------------------------------------------
+
+def attiva_profilo():
+    """
+    Funzione che attiva la profilazione ed azzera gli eventi registrati in precedenza
+    """
+    _profilo["attivo"] = True
+    _profilo["eventi"] = []
+    _profilo["fonte"]  = None
+    _profilo["t0"]     = time.perf_counter()
+
+
+def disattiva_profilo():
+    """
+    Funzione che disattiva la profilazione e restituisce la lista degli eventi registrati
+    """
+    _profilo["attivo"] = False
+
+    return _profilo["eventi"]
+
+#-------------------------------------------------------------------
+
+@contextmanager
+def stadio_profilo(nome, fonte = None, **dimensioni):
+    """
+    Context manager che registra un evento di profilazione per il blocco di codice che racchiude
+
+    Parametri:
+    -------------
+    nome (string)   : nome dello stadio o della funzione
+    fonte (string)  : etichetta della fonte (es. "1M"), se None viene utilizzata quella del blocco più esterno;
+                      viene ereditata da tutti i blocchi e le funzioni profilate al suo interno
+    **dimensioni    : dimensioni degli array coinvolti (es. n_punti = len(flusso))
+
+    Restituisce:
+    -------------
+    evento (dictionary) : dizionario dell'evento, a cui possono essere aggiunte dimensioni calcolate all'interno del blocco
+                          (vuoto e non registrato se la profilazione non è attiva)
+
+    Note:
+    -----------
+    - per ogni evento vengono registrati il tempo reale (time.perf_counter()), il tempo di CPU (time.process_time()),
+      l'aumento del massimo RSS del processo (in kB) e l'istante di inizio rispetto ad attiva_profilo()
+    - l'aumento del massimo RSS è nullo se il blocco non supera il massimo raggiunto in precedenza dal processo
+
+    """
+    if not _profilo["attivo"]:
+        yield {}
+        return
+
+    fonte_esterna = _profilo["fonte"]
+    if fonte is None:
+        fonte = fonte_esterna
+    _profilo["fonte"] = fonte
+
+    evento = {"nome" : nome, "fonte" : fonte, "dimensioni" : dict(dimensioni)}
+
+    rss_0 = _rss_massimo()
+    cpu_0 = time.process_time()
+    t_0   = time.perf_counter()
+
+    try:
+        yield evento["dimensioni"]
+    finally:
+        t_1 = time.perf_counter()
+
+        evento["inizio"] = t_0 - _profilo["t0"]
+        evento["tempo"]  = t_1 - t_0
+        evento["cpu"]    = time.process_time() - cpu_0
+        evento["rss"]    = _rss_massimo() - rss_0
+
+        _profilo["fonte"] = fonte_esterna
+        _profilo["eventi"].append(evento)
+
+#-------------------------------------------------------------------
+
+def profila(funzione):
+    """
+    Decoratore che registra un evento di profilazione ad ogni chiamata della funzione
+
+    Note:
+    -----------
+    - come dimensioni vengono registrate quelle degli argomenti array e dizionario (vedi stadio_profilo())
+    - se la profilazione non è attiva la funzione viene chiamata direttamente
+
+    """
+    @wraps(funzione)
+    def funzione_profilata(*args, **kwargs):
+
+        if not _profilo["attivo"]:
+            return funzione(*args, **kwargs)
+
+        dimensioni = {}
+        for i, arg in enumerate(args):
+            n = _dimensione(arg)
+            if n is not None:
+                dimensioni["arg{}".format(i)] = n
+
+        with stadio_profilo(funzione.__name__, **dimensioni):
+            return funzione(*args, **kwargs)
+
+    return funzione_profilata
+
+#-------------------------------------------------------------------
+
+def tabella_profilo(eventi = None):
+    """
+    Funzione che riassume gli eventi di profilazione in una tabella, raggruppandoli per nome
+
+    Parametri:
+    -------------
+    eventi (list) : lista degli eventi, di default quelli registrati dall'ultima chiamata di attiva_profilo()
+
+    Restituisce:
+    -------------
+    tabella (string) : con numero di chiamate, tempo reale totale e massimo, tempo di CPU totale, massimo aumento
+                       del RSS e massima dimensione registrata, ordinata per tempo reale totale decrescente
+
+    Note:
+    -----------
+    - i tempi degli eventi annidati sono compresi anche in quelli degli eventi che li contengono
+
+    """
+    if eventi is None:
+        eventi = _profilo["eventi"]
+
+    gruppi = {}
+
+    for ev in eventi:
+        g = gruppi.setdefault(ev["nome"], {"chiamate" : 0, "tempo" : 0.0, "max" : 0.0, "cpu" : 0.0, "rss" : 0, "n" : 0, "fonti" : set()})
+        g["chiamate"] += 1
+        g["tempo"]    += ev["tempo"]
+        g["max"]       = max(g["max"], ev["tempo"])
+        g["cpu"]      += ev["cpu"]
+        g["rss"]       = max(g["rss"], ev["rss"])
+        g["n"]         = max([g["n"]] + [v for v in ev["dimensioni"].values() if isinstance(v, (int, np.integer))])
+        if ev["fonte"] is not None:
+            g["fonti"].add(ev["fonte"])
+
+    righe = [" {:<28}| chiamate | tempo [s] | max [s]  | CPU [s]  | ΔRSS [MB] | max dim.  | fonti".format("Stadio / funzione"),
+             "-"*29 + "|----------|-----------|----------|----------|-----------|-----------|-------"]
+
+    for nome, g in sorted(gruppi.items(), key = lambda el: -el[1]["tempo"]):
+        righe.append(" {:<28}| {:>8} | {:>9.3f} | {:>8.3f} | {:>8.3f} | {:>9.1f} | {:>9} | {}".format(
+            nome, g["chiamate"], g["tempo"], g["max"], g["cpu"], g["rss"]/1024, g["n"], " ".join(sorted(g["fonti"]))))
+
+    return "\n".join(righe)
+
+#-------------------------------------------------------------------
+
+def salva_trace_chrome(nome_file, eventi = None):
+    """
+    Funzione che salva gli eventi di profilazione nel formato Trace Event JSON, leggibile con
+    chrome://tracing o con https://ui.perfetto.dev
+
+    Parametri:
+    -------------
+    nome_file (string) : nome del file JSON
+    eventi (list)      : lista degli eventi, di default quelli registrati dall'ultima chiamata di attiva_profilo()
+
+    Note:
+    -----------
+    - ogni evento è di tipo "X" (evento completo) con tempi in microsecondi; gli eventi di ogni fonte sono
+      disposti su una riga (tid) separata, quelli senza fonte sulla riga 0
+
+    """
+    if eventi is None:
+        eventi = _profilo["eventi"]
+
+    righe = {None : 0}
+    trace = []
+
+    for ev in sorted(eventi, key = lambda e: e["inizio"]):
+        tid = righe.setdefault(ev["fonte"], len(righe))
+
+        argomenti = {"cpu_s" : ev["cpu"], "rss_delta_kB" : ev["rss"]}
+        argomenti.update({k : (int(v) if isinstance(v, np.integer) else v) for k, v in ev["dimensioni"].items()})
+
+        trace.append({"name" : ev["nome"], "cat" : "blazar", "ph" : "X", "pid" : os.getpid(), "tid" : tid,
+                      "ts" : ev["inizio"]*1e6, "dur" : ev["tempo"]*1e6, "args" : argomenti})
+
+    for fonte, tid in righe.items():
+        trace.append({"name" : "thread_name", "ph" : "M", "pid" : os.getpid(), "tid" : tid,
+                      "args" : {"name" : "fonte {}".format(fonte) if fonte is not None else "generale"}})
+
+    with open(nome_file, "w") as f:
+        json.dump({"traceEvents" : trace, "displayTimeUnit" : "ms"}, f)
+
 
 
                                       ###########################################
                                       #     Analisi preliminare dei dati        #
                                       ###########################################
 
+@profila
+def leggi_csv(nome_file, dal_byte = 0):
+    """
+    Funzione che legge un file CSV del Fermi LAT Light Curve Repository senza utilizzare pandas
+
+    Parametri:
+    ---------------
+    nome_file (string) : percorso del file CSV
+    dal_byte (int)     : se maggiore di 0 vengono lette solo le righe che iniziano da questa posizione del file
+                         (ad esempio le righe aggiunte dopo una lettura precedente, vedi modulo_aggiornamento_blazar)
+
+    Restituisce:
+    ----------------
+    colonne (dictionary) : dizionario {nome colonna : array} che può essere utilizzato al posto del dataframe
+                           nella funzione crea_dizionario_fonte()
+
+    Note:
+    ------------
+    - come pandas.read_csv(), le colonne che contengono solo numeri vengono convertite in array di (int) o (float),
+      mentre le altre (ad esempio quella del flusso con gli upper limit "<") restano array di (string) di tipo object
+    - evitare l'import di pandas riduce sensibilmente il tempo di avvio dell'analisi numerica
+    - se non ci sono righe da leggere restituisce colonne vuote
+
+    """
+    import csv
+
+    with open(nome_file, newline = "") as f:
+        lettore = csv.reader(f)
+        nomi = next(lettore)
+
+        if dal_byte > 0:
+            f.seek(dal_byte)
+            lettore = csv.reader(f)
+
+        righe = [riga for riga in lettore if len(riga) > 0]
+
+    dati = np.array(righe, dtype = object).reshape(len(righe), len(nomi))
+
+    colonne = {}
+
+    for j in range(0, len(nomi)):
+        ar = dati[:, j]
+
+        for tipo in (int, float):
+            try:
+                ar = ar.astype(tipo)
+                break
+            except ValueError:
+                pass
+
+        colonne[nomi[j]] = ar
+
+    return colonne
+
+#-----------------------------------------------------------------------------------------------------------------------
+
+# colonne aggiuntive dei file CSV del Fermi LAT caricate da crea_dizionario_fonte() (nome breve : nome della colonna)
+
+COLONNE_FONTE = {
+    "indice" : "Photon Index",
+    "ts"     : "TS",
+    "sole"   : "Sun Distance",
+}
+
+
+@profila
 def crea_dizionario_fonte(df, nome_fonte):
     """
     Funzione che crea un dizionario contenente tutti i dati una fonte
     Parametri:
     ---------------
-    df  (dataframe pandas) :  contenente i dati da analizzare, il dataframe deve avere le seguenti colonne:
+    df  (dataframe pandas) :  contenente i dati da analizzare (oppure il dizionario restituito da leggi_csv()), deve avere le seguenti colonne:
                              ['MET'] , ['Photon Flux [0.1-100 GeV](photons cm-2 s-1)'] , ['Photon Flux Error(photons cm-2 s-1)']
     nome_fonte (string)    : nome associato alla fonte 
     
@@ -80,14 +403,17 @@ def crea_dizionario_fonte(df, nome_fonte):
                     
     Note:
     ------------
-    La funzione, oltre a creare il dizionario, converte le colonne dei dataframe in array di numpy con la funzione  .to_numpy()
+    La funzione, oltre a creare il dizionario, converte le colonne dei dataframe in array di numpy con la funzione np.asarray()
+    Le colonne di COLONNE_FONTE presenti nel dataframe vengono aggiunte, convertite in float, nella chiave ["colonne"]
+    come dizionario {nome breve : array} (vedi colonna_to_float())
 
     """
     diz_fonte = {
         "nome"       : nome_fonte, 
-        "flusso"     : df['Photon Flux [0.1-100 GeV](photons cm-2 s-1)'].to_numpy(),
-        "flusso_err" : df['Photon Flux Error(photons cm-2 s-1)'].to_numpy(),
-        "tempo"      : df['MET'].to_numpy()
+        "flusso"     : np.asarray(df['Photon Flux [0.1-100 GeV](photons cm-2 s-1)']),
+        "flusso_err" : np.asarray(df['Photon Flux Error(photons cm-2 s-1)']),
+        "tempo"      : np.asarray(df['MET']),
+        "colonne"    : {nome : colonna_to_float(df[colonna]) for nome, colonna in COLONNE_FONTE.items() if colonna in df}
     }
    
 
@@ -141,6 +467,29 @@ def flusso_err_to_float(ar):
 
 #-------------------------------------------------------------------------------------------------------------------------
 
+def colonna_to_float(ar):
+    """
+    Funzione che converte in float una colonna aggiuntiva del file CSV (vedi COLONNE_FONTE), in cui il carattere "-"
+    indica un valore mancante (ad esempio l'indice di fotone degli upper limit), che viene convertito in NaN
+
+    Parametri:
+    -------------
+    ar (array) : array di (string), (int) o (float)
+
+    Restituisce:
+    -------------
+    array : array di (float)
+
+    """
+    ar = np.asarray(ar)
+
+    if ar.dtype.kind in "iuf":
+        return ar.astype(float)
+
+    return np.where(ar == "-", "nan", ar).astype(float)
+
+#-------------------------------------------------------------------------------------------------------------------------
+
 def trova_upper_limit(flusso, tempo):
     """
     Funzione che individua gli upper limit del flusso.
@@ -179,6 +528,7 @@ def trova_upper_limit(flusso, tempo):
 
 #------------------------------------------------------------------------------------------------------------------------------------
 
+@profila
 def agg_upper_limit(diz):
     """
     Funzione che individua gli upper limit dei dati delle fonti e li aggiunge come chiavi al dizionario della fonte
@@ -214,6 +564,7 @@ def agg_upper_limit(diz):
 
 #--------------------------------------------------------------------------------------------------------------
 
+@profila
 def converti_to_float(diz):
     """
     Funzione che converte i dati del flusso e del relativo errore in float
@@ -237,9 +588,94 @@ def converti_to_float(diz):
         diz['flusso'] =      flusso_to_float(diz['flusso'])
         diz['flusso_err']  = flusso_err_to_float(diz['flusso_err'])
 
+#----------------------------------------------------------------------------------------------------------
+
+@profila
+def ribinna_curva(diz, fattore, limiti = "conservativo"):
+    """
+    Funzione che ricava una curva di luce con bin più larghi raggruppando fattore bin consecutivi della curva
+    (ad esempio una curva di 4 settimane da quella settimanale), senza leggere altri file
+
+    Parametri:
+    -------------
+    diz (dictionary) : dizionario della fonte con flusso ed errore già convertiti in float (vedi converti_to_float())
+                       e le chiavi degli upper limit (vedi agg_upper_limit())
+    fattore (int)    : numero di bin della curva in ogni nuovo bin
+    limiti (string)  : trattamento degli upper limit
+                       "conservativo" : un nuovo bin che contiene almeno un upper limit è un upper limit
+                       "rilevazioni"  : gli upper limit vengono ignorati nei bin che contengono rilevazioni,
+                                        un nuovo bin è un upper limit solo se contiene solo upper limit
+
+    Restituisce:
+    -------------
+    ribinnata (dictionary) : nuovo dizionario della fonte con le chiavi ["nome"], ["tempo"], ["flusso"], ["flusso_err"],
+                             ["upper_lim_flusso"], ["upper_lim_tempo"] e ["colonne"], nello stesso formato di diz
+                             (le colonne aggiuntive sono la media dei valori non mancanti di ogni gruppo)
+
+    Note:
+    -------------
+    - i bin vengono raggruppati sulla griglia del passo più frequente (dt_moda()) a partire dal primo bin, per cui i bin
+      mancanti non spostano i raggruppamenti successivi; il tempo di un nuovo bin è il centro nominale del raggruppamento
+    - il flusso delle rilevazioni è la media pesata con l'inverso della varianza, con errore 1/sqrt(somma dei pesi)
+    - il valore di un upper limit è la media dei valori dei bin, con gli upper limit al loro valore e le rilevazioni al
+      flusso + 2 sigma (gli upper limit del Fermi LAT sono al 95%); come nel dizionario originale l'errore è NaN
+    - le somme di tutti i gruppi vengono calcolate insieme con np.add.reduceat()
+
+    """
+    tempo, flusso, errore = diz["tempo"], diz["flusso"], diz["flusso_err"]
+
+    dt = dt_moda(tempo)
+
+    gruppi = np.rint((tempo - tempo[0])/dt).astype(np.int64)//fattore
+    inizi  = np.flatnonzero(np.r_[True, np.diff(gruppi) != 0])
+
+    upper = np.isin(tempo, diz["upper_lim_tempo"])
+    rilevati = ~upper
+
+    pesi = np.where(rilevati, 1/np.where(rilevati, errore, 1)**2, 0)
+
+    somma_pesi    = np.add.reduceat(pesi, inizi)
+    somma_flussi  = np.add.reduceat(pesi*np.where(rilevati, flusso, 0), inizi)
+    somma_limiti  = np.add.reduceat(np.where(rilevati, flusso + 2*np.where(rilevati, errore, 0), flusso), inizi)
+    n_rilevati    = np.add.reduceat(rilevati.astype(np.int64), inizi)
+    n_bin         = np.diff(np.r_[inizi, len(tempo)])
+
+    if limiti == "conservativo":
+        bin_upper = n_rilevati < n_bin
+    elif limiti == "rilevazioni":
+        bin_upper = n_rilevati == 0
+    else:
+        raise ValueError("Trattamento degli upper limit {} non valido, i valori accettati sono: conservativo, rilevazioni".format(limiti))
+
+    with np.errstate(divide = "ignore", invalid = "ignore"):
+        flusso_nuovo = np.where(bin_upper, somma_limiti/n_bin, somma_flussi/somma_pesi)
+        errore_nuovo = np.where(bin_upper, np.nan, 1/np.sqrt(somma_pesi))
+
+    tempo_nuovo = tempo[0] + (gruppi[inizi]*fattore + (fattore - 1)/2)*dt
+
+    colonne = {}
+    for nome, colonna in diz.get("colonne", {}).items():
+        # media dei valori non mancanti di ogni gruppo
+        validi = np.isfinite(colonna)
+        with np.errstate(divide = "ignore", invalid = "ignore"):
+            colonne[nome] = np.add.reduceat(np.where(validi, colonna, 0), inizi)/np.add.reduceat(validi.astype(np.int64), inizi)
+
+    ribinnata = {
+        "nome"             : diz["nome"],
+        "flusso"           : flusso_nuovo,
+        "flusso_err"       : errore_nuovo,
+        "tempo"            : tempo_nuovo,
+        "upper_lim_flusso" : flusso_nuovo[bin_upper],
+        "upper_lim_tempo"  : tempo_nuovo[bin_upper],
+        "colonne"          : colonne,
+    }
+
+    return ribinnata
+
 
 #----------------------------------------------------------------------------------------------------------
 
+@profila
 def MET_to_data_array(array):
     """
     Funzione che dato un array di dati temporali espresso in Mission Elapsed Time (MET)
@@ -370,6 +806,7 @@ def dt_moda(tempo):
 
 #----------------------------------------------------------------------------------------------------------
 
+@profila
 def interpolazione(diz):
     """
     Funzione che effettua l'interpolazione dei dati di flusso e tempo
@@ -384,66 +821,188 @@ def interpolazione(diz):
 
     Note:
     ------------
-    - utilizza la funzione dt_moda() definita in questo modulo
+    - utilizza la funzione interpolazione_blocco() definita in questo modulo, con il flusso come unica riga
                   
     """
-    flusso = diz["flusso"]
-    tempo  = diz["tempo"]
+    tempi_completi, flussi_completi = interpolazione_blocco(diz["tempo"], diz["flusso"][None, :])
 
-    ar_dt = np.diff(tempo)
-    dt_ok = dt_moda(tempo)
+    diz["flussi completi"] = flussi_completi[0]
+    diz["tempi completi"]  = tempi_completi
 
-    flussi_completi = flusso.copy()
+#-----------------------------------------------------------------------------------------------------------
 
-    indici_flussi_mancanti = np.empty(0)
-    valori_flussi_mancanti = np.empty(0)
- 
+def interpolazione_blocco(tempo, blocco):
+    """
+    Funzione che interpola sulla griglia completa tutte le righe di un blocco di colonne misurate agli stessi tempi
+    (ad esempio flusso, indice di fotone e TS), con un unico calcolo degli istanti e dei pesi di interpolazione
 
-    for i in range(0, len(ar_dt)):
-        
-        if ar_dt[i] != dt_ok :
-           
-            n_mancanti = int(( ar_dt[i] / dt_ok) -1)
-            t_1 = tempo[i - 1]
+    Parametri:
+    ----------------
+    tempo (array)  : tempi delle misure
+    blocco (array) : matrice (n_colonne, len(tempo)) dei valori misurati
 
-            if n_mancanti == 1:
-                
-                t_buco = t_1 +  dt_ok
-                y = np.interp(t_buco, tempo, flusso)
-                
-                valori_flussi_mancanti = np.append(valori_flussi_mancanti, y)
-                indici_flussi_mancanti = np.append(indici_flussi_mancanti, i)
+    Restituisce:
+    -------------
+    tempi_completi (array) : griglia dei tempi con passo dt_moda()
+    completo (array)       : matrice (n_colonne, n) dei valori con i bin mancanti interpolati
 
-  
-            if n_mancanti > 1:
-                timestamp_mancanti = np.empty(0)
-                indici_mancanti_float = np.empty(0)
+    Note:
+    ------------
+    - i bin mancanti vengono inseriti con gli stessi istanti e nelle stesse posizioni del ciclo originale di interpolazione():
+      per un buco di un bin il valore inserito è quello interpolato in t_(i-1) + dt, per buchi più lunghi in t_(i-1) + (j+1) dt
+    - i valori sono calcolati con la stessa formula di np.interp(), per cui ogni riga coincide con np.interp() sulla riga
 
-                for j in range(0, n_mancanti):
-                    
-                    t_buco = t_1 + (j + 1) * dt_ok
-                    
-                    timestamp_mancanti = np.append(timestamp_mancanti, t_buco)
-                    indici_mancanti_float = np.append(indici_mancanti_float, i + 1)
-                    indici_mancanti = indici_mancanti_float.astype(int)
-                    
+    """
+    dt_ok = dt_moda(tempo)
+    ar_dt = np.diff(tempo)
 
-                y_ar = np.interp(timestamp_mancanti, tempo, flusso)
-                
-                valori_flussi_mancanti = np.append(valori_flussi_mancanti, y_ar)
-                indici_flussi_mancanti = np.append(indici_flussi_mancanti, indici_mancanti)
+    buchi = np.flatnonzero(ar_dt != dt_ok)
+    n_mancanti = (ar_dt[buchi] / dt_ok - 1).astype(int)
+
+    buchi, n_mancanti = buchi[n_mancanti > 0], n_mancanti[n_mancanti > 0]
+
+    # posizione di ogni bin mancante all'interno del proprio buco (0, 1, ..., n_mancanti - 1)
+    j = np.arange(np.sum(n_mancanti)) - np.repeat(np.cumsum(n_mancanti) - n_mancanti, n_mancanti)
+
+    t_buchi = np.repeat(tempo[buchi - 1], n_mancanti) + (j + 1) * dt_ok
+    indici  = np.repeat(np.where(n_mancanti == 1, buchi, buchi + 1), n_mancanti)
+
+    k = np.clip(np.searchsorted(tempo, t_buchi, side = "right") - 1, 0, len(tempo) - 2)
+    pendenze = (blocco[:, k + 1] - blocco[:, k]) / (tempo[k + 1] - tempo[k])
+    valori = np.where(t_buchi >= tempo[-1], blocco[:, -1:], np.where(t_buchi <= tempo[0], blocco[:, :1],
+                                                                     pendenze * (t_buchi - tempo[k]) + blocco[:, k]))
 
     tempi_completi = np.arange(tempo[0] , tempo[-1] + dt_ok , dt_ok)
 
-    indici_flussi_mancanti = indici_flussi_mancanti.astype(int)
-    flussi_completi = np.insert(flussi_completi, indici_flussi_mancanti, valori_flussi_mancanti, )
+    return tempi_completi, np.insert(blocco, indici, valori, axis = 1)
 
-    diz["flussi completi"] = flussi_completi
-    diz["tempi completi"]  = tempi_completi
+#-----------------------------------------------------------------------------------------------------------
+
+# matrici del trend di preelabora(), che dipendono solo dai tempi: vengono calcolate una sola volta per tutti i blocchi
+# di curve sintetiche {(detrend, grado o frazione, tempi) : matrice}
+
+_operatori_trend = {}
+
+
+def _operatore_trend(tempo, detrend, parametro):
+    # base ortonormale (n, grado + 1) dei polinomi oppure matrice LOESS (n, n), memorizzate in _operatori_trend
+    chiave = (detrend, parametro, tempo.tobytes())
+
+    if chiave not in _operatori_trend:
+        if len(_operatori_trend) >= 16:
+            _operatori_trend.clear()
+
+        if detrend == "polinomio":
+            u = 2 * (tempo - tempo[0]) / (tempo[-1] - tempo[0]) - 1
+            _operatori_trend[chiave] = np.linalg.qr(np.polynomial.legendre.legvander(u, parametro))[0]
+        else:
+            _operatori_trend[chiave] = _matrice_loess(tempo, parametro)
+
+    return _operatori_trend[chiave]
+
+
+def _matrice_loess(tempo, frazione):
+    # matrice (n, n) dello smoothing lineare locale con pesi tricubici: il trend delle righe di un blocco è blocco @ L.T
+    n = len(tempo)
+    q = min(max(int(np.ceil(frazione * n)), 2), n)
+
+    distanze = np.abs(tempo[None, :] - tempo[:, None])
+    h = np.partition(distanze, q - 1, axis = 1)[:, q - 1:q]
+
+    pesi = np.clip(1 - (distanze / h)**3, 0, None)**3
+
+    # retta dei minimi quadrati pesati centrata in ogni tempo: L_ij = w_ij (S2 - (t_j - t_i) S1) / (S0 S2 - S1^2)
+    dx = tempo[None, :] - tempo[:, None]
+    S0 = np.sum(pesi, axis = 1, keepdims = True)
+    S1 = np.sum(pesi * dx, axis = 1, keepdims = True)
+    S2 = np.sum(pesi * dx**2, axis = 1, keepdims = True)
+
+    return pesi * (S2 - dx * S1) / (S0 * S2 - S1**2)
+
+
+@profila
+def preelabora(curve, tempo, log = False, clip = None, detrend = None, grado = 1, frazione = 0.3, finestra = None, alfa = 0.5):
+    """
+    Funzione che prepara le curve di luce interpolate alla trasformata di Fourier: trasformazione logaritmica, taglio dei flare,
+    rimozione del trend e finestra, nell'ordine. Tutte le righe di un blocco vengono elaborate insieme, per cui la stessa
+    chiamata si applica alla curva originale e alle curve sintetiche
+
+    Parametri:
+    ----------------
+    curve (array)    : flusso interpolato (n) oppure matrice (N, n) di curve agli stessi tempi
+    tempo (array)    : tempi completi [s] (n)
+    log (boolean)    : se True le curve vengono sostituite dal loro logaritmo in base 10
+    clip (float)     : se indicato, i valori oltre mediana + clip*sigma di ogni riga vengono riportati a quel valore,
+                       con sigma = 1.4826*MAD (deviazione mediana assoluta)
+    detrend (string) : None, "media" (sottrae la media), "polinomio" (sottrae il polinomio di grado grado dei minimi quadrati)
+                       o "loess" (sottrae la regressione lineare locale con pesi tricubici sulla frazione frazione dei tempi)
+    grado (int)      : grado del polinomio per detrend = "polinomio"
+    frazione (float) : frazione dei bin nell'intorno di ogni tempo per detrend = "loess"
+    finestra (string): None, "hann" o "tukey", normalizzata in modo da conservare la potenza media della curva
+    alfa (float)     : frazione della finestra di Tukey con il profilo a coseno (alfa = 1: finestra di Hann)
+
+    Restituisce:
+    -------------
+    curve elaborate, con la stessa forma e lo stesso tipo di curve (float64 se curve sono intere)
+
+    Note:
+    ------------
+    - mediana e MAD non cambiano permutando i valori, per cui il taglio di ogni curva sintetica avviene alla stessa
+      soglia della curva originale
+    - il trend polinomiale è la proiezione delle righe su una base ortonormale (QR dei polinomi di Legendre nei tempi
+      riscalati in [-1, 1]) e il trend LOESS un prodotto per una matrice (n, n) che dipende solo dai tempi:
+      le matrici vengono calcolate una sola volta per tutte le righe e riutilizzate per i blocchi successivi
+    - con una finestra e detrend = None viene comunque sottratta la media, altrimenti la finestra sposterebbe la potenza
+      del valore medio sulle frequenze più basse
+    - i calcoli sul blocco vengono eseguiti nel tipo delle curve (le matrici del trend e la finestra vengono convertite),
+      per cui un blocco float32 non viene mai copiato in float64
+
+    """
+    forma = np.shape(curve)
+    blocco = np.atleast_2d(np.asarray(curve))
+    if not np.issubdtype(blocco.dtype, np.floating):
+        blocco = blocco.astype(float)
+    tipo = blocco.dtype
+    tempo = np.asarray(tempo, dtype = float)
+
+    if log:
+        blocco = np.log10(np.clip(blocco, np.finfo(tipo).tiny, None))
+
+    if clip is not None:
+        mediana = np.median(blocco, axis = 1, keepdims = True)
+        sigma = 1.4826 * np.median(np.abs(blocco - mediana), axis = 1, keepdims = True)
+        blocco = np.minimum(blocco, mediana + clip * sigma)
+
+    if detrend is None and finestra is not None:
+        detrend = "media"
+
+    if detrend == "media":
+        blocco = blocco - np.mean(blocco, axis = 1, keepdims = True)
+    elif detrend == "polinomio":
+        Q = _operatore_trend(tempo, detrend, grado).astype(tipo, copy = False)
+        blocco = blocco - (blocco @ Q) @ Q.T
+    elif detrend == "loess":
+        blocco = blocco - blocco @ _operatore_trend(tempo, detrend, frazione).T.astype(tipo, copy = False)
+    elif detrend is not None:
+        raise ValueError("Detrend {} non valido, i valori accettati sono: media, polinomio, loess".format(detrend))
+
+    if finestra is not None:
+        from scipy.signal import windows
+
+        if finestra == "hann":
+            w = windows.hann(len(tempo), sym = False)
+        elif finestra == "tukey":
+            w = windows.tukey(len(tempo), alfa, sym = False)
+        else:
+            raise ValueError("Finestra {} non valida, i valori accettati sono: hann, tukey".format(finestra))
+
+        blocco = blocco * (w / np.sqrt(np.mean(w**2))).astype(tipo)
+
+    return blocco.reshape(forma)
 
-    
 #-----------------------------------------------------------------------------------------------------------
 
+@profila
 def fft_diz(diz, interp = False):
     """
     Funzione che effettua lo studio in frequenza delle curve di luce, calcola le frequenze e le potenze
@@ -511,6 +1070,7 @@ def fit(x , N, beta) :
 
 #-------------------------------------------------------------------
 
+@profila
 def fit_pwsp(diz, fit_func, p0_guess, interp = False):
     """
     Funzione che effettua il fit con una funzione definita sui dati dell'analisi in frequenza
@@ -536,6 +1096,7 @@ def fit_pwsp(diz, fit_func, p0_guess, interp = False):
     - utilizza la funzione optimize.curve_fit() di Scipy optimize
     - per il fit viene escluso il primo punto dei dati a disposizione
     """
+    from scipy import optimize
     
     if interp == False:
         freq = diz["frequenza"]
@@ -545,7 +1106,21 @@ def fit_pwsp(diz, fit_func, p0_guess, interp = False):
         freq = diz["frequenza interp"]
         pot  = diz["ck interp"]
 
-    params , params_covariance = optimize.curve_fit(fit_func, freq[1:len(freq)//2], np.abs(pot[1:len(pot)//2])**2, p0 = p0_guess, maxfev = 1200000)
+    with stadio_profilo("curve_fit", n_punti = len(freq)//2 - 1) as dimensioni:
+
+        if _profilo["attivo"]:
+            # durante la profilazione viene contato il numero di valutazioni della funzione di fit
+            valutazioni = [0]
+            funzione = fit_func
+
+            def fit_func(*args):
+                valutazioni[0] += 1
+                return funzione(*args)
+
+        params , params_covariance = optimize.curve_fit(fit_func, freq[1:len(freq)//2], np.abs(pot[1:len(pot)//2])**2, p0 = p0_guess, maxfev = 1200000)
+
+        if _profilo["attivo"]:
+            dimensioni["valutazioni"] = valutazioni[0]
 
     diz["params fit"] = params
     diz["params covariance fit"]= params_covariance
@@ -559,6 +1134,7 @@ def fit_pwsp(diz, fit_func, p0_guess, interp = False):
                            #      Periodicità       #
                            ##########################
 
+@profila
 def picco_periodo(diz , f_taglio, interp = True, return_pot = True):
     """
     Funzione che individua il picco associato al periodo a partire dallo spettro di potenza di una fonte
@@ -603,42 +1179,499 @@ def picco_periodo(diz , f_taglio, interp = True, return_pot = True):
     
     return periodo
    
+#-------------------------------------------------------------------
 
-                      #########################################
-                      #  Curve sintetiche e Significatività   #
-                      #########################################
-
-                      
-def curve_sintetiche_diz(diz, N):
+@profila
+def picco_periodo_blocco(curve, freq, f_taglio):
     """
-    Funzione per la creazione di curve sintetiche a partire dai dati di una curva di luce.
-    Restituisce un dizionario contenente le curve sintetiche
+    Funzione che individua il picco dello spettro di ciascuna curva di un blocco (righe di una matrice),
+    con un'unica trasformata sulle righe
 
     Parametri:
-    -------------------
-    diz (dictionary)   : contenente le informazioni di flusso e tempo della curva di luce
-    N   (int)          : numero di curve sintetiche da generare
+    -----------
+    curve (array)    : matrice (n_curve, n) dei flussi interpolati
+    freq (array)     : frequenze della trasformata di lunghezza n (fft.fftfreq(n, d = dt))
+    f_taglio (float) : valore in frequenza al di sotto della quale il contributo viene considerato costante
 
     Restituisce:
-    ----------------------
-    curve_sintetiche (dictionary) : contenente nella chiave ["tempo"] i dati temporali comuni a tutte le curve di luce,
-                                    e nelle N chiavi ["flusso i"] con i in [1, N] i dati del flusso di ogni curva sintetica
+    ------------
+    freq_picchi (array) : frequenze dei picchi di ciascuna curva
+    ck_picchi (array)   : valori complessi dei picchi, come il secondo elemento restituito da picco_periodo()
 
     Note:
-    --------------
-    - utilizza la funzione np.random.shuffle() di numpy
+    ------------
+    - il picco viene scelto con lo stesso ordinamento dei numeri complessi di picco_periodo() (np.argmax);
+      in caso di valori identici viene scelta la prima frequenza invece dell'ultima
 
     """
+    n = len(freq)//2
+    k = n - np.count_nonzero(freq[:n] > f_taglio)
 
-    flusso = diz["flussi completi"]
-    tempo  = diz["tempi completi"]
+    ck = fft.rfft(curve, axis = 1)[:, k:n]
+    i_picchi = np.argmax(ck, axis = 1)
 
-    curve_sintetiche = {}
-    curve_sintetiche["tempo"] = tempo
+    return freq[k + i_picchi], ck[np.arange(len(ck)), i_picchi]
 
-    for i in range(0 , N + 1):
+#-------------------------------------------------------------------
 
-        flusso_shuffle = flusso.copy()
+def picco_potenza_blocco(curve, freq, f_taglio):
+    """
+    Funzione che individua il picco di potenza |C_k|^2 dello spettro di ciascuna curva di un blocco (righe di una matrice),
+    con un'unica trasformata sulle righe
+
+    Parametri:
+    -----------
+    curve (array)    : matrice (n_curve, n) dei flussi interpolati
+    freq (array)     : frequenze della trasformata di lunghezza n (fft.fftfreq(n, d = dt))
+    f_taglio (float) : valore in frequenza al di sotto della quale il contributo viene considerato costante
+
+    Restituisce:
+    ------------
+    freq_picchi (array) : frequenze dei picchi di ciascuna curva
+    ck_picchi (array)   : valori complessi dei picchi (|ck|^2 è la potenza)
+
+    Note:
+    ------------
+    - a differenza di picco_periodo_blocco() il picco non dipende dalla fase del segnale: è il massimo locale più alto
+      dello spettro di potenza, lo stesso del primo picco di picchi_multipli() e della traccia di spettro_dinamico()
+
+    """
+    n = len(freq)//2
+    k = n - np.count_nonzero(freq[:n] > f_taglio)
+
+    ck = fft.rfft(curve, axis = 1)[:, k:n]
+    i_picchi = np.argmax(ck.real**2 + ck.imag**2, axis = 1)
+
+    return freq[k + i_picchi], ck[np.arange(len(ck)), i_picchi]
+
+#-------------------------------------------------------------------
+
+def picchi_multipli(ck, freq, f_taglio, k = 5):
+    """
+    Funzione che individua i k massimi locali più alti dello spettro di potenza, per una o più curve (righe di una matrice),
+    in modo da verificare anche i periodi secondari (ad esempio le armoniche) oltre al picco principale
+
+    Parametri:
+    -----------
+    ck (array)       : trasformata (n) oppure matrice (n_curve, n) delle trasformate, calcolate con fft.fft() o fft.rfft()
+    freq (array)     : frequenze della trasformata completa di lunghezza n (fft.fftfreq(n, d = dt))
+    f_taglio (float) : valore in frequenza al di sotto della quale il contributo viene considerato costante
+    k (int)          : numero di picchi
+
+    Restituisce:
+    ------------
+    freq_picchi (array) : frequenze (k) oppure matrice (n_curve, k) delle frequenze dei picchi, in ordine di potenza decrescente
+    ck_picchi (array)   : valori complessi dei k picchi (|ck|^2 è la potenza); se lo spettro ha meno di k massimi locali
+                          i picchi mancanti hanno frequenza nan e valore 0
+
+    Note:
+    ------------
+    - un massimo locale è un bin con potenza maggiore del precedente e non minore del successivo tra le frequenze positive
+      maggiori di f_taglio (i bin agli estremi sono confrontati con il solo vicino)
+    - i k massimi di ogni riga vengono selezionati con np.argpartition() e solo questi vengono ordinati, per cui le
+      statistiche d'ordine di tutte le curve sintetiche di un blocco si ottengono con un'unica selezione
+
+    """
+    singola = np.ndim(ck) == 1
+
+    n = len(freq)//2
+    i0 = n - np.count_nonzero(freq[:n] > f_taglio)
+
+    ck  = np.atleast_2d(ck)[:, i0:n]
+    pot = np.abs(ck)**2
+
+    bordo = np.full((len(pot), 1), -np.inf)
+    esteso = np.concatenate((bordo, pot, bordo), axis = 1)
+    valori = np.where((pot > esteso[:, :-2]) & (pot >= esteso[:, 2:]), pot, -np.inf)
+
+    k_sel = min(k, valori.shape[1])
+    indici = np.argpartition(-valori, k_sel - 1, axis = 1)[:, :k_sel]
+    indici = np.take_along_axis(indici, np.argsort(-np.take_along_axis(valori, indici, axis = 1), axis = 1, kind = "stable"), axis = 1)
+
+    validi = np.isfinite(np.take_along_axis(valori, indici, axis = 1))
+
+    freq_picchi = np.full((len(pot), k), np.nan)
+    ck_picchi   = np.zeros((len(pot), k), dtype = ck.dtype)
+
+    freq_picchi[:, :k_sel] = np.where(validi, freq[i0 + indici], np.nan)
+    ck_picchi[:, :k_sel]   = np.where(validi, np.take_along_axis(ck, indici, axis = 1), 0)
+
+    if singola:
+        return freq_picchi[0], ck_picchi[0]
+
+    return freq_picchi, ck_picchi
+
+#-------------------------------------------------------------------
+
+def _vertice_parabola(y_m, y_0, y_p):
+    # spostamento (in bin) del vertice della parabola passante per tre punti equispaziati, in [-0.5, 0.5]
+    den = y_m - 2*y_0 + y_p
+    delta = np.divide(0.5*(y_m - y_p), den, out = np.zeros(np.broadcast(y_m, y_0, y_p).shape), where = den != 0)
+
+    return np.clip(delta, -0.5, 0.5)
+
+
+@profila
+def ricampiona_curva(diz, n, metodo = "parametrico", f_picco = None, lunghezza_blocco = None, seme = None):
+    """
+    Funzione che genera n ricampionamenti della curva di luce interpolata, in un'unica matrice
+
+    Parametri:
+    -----------
+    diz (dictionary)       : contenente le chiavi ["flussi completi"], ["tempi completi"], ["tempo"] e ["flusso_err"]
+    n (int)                : numero di ricampionamenti
+    metodo (string)        : "parametrico" => ad ogni punto viene aggiunto un errore gaussiano con deviazione standard
+                                              pari all'errore sul flusso; gli upper limit (errore NaN) sono estratti
+                                              uniformemente tra 0 e il valore dell'upper limit
+                             "blocchi"     => bootstrap a blocchi mobili dei residui rispetto alla componente sinusoidale
+                                              del picco, che viene poi sommata ai residui ricampionati
+    f_picco (float)        : frequenza del picco (necessaria solo per il metodo "blocchi")
+    lunghezza_blocco (int) : lunghezza dei blocchi dei residui (default: n_punti^(1/3) arrotondato per eccesso)
+    seme                   : seme del generatore (int o None)
+
+    Restituisce:
+    ------------
+    curve (array) : matrice (n, n_punti) delle curve ricampionate
+
+    Note:
+    ------------
+    - gli errori e gli upper limit dei punti interpolati sono ricavati per interpolazione lineare da quelli dei punti misurati
+
+    """
+    rng    = np.random.default_rng(seme)
+    flusso = diz["flussi completi"]
+    tempo  = diz["tempi completi"]
+    N_p    = len(flusso)
+
+    if metodo == "parametrico":
+        ul  = np.isnan(diz["flusso_err"])
+        err = np.interp(tempo, diz["tempo"], np.where(ul, 0, diz["flusso_err"]))
+        ul  = np.interp(tempo, diz["tempo"], ul.astype(float)) > 0.5
+
+        curve = flusso + err*rng.standard_normal((n, N_p))
+        curve[:, ul] = flusso[ul]*rng.random((n, np.count_nonzero(ul)))
+
+        return curve
+
+    if metodo == "blocchi":
+        ck = fft.rfft(flusso)
+        k0 = int(round(f_picco*N_p*dt_moda(tempo)))
+
+        modello  = np.mean(flusso) + 2/N_p*np.real(ck[k0]*np.exp(2j*np.pi*k0*np.arange(N_p)/N_p))
+        residui  = flusso - modello
+
+        b = lunghezza_blocco if lunghezza_blocco is not None else int(np.ceil(N_p**(1/3)))
+        n_blocchi = -(-N_p//b)
+
+        inizi  = rng.integers(0, N_p - b + 1, size = (n, n_blocchi))
+        indici = (inizi[:, :, None] + np.arange(b)).reshape(n, -1)[:, :N_p]
+
+        return modello + residui[indici]
+
+    raise ValueError("Metodo di ricampionamento {} non disponibile, i metodi disponibili sono: parametrico, blocchi".format(metodo))
+
+#-------------------------------------------------------------------
+
+@profila
+def incertezza_periodo(diz, f_picco, n = 1000, metodo = "parametrico", livello = 0.68, finestra = 2, seme = None,
+                       preelaborazione = None, affinamento = None):
+    """
+    Funzione che stima l'intervallo di confidenza del periodo ricampionando la curva di luce:
+    gli spettri dei ricampionamenti sono calcolati con un'unica trasformata sulle righe e il picco di ciascuno
+    viene cercato vicino alla frequenza originale e raffinato con un'interpolazione parabolica
+
+    Parametri:
+    -----------
+    diz (dictionary)  : dizionario della fonte con i dati interpolati (vedi ricampiona_curva())
+    f_picco (float)   : frequenza del picco individuato con picco_periodo()
+    n (int)           : numero di ricampionamenti
+    metodo (string)   : metodo di ricampionamento, "parametrico" o "blocchi" (vedi ricampiona_curva())
+    livello (float)   : livello di confidenza dell'intervallo
+    finestra (int)    : il picco di ogni ricampionamento viene cercato entro finestra bin dalla frequenza originale
+    seme              : seme del generatore (int o None)
+    preelaborazione (dictionary) : opzioni di preelabora() applicate ai ricampionamenti prima della trasformata (None: nessuna)
+    affinamento (tuple)          : (sovracampionamento, metodo) di affina_picchi() con cui raffinare i picchi dei
+                                   ricampionamenti invece dell'interpolazione parabolica (None: parabola)
+
+    Restituisce:
+    ------------
+    incertezza (dictionary) : con le chiavi
+                              ["periodo"]           : periodo mediano dei ricampionamenti [giorni]
+                              ["periodo_min"]       : estremo inferiore dell'intervallo [giorni]
+                              ["periodo_max"]       : estremo superiore dell'intervallo [giorni]
+                              ["frequenze"]         : frequenze raffinate dei picchi dei ricampionamenti [Hz]
+                              ["livello"], ["metodo"], ["n_ricampionamenti"], ["seme"]
+
+    Note:
+    ------------
+    - il picco dei ricampionamenti è il massimo di |C_k|^2, il vertice della parabola per i tre bin attorno al massimo
+      permette di ottenere frequenze intermedie tra i bin della trasformata
+    - diz contiene la curva interpolata non elaborata: i ricampionamenti vengono elaborati e raffinati come la curva
+      originale (stadi preelaborazione e periodo della pipeline), per cui l'intervallo si riferisce allo stesso picco
+
+    """
+    curve = ricampiona_curva(diz, n, metodo, f_picco = f_picco, seme = seme)
+
+    if preelaborazione is not None:
+        curve = preelabora(curve, diz["tempi completi"], **preelaborazione)
+
+    N_p = curve.shape[1]
+    dt  = dt_moda(diz["tempi completi"])
+    df  = 1/(N_p*dt)
+    k0  = int(round(f_picco/df))
+
+    # bin della finestra, esclusa la frequenza nulla e quella di Nyquist per avere sempre i due bin adiacenti
+    k_min = max(k0 - finestra, 1)
+    k_max = min(k0 + finestra, (N_p - 1)//2)
+
+    pot = np.abs(fft.rfft(curve, axis = 1)[:, k_min - 1:k_max + 2])**2
+
+    righe = np.arange(n)
+    i = 1 + np.argmax(pot[:, 1:-1], axis = 1)
+
+    if affinamento is None:
+        frequenze = (k_min - 1 + i + _vertice_parabola(pot[righe, i - 1], pot[righe, i], pot[righe, i + 1]))*df
+    else:
+        frequenze = affina_picchi(curve, dt, (k_min - 1 + i)*df, *affinamento)[0]
+
+    periodi = 1/(frequenze*86400)
+
+    incertezza = {
+        "periodo"           : float(np.median(periodi)),
+        "periodo_min"       : float(np.quantile(periodi, (1 - livello)/2)),
+        "periodo_max"       : float(np.quantile(periodi, (1 + livello)/2)),
+        "frequenze"         : frequenze,
+        "livello"           : livello,
+        "metodo"            : metodo,
+        "n_ricampionamenti" : n,
+        "seme"              : seme,
+    }
+
+    return incertezza
+
+#-------------------------------------------------------------------
+
+@profila
+def affina_picchi(curve, dt, f_picchi, sovracampionamento = 16, metodo = "zoom"):
+    """
+    Funzione che raffina la frequenza e il valore del picco di ciascuna curva di un blocco (righe di una matrice)
+    attorno al picco individuato sulla griglia della trasformata, con risoluzione migliore di 1/T
+
+    Parametri:
+    -----------
+    curve (array)            : matrice (n_curve, n) dei flussi (oppure un'unica curva)
+    dt (float)               : passo di campionamento delle curve [s]
+    f_picchi (array)         : frequenze dei picchi sulla griglia della trasformata, una per curva
+    sovracampionamento (int) : numero di frequenze per bin della trasformata in cui viene cercato il picco
+    metodo (string)          : "zoom"     => trasformata di Fourier discreta valutata direttamente su 2*sovracampionamento + 1
+                                             frequenze entro un bin dal picco, con un unico prodotto matriciale per il blocco
+                               "padding"  => trasformata sulle righe con zero-padding a n*sovracampionamento punti
+                               "parabola" => vertice della parabola per i tre bin attorno al picco (sovracampionamento ignorato)
+
+    Restituisce:
+    ------------
+    freq_picchi (array) : frequenze raffinate dei picchi
+    ck_picchi (array)   : valori complessi della trasformata alle frequenze raffinate, con la stessa normalizzazione
+                          di fft.fft() (|C_k|^2 confrontabile con la potenza dei picchi sulla griglia)
+
+    Note:
+    ------------
+    - il picco raffinato è il massimo di |C_k|^2 entro un bin dal picco iniziale, che può essere stato scelto con
+      l'ordinamento dei numeri complessi di picco_periodo()
+    - viene sottratto il flusso medio di ogni curva, che non cambia la trasformata sulla griglia (tranne a frequenza nulla)
+      ma che tra i bin si disperderebbe sulle frequenze vicine al picco
+    - con "zoom" ogni curva viene prima demodulata alla frequenza del proprio picco, in modo che la matrice della trasformata
+      (n, 2*sovracampionamento + 1) sia comune a tutte le curve del blocco
+
+    """
+    curve = np.atleast_2d(curve)
+    curve = curve - np.mean(curve, axis = 1, keepdims = True)
+    f_picchi = np.broadcast_to(f_picchi, len(curve))
+
+    n  = curve.shape[1]
+    df = 1/(n*dt)
+    t  = np.arange(n)*dt
+    righe = np.arange(len(curve))
+
+    if metodo == "padding":
+        O = sovracampionamento
+        spettro = fft.rfft(curve, n = n*O, axis = 1)
+
+        indici = np.clip(np.rint(f_picchi/df).astype(int)[:, None]*O + np.arange(-O, O + 1), 0, spettro.shape[1] - 1)
+        valori = spettro[righe[:, None], indici]
+        i = np.argmax(np.abs(valori), axis = 1)
+
+        return indici[righe, i]*df/O, valori[righe, i]
+
+    if metodo == "zoom":
+        scarti = np.arange(-sovracampionamento, sovracampionamento + 1)*df/sovracampionamento
+    elif metodo == "parabola":
+        f_picchi = np.rint(f_picchi/df)*df
+        scarti = np.array([-df, 0, df])
+    else:
+        raise ValueError("Metodo di affinamento {} non disponibile, i metodi disponibili sono: zoom, padding, parabola".format(metodo))
+
+    demodulate = curve*np.exp(-2j*np.pi*np.outer(f_picchi, t))
+    valori = demodulate @ np.exp(-2j*np.pi*np.outer(t, scarti))
+
+    if metodo == "zoom":
+        i = np.argmax(np.abs(valori), axis = 1)
+
+        return f_picchi + scarti[i], valori[righe, i]
+
+    pot = np.abs(valori)**2
+    spostamenti = _vertice_parabola(pot[:, 0], pot[:, 1], pot[:, 2])*df
+
+    return f_picchi + spostamenti, np.sum(demodulate*np.exp(-2j*np.pi*np.outer(spostamenti, t)), axis = 1)
+
+#-------------------------------------------------------------------
+
+def affina_picco(diz, periodo, sovracampionamento = 16, metodo = "zoom"):
+    """
+    Funzione che raffina il picco del periodo individuato con picco_periodo() sui dati interpolati
+
+    Parametri:
+    -----------
+    diz (dictionary)         : contenente le chiavi ["flussi completi"] e ["tempi completi"]
+    periodo (list)           : frequenza e valore del picco restituiti da picco_periodo()
+    sovracampionamento (int) : numero di frequenze per bin della trasformata (vedi affina_picchi())
+    metodo (string)          : "zoom", "padding" o "parabola" (vedi affina_picchi())
+
+    Restituisce:
+    ------------
+    periodo (list) : contenente la frequenza e il valore complesso del picco raffinati, come picco_periodo()
+
+    """
+    freq, ck = affina_picchi(diz["flussi completi"], dt_moda(diz["tempi completi"]), periodo[0], sovracampionamento, metodo)
+
+    return [freq[0], ck[0]]
+
+#-------------------------------------------------------------------
+
+@profila
+def spettri_colonne(diz, colonne = ("indice", "ts", "sole"), f_taglio = 1e-8, f_picco = None):
+    """
+    Funzione che analizza insieme il flusso e le colonne aggiuntive di una fonte (vedi COLONNE_FONTE) come un unico
+    blocco (n_colonne, n_bin): interpolazione, trasformata e ricerca dei picchi vengono eseguite una sola volta sul blocco
+
+    Parametri:
+    -----------
+    diz (dictionary) : dizionario della fonte con flusso convertito in float e la chiave ["colonne"]; se contiene già
+                       il flusso interpolato (["flussi completi"], stadio "interpolazione") questo viene riutilizzato
+    colonne (list)   : nomi brevi delle colonne aggiuntive da analizzare insieme al flusso
+    f_taglio (float) : valore in frequenza al di sotto della quale il contributo viene considerato costante
+    f_picco (float)  : frequenza del picco del flusso individuato con picco_periodo() (stadio "periodo"); se indicata
+                       il picco del flusso è il bin più vicino a f_picco invece del massimo della potenza
+
+    Restituisce:
+    ------------
+    spettri (dictionary) : con le chiavi
+                           ["nome"], ["colonne"]    : nome della fonte e nomi delle righe ("flusso" e le colonne)
+                           ["tempi completi"]       : griglia dei tempi interpolati
+                           ["blocco"]               : matrice (n_colonne, n) dei valori interpolati
+                           ["frequenze"], ["potenza"] : frequenze positive sopra f_taglio e potenze |c_k|^2 di ogni riga
+                           ["picchi"]               : frequenza del massimo della potenza di ogni riga (per il flusso
+                                                      quella di f_picco, se indicata)
+                           ["costanti"]             : True per le righe costanti (ad esempio l'indice di fotone fissato),
+                                                      senza picco
+                           ["veto_sole"]            : True se il picco del flusso cade entro un bin da quello della distanza
+                                                      dal Sole (None se la colonna "sole" non è analizzata)
+
+    Note:
+    ------------
+    - i valori mancanti delle colonne aggiuntive (NaN) vengono prima interpolati linearmente dai valori misurati
+    - i picchi delle colonne sono i massimi della potenza, che possono differire da quello di picco_periodo() (che
+      conserva l'ordinamento dei numeri complessi): per questo il veto viene applicato al picco f_picco del flusso,
+      lo stesso riportato nella tabella dei periodi
+    - il blocco viene interpolato con interpolazione_blocco(), per cui la riga del flusso coincide con diz["flussi completi"];
+      se il flusso interpolato è già disponibile vengono interpolate solo le colonne aggiuntive
+
+    """
+    tempo = diz["tempo"]
+
+    righe = [] if "flussi completi" in diz else [diz["flusso"].astype(float)]
+    for nome in colonne:
+        colonna = diz["colonne"][nome]
+        validi = np.isfinite(colonna)
+        righe.append(np.interp(tempo, tempo[validi], colonna[validi]) if np.any(validi) else np.zeros(len(tempo)))
+
+    if "flussi completi" in diz:
+        tempi_completi, blocco = diz["tempi completi"], diz["flussi completi"][None, :]
+        if righe:
+            blocco = np.vstack([blocco, interpolazione_blocco(tempo, np.vstack(righe))[1]])
+    else:
+        tempi_completi, blocco = interpolazione_blocco(tempo, np.vstack(righe))
+
+    freq = fft.rfftfreq(blocco.shape[1], d = dt_moda(tempo))
+    sopra = (freq > f_taglio) & (np.arange(len(freq)) < blocco.shape[1]//2)
+
+    potenza = np.abs(fft.rfft(blocco, axis = 1)[:, sopra])**2
+    frequenze = freq[sopra]
+
+    costanti = np.ptp(blocco, axis = 1) == 0
+    i_picchi = np.argmax(potenza, axis = 1)
+    if f_picco is not None:
+        i_picchi[0] = np.argmin(np.abs(frequenze - f_picco))
+    picchi = np.where(costanti, np.nan, frequenze[i_picchi])
+
+    veto = None
+    if "sole" in colonne:
+        i_sole = 1 + list(colonne).index("sole")
+        veto = bool(abs(i_picchi[0] - i_picchi[i_sole]) <= 1)
+
+    spettri = {
+        "nome"           : diz["nome"],
+        "colonne"        : ["flusso"] + list(colonne),
+        "tempi completi" : tempi_completi,
+        "blocco"         : blocco,
+        "frequenze"      : frequenze,
+        "potenza"        : potenza,
+        "picchi"         : picchi,
+        "costanti"       : costanti,
+        "veto_sole"      : veto,
+    }
+
+    return spettri
+
+
+
+
+                      #########################################
+                      #  Curve sintetiche e Significatività   #
+                      #########################################
+
+                      
+@profila
+def curve_sintetiche_diz(diz, N):
+    """
+    Funzione per la creazione di curve sintetiche a partire dai dati di una curva di luce.
+    Restituisce un dizionario contenente le curve sintetiche
+
+    Parametri:
+    -------------------
+    diz (dictionary)   : contenente le informazioni di flusso e tempo della curva di luce
+    N   (int)          : numero di curve sintetiche da generare
+
+    Restituisce:
+    ----------------------
+    curve_sintetiche (dictionary) : contenente nella chiave ["tempo"] i dati temporali comuni a tutte le curve di luce,
+                                    e nelle N chiavi ["flusso i"] con i in [1, N] i dati del flusso di ogni curva sintetica
+
+    Note:
+    --------------
+    - utilizza la funzione np.random.shuffle() di numpy
+
+    """
+
+    flusso = diz["flussi completi"]
+    tempo  = diz["tempi completi"]
+
+    curve_sintetiche = {}
+    curve_sintetiche["tempo"] = tempo
+
+    for i in range(0 , N + 1):
+
+        flusso_shuffle = flusso.copy()
         np.random.shuffle(flusso_shuffle)
 
         curve_sintetiche["flusso {}".format( i + 1)] = flusso_shuffle   
@@ -647,6 +1680,7 @@ def curve_sintetiche_diz(diz, N):
 
 #---------------------------------------------------------------------------------------------------------------------------------
 
+@profila
 def fft_curve_sintetiche_diz(diz):
     """
     Funzione che effettua lo studio in  frequenza delle curve sintetiche
@@ -739,6 +1773,7 @@ def picco_periodo_sint( freq_sint , pot_i_sint, f_taglio, return_freq = True):
         return pot_picco
    
 
+@profila
 def ar_picchi_sintetici(diz_fft, f_taglio):
     """
     Funzione che dato il dizionario delle trasformate di Fourier trova la potenza relativa ai picchi massisimi
@@ -769,42 +1804,244 @@ def ar_picchi_sintetici(diz_fft, f_taglio):
             
     return ck_picchi_sintetici
 
+#--------------------------------------------------------------
+
+@profila
+def picchi_sintetici_tagli(diz_fft):
+    """
+    Funzione che calcola, per ogni possibile frequenza di taglio, il picco di ciascuno spettro sintetico,
+    in modo da poter ottenere la distribuzione dei picchi per una qualsiasi frequenza di taglio senza ripetere la ricerca
+
+    Parametri:
+    ---------------
+    diz_fft (dictionary) : contenente lo studio in frequenza delle curve di luce sintetiche (vedi fft_curve_sintetiche_diz())
+
+    Restituisce:
+    ---------------
+    tagli (dictionary) : con le chiavi
+                         ["freq"]   : frequenze positive dello spettro (prima metà dell'array delle frequenze)
+                         ["picchi"] : matrice (n_curve, len(freq)) in cui l'elemento [i, k] è il modulo del picco
+                                      della curva i considerando solo le frequenze da freq[k] in poi
+
+    Note:
+    ---------------
+    - il picco viene scelto con lo stesso ordinamento dei numeri complessi di picco_periodo_sint() (np.max),
+      tramite il massimo cumulativo (np.maximum.accumulate) delle righe lette dalla fine
+    - viene memorizzato solo il modulo del picco, sufficiente per istogramma_significatività()
+
+    """
+    freq = diz_fft["freq"]
+    n    = len(freq)//2
+
+    ck = np.array([dati[:n] for chiave, dati in diz_fft.items() if chiave != "freq"])
 
+    massimi = np.maximum.accumulate(ck[:, ::-1], axis = 1)[:, ::-1]
+
+    tagli = {
+        "freq"   : freq[:n],
+        "picchi" : np.abs(massimi),
+    }
+
+    return tagli
 
 #--------------------------------------------------------------
 
-def significatività_int(picchi_sint, picco_orig, n_bin):
+def picchi_sintetici_taglio(tagli, f_taglio):
     """
-    Funzione che calcola la significativtià del periodo associato ad una fonte
-    ATTENZIONE! Restituisce unicamente il valore-p ovvero l'are sottesa alla curva che va dalla potenza del periodo originale in poi
+    Funzione che restituisce il modulo dei picchi sintetici per una frequenza di taglio, a partire da picchi_sintetici_tagli()
+    (equivalente in modulo ad ar_picchi_sintetici())
+    """
+    k = len(tagli["freq"]) - np.count_nonzero(tagli["freq"] > f_taglio)
+
+    return tagli["picchi"][:, k]
+
+
+
+#--------------------------------------------------------------
+
+@profila
+def curve_sintetiche_blocco(flusso, n_curve, seme = None):
+    """
+    Funzione che genera un blocco di curve sintetiche come righe di una matrice, invece che come chiavi di un dizionario
+
+    Parametri:
+    ---------------
+    flusso (array)  : flusso interpolato della curva di luce (diz["flussi completi"])
+    n_curve (int)   : numero di curve sintetiche del blocco
+    seme            : seme del generatore di numeri casuali (int, np.random.SeedSequence o None)
+
+    Restituisce:
+    ---------------
+    curve (array) : matrice (n_curve, len(flusso)) in cui ogni riga è una permutazione casuale indipendente del flusso
+
+    Note:
+    ---------------
+    - utilizza Generator.permuted() di numpy, che permuta tutte le righe in un'unica chiamata
+    - il tipo della matrice è quello del flusso e la permutazione viene eseguita direttamente in quel tipo, per cui con
+      un flusso float32 la matrice occupa metà della memoria; le permutazioni dipendono solo dal seme e non dal tipo,
+      per cui a parità di seme le curve in float32 sono quelle in float64 arrotondate
+      (Generator.permuted() è però circa 1.5 volte più lento su elementi da 4 byte)
+
+    """
+    rng = np.random.default_rng(seme)
+
+    return rng.permuted(np.broadcast_to(flusso, (n_curve, len(flusso))), axis = 1)
+
+#--------------------------------------------------------------
+
+@profila
+def picchi_sintetici_blocco(curve, freq, f_taglio):
+    """
+    Funzione che calcola i picchi degli spettri di un blocco di curve sintetiche, con un'unica trasformata sulle righe
+
+    Parametri:
+    ---------------
+    curve (array)   : matrice (n_curve, n) delle curve sintetiche (vedi curve_sintetiche_blocco())
+    freq (array)    : frequenze della trasformata di lunghezza n (fft.fftfreq(n, d = dt), come diz_fft["freq"])
+    f_taglio (float): valore della frequenza al di sotto della quale il contributo viene considerato costante
+
+    Restituisce:
+    ---------------
+    picchi (array) : valori complessi dei picchi di ciascuna curva, equivalenti a quelli di ar_picchi_sintetici()
+
+    Note:
+    ---------------
+    - utilizza fft.rfft(), che calcola solo le frequenze positive (le uniche utilizzate per la ricerca del picco)
+    - il picco viene scelto con lo stesso ordinamento dei numeri complessi di picco_periodo_sint() (np.max)
+
+    """
+    n = len(freq)//2
+    k = n - np.count_nonzero(freq[:n] > f_taglio)
+
+    ck = fft.rfft(curve, axis = 1)[:, k:n]
+
+    return np.max(ck, axis = 1)
+
+#--------------------------------------------------------------
+
+@profila
+def istogramma_significatività(picchi_sint, picco_orig, n_bin):
+    """
+    Funzione che calcola l'istogramma (normalizzato) della distribuzione dei picchi di potenza delle curve sintetiche.
+    L'istogramma viene calcolato una sola volta e riutilizzato sia per il calcolo del valore-p che per i grafici
 
     Parametri:
     -------------
-    picchi_sint (array) : contenente i valori di potenza dei picchi degli spettri di potenza sintetici
-    picco_orig  (float) : valore del picco di potenza originale
+    picchi_sint (array) : contenente i valori (complessi) dei picchi degli spettri di potenza sintetici
+    picco_orig  (float) : valore (complesso) del picco di potenza originale
     n_bin       (int)   : numero di bin in cui suddividere l'istogramma
 
     Restituisce:
     --------------
-    area        (float) : area sottesa alla curva che va dalla potenza del periodo originale in poi
-                          se l'area è nulla restituisce comunque un valore che dipende dalla sensibilità del processo e quindi dal numero di curve simulate  
-    
+    ist (dictionary) : istogramma con le chiavi
+                       ["bordi"]           : bordi dei bin (n_bin + 1 valori)
+                       ["densità"]         : densità di probabilità di ogni bin
+                       ["potenze"]         : potenze |C_k|^2 dei picchi sintetici
+                       ["picco"]           : potenza |C_k|^2 del picco originale
+                       ["n_realizzazioni"] : numero di curve sintetiche
+
     """
-    picchi_sint = np.abs(picchi_sint)**2
-    picco_orig  = np.abs(picco_orig)**2
+    potenze = np.abs(picchi_sint)**2
 
-    n , bis, p = plt.hist(picchi_sint, bins = n_bin , density = True)  
-    plt.close() 
+    densità, bordi = np.histogram(potenze, bins = n_bin, density = True)
+
+    ist = {
+        "bordi"           : bordi,
+        "densità"         : densità,
+        "potenze"         : potenze,
+        "picco"           : np.abs(picco_orig)**2,
+        "n_realizzazioni" : len(potenze),
+    }
+
+    return ist
+
+#--------------------------------------------------------------
+
+def valore_p_istogramma(ist):
+    """
+    Funzione che calcola il valore-p, ovvero l'area dell'istogramma della significatività che va dalla potenza del periodo originale in poi
+
+    Parametri:
+    -------------
+    ist (dictionary) : istogramma restituito da istogramma_significatività()
+
+    Restituisce:
+    --------------
+    area (float) : area sottesa alla curva che va dalla potenza del periodo originale in poi
+                   se l'area è nulla restituisce comunque un valore che dipende dalla sensibilità del processo e quindi dal numero di curve simulate  
+
+    """
+    bis = ist["bordi"]
+    n   = ist["densità"]
 
     centri_bins = 0.5 * (bis[1:] + bis[:-1])
     larg_bins = bis[1] - bis[0]
     
-    mask = centri_bins >= picco_orig
+    mask = centri_bins >= ist["picco"]
 
     area = np.sum(n[mask]*larg_bins)
 
     if area == 0:
-        area = 1/np.sqrt(len(picchi_sint))
+        area = 1/np.sqrt(ist["n_realizzazioni"])
         
     return area
 
+#--------------------------------------------------------------
+
+def valori_p_istogramma(ist, potenze):
+    """
+    Funzione che calcola il valore-p di più potenze di picco con lo stesso istogramma della significatività,
+    ad esempio per molte curve analizzate con un'unica distribuzione nulla
+
+    Parametri:
+    -------------
+    ist (dictionary) : istogramma restituito da istogramma_significatività()
+    potenze (array)  : potenze |C_k|^2 dei picchi di cui calcolare il valore-p
+
+    Restituisce:
+    --------------
+    p (array) : valori-p, uguali a quelli di valore_p_istogramma() con ist["picco"] uguale a ciascuna potenza
+                (compreso il valore 1/sqrt(n_realizzazioni) quando l'area è nulla)
+
+    Note:
+    --------------
+    - l'area dai bin con centro >= potenza in poi viene letta dalla somma cumulativa delle aree dei bin (np.searchsorted)
+
+    """
+    bis = ist["bordi"]
+
+    centri_bins = 0.5 * (bis[1:] + bis[:-1])
+    larg_bins = bis[1] - bis[0]
+
+    coda = np.append(np.cumsum((ist["densità"]*larg_bins)[::-1])[::-1], 0.0)
+
+    p = coda[np.searchsorted(centri_bins, potenze, side = "left")]
+    p[p == 0] = 1/np.sqrt(ist["n_realizzazioni"])
+
+    return p
+
+#--------------------------------------------------------------
+
+def significatività_int(picchi_sint, picco_orig, n_bin):
+    """
+    Funzione che calcola la significativtià del periodo associato ad una fonte
+    ATTENZIONE! Restituisce unicamente il valore-p ovvero l'are sottesa alla curva che va dalla potenza del periodo originale in poi
+
+    Parametri:
+    -------------
+    picchi_sint (array) : contenente i valori di potenza dei picchi degli spettri di potenza sintetici
+    picco_orig  (float) : valore del picco di potenza originale
+    n_bin       (int)   : numero di bin in cui suddividere l'istogramma
+
+    Restituisce:
+    --------------
+    area        (float) : area sottesa alla curva che va dalla potenza del periodo originale in poi
+                          se l'area è nulla restituisce comunque un valore che dipende dalla sensibilità del processo e quindi dal numero di curve simulate  
+
+    Note:
+    ------------
+    - utilizza le funzioni istogramma_significatività() e valore_p_istogramma() definite in questo modulo;
+      se l'istogramma serve anche per i grafici conviene calcolarlo una volta e utilizzare direttamente valore_p_istogramma()
+    
+    """
+    return valore_p_istogramma(istogramma_significatività(picchi_sint, picco_orig, n_bin))
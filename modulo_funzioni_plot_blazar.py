@@ -3,24 +3,332 @@ Modulo funzioni per realizzazione di grafici relativi allo studio della periodic
 
 Autore: Valenti Alessandra
 
+Note:
+-----------
+matplotlib viene importato solo al primo grafico tramite la funzione carica_pyplot(), in modo che importare il modulo
+non abbia il costo di avvio di matplotlib e di LaTeX. Per l'esecuzione su macchine senza display è possibile 
+selezionare un backend non interattivo con la funzione modalita_headless() prima di realizzare i grafici.
+
 """
-import modulo_funzioni_blazar as fbl
 import numpy as np
-import matplotlib.pyplot as plt
-import pandas as pd
-import scipy as sc
 import math
-from scipy import  fft, optimize
-from datetime import datetime, timedelta
-import matplotlib.dates as mdates
-from matplotlib import colors
-from matplotlib.colors import Normalize
-import colorsys
-plt.rcParams['text.usetex'] = True # per utilizzare il pacchetto di latex
 
 
+_matplotlib = {
+    "plt"      : None,       # modulo pyplot, caricato al primo utilizzo
+    "backend"  : None,       # backend da selezionare al caricamento (None = backend di default)
+    "usetex"   : True,       # per utilizzare il pacchetto di latex
+}
+
+
+def modalita_headless(backend = "Agg"):
+    """
+    Funzione che seleziona un backend non interattivo di matplotlib, da utilizzare quando non è disponibile un display
+
+    Parametri:
+    -------------
+    backend (string) : nome del backend non interattivo (default "Agg")
+
+    Note:
+    -----------
+    - se pyplot è già stato caricato il backend viene cambiato immediatamente
+    
+    """
+    _matplotlib["backend"] = backend
+
+    if _matplotlib["plt"] is not None:
+        _matplotlib["plt"].switch_backend(backend)
+
+#--------------------------------------------------------------------------------
+
+def carica_pyplot():
+    """
+    Funzione che importa matplotlib.pyplot al primo utilizzo e ne imposta la configurazione
+
+    Restituisce:
+    -------------
+    plt (module) : il modulo matplotlib.pyplot
+
+    """
+    if _matplotlib["plt"] is None:
+        import matplotlib
+
+        if _matplotlib["backend"] is not None:
+            matplotlib.use(_matplotlib["backend"])
+
+        import matplotlib.pyplot as plt
+        plt.rcParams['text.usetex'] = _matplotlib["usetex"]
+
+        _matplotlib["plt"] = plt
+
+    return _matplotlib["plt"]
+
+#--------------------------------------------------------------------------------
+
+def imposta_testo(usetex = True):
+    """
+    Funzione che sceglie come vengono composti i testi dei grafici
+
+    Parametri:
+    -------------
+    usetex (boolean) : se True i testi vengono composti con LaTeX (default del modulo),
+                       se False viene utilizzato mathtext di matplotlib, che non richiede un'installazione di LaTeX
+                       ed è molto più veloce per la produzione di molti grafici
+
+    """
+    _matplotlib["usetex"] = usetex
+
+    if _matplotlib["plt"] is not None:
+        _matplotlib["plt"].rcParams['text.usetex'] = usetex
+
+#--------------------------------------------------------------------------------
+
+def _etichetta_flusso():
+    """
+    Restituisce l'etichetta dell'asse del flusso di fotoni, nella sintassi di LaTeX o di mathtext
+    (mathtext non supporta il comando \\textrm)
+    """
+    if _matplotlib["usetex"] == True:
+        return r'$\textrm{Flusso di Fotoni} \quad  [0.1-100 GeV](\textrm{photons} \quad cm^{-2} s^{-1})$'
+
+    return r'Flusso di Fotoni $[0.1-100\,GeV]\,(photons \; cm^{-2} s^{-1})$'
+
+#--------------------------------------------------------------------------------
+
+def _mostra_o_salva(fig, file_output):
+    """
+    Se file_output è None mostra il grafico, altrimenti lo salva nel file indicato (il formato PNG/PDF/SVG viene
+    dedotto dall'estensione) e chiude la figura per liberare la memoria
+    """
+    plt = carica_pyplot()
+
+    if file_output is None:
+        plt.show()
+    else:
+        fig.savefig(file_output, bbox_inches = "tight")
+        plt.close(fig)
+
+#--------------------------------------------------------------------------------
+
+
+
+                       ##################################################
+                       #     Decimazione delle curve per i grafici      #
+                       ##################################################
+
+# Per curve di luce molto lunghe o molto dense (ad esempio giornaliere su 16 anni) disegnare tutti i punti rende
+# i grafici lenti e i file molto pesanti. Le funzioni seguenti riducono il numero di punti disegnati ad un valore
+# massimo fissato (dell'ordine del numero di colonne di pixel del grafico), in modo che il tempo di realizzazione
+# del grafico non dipenda dalla lunghezza della curva. Gli upper limit vengono sempre mantenuti.
+
+def _bucket(x, n_bucket):
+    """
+    Restituisce per ogni punto l'indice del bucket (intervallo di uguale ampiezza in x) a cui appartiene
+    """
+    x = np.asarray(x, dtype = float)
+    ampiezza = x[-1] - x[0]
+
+    if ampiezza <= 0:
+        return np.zeros(len(x), dtype = int)
+
+    b = ((x - x[0]) / ampiezza * n_bucket).astype(int)
+
+    return np.clip(b, 0, n_bucket - 1)
+
+#--------------------------------------------------------------------------------
+
+def indici_minmax(x, y, n_colonne):
+    """
+    Funzione che individua i punti da disegnare con il metodo dell'inviluppo minimo/massimo:
+    l'asse x viene diviso in n_colonne intervalli uguali e per ognuno vengono mantenuti il punto di minimo e di massimo
+
+    Parametri:
+    -------------
+    x (array)       : ascisse ordinate in modo crescente (float)
+    y (array)       : ordinate dei punti
+    n_colonne (int) : numero di intervalli (idealmente il numero di colonne di pixel del grafico)
+
+    Restituisce:
+    -------------
+    indici (array) : indici ordinati dei punti da mantenere (al massimo 2*n_colonne)
+
+    """
+    y = np.asarray(y, dtype = float)
+    b = _bucket(x, n_colonne)
+
+    # dato che x è ordinato, i punti di ogni bucket sono contigui
+    nuovo = np.r_[True, b[1:] != b[:-1]]
+    inizi = np.flatnonzero(nuovo)
+    run   = np.cumsum(nuovo) - 1
+
+    y_min = np.minimum.reduceat(y, inizi)[run]
+    y_max = np.maximum.reduceat(y, inizi)[run]
+
+    i_min = np.flatnonzero(y == y_min)
+    i_max = np.flatnonzero(y == y_max)
+
+    # per ogni bucket viene mantenuta solo la prima occorrenza del minimo e del massimo
+    i_min = i_min[np.unique(run[i_min], return_index = True)[1]]
+    i_max = i_max[np.unique(run[i_max], return_index = True)[1]]
+
+    return np.union1d(i_min, i_max)
+
+#--------------------------------------------------------------------------------
+
+def indici_lttb(x, y, n_punti):
+    """
+    Funzione che individua i punti da disegnare con l'algoritmo Largest-Triangle-Three-Buckets (LTTB):
+    i punti interni vengono divisi in n_punti - 2 bucket e per ognuno viene scelto il punto che forma il triangolo
+    di area massima con il punto scelto nel bucket precedente e con la media del bucket successivo
+
+    Parametri:
+    -------------
+    x (array)     : ascisse ordinate in modo crescente (float)
+    y (array)     : ordinate dei punti
+    n_punti (int) : numero di punti da mantenere
+
+    Restituisce:
+    -------------
+    indici (array) : indici ordinati dei punti da mantenere (il primo e l'ultimo punto sono sempre inclusi)
+
+    """
+    x = np.asarray(x, dtype = float)
+    y = np.asarray(y, dtype = float)
+    n = len(x)
+
+    if n_punti >= n or n_punti < 3:
+        return np.arange(0, n)
+
+    bordi = np.linspace(1, n - 1, n_punti - 1).astype(int)
+
+    indici = np.empty(n_punti, dtype = int)
+    indici[0]  = 0
+    indici[-1] = n - 1
+
+    a = 0
+    for i in range(0, n_punti - 2):
+        inizio, fine = bordi[i], bordi[i + 1]
+
+        if i < n_punti - 3:
+            x_med = x[bordi[i + 1]:bordi[i + 2]].mean()
+            y_med = y[bordi[i + 1]:bordi[i + 2]].mean()
+        else:
+            x_med, y_med = x[-1], y[-1]
+
+        aree = np.abs((x[a] - x_med) * (y[inizio:fine] - y[a]) - (x[a] - x[inizio:fine]) * (y_med - y[a]))
+        a = inizio + np.argmax(aree)
+        indici[i + 1] = a
+
+    return indici
+
+#--------------------------------------------------------------------------------
+
+def decima_curva(diz, max_punti = None, metodo = "minmax"):
+    """
+    Funzione che prepara i dati di una curva di luce per il grafico, decimandoli se sono più di max_punti
+
+    Parametri:
+    -------------
+    diz (dictionary)  : dizionario della fonte con le chiavi ["tempo"], ["tempo_data"], ["flusso"], ["flusso_err"],
+                        ["upper_lim_tempo"], ["upper_lim_data"] e ["upper_lim_flusso"]
+    max_punti (int)   : numero massimo di punti da disegnare, se None i dati non vengono decimati
+    metodo (string)   : "minmax" (inviluppo minimo/massimo per colonna) oppure "lttb" (Largest-Triangle-Three-Buckets)
+
+    Restituisce:
+    -------------
+    dizionario con le chiavi:
+        ["nome"], ["upper_lim_data"], ["upper_lim_flusso"] : invariate (gli upper limit sono sempre disegnati tutti)
+        ["tempo_data"], ["flusso"]                          : punti della linea, decimati
+        ["err_data"], ["err_flusso"], ["err_barre"]         : punti e barre di errore da disegnare con errorbar()
+
+    Note:
+    ------------
+    - le barre di errore vengono aggregate per bucket: per ogni bucket viene disegnato un unico punto nella media
+      del bucket, con una barra che va dal minimo di (flusso - errore) al massimo di (flusso + errore) dei punti del bucket
+    - i punti della curva che corrispondono ad upper limit vengono sempre mantenuti nella linea
+
+    """
+    tempo  = np.asarray(diz["tempo"], dtype = float)
+    flusso = np.asarray(diz["flusso"], dtype = float)
+    err    = np.asarray(diz["flusso_err"], dtype = float)
+
+    curva = {
+        "nome"             : diz["nome"],
+        "upper_lim_data"   : diz["upper_lim_data"],
+        "upper_lim_flusso" : diz["upper_lim_flusso"],
+        "tempo_data"       : diz["tempo_data"],
+        "flusso"           : flusso,
+        "err_data"         : diz["tempo_data"],
+        "err_flusso"       : flusso,
+        "err_barre"        : err,
+    }
+
+    if max_punti is None or len(flusso) <= max_punti:
+        return curva
+
+    if metodo == "minmax":
+        indici = indici_minmax(tempo, flusso, max_punti // 2)
+    elif metodo == "lttb":
+        indici = indici_lttb(tempo, flusso, max_punti)
+    else:
+        raise ValueError("Metodo di decimazione {} non supportato, i metodi disponibili sono: minmax, lttb".format(metodo))
+
+    upper_lim = np.flatnonzero(np.isin(tempo, diz["upper_lim_tempo"]))
+    indici = np.union1d(indici, upper_lim)
+
+    curva["tempo_data"] = diz["tempo_data"][indici]
+    curva["flusso"]     = flusso[indici]
+
+    # aggregazione delle barre di errore per bucket
+
+    b = _bucket(tempo, max_punti // 2)
+    err = np.nan_to_num(err)
+
+    conteggi = np.bincount(b)
+    pieni    = conteggi > 0
+    inizi    = np.flatnonzero(np.r_[True, b[1:] != b[:-1]])
+
+    t_med = np.bincount(b, weights = tempo)[pieni] / conteggi[pieni]
+    y_med = np.bincount(b, weights = flusso)[pieni] / conteggi[pieni]
+    y_inf = np.minimum.reduceat(flusso - err, inizi)
+    y_sup = np.maximum.reduceat(flusso + err, inizi)
+
+    import modulo_funzioni_blazar as fbl
+
+    curva["err_data"]   = fbl.MET_to_data_array(t_med)
+    curva["err_flusso"] = y_med
+    curva["err_barre"]  = np.vstack((y_med - y_inf, y_sup - y_med))
+
+    return curva
+
+#--------------------------------------------------------------------------------
+
+def decima_spettro(freq, pot, max_punti = None, log = False):
+    """
+    Funzione che decima uno spettro di potenza con il metodo dell'inviluppo minimo/massimo
+
+    Parametri:
+    -------------
+    freq, pot (array) : frequenze (crescenti) e potenze dello spettro
+    max_punti (int)   : numero massimo di punti da disegnare, se None lo spettro non viene decimato
+    log (boolean)     : se True gli intervalli sono uguali in scala logaritmica, come nel grafico
+
+    Restituisce:
+    -------------
+    freq, pot (array) : frequenze e potenze da disegnare
+
+    """
+    if max_punti is None or len(freq) <= max_punti:
+        return freq, pot
+
+    x = np.log10(np.clip(freq, np.min(freq[freq > 0]), None)) if log == True else freq
+    indici = indici_minmax(x, pot, max_punti // 2)
+
+    return freq[indici], pot[indici]
 
-def plot_all(diz1, diz2, diz3, diz4, base_temp, arr_col1, arr_col2):
+#--------------------------------------------------------------------------------
+
+def plot_all(diz1, diz2, diz3, diz4, base_temp, arr_col1, arr_col2, file_output = None, max_punti = None, decimazione = "minmax"):
     """
     Dati i dizionari delle 4 fonti da graficare (idealmente tutte su base mensile o settimanale)
     realizza il corrispettivo grafico contenente la curva di luce, gli erorri e gli upper limit
@@ -31,9 +339,17 @@ def plot_all(diz1, diz2, diz3, diz4, base_temp, arr_col1, arr_col2):
     base_temp (string)                  : stringa che indica se i dati della fonte sono in base settimanale o mensile
                                           ATTENZIONE! i valori accettati sono (M , W)
     arr_col1, arr_col2 (array)          : array contenente i colori utilizzati per realizzare i grafici
+    file_output (string)                : se indicato il grafico viene salvato nel file invece di essere mostrato
+    max_punti (int)                     : se indicato, le curve con più punti vengono decimate con decima_curva()
+    decimazione (string)                : metodo di decimazione ("minmax" o "lttb")
     
 
     """
+    plt = carica_pyplot()
+    import matplotlib.dates as mdates
+
+    diz1, diz2, diz3, diz4 = [decima_curva(diz, max_punti, decimazione) for diz in (diz1, diz2, diz3, diz4)]
+
     if base_temp == "M":
         base = "mensile"
     if base_temp == "W":
@@ -50,20 +366,20 @@ def plot_all(diz1, diz2, diz3, diz4, base_temp, arr_col1, arr_col2):
     ax[1,0].plot(diz3["tempo_data"], diz3["flusso"], color = arr_col1[2], alpha = 0.5, label = diz3["nome"] )
     ax[1,1].plot(diz4["tempo_data"], diz4["flusso"], color = arr_col1[3], alpha = 0.5, label = diz4["nome"] )
 
-    ax[0,0].errorbar(diz1["tempo_data"], diz1["flusso"], yerr = diz1["flusso_err"], color = arr_col1[0], alpha = 0.5, fmt = 'o')
-    ax[0,1].errorbar(diz2["tempo_data"], diz2["flusso"], yerr = diz2["flusso_err"], color = arr_col1[1], alpha = 0.5, fmt = 'o')
-    ax[1,0].errorbar(diz3["tempo_data"], diz3["flusso"], yerr = diz3["flusso_err"], color = arr_col1[2], alpha = 0.5, fmt = 'o')
-    ax[1,1].errorbar(diz4["tempo_data"], diz4["flusso"], yerr = diz4["flusso_err"], color = arr_col1[3], alpha = 0.5, fmt = 'o')
+    ax[0,0].errorbar(diz1["err_data"], diz1["err_flusso"], yerr = diz1["err_barre"], color = arr_col1[0], alpha = 0.5, fmt = 'o')
+    ax[0,1].errorbar(diz2["err_data"], diz2["err_flusso"], yerr = diz2["err_barre"], color = arr_col1[1], alpha = 0.5, fmt = 'o')
+    ax[1,0].errorbar(diz3["err_data"], diz3["err_flusso"], yerr = diz3["err_barre"], color = arr_col1[2], alpha = 0.5, fmt = 'o')
+    ax[1,1].errorbar(diz4["err_data"], diz4["err_flusso"], yerr = diz4["err_barre"], color = arr_col1[3], alpha = 0.5, fmt = 'o')
 
     ax[0,0].scatter(  diz1["upper_lim_data"],diz1['upper_lim_flusso'], color = arr_col2[0], marker = '*', s=100, zorder=3,  label= 'upper limits'  )
     ax[0,1].scatter(  diz2["upper_lim_data"],diz2['upper_lim_flusso'], color = arr_col2[1], marker = '*', s=100, zorder=3,  label= 'upper limits'  )
     ax[1,0].scatter(  diz3["upper_lim_data"],diz3['upper_lim_flusso'], color = arr_col2[2], marker = '*', s=100, zorder=3,  label= 'upper limits'  )
     ax[1,1].scatter(  diz4["upper_lim_data"],diz4['upper_lim_flusso'], color = arr_col2[3], marker = '*', s=100, zorder=3,  label= 'upper limits'  )
 
-    ax[0,0].set_ylabel(r'$\textrm{Flusso di Fotoni} \quad  [0.1-100 GeV](\textrm{photons} \quad cm^{-2} s^{-1})$', fontsize=10)
-    ax[0,1].set_ylabel(r'$\textrm{Flusso di Fotoni} \quad  [0.1-100 GeV](\textrm{photons} \quad cm^{-2} s^{-1})$', fontsize=10)
-    ax[1,0].set_ylabel(r'$\textrm{Flusso di Fotoni} \quad  [0.1-100 GeV](\textrm{photons} \quad cm^{-2} s^{-1})$', fontsize=10)
-    ax[1,1].set_ylabel(r'$\textrm{Flusso di Fotoni} \quad  [0.1-100 GeV](\textrm{photons} \quad cm^{-2} s^{-1})$', fontsize=10)
+    ax[0,0].set_ylabel(_etichetta_flusso(), fontsize=10)
+    ax[0,1].set_ylabel(_etichetta_flusso(), fontsize=10)
+    ax[1,0].set_ylabel(_etichetta_flusso(), fontsize=10)
+    ax[1,1].set_ylabel(_etichetta_flusso(), fontsize=10)
 
     ax[0,0].set_xlabel("Tempo")
     ax[0,1].set_xlabel("Tempo")
@@ -75,13 +391,13 @@ def plot_all(diz1, diz2, diz3, diz4, base_temp, arr_col1, arr_col2):
     ax[1,0].legend()  
     ax[1,1].legend()
 
-    plt.show()
+    _mostra_o_salva(fig, file_output)
 
 
 
 
 #--------------------------------------------------------------------------------
-def plot_all_pwsp(diz1, diz2, diz3, diz4, base_temp, arr_col1, log = False, interp = False):
+def plot_all_pwsp(diz1, diz2, diz3, diz4, base_temp, arr_col1, log = False, interp = False, file_output = None, max_punti = None):
     """
     Dati i dizionari delle 4 fonti da graficare (idealmente tutte su base mensile o settimanale)
     realizza il corrispettivo grafico contenente gli spettri di potenza delle fonti 
@@ -96,8 +412,11 @@ def plot_all_pwsp(diz1, diz2, diz3, diz4, base_temp, arr_col1, log = False, inte
     interp                 (boolean)    : variabile booleana che indica se il grafico dello spettro di potenza deve essere fatto sui dati interpolati o no
                                           interp = False =>  sui dati NON interpolati
                                           interp = True  =>  sui dati interpolati
+    file_output            (string)     : se indicato il grafico viene salvato nel file invece di essere mostrato
+    max_punti              (int)        : se indicato, gli spettri con più punti vengono decimati con decima_spettro()
     
     """
+    plt = carica_pyplot()
            
     if interp == False:
         freq1 = diz1["frequenza"]
@@ -128,10 +447,10 @@ def plot_all_pwsp(diz1, diz2, diz3, diz4, base_temp, arr_col1, log = False, inte
     
     fig.suptitle('Spettri di potenza su base {} delle fonti'.format(base), fontsize=16)
 
-    ax[0,0].plot(freq1[:len(freq1)//2], np.abs(pot1[:len(pot1)//2])**2, color = arr_col1[0], alpha = 0.8, label = diz1["nome"] )
-    ax[0,1].plot(freq2[:len(freq2)//2], np.abs(pot2[:len(pot2)//2])**2, color = arr_col1[1], alpha = 0.8, label = diz2["nome"] )
-    ax[1,0].plot(freq3[:len(freq3)//2], np.abs(pot3[:len(pot3)//2])**2, color = arr_col1[2], alpha = 0.8, label = diz3["nome"] )
-    ax[1,1].plot(freq4[:len(freq4)//2], np.abs(pot4[:len(pot4)//2])**2, color = arr_col1[3], alpha = 0.8, label = diz4["nome"] )
+    ax[0,0].plot(*decima_spettro(freq1[:len(freq1)//2], np.abs(pot1[:len(pot1)//2])**2, max_punti, log), color = arr_col1[0], alpha = 0.8, label = diz1["nome"] )
+    ax[0,1].plot(*decima_spettro(freq2[:len(freq2)//2], np.abs(pot2[:len(pot2)//2])**2, max_punti, log), color = arr_col1[1], alpha = 0.8, label = diz2["nome"] )
+    ax[1,0].plot(*decima_spettro(freq3[:len(freq3)//2], np.abs(pot3[:len(pot3)//2])**2, max_punti, log), color = arr_col1[2], alpha = 0.8, label = diz3["nome"] )
+    ax[1,1].plot(*decima_spettro(freq4[:len(freq4)//2], np.abs(pot4[:len(pot4)//2])**2, max_punti, log), color = arr_col1[3], alpha = 0.8, label = diz4["nome"] )
     
     ax[0,0].set_xlabel(r'Frequenza $[Hz]$ ', fontsize=16)
     ax[0,1].set_xlabel(r'Frequenza $[Hz]$ ', fontsize=16)
@@ -161,12 +480,14 @@ def plot_all_pwsp(diz1, diz2, diz3, diz4, base_temp, arr_col1, log = False, inte
     ax[0,1].legend()
     ax[1,1].legend()
 
-    plt.show()
+    _mostra_o_salva(fig, file_output)
 
 
 #-----------------------------------------------------------------------------------------
 
-def plot_all_pwsp_fit(diz1, diz2, diz3, diz4, base_temp, arr_col1, arr_col2, interp = False, log = True):
+def plot_all_pwsp_fit(diz1, diz2, diz3, diz4, base_temp, arr_col1, arr_col2, interp = False, log = True, file_output = None):
+
+    plt = carica_pyplot()
 
     if interp == False:
         freq1 = diz1["frequenza"]
@@ -255,31 +576,75 @@ def plot_all_pwsp_fit(diz1, diz2, diz3, diz4, base_temp, arr_col1, arr_col2, int
     ax[1,1].legend()
     ax[1,0].legend()
 
-    plt.show()
+    _mostra_o_salva(fig, file_output)
 
 
 #---------------------------------------------------------------------
 
-def istogramma_singificatività(picchi, periodo, colore1, colore2, n_bins, base_temp ):
+def _barre_istogramma(ax, ist, label, linewidth = 0.2, colore = None, mappa = None):
+    """
+    Disegna le barre di un istogramma calcolato con modulo_funzioni_blazar.istogramma_significatività(),
+    senza ricalcolarlo dai campioni. Se è indicata una mappa di colori, ogni barra viene colorata in base alla sua altezza
+    """
+    from matplotlib import colors
+
+    bordi    = ist["bordi"]
+    densità  = ist["densità"]
+
+    if mappa is not None:
+        fracs = densità / densità.max()
+        norm = colors.Normalize(fracs.min(), fracs.max())
+        colore = mappa(norm(fracs))
+
+    ax.bar(bordi[:-1], densità, width = np.diff(bordi), align = "edge", color = colore, edgecolor = "black", linewidth = linewidth, label = label)
+
+#--------------------------------------------------------------------------------
+
+def istogramma_singificatività(ist, colore1, colore2, base_temp, file_output = None):
+    """
+    Realizza l'istogramma della distribuzione dei massimi delle curve sintetiche di una fonte, con il picco originale
+
+    Parametri:
+    -----------------
+    ist (dictionary)     : istogramma restituito da modulo_funzioni_blazar.istogramma_significatività()
+    colore1, colore2     : colori dell'istogramma e della linea del picco originale
+    base_temp (string)   : base temporale della fonte, i valori accettati sono (M , W)
+    file_output (string) : se indicato il grafico viene salvato nel file invece di essere mostrato
+
+    """
+    plt = carica_pyplot()
 
     if base_temp == "M":
         strng = "mensile"
     if base_temp == "W":
         strng = "settimanale"
 
-    plt.title("Istogramma della distribuzione dei massimi delle curve sintetiche in base {}".format(strng))
+    fig, ax = plt.subplots()
+    ax.set_title("Istogramma della distribuzione dei massimi delle curve sintetiche in base {}".format(strng))
     
-    n, bis, p = plt.hist(np.abs(picchi)**2, bins = n_bins , color = colore1,  edgecolor = "black", density = True, linewidth = 0.2, label = "Massimi delle curve sintetiche")
+    _barre_istogramma(ax, ist, "Massimi delle curve sintetiche", colore = colore1)
     
-    plt.axvline(np.abs(periodo)**2, color = colore2, linestyle = '--',linewidth = 3, label = "Picco originale" )
-    plt.xlabel(r"$|C_k^2|$", fontsize=15)
-    plt.ylabel(r"Densità di Probabilità", fontsize=15)
-    plt.legend()
-    plt.show()
+    ax.axvline(ist["picco"], color = colore2, linestyle = '--',linewidth = 3, label = "Picco originale" )
+    ax.set_xlabel(r"$|C_k^2|$", fontsize=15)
+    ax.set_ylabel(r"Densità di Probabilità", fontsize=15)
+    ax.legend()
+    _mostra_o_salva(fig, file_output)
 
 
-def plot_all_hist(picchi1, picchi2, picchi3, picchi4, p1, p2, p3, p4, base_temp, colori2, n_bins):
+def plot_all_hist(ist1, ist2, ist3, ist4, base_temp, colori2, file_output = None):
+    """
+    Dati gli istogrammi della significatività delle 4 fonti (idealmente tutte su base mensile o settimanale)
+    realizza il corrispettivo grafico con le distribuzioni dei massimi delle curve sintetiche e i picchi originali
 
+    Parametri:
+    -----------------
+    ist1, ist2, ist3, ist4 (dictionary) : istogrammi restituiti da modulo_funzioni_blazar.istogramma_significatività()
+    base_temp (string)                  : base temporale delle fonti, i valori accettati sono (M , W)
+    colori2 (array)                     : array contenente i colori delle linee dei picchi originali
+    file_output (string)                : se indicato il grafico viene salvato nel file invece di essere mostrato
+
+    """
+    plt = carica_pyplot()
 
     fig , ax = plt.subplots(2,2)
     plt.subplots_adjust(wspace=0.1)
@@ -291,37 +656,17 @@ def plot_all_hist(picchi1, picchi2, picchi3, picchi4, p1, p2, p3, p4, base_temp,
 
     fig.suptitle("Istogrammi della distribuzione dei massimi delle curve sintetiche su base {}".format(base), fontsize=15 )
 
-    ax[0,0].axvline(np.abs(p1)**2, color = colori2[0], linestyle = '--',linewidth = 3, label = "Picco originale" )
-    n, bis, p = ax[0,0].hist(np.abs(picchi1)**2, bins = n_bins, edgecolor = "black", linewidth = 0.2, label = "3C 273 (FSRQ)" , density = True)
-    fracs = n / n.max()
-    norm = colors.Normalize(fracs.min(), fracs.max())
-    for thisfrac, thispatch in zip(fracs, p):
-        color = plt.cm.cool_r(norm(thisfrac))
-        thispatch.set_facecolor(color)
-
-    ax[0,1].axvline(np.abs(p2)**2, color = colori2[1], linestyle = '--',linewidth = 3, label = "Picco originale" )
-    n, bis, p = ax[0,1].hist(np.abs(picchi2)**2, bins = n_bins, edgecolor = "black", linewidth = 0.1, label = "PG 1553 + 113 (BL Lac)", density = True)
-    fracs = n / n.max()
-    norm = colors.Normalize(fracs.min(), fracs.max())
-    for thisfrac, thispatch in zip(fracs, p):
-        color = plt.cm.autumn(norm(thisfrac))
-        thispatch.set_facecolor(color)
-
-    ax[1,1].axvline(np.abs(p3)**2, color = colori2[2], linestyle = '--',linewidth = 3, label = "Picco originale" )
-    n, bis, p = ax[1,1].hist(np.abs(picchi3)**2, bins = n_bins, edgecolor = "black", linewidth = 0.2, label = "BL Lacertae (BL Lac)", density = True)
-    fracs = n / n.max()
-    norm = colors.Normalize(fracs.min(), fracs.max())
-    for thisfrac, thispatch in zip(fracs, p):
-        color = plt.cm.summer(norm(thisfrac))
-        thispatch.set_facecolor(color)
-
-    ax[1,0].axvline(np.abs(p4)**2, color = colori2[3], linestyle = '--',linewidth = 3, label = "Picco originale" )
-    n, bis, p = ax[1,0].hist(np.abs(picchi4)**2, bins = n_bins, edgecolor = "black", linewidth = 0.2, label = "3C 454.3 (FSRQ)", density = True)
-    fracs = n / n.max()
-    norm = colors.Normalize(fracs.min(), fracs.max())
-    for thisfrac, thispatch in zip(fracs, p):
-        color = plt.cm.spring(norm(thisfrac))
-        thispatch.set_facecolor(color)
+    ax[0,0].axvline(ist1["picco"], color = colori2[0], linestyle = '--',linewidth = 3, label = "Picco originale" )
+    _barre_istogramma(ax[0,0], ist1, "3C 273 (FSRQ)", linewidth = 0.2, mappa = plt.cm.cool_r)
+
+    ax[0,1].axvline(ist2["picco"], color = colori2[1], linestyle = '--',linewidth = 3, label = "Picco originale" )
+    _barre_istogramma(ax[0,1], ist2, "PG 1553 + 113 (BL Lac)", linewidth = 0.1, mappa = plt.cm.autumn)
+
+    ax[1,1].axvline(ist3["picco"], color = colori2[2], linestyle = '--',linewidth = 3, label = "Picco originale" )
+    _barre_istogramma(ax[1,1], ist3, "BL Lacertae (BL Lac)", linewidth = 0.2, mappa = plt.cm.summer)
+
+    ax[1,0].axvline(ist4["picco"], color = colori2[3], linestyle = '--',linewidth = 3, label = "Picco originale" )
+    _barre_istogramma(ax[1,0], ist4, "3C 454.3 (FSRQ)", linewidth = 0.2, mappa = plt.cm.spring)
     
     ax[0,0].set_ylabel(r"Densità di Probabilità", fontsize=15)
     ax[0,1].set_ylabel(r"Densità di Probabilità", fontsize=15) 
@@ -337,5 +682,350 @@ def plot_all_hist(picchi1, picchi2, picchi3, picchi4, p1, p2, p3, p4, base_temp,
     ax[1,1].legend()
     ax[1,0].legend()
 
-    plt.show()
+    _mostra_o_salva(fig, file_output)
+
+
+
+
+                       #######################################
+                       #     Grafici delle singole fonti     #
+                       #######################################
+
+# Le funzioni seguenti realizzano gli stessi grafici delle funzioni plot_all* per una sola fonte alla volta,
+# e vengono utilizzate quando non sono disponibili tutte e 4 le fonti o per la produzione dei grafici su file.
+
+def plot_fonte(diz, base_temp, colore1, colore2, file_output = None, max_punti = None, decimazione = "minmax"):
+    """
+    Realizza il grafico della curva di luce di una fonte, con gli errori e gli upper limit
+
+    Parametri:
+    -----------------
+    diz (dictionary)     : dizionario contenente i dati della fonte (con le chiavi delle date)
+    base_temp (string)   : base temporale della fonte, i valori accettati sono (M , W)
+    colore1, colore2     : colori della curva di luce e degli upper limit
+    file_output (string) : se indicato il grafico viene salvato nel file invece di essere mostrato
+    max_punti (int)      : se indicato, la curva viene decimata con decima_curva() se ha più punti
+    decimazione (string) : metodo di decimazione ("minmax" o "lttb")
+
+    """
+    plt = carica_pyplot()
+    import matplotlib.dates as mdates
+
+    diz = decima_curva(diz, max_punti, decimazione)
+
+    base = {"M" : "mensile", "W" : "settimanale"}[base_temp]
+
+    fig, ax = plt.subplots()
+    ax.set_title('Curva di luce su base {} di {}'.format(base, diz["nome"]))
+    ax.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m/%y'))
+
+    ax.plot(diz["tempo_data"], diz["flusso"], color = colore1, alpha = 0.5, label = diz["nome"])
+    ax.errorbar(diz["err_data"], diz["err_flusso"], yerr = diz["err_barre"], color = colore1, alpha = 0.5, fmt = 'o')
+    ax.scatter(diz["upper_lim_data"], diz['upper_lim_flusso'], color = colore2, marker = '*', s=100, zorder=3, label= 'upper limits')
+
+    ax.set_ylabel(_etichetta_flusso(), fontsize=10)
+    ax.set_xlabel("Tempo")
+    ax.legend()
+
+    _mostra_o_salva(fig, file_output)
+
+#--------------------------------------------------------------------------------
+
+def plot_pwsp_fonte(diz, base_temp, colore1, log = True, interp = True, file_output = None, max_punti = None):
+    """
+    Realizza il grafico dello spettro di potenza di una fonte
+
+    Parametri:
+    -----------------
+    diz (dictionary)     : dizionario contenente i dati dell'analisi in frequenza della fonte
+    base_temp (string)   : base temporale della fonte, i valori accettati sono (M , W)
+    colore1              : colore dello spettro
+    log (boolean)        : se True il grafico viene realizzato in scala logaritmica
+    interp (boolean)     : se True viene utilizzato lo spettro dei dati interpolati
+    file_output (string) : se indicato il grafico viene salvato nel file invece di essere mostrato
+    max_punti (int)      : se indicato, lo spettro viene decimato con decima_spettro() se ha più punti
+
+    """
+    plt = carica_pyplot()
+
+    if interp == False:
+        freq = diz["frequenza"]
+        pot  = diz["ck"]
+    if interp == True:
+        freq = diz["frequenza interp"]
+        pot  = diz["ck interp"]
+
+    base = {"M" : "mensile", "W" : "settimanale"}[base_temp]
+
+    fig, ax = plt.subplots()
+    ax.set_title('Spettro di potenza su base {} di {}'.format(base, diz["nome"]))
+
+    ax.plot(*decima_spettro(freq[:len(freq)//2], np.abs(pot[:len(pot)//2])**2, max_punti, log), color = colore1, alpha = 0.8, label = diz["nome"])
+
+    ax.set_xlabel(r'Frequenza $[Hz]$ ', fontsize=16)
+    ax.set_ylabel(r'$|C_k|^2$', fontsize=16)
+
+    if log == True:
+        ax.set_xscale('log')
+        ax.set_yscale('log')
+
+    ax.legend()
+
+    _mostra_o_salva(fig, file_output)
+
+#--------------------------------------------------------------------------------
+
+def plot_pwsp_fit_fonte(diz, base_temp, colore1, colore2, interp = True, log = True, file_output = None):
+    """
+    Realizza il grafico dello spettro di potenza di una fonte insieme al fit con la funzione di rumore
+
+    Parametri:
+    -----------------
+    diz (dictionary)     : dizionario contenente i dati dell'analisi in frequenza e del fit della fonte
+    base_temp (string)   : base temporale della fonte, i valori accettati sono (M , W)
+    colore1, colore2     : colori dello spettro e del fit
+    interp (boolean)     : se True viene utilizzato lo spettro dei dati interpolati
+    log (boolean)        : se True il grafico viene realizzato in scala logaritmica
+    file_output (string) : se indicato il grafico viene salvato nel file invece di essere mostrato
+
+    """
+    plt = carica_pyplot()
+
+    if interp == False:
+        freq = diz["frequenza"]
+        pot  = diz["ck"]
+    if interp == True:
+        freq = diz["frequenza interp"]
+        pot  = diz["ck interp"]
+
+    base = {"M" : "mensile", "W" : "settimanale"}[base_temp]
+
+    fig, ax = plt.subplots()
+    ax.set_title('Fit dell analisi spettrale su base {} di {}'.format(base, diz["nome"]))
+
+    ax.plot(freq[1:len(freq)//2], np.abs(pot[1:len(pot)//2]**2), color = colore1, alpha = 0.6, label = diz["nome"])
+    ax.plot(freq[1:len(freq)//2], diz["dati_fit"], color = colore2, alpha = 0.9, label = "{} Fit".format(diz["nome"]))
+
+    ax.set_xlabel(r'Frequenza $[Hz]$ ')
+    ax.set_ylabel(r'$|C_k|^2$')
+
+    if log == True:
+        ax.set_xscale('log')
+        ax.set_yscale('log')
+
+    ax.text(0.1, 0.1, r'$\beta$ = {:1.2f} $\pm$ {:1.2f}'.format(diz["params fit"][1], math.sqrt(diz["params covariance fit"][1,1])),
+            fontsize=18, color = colore2, transform=ax.transAxes)
+    ax.legend()
+
+    _mostra_o_salva(fig, file_output)
+
+#--------------------------------------------------------------------------------
+
+def plot_mappa_efficienza(mappa, nome = None, file_output = None):
+    """
+    Realizza il grafico della mappa di efficienza di rilevazione di una campagna di iniezione
+
+    Parametri:
+    -----------------
+    mappa (dictionary)   : mappa restituita da modulo_iniezione_blazar.campagna_iniezione()
+    nome (string)        : nome della fonte per il titolo (default: chiave della fonte)
+    file_output (string) : se indicato il grafico viene salvato nel file invece di essere mostrato
+
+    """
+    plt = carica_pyplot()
+
+    fig, ax = plt.subplots()
+    ax.set_title('Efficienza di rilevazione ({}) di {}'.format(mappa["forma"].replace("_", " "), nome or mappa["chiave"]))
+
+    img = ax.pcolormesh(mappa["periodi"], mappa["ampiezze"], mappa["efficienza"].T, vmin = 0, vmax = 1,
+                        cmap = 'viridis', shading = 'nearest')
+    fig.colorbar(img, ax = ax, label = 'Efficienza')
+
+    ax.set_xlabel(r'Periodo iniettato $[gg]$')
+    ax.set_ylabel(r'Ampiezza relativa al flusso medio')
+    ax.set_xscale('log')
+    ax.set_yscale('log')
+
+    _mostra_o_salva(fig, file_output)
+
+#--------------------------------------------------------------------------------
+
+def plot_spettro_dinamico(spettri, base_temp, colore1, file_output = None):
+    """
+    Realizza il grafico degli spettri dinamici di una fonte, con un pannello per ogni lunghezza delle finestre:
+    mappa tempo-periodo della potenza (in scala logaritmica) e traccia dei picchi
+
+    Parametri:
+    -----------------
+    spettri (dictionary) : spettri dinamici restituiti da modulo_tempo_frequenza_blazar.spettri_dinamici()
+    base_temp (string)   : base temporale della fonte, i valori accettati sono (M , W)
+    colore1              : colore della traccia dei picchi
+    file_output (string) : se indicato il grafico viene salvato nel file invece di essere mostrato
+
+    """
+    import modulo_funzioni_blazar as fbl
+
+    plt = carica_pyplot()
+
+    base = {"M" : "mensile", "W" : "settimanale"}[base_temp]
+    finestre = spettri["finestre"]
+
+    fig, axs = plt.subplots(len(finestre), 1, figsize = (10, 3.5*len(finestre)), squeeze = False, sharex = True)
+    fig.suptitle('Spettri dinamici su base {} di {}'.format(base, spettri["nome"]))
+
+    for ax, (finestra_gg, sd) in zip(axs[:, 0], finestre.items()):
+        date = fbl.MET_to_data_array(sd["tempi"])
+        periodi = 1/(sd["frequenze"][1:]*86400)
+
+        img = ax.pcolormesh(date, periodi, np.log10(sd["potenza"][:, 1:].T), cmap = 'magma', shading = 'nearest')
+        ax.plot(date, 1/(sd["freq_picchi"]*86400), color = colore1, linewidth = 1.2, label = 'Picco')
+
+        ax.set_yscale('log')
+        ax.set_ylabel(r'Periodo $[gg]$')
+        ax.set_title('Finestra di {:g} giorni'.format(finestra_gg), fontsize = 10)
+        fig.colorbar(img, ax = ax, label = r'$\log_{10}|C_k|^2$')
+        ax.legend(loc = 'upper right')
+
+    axs[-1, 0].set_xlabel('Data')
+
+    _mostra_o_salva(fig, file_output)
+
+#--------------------------------------------------------------------------------
+
+def plot_wwz(trasformata, base_temp, colore1, file_output = None):
+    """
+    Realizza il grafico della Weighted Wavelet Z-transform di una fonte: mappa tempo-periodo della WWZ
+    e WWZ media sulle traslazioni temporali
+
+    Parametri:
+    -----------------
+    trasformata (dictionary) : trasformata restituita da modulo_tempo_frequenza_blazar.wwz()
+    base_temp (string)       : base temporale della fonte, i valori accettati sono (M , W)
+    colore1                  : colore della WWZ media
+    file_output (string)     : se indicato il grafico viene salvato nel file invece di essere mostrato
+
+    """
+    import modulo_funzioni_blazar as fbl
+
+    plt = carica_pyplot()
+
+    base = {"M" : "mensile", "W" : "settimanale"}[base_temp]
+
+    date = fbl.MET_to_data_array(trasformata["tau"])
+    periodi = 1/(trasformata["frequenze"]*86400)
+
+    fig, (ax1, ax2) = plt.subplots(1, 2, figsize = (12, 5), sharey = True, gridspec_kw = {"width_ratios" : [3, 1]})
+    fig.suptitle('WWZ su base {} di {}'.format(base, trasformata["nome"]))
+
+    img = ax1.pcolormesh(date, periodi, trasformata["wwz"].T, cmap = 'magma', shading = 'nearest')
+    fig.colorbar(img, ax = ax1, label = 'WWZ')
+    ax1.set_yscale('log')
+    ax1.set_xlabel('Data')
+    ax1.set_ylabel(r'Periodo $[gg]$')
+
+    ax2.plot(trasformata["media"], periodi, color = colore1)
+    ax2.axhline(1/(trasformata["periodo"][0]*86400), color = colore1, linestyle = '--', alpha = 0.6)
+    ax2.set_xlabel('WWZ media')
+
+    _mostra_o_salva(fig, file_output)
+
+#------------------------------------------------------------------------------------------------------------
+
+def plot_ripiegamento(risultato, base_temp, colore1, colore2, file_output = None):
+    """
+    Realizza il grafico del ripiegamento in fase di una fonte: chi^2 dell'epoch folding e theta della PDM
+    in funzione del periodo di prova
+
+    Parametri:
+    -----------------
+    risultato (dictionary) : risultato di modulo_ripiegamento_blazar.ripiegamento()
+    base_temp (string)     : base temporale della fonte, i valori accettati sono (M , W)
+    colore1, colore2       : colori del chi^2 e di theta
+    file_output (string)   : se indicato il grafico viene salvato nel file invece di essere mostrato
+
+    """
+    plt = carica_pyplot()
+
+    base = {"M" : "mensile", "W" : "settimanale"}[base_temp]
+
+    periodi = risultato["periodi"]/86400
+
+    fig, (ax1, ax2) = plt.subplots(2, 1, figsize = (10, 7), sharex = True)
+    fig.suptitle('Ripiegamento in fase su base {} di {}'.format(base, risultato["nome"]))
+
+    ax1.plot(periodi, risultato["chi2"], color = colore1, linewidth = 0.8)
+    ax1.axvline(1/(risultato["picco_ef"][0]*86400), color = colore1, linestyle = '--', alpha = 0.6)
+    ax1.set_ylabel(r'$\chi^2$ epoch folding')
+
+    ax2.plot(periodi, risultato["theta"], color = colore2, linewidth = 0.8)
+    ax2.axvline(1/(risultato["picco_pdm"][0]*86400), color = colore2, linestyle = '--', alpha = 0.6)
+    ax2.set_ylabel(r'$\theta$ PDM')
+    ax2.set_xscale('log')
+    ax2.set_xlabel(r'Periodo $[gg]$')
+
+    _mostra_o_salva(fig, file_output)
+
+#------------------------------------------------------------------------------------------------------------
+
+def plot_gls(periodogramma, base_temp, colore1, file_output = None):
+    """
+    Realizza il grafico del periodogramma di Lomb-Scargle generalizzato pesato di una fonte in funzione del periodo
+
+    Parametri:
+    -----------------
+    periodogramma (dictionary) : periodogramma restituito da modulo_periodogramma_blazar.periodogramma_gls()
+    base_temp (string)         : base temporale della fonte, i valori accettati sono (M , W)
+    colore1                    : colore del periodogramma
+    file_output (string)       : se indicato il grafico viene salvato nel file invece di essere mostrato
+
+    """
+    plt = carica_pyplot()
+
+    base = {"M" : "mensile", "W" : "settimanale"}[base_temp]
+
+    fig, ax = plt.subplots(figsize = (10, 5))
+    ax.set_title('Periodogramma pesato su base {} di {}'.format(base, periodogramma["nome"]))
+
+    ax.plot(1/(periodogramma["frequenze"]*86400), periodogramma["potenza"], color = colore1, linewidth = 0.8)
+    ax.axvline(1/(periodogramma["picco"][0]*86400), color = colore1, linestyle = '--', alpha = 0.6)
+    ax.set_xscale('log')
+    ax.set_xlabel(r'Periodo $[gg]$')
+    ax.set_ylabel('Potenza normalizzata')
+
+    _mostra_o_salva(fig, file_output)
+
+#------------------------------------------------------------------------------------------------------------
+
+def plot_blocchi(blocchi, base_temp, colore1, colore2, file_output = None):
+    """
+    Realizza il grafico della curva di luce misurata di una fonte con la segmentazione in blocchi bayesiani
+
+    Parametri:
+    -----------------
+    blocchi (dictionary) : segmentazione restituita da modulo_blocchi_blazar.blocchi_fonte()
+    base_temp (string)   : base temporale della fonte, i valori accettati sono (M , W)
+    colore1, colore2     : colori delle misure e dei blocchi
+    file_output (string) : se indicato il grafico viene salvato nel file invece di essere mostrato
+
+    """
+    import modulo_funzioni_blazar as fbl
+
+    plt = carica_pyplot()
+    import matplotlib.dates as mdates
+
+    base = {"M" : "mensile", "W" : "settimanale"}[base_temp]
+
+    fig, ax = plt.subplots(figsize = (10, 5))
+    ax.set_title('Blocchi bayesiani su base {} di {}'.format(base, blocchi["nome"]))
+    ax.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m/%y'))
+
+    ax.errorbar(fbl.MET_to_data_array(blocchi["tempo"]), blocchi["flusso"], yerr = blocchi["errore"], color = colore1,
+                alpha = 0.4, fmt = 'o', markersize = 2, label = blocchi["nome"])
+    ax.stairs(blocchi["flussi"], fbl.MET_to_data_array(blocchi["bordi"]), color = colore2, linewidth = 1.5,
+              label = '{} blocchi'.format(len(blocchi["flussi"])))
+
+    ax.set_ylabel(_etichetta_flusso(), fontsize=10)
+    ax.set_xlabel("Tempo")
+    ax.legend()
 
+    _mostra_o_salva(fig, file_output)
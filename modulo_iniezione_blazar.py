@@ -0,0 +1,384 @@
+"""
+Modulo per le campagne di iniezione e recupero di segnali periodici nelle curve di luce dei Blazar
+
+Autore: Valenti Alessandra
+
+
+Per misurare quali periodi e ampiezze possono essere individuati alla cadenza di ogni fonte, nella curva interpolata reale
+vengono iniettati segnali periodici (sinusoidali o non sinusoidali, vedi FORME) su una griglia di periodi, ampiezze e fasi.
+Ogni curva iniettata viene analizzata come le fonti: picco di potenza |C_k|^2 dello spettro oltre la frequenza di taglio
+e valore-p rispetto alla distribuzione nulla dei picchi di potenza delle curve sintetiche. Il picco è il massimo di |C_k|^2
+(modulo_funzioni_blazar.picco_potenza_blocco()) e non l'ordinamento dei numeri complessi di picco_periodo(), che
+sceglierebbe il bin con la parte reale più grande e renderebbe l'efficienza dipendente dalla fase del segnale.
+I segnali vengono iniettati nella curva interpolata non elaborata e le curve iniettate vengono poi elaborate e raffinate
+come le curve sintetiche (parametri "preelaborazione" e "sovracampionamento" della pipeline), per cui i picchi sono
+confrontabili con la distribuzione nulla.
+
+La distribuzione nulla viene calcolata una sola volta per fonte (modulo_parallelo_blazar.picchi_sintetici_paralleli() con
+potenza = True, con i parametri N e seme dello stato) ed è comune a tutte le iniezioni. Le curve iniettate vengono generate
+e analizzate a blocchi (matrici di curve) in un pool di processi: il flusso, i tempi, le frequenze, i parametri
+della griglia e gli array dei picchi in uscita sono in memoria condivisa (modulo_parallelo_blazar.esegui_condiviso())
+e ad ogni processo viene inviato solo il compito (inizio, fine).
+
+Un segnale è recuperato se la frequenza del picco dista dalla frequenza iniettata al più di "tolleranza" passi in frequenza,
+ed è rilevato se è recuperato e il valore-p è minore o uguale alla soglia. Il risultato di una campagna è una mappa di
+efficienza (frazione delle fasi in cui il segnale è rilevato) per ogni coppia (periodo, ampiezza).
+
+Elenco delle funzioni:
+     - inietta_segnali .................... curve di luce con i segnali iniettati (matrice di curve)
+     - griglia_predefinita ................ griglia di periodi, ampiezze e fasi compresa nell'intervallo analizzabile
+     - campagna_iniezione ................. mappa di efficienza di rilevazione di una fonte
+     - campagna_fonti ..................... mappe di efficienza delle fonti del catalogo
+     - salva_mappe ........................ scrive le mappe di efficienza in un archivio npz
+     - tabella_efficienza ................. testo della tabella riassuntiva delle mappe
+
+"""
+import modulo_funzioni_blazar as fbl
+import modulo_pipeline_blazar as pbl
+import modulo_parallelo_blazar as ppbl
+import numpy as np
+
+
+DIMENSIONE_BLOCCO = 256    # numero di curve iniettate per compito
+
+
+def _sinusoidale(x):
+    return np.sin(2*np.pi*x)
+
+
+def _dente_di_sega(x):
+    return 2*(x % 1) - 1
+
+
+def _impulsi(x):
+    # impulso gaussiano di larghezza 0.05 in fase, a media nulla su un periodo
+    return np.exp(-0.5*(((x % 1) - 0.5)/0.05)**2) - 0.05*np.sqrt(2*np.pi)
+
+
+# forme dei segnali in funzione della fase x = t/P + fase/(2 pi), con ampiezza massima 1
+
+FORME = {
+    "sinusoidale"   : _sinusoidale,
+    "dente_di_sega" : _dente_di_sega,
+    "impulsi"       : _impulsi,
+}
+
+
+                                      ###########################################
+                                      #         Iniezione dei segnali           #
+                                      ###########################################
+
+def inietta_segnali(flusso, tempo, periodi, ampiezze, fasi, forma = "sinusoidale"):
+    """
+    Funzione che inietta un segnale periodico nella curva di luce per ogni terna (periodo, ampiezza, fase)
+
+    Parametri:
+    -------------
+    flusso (array)   : flusso interpolato della curva di luce
+    tempo (array)    : tempi della curva interpolata [s]
+    periodi (array)  : periodi dei segnali [s]
+    ampiezze (array) : ampiezze dei segnali relative al flusso medio della curva
+    fasi (array)     : fasi dei segnali [rad]
+    forma (string)   : forma del segnale, una delle chiavi di FORME
+
+    Restituisce:
+    -------------
+    curve (array) : matrice (len(periodi), len(flusso)) delle curve con i segnali iniettati
+
+    """
+    x = (tempo - tempo[0])[None, :]/periodi[:, None] + fasi[:, None]/(2*np.pi)
+
+    return flusso + (ampiezze*np.mean(flusso))[:, None]*FORME[forma](x)
+
+#------------------------------------------------------------------------------------------------------------
+
+def _picchi_potenza(curve, tempo, freq, f_taglio, preelaborazione = None, affinamento = None):
+    # picchi di potenza di un blocco di curve, elaborate e raffinate come le curve sintetiche della distribuzione nulla
+    if preelaborazione is not None:
+        curve = fbl.preelabora(curve, tempo, **preelaborazione)
+
+    f_picchi, ck_picchi = fbl.picco_potenza_blocco(curve, freq, f_taglio)
+
+    if affinamento is not None:
+        f_picchi, ck_picchi = fbl.affina_picchi(curve, 1/(len(freq)*freq[1]), f_picchi, *affinamento)
+
+    return f_picchi, ck_picchi
+
+
+def _picchi_iniettati(ar, inizio, fine, forma, f_taglio, preelaborazione = None, affinamento = None):
+    # picchi delle curve iniettate [inizio, fine) della griglia appiattita
+    curve = inietta_segnali(ar["flusso"], ar["tempo"], ar["periodi"][inizio:fine], ar["ampiezze"][inizio:fine],
+                            ar["fasi"][inizio:fine], forma)
+
+    return _picchi_potenza(curve, ar["tempo"], ar["freq"], f_taglio, preelaborazione, affinamento)
+
+
+def _esegui_blocco(ar, compito, forma, f_taglio, preelaborazione, affinamento):
+    # analizza le curve iniettate [inizio, fine) e scrive i picchi nella porzione corrispondente degli array di uscita
+    inizio, fine = compito
+
+    ar["freq_picchi"][inizio:fine], ar["ck_picchi"][inizio:fine] = _picchi_iniettati(ar, inizio, fine, forma, f_taglio,
+                                                                                      preelaborazione, affinamento)
+
+    return fine - inizio
+
+
+def _picchi_griglia(array, forma, f_taglio, n_processi, dimensione_blocco, preelaborazione = None, affinamento = None):
+    # picchi delle curve iniettate di tutta la griglia appiattita, a blocchi ed eventualmente in parallelo
+    M = len(array["periodi"])
+
+    limiti  = list(range(0, M, dimensione_blocco)) + [M]
+    compiti = [(limiti[i], limiti[i + 1]) for i in range(len(limiti) - 1)]
+
+    uscite = {"freq_picchi" : np.empty(M), "ck_picchi" : np.empty(M, dtype = complex)}
+    uscite = ppbl.esegui_condiviso(_esegui_blocco, compiti, array, uscite, n_processi, forma = forma, f_taglio = f_taglio,
+                                   preelaborazione = preelaborazione, affinamento = affinamento)
+
+    return uscite["freq_picchi"], uscite["ck_picchi"]
+
+#------------------------------------------------------------------------------------------------------------
+
+def _distribuzione_nulla(stato, array, n_processi, affinamento = None):
+    # istogramma dei picchi di potenza delle curve sintetiche (N + 1 curve, come nello stadio picchi_sintetici),
+    # scelti, elaborati e raffinati come quelli delle curve iniettate
+    par = stato["parametri"]
+
+    preelaborazione = None
+    if par["preelaborazione"] is not None:
+        preelaborazione = (array["tempo"], par["preelaborazione"])
+
+    picchi = ppbl.picchi_sintetici_paralleli(array["flusso"].astype(par["precisione"]), array["freq"], par["N"] + 1,
+                                             par["frequenza_taglio"], n_processi = n_processi, seme = par["seme"],
+                                             affinamento = affinamento, preelaborazione = preelaborazione, potenza = True)
+
+    _, picco = _picchi_potenza(array["flusso"][None, :], array["tempo"], array["freq"], par["frequenza_taglio"],
+                               par["preelaborazione"], affinamento)
+
+    return fbl.istogramma_significatività(picchi, picco[0], par["n_bins"])
+
+
+                                      ###########################################
+                                      #        Campagne di iniezione            #
+                                      ###########################################
+
+def griglia_predefinita(stato, n_periodi = 30, n_ampiezze = 20, n_fasi = 8, ampiezze = (0.05, 2.0)):
+    """
+    Funzione che restituisce una griglia di iniezione per la fonte, con i periodi compresi nell'intervallo analizzabile
+
+    Parametri:
+    -------------
+    stato (dictionary) : stato della fonte (vedi modulo_pipeline_blazar.crea_stato())
+    n_periodi (int)    : numero di periodi, equispaziati in scala logaritmica
+    n_ampiezze (int)   : numero di ampiezze, equispaziate in scala logaritmica
+    n_fasi (int)       : numero di fasi, equispaziate in [0, 2 pi)
+    ampiezze (tuple)   : ampiezza minima e massima relative al flusso medio
+
+    Restituisce:
+    -------------
+    griglia (dictionary) : con le chiavi ["periodi"] [giorni], ["ampiezze"] e ["fasi"] [rad]
+
+    Note:
+    -------------
+    - i periodi vanno da 2.5 volte il passo di campionamento (poco sopra la frequenza di Nyquist) a 0.9 volte il periodo
+      corrispondente alla frequenza di taglio
+
+    """
+    diz = pbl.esegui_stadio(stato, "interpolazione")
+    dt_gg = fbl.dt_moda(diz["tempi completi"])/86400
+
+    p_max = 0.9/(stato["parametri"]["frequenza_taglio"]*86400)
+
+    griglia = {
+        "periodi"  : np.geomspace(2.5*dt_gg, p_max, n_periodi),
+        "ampiezze" : np.geomspace(ampiezze[0], ampiezze[1], n_ampiezze),
+        "fasi"     : 2*np.pi*np.arange(n_fasi)/n_fasi,
+    }
+
+    return griglia
+
+#------------------------------------------------------------------------------------------------------------
+
+def campagna_iniezione(stato, griglia = None, forma = "sinusoidale", soglia_p = 0.01, tolleranza = 1,
+                       n_processi = None, dimensione_blocco = DIMENSIONE_BLOCCO):
+    """
+    Funzione che misura l'efficienza di rilevazione dei segnali periodici iniettati nella curva di luce di una fonte
+
+    Parametri:
+    -------------
+    stato (dictionary)      : stato della fonte (vedi modulo_pipeline_blazar.crea_stato()), i parametri N, n_bins, precisione
+                              e seme sono quelli della distribuzione nulla
+    griglia (dictionary)    : griglia di iniezione con le chiavi ["periodi"] [giorni], ["ampiezze"] e ["fasi"] [rad]
+                              (default: griglia_predefinita())
+    forma (string)          : forma del segnale, una delle chiavi di FORME
+    soglia_p (float)        : soglia sul valore-p per la rilevazione
+    tolleranza (int)        : distanza massima, in passi in frequenza, tra il picco e la frequenza iniettata
+    n_processi (int)        : numero di processi del pool (default: numero di CPU), per le curve iniettate e per la
+                              distribuzione nulla; con n_processi = 1 i blocchi vengono calcolati nel processo principale
+                              senza memoria condivisa
+    dimensione_blocco (int) : numero di curve iniettate per compito
+
+    Restituisce:
+    -------------
+    mappa (dictionary) : con le chiavi
+                         ["chiave"], ["forma"], ["soglia_p"], ["tolleranza"]
+                         ["periodi"], ["ampiezze"], ["fasi"] : griglia di iniezione
+                         ["efficienza"]      : matrice (periodi, ampiezze) della frazione di fasi in cui il segnale è rilevato
+                         ["recupero"]        : matrice (periodi, ampiezze) della frazione di fasi in cui il periodo è recuperato
+                         ["p_mediano"]       : matrice (periodi, ampiezze) del valore-p mediano sulle fasi
+                         ["n_realizzazioni"] : numero di curve sintetiche della distribuzione nulla
+
+    Note:
+    -------------
+    - se il valore-p è il limite superiore 1/sqrt(n_realizzazioni) (nessun picco sintetico supera quello della curva
+      iniettata, vedi modulo_funzioni_blazar.valore_p_istogramma()) il segnale è considerato significativo solo se il
+      limite non supera soglia_p: con troppe poche curve sintetiche la soglia non può essere verificata e nessun
+      segnale viene rilevato
+    - il picco di ogni curva iniettata e di ogni curva sintetica della distribuzione nulla è il massimo di |C_k|^2
+      oltre la frequenza di taglio (modulo_funzioni_blazar.picco_potenza_blocco()), per cui l'efficienza misura la
+      rilevabilità del segnale e non la sua fase; la distribuzione nulla è quindi diversa da quella dello stadio istogramma,
+      che usa l'ordinamento dei numeri complessi di picco_periodo()
+    - con i parametri "preelaborazione" e "sovracampionamento" dello stato le curve iniettate vengono elaborate prima
+      della trasformata e i loro picchi raffinati, come le curve sintetiche della distribuzione nulla
+    - il numero di curve analizzate è len(periodi)*len(ampiezze)*len(fasi); la memoria di ogni compito è quella
+      di dimensione_blocco curve e dei loro spettri
+
+    """
+    if forma not in FORME:
+        raise KeyError("Forma {} non disponibile, le forme disponibili sono: {}".format(forma, ", ".join(FORME)))
+
+    if griglia is None:
+        griglia = griglia_predefinita(stato)
+
+    diz = pbl.esegui_stadio(stato, "interpolazione")
+
+    flusso, tempo = diz["flussi completi"], diz["tempi completi"]
+    dt   = fbl.dt_moda(tempo)
+    freq = np.fft.fftfreq(len(flusso), d = dt)
+
+    # griglia appiattita: indice (periodo, ampiezza, fase) in ordine C
+    periodi, ampiezze, fasi = np.meshgrid(griglia["periodi"]*86400, griglia["ampiezze"], griglia["fasi"], indexing = "ij")
+
+    array = {
+        "flusso"   : np.asarray(flusso, dtype = float),
+        "tempo"    : np.asarray(tempo, dtype = float),
+        "freq"     : freq,
+        "periodi"  : periodi.ravel(),
+        "ampiezze" : ampiezze.ravel(),
+        "fasi"     : fasi.ravel(),
+    }
+
+    par = stato["parametri"]
+
+    affinamento = None
+    if par["sovracampionamento"] is not None:
+        affinamento = (par["sovracampionamento"], par["affinamento"])
+
+    freq_picchi, ck_picchi = _picchi_griglia(array, forma, par["frequenza_taglio"], n_processi, dimensione_blocco,
+                                             par["preelaborazione"], affinamento)
+
+    ist = _distribuzione_nulla(stato, array, n_processi, affinamento)
+
+    p = fbl.valori_p_istogramma(ist, np.abs(ck_picchi)**2)
+    limite = 1/np.sqrt(ist["n_realizzazioni"])
+
+    recuperati = np.abs(freq_picchi - 1/array["periodi"]) <= tolleranza/(len(flusso)*dt)
+    # il limite superiore del valore-p vale come rilevazione solo se l'istogramma può risolvere la soglia
+    rilevati   = recuperati & ((p <= soglia_p) | ((p == limite) & (limite <= soglia_p)))
+
+    forma_griglia = periodi.shape
+
+    mappa = {
+        "chiave"          : stato["chiave"],
+        "forma"           : forma,
+        "soglia_p"        : soglia_p,
+        "tolleranza"      : tolleranza,
+        "periodi"         : np.asarray(griglia["periodi"], dtype = float),
+        "ampiezze"        : np.asarray(griglia["ampiezze"], dtype = float),
+        "fasi"            : np.asarray(griglia["fasi"], dtype = float),
+        "efficienza"      : rilevati.reshape(forma_griglia).mean(axis = 2),
+        "recupero"        : recuperati.reshape(forma_griglia).mean(axis = 2),
+        "p_mediano"       : np.median(p.reshape(forma_griglia), axis = 2),
+        "n_realizzazioni" : ist["n_realizzazioni"],
+    }
+
+    return mappa
+
+#------------------------------------------------------------------------------------------------------------
+
+def campagna_fonti(chiavi = None, griglia = None, forma = "sinusoidale", soglia_p = 0.01, tolleranza = 1, n_processi = None,
+                   dimensione_blocco = DIMENSIONE_BLOCCO, **parametri):
+    """
+    Funzione che esegue la campagna di iniezione per le fonti del catalogo
+
+    Parametri:
+    -------------
+    chiavi (list)        : chiavi delle fonti (default: tutte le fonti di modulo_pipeline_blazar.FONTI)
+    griglia (dictionary) : griglia comune a tutte le fonti (default: griglia_predefinita() di ogni fonte)
+    **parametri          : parametri dell'analisi delle fonti (vedi modulo_pipeline_blazar.PARAMETRI)
+    gli altri parametri sono quelli di campagna_iniezione()
+
+    Restituisce:
+    -------------
+    mappe (dictionary) : {chiave : mappa} con le mappe di efficienza restituite da campagna_iniezione()
+
+    """
+    if chiavi is None:
+        chiavi = list(pbl.FONTI)
+
+    parametri.setdefault("processi", n_processi)
+
+    mappe = {}
+
+    for chiave in chiavi:
+        stato = pbl.crea_stato(chiave, **parametri)
+        mappe[chiave] = campagna_iniezione(stato, griglia, forma, soglia_p, tolleranza, n_processi, dimensione_blocco)
+
+    return mappe
+
+
+                                      ###########################################
+                                      #        Salvataggio e riepilogo          #
+                                      ###########################################
+
+def salva_mappe(mappe, nome_file):
+    """
+    Funzione che scrive le mappe di efficienza in un archivio npz, con gli array di ogni fonte nelle chiavi "<chiave>_<nome>"
+    (ad esempio "1M_efficienza"); le mappe possono essere rilette con np.load()
+    """
+    array = {}
+
+    for chiave, mappa in mappe.items():
+        for nome, valore in mappa.items():
+            if nome != "chiave":
+                array["{}_{}".format(chiave, nome)] = np.asarray(valore)
+
+    np.savez_compressed(nome_file, **array)
+
+#------------------------------------------------------------------------------------------------------------
+
+def tabella_efficienza(mappe, livello = 0.5):
+    """
+    Funzione che restituisce il testo della tabella riassuntiva delle mappe di efficienza: per ogni fonte
+    l'efficienza media e, per alcuni periodi, l'ampiezza minima con efficienza almeno pari a livello
+    """
+    testo = ["\033[95m     Tabella dell'efficienza di rilevazione dei segnali iniettati   \033[0m",
+             "",
+             " Fonte | Forma          | Efficienza media | Periodo [gg] | Ampiezza minima ({:.0f}%) ".format(livello*100)]
+
+    for chiave, mappa in mappe.items():
+        testo.append("-------|----------------|------------------|--------------|------------------------")
+
+        periodi = mappa["periodi"]
+        scelti  = np.unique(np.linspace(0, len(periodi) - 1, min(5, len(periodi))).round().astype(int))
+
+        for j, i in enumerate(scelti):
+            sopra = np.flatnonzero(mappa["efficienza"][i] >= livello)
+            ampiezza = "{:.3f}".format(mappa["ampiezze"][sopra[0]]) if len(sopra) > 0 else "  -"
+
+            if j == 0:
+                testo.append(" {:<6}| {:<15}| {:<17.3f}| {:<13.1f}| {}".format(chiave, mappa["forma"], mappa["efficienza"].mean(),
+                                                                              periodi[i], ampiezza))
+            else:
+                testo.append(" {:<6}| {:<15}| {:<17}| {:<13.1f}| {}".format("", "", "", periodi[i], ampiezza))
+
+    return "\n".join(testo)
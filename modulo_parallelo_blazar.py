@@ -0,0 +1,320 @@
+"""
+Modulo per il calcolo parallelo delle curve sintetiche con memoria condivisa
+
+Autore: Valenti Alessandra
+
+
+Le curve sintetiche vengono generate e analizzate a blocchi (matrici di curve, vedi
+modulo_funzioni_blazar.curve_sintetiche_blocco() e picchi_sintetici_blocco()) in un pool di processi.
+Il flusso interpolato, le frequenze della trasformata e l'array dei picchi in uscita vengono allocati in memoria
+condivisa (multiprocessing.shared_memory): ogni processo si collega agli array una sola volta all'avvio, senza copiarli,
+e scrive i picchi del proprio blocco direttamente nella porzione dell'array di uscita che gli è assegnata.
+Le eventuali opzioni di preelaborazione (modulo_funzioni_blazar.preelabora()) vengono applicate ad ogni blocco di curve
+sintetiche prima della trasformata; con multipli = k per ogni curva vengono calcolati, nello stesso passaggio, anche i k
+picchi più alti (modulo_funzioni_blazar.picchi_multipli()), scritti in un secondo array condiviso. Con potenza = True il
+picco di ogni curva è il massimo di |C_k|^2 (modulo_funzioni_blazar.picco_potenza_blocco()) invece dell'ordinamento
+dei numeri complessi di picco_periodo().
+Ad ogni processo viene quindi inviato solo il compito (inizio, fine, seme), per cui il costo di comunicazione
+di ogni compito non dipende dalla lunghezza della curva di luce né dal numero di curve.
+
+Elenco delle funzioni:
+     - crea_condiviso ..................... copia un array in un nuovo blocco di memoria condivisa
+     - collega_condiviso .................. collega un array ad un blocco di memoria condivisa esistente
+     - esegui_condiviso ................... esegue dei compiti in un pool di processi con gli array in memoria condivisa
+     - picchi_sintetici_paralleli ......... picchi degli spettri di N curve sintetiche calcolati in parallelo
+     - valida_precisione .................. confronto dei valori-p in float32 e float64 sui dati delle fonti
+
+"""
+import modulo_funzioni_blazar as fbl
+import modulo_pipeline_blazar as pbl
+import numpy as np
+import os
+from scipy import fft
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor
+
+
+DIMENSIONE_BLOCCO = 256    # numero di curve sintetiche per compito
+
+# stato dei processi del pool: array condivisi {nome : array}, blocchi di memoria collegati, funzione eseguita per ogni
+# compito e suoi parametri
+_processo = {"array" : {}, "memorie" : [], "funzione" : None, "parametri" : {}}
+
+
+                                      ###########################################
+                                      #           Memoria condivisa             #
+                                      ###########################################
+
+def crea_condiviso(ar):
+    """
+    Funzione che copia un array in un nuovo blocco di memoria condivisa
+
+    Parametri:
+    -------------
+    ar (array) : array da condividere (può essere vuoto di dati, ad esempio np.empty(N))
+
+    Restituisce:
+    -------------
+    memoria (SharedMemory) : blocco di memoria condivisa, da chiudere con close() e rimuovere con unlink() al termine
+    condiviso (array)      : array di numpy che utilizza il blocco di memoria
+    descrittore (tuple)    : (nome del blocco, forma, tipo) da inviare ai processi per collega_condiviso()
+
+    """
+    memoria = shared_memory.SharedMemory(create = True, size = max(ar.nbytes, 1))
+    condiviso = np.ndarray(ar.shape, dtype = ar.dtype, buffer = memoria.buf)
+    condiviso[...] = ar
+
+    return memoria, condiviso, (memoria.name, ar.shape, ar.dtype.str)
+
+
+def collega_condiviso(descrittore):
+    """
+    Funzione che collega un array ad un blocco di memoria condivisa creato con crea_condiviso(), senza copiarlo
+
+    Restituisce:
+    -------------
+    memoria (SharedMemory), condiviso (array)
+
+    Note:
+    -------------
+    - i processi del pool condividono il resource tracker del processo principale, che rimuove il blocco con unlink()
+
+    """
+    nome, forma, tipo = descrittore
+
+    memoria = shared_memory.SharedMemory(name = nome)
+
+    return memoria, np.ndarray(forma, dtype = np.dtype(tipo), buffer = memoria.buf)
+
+#------------------------------------------------------------------------------------------------------------
+
+def _collega_processo(descrittori, funzione, parametri):
+    # inizializzazione dei processi del pool: collegamento agli array condivisi (una sola volta per processo)
+    for nome, descrittore in descrittori.items():
+        memoria, _processo["array"][nome] = collega_condiviso(descrittore)
+        _processo["memorie"].append(memoria)
+
+    _processo["funzione"]  = funzione
+    _processo["parametri"] = parametri
+
+
+def _esegui_compito(compito):
+    return _processo["funzione"](_processo["array"], compito, **_processo["parametri"])
+
+#------------------------------------------------------------------------------------------------------------
+
+def esegui_condiviso(funzione, compiti, ingressi, uscite, n_processi = None, **parametri):
+    """
+    Funzione che esegue i compiti in un pool di processi, con gli array di ingresso e di uscita in memoria condivisa
+
+    Parametri:
+    -------------
+    funzione              : funzione del livello di un modulo, chiamata come funzione(array, compito, **parametri) per ogni
+                            compito, con array il dizionario {nome : array} di tutti gli ingressi e le uscite; scrive i
+                            risultati del compito nella propria porzione degli array di uscita
+    compiti (list)        : compiti, ad esempio (inizio, fine) delle righe da calcolare
+    ingressi (dictionary) : {nome : array} degli array in sola lettura
+    uscite (dictionary)   : {nome : array} degli array di uscita (ad esempio np.empty(N))
+    n_processi (int)      : numero di processi del pool (default: numero di CPU), con n_processi = 1 o con un solo compito
+                            i compiti vengono eseguiti nel processo principale senza memoria condivisa
+    **parametri           : parametri comuni a tutti i compiti, inviati una sola volta ad ogni processo
+
+    Restituisce:
+    -------------
+    uscite (dictionary) : {nome : array} con i risultati di tutti i compiti
+
+    Note:
+    -------------
+    - ad ogni processo viene inviato solo il compito, per cui il costo di comunicazione non dipende dalla dimensione degli array
+    - i blocchi di memoria condivisa vengono chiusi e rimossi anche se un compito solleva un'eccezione
+
+    """
+    if n_processi is None:
+        n_processi = os.cpu_count()
+
+    if n_processi == 1 or len(compiti) == 1:
+        array = dict(ingressi, **uscite)
+        for compito in compiti:
+            funzione(array, compito, **parametri)
+
+        return uscite
+
+    memorie, condivisi, descrittori = [], {}, {}
+
+    try:
+        for nome, ar in tuple(ingressi.items()) + tuple(uscite.items()):
+            memoria, condivisi[nome], descrittori[nome] = crea_condiviso(ar)
+            memorie.append(memoria)
+
+        with ProcessPoolExecutor(max_workers = n_processi, initializer = _collega_processo,
+                                 initargs = (descrittori, funzione, parametri)) as pool:
+            list(pool.map(_esegui_compito, compiti))
+
+        uscite = {nome : condivisi[nome].copy() for nome in uscite}
+
+    finally:
+        # gli array devono essere rilasciati prima di chiudere i blocchi di memoria
+        condivisi.clear()
+        for memoria in memorie:
+            memoria.close()
+            memoria.unlink()
+
+    return uscite
+
+
+                                      ###########################################
+                                      #        Curve sintetiche parallele       #
+                                      ###########################################
+
+def _picchi_blocco(curve, freq, f_taglio, affinamento, preelaborazione = None, multipli = None, potenza = False):
+    # picchi di un blocco di curve sintetiche, eventualmente elaborate prima della trasformata e raffinati tra i bin
+    if preelaborazione is not None:
+        tempo, opzioni = preelaborazione
+        curve = fbl.preelabora(curve, tempo, **opzioni)
+
+    if potenza:
+        f_picchi, picchi = fbl.picco_potenza_blocco(curve, freq, f_taglio)
+
+        if affinamento is None:
+            return picchi
+
+        return fbl.affina_picchi(curve, 1/(len(freq)*freq[1]), f_picchi, *affinamento)[1]
+
+    if multipli is not None:
+        # picco principale e k picchi più alti delle stesse curve, da un'unica trasformata del blocco
+        ck = fft.rfft(curve, axis = 1)
+
+        if affinamento is None:
+            # come picchi_sintetici_blocco(): ordinamento dei numeri complessi oltre f_taglio
+            n = len(freq)//2
+            picchi = np.max(ck[:, n - np.count_nonzero(freq[:n] > f_taglio):n], axis = 1)
+        else:
+            picchi = _picchi_blocco(curve, freq, f_taglio, affinamento)
+
+        return picchi, fbl.picchi_multipli(ck, freq, f_taglio, multipli)[1]
+
+    if affinamento is None:
+        return fbl.picchi_sintetici_blocco(curve, freq, f_taglio)
+
+    f_picchi, _ = fbl.picco_periodo_blocco(curve, freq, f_taglio)
+
+    return fbl.affina_picchi(curve, 1/(len(freq)*freq[1]), f_picchi, *affinamento)[1]
+
+
+def _esegui_blocco(ar, compito, f_taglio, affinamento, preelaborazione, multipli, potenza):
+    # genera le curve sintetiche [inizio, fine) e scrive i loro picchi nella porzione corrispondente degli array di uscita
+    inizio, fine, seme = compito
+
+    curve = fbl.curve_sintetiche_blocco(ar["flusso"], fine - inizio, seme)
+    picchi = _picchi_blocco(curve, ar["freq"], f_taglio, affinamento, preelaborazione, multipli, potenza)
+
+    if multipli is None:
+        ar["picchi"][inizio:fine] = picchi
+    else:
+        ar["picchi"][inizio:fine], ar["multipli"][inizio:fine] = picchi
+
+    return fine - inizio
+
+#------------------------------------------------------------------------------------------------------------
+
+def picchi_sintetici_paralleli(flusso, freq, N, f_taglio, n_processi = None, dimensione_blocco = DIMENSIONE_BLOCCO, seme = None,
+                               affinamento = None, preelaborazione = None, multipli = None, potenza = False):
+    """
+    Funzione che calcola in parallelo i picchi degli spettri di N curve sintetiche
+
+    Parametri:
+    -------------
+    flusso (array)          : flusso interpolato della curva di luce
+    freq (array)            : frequenze della trasformata (fft.fftfreq(len(flusso), d = dt))
+    N (int)                 : numero di curve sintetiche
+    f_taglio (float)        : valore della frequenza al di sotto della quale il contributo viene considerato costante
+    n_processi (int)        : numero di processi del pool (default: numero di CPU), con n_processi = 1
+                              i blocchi vengono calcolati nel processo principale senza memoria condivisa
+    dimensione_blocco (int) : numero di curve sintetiche per compito
+    seme                    : seme del generatore (int o None); i semi dei blocchi sono ricavati con
+                              np.random.SeedSequence.spawn(), per cui a parità di seme e di dimensione dei blocchi
+                              il risultato non dipende dal numero di processi
+    affinamento (tuple)     : (sovracampionamento, metodo) per raffinare i picchi tra i bin della trasformata con
+                              modulo_funzioni_blazar.affina_picchi() (default None: picchi sulla griglia)
+    preelaborazione (tuple) : (tempi completi, opzioni di modulo_funzioni_blazar.preelabora()) applicate ad ogni blocco
+                              di curve sintetiche prima della trasformata (default None: nessuna elaborazione)
+    multipli (int)          : se indicato, per ogni curva vengono calcolati anche i multipli picchi più alti (statistiche
+                              d'ordine, vedi modulo_funzioni_blazar.picchi_multipli()) sulla griglia, senza affinamento
+    potenza (bool)          : se True il picco di ogni curva è il massimo di |C_k|^2 (modulo_funzioni_blazar.picco_potenza_blocco()),
+                              che non dipende dalla fase, invece dell'ordinamento dei numeri complessi (non combinabile con multipli)
+
+    Restituisce:
+    -------------
+    picchi (array) : valori complessi dei picchi delle N curve (equivalenti a quelli di ar_picchi_sintetici()),
+                     con il tipo complesso corrispondente a quello del flusso
+    con multipli = k viene restituita la coppia (picchi, picchi_multipli), con picchi_multipli matrice (N, k) dei picchi
+    più alti delle stesse curve sintetiche
+
+    """
+    if potenza and multipli is not None:
+        raise ValueError("Le opzioni potenza e multipli non possono essere usate insieme")
+
+    limiti = list(range(0, N, dimensione_blocco)) + [N]
+    semi   = np.random.SeedSequence(seme).spawn(len(limiti) - 1)
+    compiti = [(limiti[i], limiti[i + 1], semi[i]) for i in range(len(limiti) - 1)]
+
+    tipo = np.result_type(flusso.dtype, np.complex64)
+
+    uscite = {"picchi" : np.empty(N, dtype = tipo)}
+    if multipli is not None:
+        uscite["multipli"] = np.empty((N, multipli), dtype = tipo)
+
+    uscite = esegui_condiviso(_esegui_blocco, compiti, {"flusso" : flusso, "freq" : freq}, uscite, n_processi, f_taglio = f_taglio,
+                              affinamento = affinamento, preelaborazione = preelaborazione, multipli = multipli, potenza = potenza)
+
+    return uscite["picchi"] if multipli is None else (uscite["picchi"], uscite["multipli"])
+
+
+                                      ###########################################
+                                      #     Validazione della precisione        #
+                                      ###########################################
+
+def valida_precisione(chiavi = None, seme = 0, n_processi = None, **parametri):
+    """
+    Funzione che confronta i valori-p ottenuti con il motore parallelo in singola (float32) e doppia (float64) precisione
+    sui dati delle fonti del catalogo
+
+    Parametri:
+    -------------
+    chiavi (list)    : chiavi delle fonti (default: tutte le fonti di modulo_pipeline_blazar.FONTI)
+    seme (int)       : seme delle curve sintetiche, uguale per le due precisioni
+    n_processi (int) : numero di processi del pool
+    **parametri      : altri parametri dell'analisi (ad esempio N)
+
+    Restituisce:
+    -------------
+    confronto (dictionary) : {chiave : {"p_float64", "p_float32", "differenza", "errore_picchi"}} dove differenza è |Δp|
+                             ed errore_picchi il massimo errore relativo sul modulo dei picchi sintetici
+
+    Note:
+    -------------
+    - a parità di seme le curve sintetiche in float32 sono quelle in float64 arrotondate (vedi
+      modulo_funzioni_blazar.curve_sintetiche_blocco()), per cui le differenze sono dovute solo alla precisione
+
+    """
+    if chiavi is None:
+        chiavi = list(pbl.FONTI)
+
+    confronto = {}
+
+    for chiave in chiavi:
+        p, picchi = {}, {}
+
+        for precisione in ("float64", "float32"):
+            stato = pbl.crea_stato(chiave, motore = "parallelo", precisione = precisione, seme = seme, processi = n_processi, **parametri)
+            p[precisione]      = float(pbl.esegui_stadio(stato, "significatività"))
+            picchi[precisione] = np.abs(stato["stadi"]["picchi_sintetici"])
+
+        confronto[chiave] = {
+            "p_float64"     : p["float64"],
+            "p_float32"     : p["float32"],
+            "differenza"    : abs(p["float64"] - p["float32"]),
+            "errore_picchi" : float(np.max(np.abs(picchi["float32"] - picchi["float64"]) / picchi["float64"])),
+        }
+
+    return confronto
@@ -0,0 +1,285 @@
+"""
+Modulo per il periodogramma di Lomb-Scargle generalizzato pesato con gli errori sul flusso
+
+Autore: Valenti Alessandra
+
+
+Lo spettro della curva interpolata pesa allo stesso modo i bin poco significativi e i flare più luminosi. Il periodogramma
+di Lomb-Scargle generalizzato (Zechmeister & Kürster 2009) viene invece calcolato sui dati misurati, con pesi w_i = 1/sigma_i^2
+normalizzati e con una costante libera nel modello sinusoidale; la potenza normalizzata p(f) è compresa tra 0 e 1.
+
+Per un blocco di frequenze le somme trigonometriche sono prodotti matriciali tra i flussi e le matrici (misure, frequenze)
+di w*cos e w*sin, che dipendono solo dai tempi e dai pesi. Flusso ed errore sono correlati (i flare hanno errori relativi
+minori), per cui le curve sintetiche permutano le coppie (flusso, peso) sui tempi delle misure: le somme sum w_i y_i e
+sum w_i y_i^2 non cambiano, mentre quelle che dipendono dai tempi sono prodotti delle matrici (curve, misure) dei pesi
+e dei prodotti w*y permutati per le matrici di cos, sin, cos^2 e cos*sin, calcolate una sola volta per tutte le curve:
+per un blocco di curve servono sei prodotti matriciali. I blocchi di frequenze hanno memoria limitata e possono essere
+calcolati in più thread (numpy rilascia il GIL nei prodotti matriciali).
+
+Trattamento degli upper limit (e degli errori NaN di flusso_err_to_float()):
+    - "escludi" : gli upper limit e i bin con errore non valido vengono esclusi
+    - "metà"    : gli upper limit vengono inclusi con flusso e errore pari a metà del loro valore
+
+Elenco delle funzioni:
+     - dati_pesati ........................ tempi, flussi e pesi 1/sigma^2 secondo il trattamento degli upper limit
+     - griglia_frequenze .................. frequenze equispaziate fino alla frequenza di Nyquist
+     - periodogramma_gls .................. potenza del periodogramma generalizzato pesato e picco
+     - picchi_gls_sintetici ............... picchi dei periodogrammi di N curve sintetiche, a blocchi di curve e di frequenze
+     - tabella_gls ........................ testo della tabella dei picchi e della significatività
+
+"""
+import modulo_funzioni_blazar as fbl
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+
+DIMENSIONE_BLOCCO = 256    # numero di curve sintetiche per blocco
+
+
+                                      ###########################################
+                                      #         Dati e griglia di frequenze     #
+                                      ###########################################
+
+def dati_pesati(diz, upper_limit = "escludi"):
+    """
+    Funzione che restituisce tempi, flussi e pesi 1/sigma^2 della curva misurata secondo il trattamento degli upper limit
+
+    Parametri:
+    -------------
+    diz (dictionary)     : dizionario della fonte con flusso ed errore convertiti in float (stadio "float" della pipeline)
+    upper_limit (string) : "escludi" oppure "metà" (vedi la descrizione del modulo)
+
+    Restituisce:
+    -------------
+    tempo, flusso, pesi (array)
+
+    """
+    tempo  = diz["tempo"]
+    flusso = diz["flusso"].astype(float)
+    errore = diz["flusso_err"].astype(float)
+
+    upper = np.isin(tempo, diz["upper_lim_tempo"])
+
+    if upper_limit == "metà":
+        flusso = np.where(upper, flusso/2, flusso)
+        errore = np.where(upper, flusso, errore)
+    elif upper_limit != "escludi":
+        raise ValueError("Trattamento degli upper limit {} non valido, i valori accettati sono: escludi, metà".format(upper_limit))
+    else:
+        errore = np.where(upper, np.nan, errore)
+
+    validi = np.isfinite(errore) & (errore > 0)
+
+    return tempo[validi], flusso[validi], 1/errore[validi]**2
+
+
+def griglia_frequenze(tempo, sovracampionamento = 1, f_min = 1e-8, f_max = None):
+    """
+    Funzione che restituisce le frequenze [Hz] con passo 1/(T*sovracampionamento) tra f_min e f_max
+    (default f_max: frequenza di Nyquist del passo di campionamento più frequente); con sovracampionamento = 1
+    il passo è quello della trasformata della curva interpolata
+    """
+    if f_max is None:
+        f_max = 1/(2*fbl.dt_moda(tempo))
+
+    df = 1/((tempo[-1] - tempo[0])*sovracampionamento)
+
+    return np.arange(np.ceil(f_min/df), np.floor(f_max/df) + 1)*df
+
+
+                                      ###########################################
+                                      #    Periodogramma generalizzato pesato   #
+                                      ###########################################
+
+def _matrici_blocco(tempo, pesi, frequenze):
+    # matrici (misure, frequenze) di w*cos e w*sin e somme che dipendono solo da tempi e pesi
+    fase = 2*np.pi*np.outer(tempo - tempo[0], frequenze)
+    cos, sin = np.cos(fase), np.sin(fase)
+
+    wcos, wsin = pesi[:, None]*cos, pesi[:, None]*sin
+
+    C, S = np.sum(wcos, axis = 0), np.sum(wsin, axis = 0)
+    CC, CS = np.sum(wcos*cos, axis = 0), np.sum(wcos*sin, axis = 0)
+
+    CC_ = CC - C**2
+    SS_ = 1 - CC - S**2
+    CS_ = CS - C*S
+
+    return wcos, wsin, C, S, CC_, SS_, CS_, CC_*SS_ - CS_**2
+
+
+def _potenze_blocco(curve, pesi, matrici):
+    # potenza normalizzata (curve, frequenze) delle righe di curve per un blocco di frequenze
+    wcos, wsin, C, S, CC_, SS_, CS_, D = matrici
+
+    Y  = (curve @ pesi)[:, None]
+    YY = (curve**2 @ pesi)[:, None] - Y**2
+
+    YC = curve @ wcos - Y*C
+    YS = curve @ wsin - Y*S
+
+    with np.errstate(divide = "ignore", invalid = "ignore"):
+        return (SS_*YC**2 + CC_*YS**2 - 2*CS_*YC*YS)/(YY*D)
+
+
+def _trigonometriche_blocco(tempo, frequenze):
+    # matrici (misure, frequenze) di cos, sin, cos^2 e cos*sin, che dipendono solo dai tempi (curve sintetiche)
+    fase = 2*np.pi*np.outer(tempo - tempo[0], frequenze)
+    cos, sin = np.cos(fase), np.sin(fase)
+
+    return cos, sin, cos*cos, cos*sin
+
+
+def _potenze_coppie(pesi, prodotti, Y, YY, matrici):
+    # potenza normalizzata (curve, frequenze) per righe di pesi e prodotti w*y permutati insieme (curve, misure)
+    cos, sin, cos2, cossin = matrici
+
+    C, S = pesi @ cos, pesi @ sin
+    CC = pesi @ cos2
+
+    CC_ = CC - C**2
+    SS_ = 1 - CC - S**2
+    CS_ = pesi @ cossin - C*S
+
+    YC = prodotti @ cos - Y*C
+    YS = prodotti @ sin - Y*S
+
+    with np.errstate(divide = "ignore", invalid = "ignore"):
+        return (SS_*YC**2 + CC_*YS**2 - 2*CS_*YC*YS)/(YY*(CC_*SS_ - CS_**2))
+
+
+def _blocchi_frequenze(tempo, pesi, frequenze, n_curve, memoria_max):
+    # matrici di tutti i blocchi di frequenze, con blocchi tali che le matrici intermedie non superino memoria_max
+    n_blocco = max(int(memoria_max//(8*(4*len(tempo) + 4*n_curve))), 1)
+
+    return [_matrici_blocco(tempo, pesi, frequenze[i:i + n_blocco]) for i in range(0, len(frequenze), n_blocco)]
+
+
+def _mappa(funzione, blocchi, n_thread):
+    # applica funzione ai blocchi di frequenze, eventualmente in un pool di thread
+    if n_thread is None or n_thread <= 1:
+        return [funzione(blocco) for blocco in blocchi]
+
+    with ThreadPoolExecutor(max_workers = n_thread) as pool:
+        return list(pool.map(funzione, blocchi))
+
+#------------------------------------------------------------------------------------------------------------
+
+@fbl.profila
+def periodogramma_gls(tempo, flusso, pesi, frequenze, memoria_max = 64e6, n_thread = None):
+    """
+    Funzione che calcola il periodogramma di Lomb-Scargle generalizzato pesato della curva di luce misurata
+
+    Parametri:
+    -------------
+    tempo, flusso, pesi (array) : tempi [s], flussi e pesi 1/sigma^2 (vedi dati_pesati())
+    frequenze (array)           : frequenze [Hz] (vedi griglia_frequenze())
+    memoria_max (float)         : memoria massima [byte] delle matrici di un blocco di frequenze
+    n_thread (int)              : numero di thread tra cui suddividere i blocchi di frequenze (default: un solo thread)
+
+    Restituisce:
+    -------------
+    periodogramma (dictionary) : con le chiavi
+                                 ["frequenze"] : frequenze [Hz]
+                                 ["potenza"]   : potenza normalizzata p(f) tra 0 e 1
+                                 ["picco"]     : frequenza e radice della potenza del massimo, nel formato di
+                                                 picco_periodo() (|picco|^2 = p)
+
+    """
+    pesi = pesi/np.sum(pesi)
+    curva = np.asarray(flusso, dtype = float)[None, :]
+
+    blocchi = _blocchi_frequenze(tempo, pesi, frequenze, 1, memoria_max)
+    potenza = np.concatenate(_mappa(lambda matrici: _potenze_blocco(curva, pesi, matrici)[0], blocchi, n_thread))
+
+    i_picco = np.nanargmax(potenza)
+
+    periodogramma = {
+        "frequenze" : frequenze,
+        "potenza"   : potenza,
+        "picco"     : [frequenze[i_picco], np.sqrt(potenza[i_picco])],
+    }
+
+    return periodogramma
+
+#------------------------------------------------------------------------------------------------------------
+
+@fbl.profila
+def picchi_gls_sintetici(tempo, flusso, pesi, frequenze, N, seme = None, memoria_max = 64e6, n_thread = None,
+                         dimensione_blocco = DIMENSIONE_BLOCCO):
+    """
+    Funzione che calcola i picchi dei periodogrammi di N curve sintetiche (permutazioni delle coppie flusso e peso
+    sui tempi delle misure), per la significatività del picco di periodogramma_gls()
+
+    Parametri:
+    -------------
+    tempo, flusso, pesi (array) : tempi [s], flussi e pesi 1/sigma^2 (vedi dati_pesati())
+    frequenze (array)           : frequenze [Hz]
+    N (int)                     : numero di curve sintetiche
+    seme                        : seme del generatore (int o None); i semi dei blocchi di curve sono ricavati con
+                                  np.random.SeedSequence.spawn(), per cui il risultato non dipende dal numero di thread
+    memoria_max (float)         : memoria massima [byte] delle matrici di un blocco di frequenze
+    n_thread (int)              : numero di thread tra cui suddividere i blocchi di frequenze
+    dimensione_blocco (int)     : numero di curve sintetiche per blocco
+
+    Restituisce:
+    -------------
+    picchi (array) : radici delle potenze massime delle N curve, confrontabili con periodogramma_gls()["picco"][1]
+
+    Note:
+    -------------
+    - ogni peso resta associato al proprio flusso: permutare solo il flusso lasciando i pesi sui bin temporali
+      renderebbe la distribuzione nulla sbagliata, perché flusso ed errore sono correlati
+    - le permutazioni sono matrici di indici (vedi modulo_funzioni_blazar.curve_sintetiche_blocco()) con cui vengono
+      estratti pesi e prodotti w*y; le matrici trigonometriche vengono calcolate una sola volta e sono le stesse
+      per tutti i blocchi di curve
+
+    """
+    pesi = pesi/np.sum(pesi)
+    prodotti = pesi*np.asarray(flusso, dtype = float)
+
+    # somme invarianti per le permutazioni delle coppie
+    Y  = np.sum(prodotti)
+    YY = np.sum(prodotti*flusso) - Y**2
+
+    n_blocco = max(int(memoria_max//(8*(4*len(tempo) + 8*dimensione_blocco))), 1)
+    blocchi  = [_trigonometriche_blocco(tempo, frequenze[i:i + n_blocco]) for i in range(0, len(frequenze), n_blocco)]
+
+    limiti = list(range(0, N, dimensione_blocco)) + [N]
+    semi   = np.random.SeedSequence(seme).spawn(len(limiti) - 1)
+
+    picchi = np.empty(N)
+
+    for i in range(len(limiti) - 1):
+        indici = fbl.curve_sintetiche_blocco(np.arange(len(pesi)), limiti[i + 1] - limiti[i], semi[i])
+        w, wy  = pesi[indici], prodotti[indici]
+
+        massimi = _mappa(lambda matrici: np.nanmax(_potenze_coppie(w, wy, Y, YY, matrici), axis = 1), blocchi, n_thread)
+        picchi[limiti[i]:limiti[i + 1]] = np.max(massimi, axis = 0)
+
+    return np.sqrt(picchi)
+
+#------------------------------------------------------------------------------------------------------------
+
+def tabella_gls(periodogrammi, valori_p = None):
+    """
+    Funzione che restituisce il testo della tabella dei picchi dei periodogrammi generalizzati pesati
+
+    Parametri:
+    -------------
+    periodogrammi (dictionary) : {chiave della fonte : risultato di periodogramma_gls()}
+    valori_p (dictionary)      : {chiave della fonte : valore-p} (facoltativo)
+
+    """
+    testo = ["\033[95m     Tabella dei picchi del periodogramma di Lomb-Scargle generalizzato pesato   \033[0m",
+             "",
+             " Fonte | frequenza del picco [Hz] | potenza normalizzata | periodo [gg] | p-value"]
+
+    for chiave, pg in periodogrammi.items():
+        p = "  -" if valori_p is None else "{:.5f}".format(valori_p[chiave])
+
+        testo.append("-------|--------------------------|---------------------|--------------|---------")
+        testo.append(" {:<6}| {:<25.3e}| {:<20.4f}| {:<13.2f}| {}".format(chiave, pg["picco"][0], pg["picco"][1]**2,
+                     1/(pg["picco"][0]*86400), p))
+
+    return "\n".join(testo)
@@ -0,0 +1,685 @@
+"""
+Modulo per l'esecuzione a stadi dell'analisi della periodicità dei Blazar
+
+Autore: Valenti Alessandra
+
+
+L'analisi di una fonte è descritta come un piccolo grafo (DAG) di stadi con nome, ognuno dei quali dichiara
+gli stadi da cui dipende. Quando viene richiesto uno stadio, vengono calcolati unicamente gli stadi necessari
+e solo per le fonti richieste; i risultati di ogni stadio vengono memorizzati nello stato della fonte
+in modo da non essere mai ricalcolati.
+
+Elenco degli stadi (tra parentesi le dipendenze):
+     - carica .............................. ()
+     - upper_limit ......................... (carica)
+     - float ............................... (upper_limit)
+     - date ................................ (float)
+     - interpolazione ...................... (float)
+     - preelaborazione ..................... (interpolazione)
+     - fft ................................. (float)
+     - fft_interp .......................... (preelaborazione)
+     - fit ................................. (fft_interp)
+     - periodo ............................. (fft_interp)
+     - incertezza_periodo .................. (periodo)
+     - spettro_dinamico .................... (interpolazione)
+     - wwz ................................. (float)
+     - picchi_wwz_sintetici ................ (wwz)
+     - istogramma_wwz ...................... (picchi_wwz_sintetici)
+     - significatività_wwz ................. (istogramma_wwz)
+     - ripiegamento ........................ (float)
+     - picchi_ripiegamento_sintetici ....... (ripiegamento)
+     - istogramma_ripiegamento ............. (picchi_ripiegamento_sintetici)
+     - significatività_ripiegamento ........ (istogramma_ripiegamento)
+     - colonne ............................. (interpolazione, periodo)
+     - gls ................................. (float)
+     - picchi_gls_sintetici ................ (gls)
+     - istogramma_gls ...................... (picchi_gls_sintetici)
+     - significatività_gls ................. (istogramma_gls)
+     - blocchi ............................. (float)
+     - sintetiche .......................... (interpolazione)
+     - fft_sintetiche ...................... (sintetiche)
+     - picchi_sintetici .................... (fft_sintetiche)
+     - istogramma .......................... (picchi_sintetici, periodo)
+     - significatività ..................... (istogramma)
+     - picchi_multipli ..................... (fft_interp)
+     - picchi_multipli_sintetici ........... (fft_sintetiche)
+     - istogramma_multipli ................. (picchi_multipli_sintetici, picchi_multipli)
+     - significatività_multipli ............ (istogramma_multipli)
+     - picchi_paralleli .................... (interpolazione)
+
+Con il parametro "motore" = "parallelo" lo stadio picchi_sintetici viene calcolato direttamente dalla curva interpolata
+con modulo_parallelo_blazar (curve sintetiche a blocchi in un pool di processi con memoria condivisa, stadio picchi_paralleli),
+senza gli stadi sintetiche e fft_sintetiche (vedi MOTORI); con "precisione" = "float32" curve sintetiche, trasformate
+e picchi vengono calcolati in singola precisione.
+
+Lo stadio picchi_multipli_sintetici utilizza le stesse trasformate dello stadio picchi_sintetici: le distribuzioni nulle
+delle statistiche d'ordine dei k picchi più alti vengono calcolate con le stesse simulazioni, per cui verificare k periodi
+candidati non richiede altre curve sintetiche. Con il motore parallelo e il parametro "multipli_paralleli" i k picchi più alti
+vengono calcolati nello stesso passaggio del picco principale (stadio picchi_paralleli); altrimenti vengono calcolati
+in un secondo passaggio con il seme registrato dallo stadio picchi_paralleli, cioè sulle stesse curve sintetiche.
+
+Con il parametro "sovracampionamento" il picco originale (stadio periodo) e i picchi delle curve sintetiche vengono raffinati
+tra i bin della trasformata con lo stesso metodo (parametro "affinamento", vedi modulo_funzioni_blazar.affina_picchi()),
+in modo che la distribuzione nulla e il picco originale restino confrontabili.
+
+Con il parametro "preelaborazione" (dizionario delle opzioni di modulo_funzioni_blazar.preelabora()) la curva interpolata
+viene trasformata prima della trasformata di Fourier (logaritmo, taglio dei flare, rimozione del trend, finestra); le curve
+sintetiche permutano il flusso interpolato originale e vengono elaborate con la stessa chiamata, a blocchi, in entrambi i motori.
+
+Con crea_stato_derivato() lo stadio float di una fonte viene ricavato dalla curva di un'altra fonte raggruppandone i bin
+(ad esempio la curva mensile da quella settimanale), per cui il file della fonte derivata non viene letto.
+
+"""
+import modulo_funzioni_blazar as fbl
+import numpy as np
+import os
+
+
+                                      ###########################################
+                                      #     Catalogo delle fonti e parametri    #
+                                      ###########################################
+
+# le chiavi sono formate dal numero della fonte e dalla base temporale (M = mensile, W = settimanale)
+
+FONTI = {
+    "1M" : {"file" : '4FGL_J1229.0+0202_monthly_12_23_2024.csv', "nome" : "3C 273 (FSRQ)"         , "base" : "M"},
+    "2M" : {"file" : '4FGL_J1555.7+1111_monthly_12_23_2024.csv', "nome" : "PG 1553 + 113 (BL Lac)", "base" : "M"},
+    "3M" : {"file" : '4FGL_J2202.7+4216_monthly_12_23_2024.csv', "nome" : "BL Lacertae (BL Lac)"  , "base" : "M"},
+    "4M" : {"file" : '4FGL_J2253.9+1609_monthly_12_23_2024.csv', "nome" : "3C 454.3 (FSRQ)"       , "base" : "M"},
+
+    "1W" : {"file" : '4FGL_J1229.0+0202_weekly_12_23_2024.csv' , "nome" : "3C 273 (FSRQ)"         , "base" : "W"},
+    "2W" : {"file" : '4FGL_J1555.7+1111_weekly_12_23_2024.csv' , "nome" : "PG 1553 + 113 (BL Lac)", "base" : "W"},
+    "3W" : {"file" : '4FGL_J2202.7+4216_weekly_12_23_2024.csv' , "nome" : "BL Lacertae (BL Lac)"  , "base" : "W"},
+    "4W" : {"file" : '4FGL_J2253.9+1609_weekly_12_23_2024.csv' , "nome" : "3C 454.3 (FSRQ)"       , "base" : "W"},
+}
+
+BASI = {"M" : "mensile", "W" : "settimanale"}
+
+PARAMETRI = {
+    "cartella"         : ".",          # cartella contenente i file CSV
+    "p0_fit"           : [1e-9, 0.9],  # initial guesses per il fit
+    "frequenza_taglio" : 1e-8,
+    "N"                : 10000,        # numero di curve sintetiche
+    "n_bins"           : 100,          # numero di bin degli istogrammi della significatività
+    "motore"           : "dizionari",  # "dizionari" (curve sintetiche come chiavi di un dizionario) o "parallelo"
+    "processi"         : None,         # processi del motore parallelo (default: numero di CPU)
+    "seme"             : None,         # seme delle curve sintetiche del motore parallelo
+    "precisione"       : "float64",    # "float32" per curve sintetiche e spettri in singola precisione (motore parallelo)
+    "bootstrap"        : "blocchi",    # ricampionamento per l'incertezza sul periodo: "blocchi" (residui) o "parametrico" (errori sul flusso)
+    "ricampionamenti"  : 1000,         # numero di ricampionamenti per l'incertezza sul periodo
+    "livello"          : 0.68,         # livello di confidenza dell'intervallo sul periodo
+    "seme_bootstrap"   : 0,            # seme dei ricampionamenti del periodo se "seme" non è indicato (intervallo riproducibile)
+    "sovracampionamento" : None,       # se indicato, picco originale e picchi sintetici vengono raffinati tra i bin (vedi fbl.affina_picchi())
+    "affinamento"      : "zoom",       # metodo di affinamento dei picchi: "zoom", "padding" o "parabola"
+    "finestre_gg"      : [730, 1460, 2920],  # lunghezze delle finestre dello spettro dinamico [giorni]
+    "passo_gg"         : None,         # passo tra le finestre dello spettro dinamico [giorni] (default: un bin)
+    "n_frequenze_wwz"  : 200,          # frequenze della WWZ, tra la frequenza di taglio e quella di Nyquist
+    "n_tau_wwz"        : 100,          # traslazioni temporali della WWZ
+    "N_wwz"            : 1000,         # numero di curve sintetiche per la significatività della WWZ
+    "n_periodi"        : 10000,        # periodi di prova del ripiegamento in fase, equispaziati in frequenza
+    "n_bin_fase"       : 10,           # bin di fase del ripiegamento (epoch folding e PDM)
+    "N_ripiegamento"   : 1000,         # numero di curve sintetiche per la significatività del ripiegamento
+    "colonne"          : ["indice", "ts", "sole"],  # colonne aggiuntive analizzate insieme al flusso (vedi fbl.COLONNE_FONTE)
+    "upper_limit_gls"  : "escludi",    # upper limit nel periodogramma generalizzato pesato: "escludi" o "metà" (flusso ed errore metà del limite)
+    "sovracampionamento_gls" : 1,      # frequenze per bin della trasformata nel periodogramma generalizzato pesato
+    "N_gls"            : 10000,        # numero di curve sintetiche per la significatività del periodogramma generalizzato pesato
+    "thread"           : None,         # thread per i blocchi di frequenze del periodogramma generalizzato pesato (default: uno)
+    "limiti_ribinning" : "conservativo",  # upper limit delle curve ricavate con crea_stato_derivato(): "conservativo" o "rilevazioni"
+    "k_picchi"         : 5,            # numero dei picchi più alti verificati dagli stadi picchi_multipli (periodi secondari)
+    "multipli_paralleli" : False,      # con il motore parallelo calcola i k_picchi picchi più alti delle curve sintetiche insieme al picco principale
+    "p0_blocchi"       : 0.05,         # probabilità di falso positivo di ogni cambiamento dei blocchi bayesiani
+    "upper_limit_blocchi" : "escludi", # upper limit nei blocchi bayesiani: "escludi" o "metà" (come upper_limit_gls)
+    "preelaborazione"  : None,         # opzioni di fbl.preelabora() applicate prima della trasformata (es. {"detrend" : "loess", "finestra" : "hann"})
+    "max_aggiornamenti" : 52,          # aggiornamenti incrementali dell'archivio dopo i quali il file della fonte viene riletto completamente
+}
+
+
+                                      ###########################################
+                                      #            Definizione stadi            #
+                                      ###########################################
+
+def _stadio_carica(stato):
+    fonte = FONTI[stato["chiave"]]
+    df = fbl.leggi_csv(os.path.join(stato["parametri"]["cartella"], fonte["file"]))
+
+    return fbl.crea_dizionario_fonte(df, fonte["nome"])
+
+
+def _stadio_upper_limit(stato):
+    diz = stato["stadi"]["carica"]
+    fbl.agg_upper_limit(diz)
+
+    return diz
+
+
+def _stadio_float(stato):
+    diz = stato["stadi"]["upper_limit"]
+    fbl.converti_to_float(diz)
+
+    return diz
+
+
+def _stadio_date(stato):
+    diz = stato["stadi"]["float"]
+    fbl.MET_to_data_diz(diz)
+
+    return diz
+
+
+def _stadio_interpolazione(stato):
+    diz = stato["stadi"]["float"]
+    fbl.interpolazione(diz)
+
+    return diz
+
+
+def _stadio_preelaborazione(stato):
+    diz = stato["stadi"]["interpolazione"]
+    opzioni = stato["parametri"]["preelaborazione"]
+
+    if opzioni is None:
+        return diz
+
+    # copia del dizionario: il flusso interpolato originale resta disponibile per le curve sintetiche e gli altri stadi
+    elaborato = dict(diz)
+    elaborato["flussi grezzi"]   = diz["flussi completi"]
+    elaborato["flussi completi"] = fbl.preelabora(diz["flussi completi"], diz["tempi completi"], **opzioni)
+
+    return elaborato
+
+
+def _stadio_fft(stato):
+    diz = stato["stadi"]["float"]
+    fbl.fft_diz(diz)
+
+    return diz
+
+
+def _stadio_fft_interp(stato):
+    diz = stato["stadi"]["preelaborazione"]
+    fbl.fft_diz(diz, interp = True)
+
+    return diz
+
+
+def _stadio_fit(stato):
+    diz = stato["stadi"]["fft_interp"]
+    fbl.fit_pwsp(diz, fbl.fit, stato["parametri"]["p0_fit"], interp = True)
+
+    return diz
+
+
+def _stadio_periodo(stato):
+    diz = stato["stadi"]["fft_interp"]
+    par = stato["parametri"]
+
+    periodo = fbl.picco_periodo(diz, par["frequenza_taglio"], interp = True)
+
+    if par["sovracampionamento"] is not None:
+        periodo = fbl.affina_picco(diz, periodo, par["sovracampionamento"], par["affinamento"])
+
+    return periodo
+
+
+def _stadio_incertezza_periodo(stato):
+    par = stato["parametri"]
+
+    seme = par["seme_bootstrap"] if par["seme"] is None else par["seme"]
+
+    # i ricampionamenti della curva interpolata vengono elaborati e raffinati come la curva originale
+    affinamento = None
+    if par["sovracampionamento"] is not None:
+        affinamento = (par["sovracampionamento"], par["affinamento"])
+
+    return fbl.incertezza_periodo(stato["stadi"]["interpolazione"], stato["stadi"]["periodo"][0], n = par["ricampionamenti"],
+                                  metodo = par["bootstrap"], livello = par["livello"], seme = seme,
+                                  preelaborazione = par["preelaborazione"], affinamento = affinamento)
+
+
+def _stadio_spettro_dinamico(stato):
+    import modulo_tempo_frequenza_blazar as tfbl
+
+    par = stato["parametri"]
+
+    return tfbl.spettri_dinamici(stato["stadi"]["interpolazione"], par["finestre_gg"], par["passo_gg"], par["frequenza_taglio"])
+
+
+def _stadio_wwz(stato):
+    import modulo_tempo_frequenza_blazar as tfbl
+
+    diz = stato["stadi"]["float"]
+    par = stato["parametri"]
+
+    frequenze, tau = tfbl.griglia_wwz(diz["tempo"], par["n_frequenze_wwz"], par["n_tau_wwz"], f_min = par["frequenza_taglio"])
+
+    trasformata = tfbl.wwz(diz["tempo"], diz["flusso"], frequenze, tau)
+    trasformata["nome"] = diz["nome"]
+
+    return trasformata
+
+
+def _stadio_picchi_wwz_sintetici(stato):
+    import modulo_tempo_frequenza_blazar as tfbl
+
+    diz = stato["stadi"]["float"]
+    tr  = stato["stadi"]["wwz"]
+    par = stato["parametri"]
+
+    return tfbl.picchi_wwz_sintetici(diz["tempo"], diz["flusso"], tr["frequenze"], tr["tau"], par["N_wwz"],
+                                     seme = par["seme"], n_processi = par["processi"])
+
+
+def _stadio_istogramma_wwz(stato):
+    picchi = stato["stadi"]["picchi_wwz_sintetici"]
+
+    return fbl.istogramma_significatività(picchi, stato["stadi"]["wwz"]["periodo"][1], stato["parametri"]["n_bins"])
+
+
+def _stadio_significatività_wwz(stato):
+    return fbl.valore_p_istogramma(stato["stadi"]["istogramma_wwz"])
+
+
+def _stadio_ripiegamento(stato):
+    import modulo_ripiegamento_blazar as rpbl
+
+    diz = stato["stadi"]["float"]
+    par = stato["parametri"]
+
+    periodi = rpbl.griglia_periodi(diz["tempo"], par["n_periodi"], f_min = par["frequenza_taglio"], n_bin = par["n_bin_fase"])
+
+    risultato = rpbl.ripiegamento(diz["tempo"], diz["flusso"], periodi, par["n_bin_fase"])
+    risultato["nome"] = diz["nome"]
+
+    return risultato
+
+
+def _stadio_picchi_ripiegamento_sintetici(stato):
+    import modulo_ripiegamento_blazar as rpbl
+
+    diz = stato["stadi"]["float"]
+    par = stato["parametri"]
+
+    return rpbl.picchi_ripiegamento_sintetici(diz["tempo"], diz["flusso"], stato["stadi"]["ripiegamento"]["periodi"],
+                                              par["N_ripiegamento"], par["n_bin_fase"], seme = par["seme"], n_processi = par["processi"])
+
+
+def _stadio_istogramma_ripiegamento(stato):
+    picchi = stato["stadi"]["picchi_ripiegamento_sintetici"]
+    rip    = stato["stadi"]["ripiegamento"]
+
+    return {statistica : fbl.istogramma_significatività(picchi[statistica], rip["picco_" + statistica][1], stato["parametri"]["n_bins"])
+            for statistica in ("ef", "pdm")}
+
+
+def _stadio_significatività_ripiegamento(stato):
+    return {statistica : fbl.valore_p_istogramma(ist) for statistica, ist in stato["stadi"]["istogramma_ripiegamento"].items()}
+
+
+def _stadio_colonne(stato):
+    # il flusso interpolato viene riutilizzato e il veto del Sole applicato al picco del periodo riportato in tabella
+    return fbl.spettri_colonne(stato["stadi"]["interpolazione"], stato["parametri"]["colonne"], stato["parametri"]["frequenza_taglio"],
+                               f_picco = stato["stadi"]["periodo"][0])
+
+
+def _stadio_gls(stato):
+    import modulo_periodogramma_blazar as pgbl
+
+    diz = stato["stadi"]["float"]
+    par = stato["parametri"]
+
+    tempo, flusso, pesi = pgbl.dati_pesati(diz, par["upper_limit_gls"])
+    frequenze = pgbl.griglia_frequenze(tempo, par["sovracampionamento_gls"], f_min = par["frequenza_taglio"])
+
+    periodogramma = pgbl.periodogramma_gls(tempo, flusso, pesi, frequenze, n_thread = par["thread"])
+    periodogramma["nome"] = diz["nome"]
+
+    return periodogramma
+
+
+def _stadio_picchi_gls_sintetici(stato):
+    import modulo_periodogramma_blazar as pgbl
+
+    par = stato["parametri"]
+
+    tempo, flusso, pesi = pgbl.dati_pesati(stato["stadi"]["float"], par["upper_limit_gls"])
+
+    return pgbl.picchi_gls_sintetici(tempo, flusso, pesi, stato["stadi"]["gls"]["frequenze"], par["N_gls"],
+                                     seme = par["seme"], n_thread = par["thread"])
+
+
+def _stadio_istogramma_gls(stato):
+    picchi = stato["stadi"]["picchi_gls_sintetici"]
+
+    return fbl.istogramma_significatività(picchi, stato["stadi"]["gls"]["picco"][1], stato["parametri"]["n_bins"])
+
+
+def _stadio_significatività_gls(stato):
+    return fbl.valore_p_istogramma(stato["stadi"]["istogramma_gls"])
+
+
+def _stadio_blocchi(stato):
+    import modulo_blocchi_blazar as bbbl
+
+    par = stato["parametri"]
+
+    return bbbl.blocchi_fonte(stato["stadi"]["float"], par["p0_blocchi"], par["upper_limit_blocchi"])
+
+
+def _stadio_sintetiche(stato):
+    par  = stato["parametri"]
+    sint = fbl.curve_sintetiche_diz(stato["stadi"]["interpolazione"], par["N"])
+
+    if par["preelaborazione"] is not None:
+        # tutte le curve sintetiche vengono elaborate con un'unica chiamata, come matrice di curve
+        chiavi = [chiave for chiave in sint if chiave != "tempo"]
+        blocco = fbl.preelabora(np.array([sint[chiave] for chiave in chiavi]), sint["tempo"], **par["preelaborazione"])
+        sint.update(zip(chiavi, blocco))
+
+    return sint
+
+
+def _stadio_fft_sintetiche(stato):
+    return fbl.fft_curve_sintetiche_diz(stato["stadi"]["sintetiche"])
+
+
+def _stadio_picchi_sintetici(stato):
+    par = stato["parametri"]
+
+    if par["sovracampionamento"] is None:
+        return fbl.ar_picchi_sintetici(stato["stadi"]["fft_sintetiche"], par["frequenza_taglio"])
+
+    # picchi raffinati: le curve sintetiche vengono analizzate a blocchi come matrici di curve
+    sint = stato["stadi"]["sintetiche"]
+    freq = stato["stadi"]["fft_sintetiche"]["freq"]
+    dt   = fbl.dt_moda(sint["tempo"])
+
+    curve  = [dati for chiave, dati in sint.items() if chiave != "tempo"]
+    picchi = np.empty(len(curve), dtype = complex)
+
+    for inizio in range(0, len(curve), 256):
+        blocco = np.array(curve[inizio:inizio + 256])
+        f_picchi, _ = fbl.picco_periodo_blocco(blocco, freq, par["frequenza_taglio"])
+        picchi[inizio:inizio + len(blocco)] = fbl.affina_picchi(blocco, dt, f_picchi, par["sovracampionamento"], par["affinamento"])[1]
+
+    return picchi
+
+
+def _picchi_paralleli(stato, seme, multipli = None):
+    import modulo_parallelo_blazar as ppbl
+
+    diz = stato["stadi"]["interpolazione"]
+    par = stato["parametri"]
+    freq = np.fft.fftfreq(len(diz["flussi completi"]), d = fbl.dt_moda(diz["tempi completi"]))
+
+    # N + 1 curve, come in curve_sintetiche_diz()
+    flusso = diz["flussi completi"].astype(par["precisione"])
+
+    affinamento = None
+    if par["sovracampionamento"] is not None:
+        affinamento = (par["sovracampionamento"], par["affinamento"])
+
+    preelaborazione = None
+    if par["preelaborazione"] is not None:
+        preelaborazione = (diz["tempi completi"], par["preelaborazione"])
+
+    return ppbl.picchi_sintetici_paralleli(flusso, freq, par["N"] + 1, par["frequenza_taglio"],
+                                           n_processi = par["processi"], seme = seme, affinamento = affinamento,
+                                           preelaborazione = preelaborazione, multipli = multipli)
+
+
+def _stadio_picchi_paralleli(stato):
+    par = stato["parametri"]
+
+    # senza seme ne viene estratto uno e registrato, in modo che un secondo passaggio usi le stesse curve sintetiche
+    seme = np.random.SeedSequence().entropy if par["seme"] is None else par["seme"]
+
+    if not par["multipli_paralleli"]:
+        return {"seme" : seme, "picchi" : _picchi_paralleli(stato, seme), "multipli" : None}
+
+    picchi, multipli = _picchi_paralleli(stato, seme, par["k_picchi"])
+
+    return {"seme" : seme, "picchi" : picchi, "multipli" : multipli}
+
+
+def _stadio_picchi_sintetici_paralleli(stato):
+    return stato["stadi"]["picchi_paralleli"]["picchi"]
+
+
+def _stadio_picchi_multipli(stato):
+    diz = stato["stadi"]["fft_interp"]
+    par = stato["parametri"]
+
+    frequenze, picchi = fbl.picchi_multipli(diz["ck interp"], diz["frequenza interp"], par["frequenza_taglio"], par["k_picchi"])
+
+    return {"nome" : diz["nome"], "frequenze" : frequenze, "picchi" : picchi}
+
+
+def _stadio_picchi_multipli_sintetici(stato):
+    par  = stato["parametri"]
+    diz_fft = stato["stadi"]["fft_sintetiche"]
+
+    # le trasformate delle curve sintetiche vengono analizzate a blocchi come matrici, con un'unica selezione per blocco
+    trasformate = [dati for chiave, dati in diz_fft.items() if chiave != "freq"]
+    picchi = np.empty((len(trasformate), par["k_picchi"]), dtype = complex)
+
+    for inizio in range(0, len(trasformate), 256):
+        blocco = np.array(trasformate[inizio:inizio + 256])
+        picchi[inizio:inizio + len(blocco)] = fbl.picchi_multipli(blocco, diz_fft["freq"], par["frequenza_taglio"], par["k_picchi"])[1]
+
+    return picchi
+
+
+def _stadio_picchi_multipli_paralleli(stato):
+    paralleli = stato["stadi"]["picchi_paralleli"]
+
+    if paralleli["multipli"] is not None:
+        return paralleli["multipli"]
+
+    # picchi_paralleli calcolato senza i picchi multipli: secondo passaggio sulle stesse curve sintetiche (stesso seme)
+    return _picchi_paralleli(stato, paralleli["seme"], stato["parametri"]["k_picchi"])[1]
+
+
+def _stadio_istogramma_multipli(stato):
+    picchi = stato["stadi"]["picchi_multipli_sintetici"]
+    reali  = stato["stadi"]["picchi_multipli"]["picchi"]
+
+    # un istogramma per ogni statistica d'ordine: il j-esimo picco reale viene confrontato con i j-esimi picchi sintetici
+    return [fbl.istogramma_significatività(picchi[:, j], reali[j], stato["parametri"]["n_bins"]) for j in range(len(reali))]
+
+
+def _stadio_significatività_multipli(stato):
+    istogrammi = stato["stadi"]["istogramma_multipli"]
+    reali = stato["stadi"]["picchi_multipli"]["picchi"]
+
+    # valore-p di ogni picco rispetto alla propria statistica d'ordine e rispetto al picco principale delle curve sintetiche
+    return {"ordine"  : np.array([fbl.valore_p_istogramma(ist) for ist in istogrammi]),
+            "globale" : fbl.valori_p_istogramma(istogrammi[0], np.abs(reali)**2)}
+
+
+def _stadio_istogramma(stato):
+    picchi  = stato["stadi"]["picchi_sintetici"]
+    periodo = stato["stadi"]["periodo"]
+
+    return fbl.istogramma_significatività(picchi, periodo[1], stato["parametri"]["n_bins"])
+
+
+def _stadio_significatività(stato):
+    return fbl.valore_p_istogramma(stato["stadi"]["istogramma"])
+
+
+# nome dello stadio : (lista delle dipendenze, funzione che lo calcola)
+
+STADI = {
+    "carica"           : ([]                                     , _stadio_carica),
+    "upper_limit"      : (["carica"]                             , _stadio_upper_limit),
+    "float"            : (["upper_limit"]                        , _stadio_float),
+    "date"             : (["float"]                              , _stadio_date),
+    "interpolazione"   : (["float"]                              , _stadio_interpolazione),
+    "fft"              : (["float"]                              , _stadio_fft),
+    "preelaborazione"  : (["interpolazione"]                     , _stadio_preelaborazione),
+    "fft_interp"       : (["preelaborazione"]                    , _stadio_fft_interp),
+    "fit"              : (["fft_interp"]                         , _stadio_fit),
+    "periodo"          : (["fft_interp"]                         , _stadio_periodo),
+    "incertezza_periodo" : (["periodo"]                          , _stadio_incertezza_periodo),
+    "spettro_dinamico" : (["interpolazione"]                     , _stadio_spettro_dinamico),
+    "wwz"              : (["float"]                              , _stadio_wwz),
+    "picchi_wwz_sintetici" : (["wwz"]                            , _stadio_picchi_wwz_sintetici),
+    "istogramma_wwz"   : (["picchi_wwz_sintetici"]               , _stadio_istogramma_wwz),
+    "significatività_wwz" : (["istogramma_wwz"]                  , _stadio_significatività_wwz),
+    "ripiegamento"     : (["float"]                              , _stadio_ripiegamento),
+    "picchi_ripiegamento_sintetici" : (["ripiegamento"]          , _stadio_picchi_ripiegamento_sintetici),
+    "istogramma_ripiegamento" : (["picchi_ripiegamento_sintetici"] , _stadio_istogramma_ripiegamento),
+    "significatività_ripiegamento" : (["istogramma_ripiegamento"] , _stadio_significatività_ripiegamento),
+    "colonne"          : (["interpolazione", "periodo"]          , _stadio_colonne),
+    "gls"              : (["float"]                              , _stadio_gls),
+    "picchi_gls_sintetici" : (["gls"]                            , _stadio_picchi_gls_sintetici),
+    "istogramma_gls"   : (["picchi_gls_sintetici"]               , _stadio_istogramma_gls),
+    "significatività_gls" : (["istogramma_gls"]                  , _stadio_significatività_gls),
+    "blocchi"          : (["float"]                              , _stadio_blocchi),
+    "sintetiche"       : (["interpolazione"]                     , _stadio_sintetiche),
+    "fft_sintetiche"   : (["sintetiche"]                         , _stadio_fft_sintetiche),
+    "picchi_sintetici" : (["fft_sintetiche"]                     , _stadio_picchi_sintetici),
+    "istogramma"       : (["picchi_sintetici", "periodo"]        , _stadio_istogramma),
+    "significatività"  : (["istogramma"]                         , _stadio_significatività),
+    "picchi_multipli"  : (["fft_interp"]                         , _stadio_picchi_multipli),
+    "picchi_multipli_sintetici" : (["fft_sintetiche"]            , _stadio_picchi_multipli_sintetici),
+    "istogramma_multipli" : (["picchi_multipli_sintetici", "picchi_multipli"] , _stadio_istogramma_multipli),
+    "significatività_multipli" : (["istogramma_multipli"]        , _stadio_significatività_multipli),
+    "picchi_paralleli" : (["interpolazione"]                     , _stadio_picchi_paralleli),
+}
+
+# stadi che vengono sostituiti, a seconda del parametro "motore", da una diversa implementazione (con diverse dipendenze)
+
+MOTORI = {
+    "dizionari" : {},
+    "parallelo" : {"picchi_sintetici"          : (["picchi_paralleli"], _stadio_picchi_sintetici_paralleli),
+                   "picchi_multipli_sintetici" : (["picchi_paralleli"], _stadio_picchi_multipli_paralleli)},
+}
+
+
+                                      ###########################################
+                                      #          Esecuzione degli stadi         #
+                                      ###########################################
+
+def crea_stato(chiave, **parametri):
+    """
+    Funzione che crea lo stato di una fonte, ovvero il dizionario in cui vengono memorizzati i risultati degli stadi
+
+    Parametri:
+    -------------
+    chiave (string)   : chiave della fonte nel catalogo FONTI (es. "1M", "4W")
+    **parametri       : eventuali parametri che sostituiscono quelli di default contenuti in PARAMETRI
+
+    Restituisce:
+    -------------
+    stato (dictionary) : con le chiavi ["chiave"], ["parametri"] e ["stadi"] (inizialmente vuoto)
+
+    """
+    if chiave not in FONTI:
+        raise KeyError("Fonte {} non presente nel catalogo, le fonti disponibili sono: {}".format(chiave, ", ".join(FONTI)))
+
+    par = dict(PARAMETRI)
+    par.update(parametri)
+
+    stato = {
+        "chiave"    : chiave,
+        "parametri" : par,
+        "stadi"     : {}
+    }
+
+    return stato
+
+#------------------------------------------------------------------------------------------------------------
+
+def crea_stato_derivato(stato_base, chiave, fattore, **parametri):
+    """
+    Funzione che crea lo stato di una fonte la cui curva di luce viene ricavata da quella di un'altra fonte, raggruppandone
+    fattore bin consecutivi (ad esempio la curva mensile dalla curva settimanale della stessa fonte), senza leggere il suo file
+
+    Parametri:
+    -------------
+    stato_base (dictionary) : stato della fonte con la curva di partenza (ad esempio "1W")
+    chiave (string)         : chiave della fonte derivata nel catalogo FONTI (ad esempio "1M")
+    fattore (int)           : numero di bin della curva di partenza in ogni bin della curva derivata
+    **parametri             : eventuali parametri che sostituiscono quelli di default contenuti in PARAMETRI
+
+    Restituisce:
+    -------------
+    stato (dictionary) : stato della fonte derivata, con lo stadio "float" già calcolato (gli stadi carica e
+                         upper_limit non vengono mai eseguiti) e il parametro ["fattore_ribinning"]
+
+    Note:
+    -------------
+    - lo stadio "float" della fonte di partenza viene calcolato (o riutilizzato se già calcolato), per cui ogni file
+      viene letto una sola volta anche quando vengono analizzate entrambe le basi temporali
+    - con fattore = 4 la curva derivata ha bin di 28 giorni invece dei 30 giorni della curva mensile del Fermi LAT
+
+    """
+    stato = crea_stato(chiave, **parametri)
+    stato["parametri"]["fattore_ribinning"] = fattore
+
+    with fbl.stadio_profilo("stadio float", fonte = chiave):
+        stato["stadi"]["float"] = fbl.ribinna_curva(esegui_stadio(stato_base, "float"), fattore, stato["parametri"]["limiti_ribinning"])
+
+    return stato
+
+#------------------------------------------------------------------------------------------------------------
+
+def esegui_stadio(stato, nome):
+    """
+    Funzione che calcola uno stadio di una fonte, calcolando prima (ricorsivamente) le sue dipendenze
+
+    Parametri:
+    -------------
+    stato (dictionary) : stato della fonte creato con crea_stato()
+    nome  (string)     : nome dello stadio da calcolare, deve essere una chiave di STADI
+
+    Restituisce:
+    -------------
+    il risultato dello stadio richiesto
+
+    Note:
+    -----------
+    - se uno stadio è già stato calcolato viene restituito il risultato memorizzato in stato["stadi"]
+    - gli stadi presenti in MOTORI[stato["parametri"]["motore"]] sostituiscono quelli di STADI
+    - se la profilazione è attiva (modulo_funzioni_blazar.attiva_profilo()) ogni stadio calcolato viene registrato
+      come evento "stadio <nome>" con l'etichetta della fonte; le dipendenze sono registrate come eventi separati
+
+    """
+    if nome not in stato["stadi"]:
+        dipendenze, funzione = MOTORI[stato["parametri"]["motore"]].get(nome, STADI[nome])
+
+        for dip in dipendenze:
+            esegui_stadio(stato, dip)
+
+        with fbl.stadio_profilo("stadio " + nome, fonte = stato["chiave"]) as dimensioni:
+            stato["stadi"][nome] = funzione(stato)
+
+            n = fbl._dimensione(stato["stadi"][nome])
+            if n is not None:
+                dimensioni["n"] = n
+
+    return stato["stadi"][nome]
+
+#------------------------------------------------------------------------------------------------------------
+
+def esegui(stati, nome):
+    """
+    Funzione che calcola lo stesso stadio per un insieme di fonti
+
+    Parametri:
+    -------------
+    stati (dictionary) : dizionario {chiave : stato} delle fonti selezionate
+    nome  (string)     : nome dello stadio da calcolare
+
+    Restituisce:
+    -------------
+    risultati (dictionary) : dizionario {chiave : risultato dello stadio}
+
+    """
+    risultati = {}
+
+    for chiave, stato in stati.items():
+        risultati[chiave] = esegui_stadio(stato, nome)
+
+    return risultati
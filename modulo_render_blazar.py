@@ -0,0 +1,161 @@
+"""
+Modulo per la produzione dei grafici su file delle fonti
+
+Autore: Valenti Alessandra
+
+
+I grafici delle singole fonti (curva di luce, spettro di potenza, fit, istogramma della significatività, spettro dinamico, WWZ, ripiegamento, periodogramma pesato e blocchi bayesiani)
+vengono salvati su file (PNG, PDF o SVG) senza essere mostrati, utilizzando il backend non interattivo Agg.
+Gli stadi necessari vengono calcolati nel processo principale, mentre i grafici vengono realizzati in parallelo
+in un pool di processi: ad ogni processo vengono inviati solo i dati necessari per il grafico.
+
+Elenco delle funzioni:
+     - dati_grafico ....................... dati necessari per un grafico di una fonte
+     - realizza_grafico ................... realizza un grafico di una fonte (mostrato o salvato)
+     - render_grafici ..................... salva in parallelo i grafici di un insieme di fonti
+
+"""
+import modulo_funzioni_plot_blazar as blplt
+import modulo_pipeline_blazar as pbl
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+
+FORMATI = ("png", "pdf", "svg")
+
+# tipo di grafico : (stadio necessario, chiavi del dizionario della fonte utilizzate dal grafico)
+
+GRAFICI = {
+    "curva"      : ("date"           , ["nome", "tempo", "tempo_data", "flusso", "flusso_err", "upper_lim_tempo", "upper_lim_data", "upper_lim_flusso"]),
+    "spettro"    : ("fft_interp"     , ["nome", "frequenza interp", "ck interp"]),
+    "fit"        : ("fit"            , ["nome", "frequenza interp", "ck interp", "dati_fit", "params fit", "params covariance fit"]),
+    "istogramma" : ("istogramma"     , ["bordi", "densità", "picco", "n_realizzazioni"]),
+    "dinamico"   : ("spettro_dinamico", ["nome", "finestre"]),
+    "wwz"        : ("wwz"            , ["nome", "tau", "frequenze", "wwz", "media", "periodo"]),
+    "ripiegamento" : ("ripiegamento" , ["nome", "periodi", "chi2", "theta", "picco_ef", "picco_pdm"]),
+    "gls"        : ("gls"            , ["nome", "frequenze", "potenza", "picco"]),
+    "blocchi"    : ("blocchi"        , ["nome", "tempo", "flusso", "errore", "bordi", "flussi"]),
+}
+
+
+def dati_grafico(stato, tipo):
+    """
+    Funzione che calcola lo stadio necessario ad un grafico e ne estrae i soli dati utilizzati
+
+    Parametri:
+    -------------
+    stato (dictionary) : stato della fonte creato con modulo_pipeline_blazar.crea_stato()
+    tipo  (string)     : tipo di grafico, deve essere una chiave di GRAFICI
+
+    Restituisce:
+    -------------
+    dati (dictionary)  : contenente unicamente le chiavi necessarie al grafico, in modo da ridurre
+                         i dati da inviare ai processi del pool (ad esempio per l'istogramma non vengono
+                         inviate le potenze delle curve sintetiche ma solo i bordi e le densità dei bin)
+
+    """
+    stadio, chiavi = GRAFICI[tipo]
+    diz = pbl.esegui_stadio(stato, stadio)
+
+    return {chiave : diz[chiave] for chiave in chiavi}
+
+#------------------------------------------------------------------------------------------------------------
+
+def realizza_grafico(tipo, chiave, dati, arr_col1, arr_col2, file_output = None, max_punti = None):
+    """
+    Funzione che realizza un grafico di una singola fonte
+
+    Parametri:
+    -------------
+    tipo (string)              : tipo di grafico, deve essere una chiave di GRAFICI
+    chiave (string)            : chiave della fonte nel catalogo (es. "1M"), utilizzata per base temporale e colori
+    dati (dictionary)          : dati restituiti da dati_grafico()
+    arr_col1, arr_col2 (array) : array dei colori utilizzati per i grafici, indicizzati con il numero della fonte
+    file_output (string)       : se indicato il grafico viene salvato nel file invece di essere mostrato
+    max_punti (int)            : numero massimo di punti disegnati per curve di luce e spettri (vedi modulo_funzioni_plot_blazar.decima_curva())
+
+    """
+    base_temp = pbl.FONTI[chiave]["base"]
+    i = (int(chiave[0]) - 1) % len(arr_col1)
+
+    if tipo == "curva":
+        blplt.plot_fonte(dati, base_temp, arr_col1[i], arr_col2[i], file_output = file_output, max_punti = max_punti)
+
+    if tipo == "spettro":
+        blplt.plot_pwsp_fonte(dati, base_temp, arr_col1[i], log = True, interp = True, file_output = file_output, max_punti = max_punti)
+
+    if tipo == "fit":
+        blplt.plot_pwsp_fit_fonte(dati, base_temp, arr_col1[i], arr_col2[i], interp = True, file_output = file_output)
+
+    if tipo == "istogramma":
+        blplt.istogramma_singificatività(dati, arr_col1[i], arr_col2[i], base_temp, file_output = file_output)
+
+    if tipo == "dinamico":
+        blplt.plot_spettro_dinamico(dati, base_temp, arr_col2[i], file_output = file_output)
+
+    if tipo == "wwz":
+        blplt.plot_wwz(dati, base_temp, arr_col1[i], file_output = file_output)
+
+    if tipo == "ripiegamento":
+        blplt.plot_ripiegamento(dati, base_temp, arr_col1[i], arr_col2[i], file_output = file_output)
+
+    if tipo == "gls":
+        blplt.plot_gls(dati, base_temp, arr_col1[i], file_output = file_output)
+
+    if tipo == "blocchi":
+        blplt.plot_blocchi(dati, base_temp, arr_col1[i], arr_col2[i], file_output = file_output)
+
+#------------------------------------------------------------------------------------------------------------
+
+def _inizializza_processo(usetex):
+    blplt.modalita_headless("Agg")
+    blplt.imposta_testo(usetex)
+
+
+def _realizza_compito(compito):
+    tipo, chiave, dati, arr_col1, arr_col2, file_output, max_punti = compito
+    realizza_grafico(tipo, chiave, dati, arr_col1, arr_col2, file_output, max_punti)
+
+    return file_output
+
+#------------------------------------------------------------------------------------------------------------
+
+def render_grafici(stati, tipi, cartella, arr_col1, arr_col2, formato = "png", usetex = False, n_processi = None, max_punti = None):
+    """
+    Funzione che salva su file i grafici richiesti per tutte le fonti indicate, realizzandoli in parallelo
+
+    Parametri:
+    -------------
+    stati (dictionary)         : dizionario {chiave : stato} delle fonti
+    tipi (list)                : tipi di grafico da realizzare per ogni fonte (chiavi di GRAFICI)
+    cartella (string)          : cartella in cui salvare i grafici (viene creata se non esiste)
+    arr_col1, arr_col2 (array) : array dei colori utilizzati per i grafici
+    formato (string)           : formato dei file, uno tra ("png", "pdf", "svg")
+    usetex (boolean)           : se False i testi vengono composti con mathtext invece che con LaTeX
+    n_processi (int)           : numero di processi del pool (default: numero di CPU), con n_processi = 1
+                                 i grafici vengono realizzati nel processo principale
+    max_punti (int)            : numero massimo di punti disegnati per curve di luce e spettri
+
+    Restituisce:
+    -------------
+    file (list) : lista dei file salvati, con nome "<chiave>_<tipo>.<formato>"
+
+    """
+    if formato not in FORMATI:
+        raise ValueError("Formato {} non supportato, i formati disponibili sono: {}".format(formato, ", ".join(FORMATI)))
+
+    os.makedirs(cartella, exist_ok = True)
+
+    compiti = []
+
+    for chiave, stato in stati.items():
+        for tipo in tipi:
+            file_output = os.path.join(cartella, "{}_{}.{}".format(chiave, tipo, formato))
+            compiti.append((tipo, chiave, dati_grafico(stato, tipo), arr_col1, arr_col2, file_output, max_punti))
+
+    if n_processi == 1:
+        _inizializza_processo(usetex)
+        return [_realizza_compito(compito) for compito in compiti]
+
+    with ProcessPoolExecutor(max_workers = n_processi, initializer = _inizializza_processo, initargs = (usetex,)) as pool:
+        return list(pool.map(_realizza_compito, compiti))
@@ -0,0 +1,244 @@
+"""
+Modulo per la ricerca del periodo per ripiegamento in fase (epoch folding e phase dispersion minimization)
+
+Autore: Valenti Alessandra
+
+
+Per le periodicità non sinusoidali, dominate dai flare, il picco dello spettro di Fourier è debole. Ripiegando la curva di luce
+misurata (senza interpolazione) su un periodo di prova e suddividendo le fasi in n_bin intervalli, si calcolano:
+    - epoch folding (EF)  : chi^2 = sum_b n_b (media_b - media)^2 / s^2, massimo al periodo vero
+    - PDM (Stellingwerf)  : theta = s_b^2 / s^2 (varianza entro i bin rispetto alla varianza totale), minimo al periodo vero
+
+Entrambe le statistiche dipendono solo dalle somme dei flussi S_b e dai conteggi n_b di ogni bin di fase, perché la somma
+dei quadrati dei flussi non dipende dal periodo. Per tutti i periodi di prova le somme vengono calcolate insieme con np.bincount
+sugli indici (periodo, bin di fase); per le curve sintetiche (permutazioni del flusso sugli stessi tempi) i conteggi sono
+gli stessi e le somme sono il prodotto di un'unica matrice sparsa (periodo*bin, tempi) per la matrice delle curve.
+
+Elenco delle funzioni:
+     - griglia_periodi .................... periodi di prova equispaziati in frequenza
+     - ripiegamento ....................... chi^2 dell'epoch folding e theta della PDM per tutti i periodi di prova
+     - picchi_ripiegamento_sintetici ...... massimi di chi^2 e minimi di theta di N curve sintetiche, in parallelo
+     - tabella_ripiegamento ............... testo della tabella dei periodi e della significatività
+
+"""
+import modulo_funzioni_blazar as fbl
+import numpy as np
+import os
+from scipy import sparse
+from concurrent.futures import ProcessPoolExecutor
+
+
+# stato dei processi del pool: curve sintetiche, tempi, periodi e parametri (impostati una sola volta per processo)
+_processo = {}
+
+
+                                      ###########################################
+                                      #          Ripiegamento in fase           #
+                                      ###########################################
+
+def griglia_periodi(tempo, n_periodi = 10000, f_min = 1e-8, f_max = None, n_bin = 10):
+    """
+    Funzione che restituisce i periodi di prova [s], equispaziati in frequenza tra f_min e f_max
+    (default f_max: 1/(n_bin*dt) con dt il passo di campionamento più frequente, in modo che ogni ciclo
+    riempia tutti i bin di fase; per periodi più brevi i dati equispaziati occupano pochi bin e chi^2 e theta hanno falsi estremi)
+    """
+    if f_max is None:
+        f_max = 1/(n_bin*fbl.dt_moda(tempo))
+
+    return 1/np.linspace(f_min, f_max, n_periodi)
+
+
+def _indici_fase(tempo, periodi, n_bin):
+    # indici (periodo, bin di fase) di ogni misura, come righe di una matrice (periodi*n_bin, tempi)
+    fase = np.mod((tempo - tempo[0])[None, :]/periodi[:, None], 1)
+    bins = np.minimum((fase*n_bin).astype(np.int64), n_bin - 1)
+
+    return np.arange(len(periodi))[:, None]*n_bin + bins
+
+
+def _statistiche(somme, conteggi, N, somma_quadrati, media):
+    # chi^2 dell'epoch folding e theta della PDM dalle somme (periodi, bin, curve) e dai conteggi (periodi, bin)
+    inversi = np.divide(1.0, conteggi, out = np.zeros(conteggi.shape), where = conteggi > 0)
+    Q = np.sum(somme**2*inversi[:, :, None], axis = 1)
+
+    varianza = (somma_quadrati - N*media**2)/(N - 1)
+    non_vuoti = np.count_nonzero(conteggi, axis = 1)[:, None]
+
+    chi2  = (Q - N*media**2)/varianza
+    theta = (somma_quadrati - Q)/(N - non_vuoti)/varianza
+
+    return chi2, theta
+
+
+def _blocco_periodi(n_bin, N, B, memoria_max):
+    # numero di periodi per blocco, in modo che indici, matrice sparsa e somme non superino memoria_max
+    return max(int(memoria_max//(8*(3*n_bin*B + 4*N))), 1)
+
+#------------------------------------------------------------------------------------------------------------
+
+@fbl.profila
+def ripiegamento(tempo, flusso, periodi, n_bin = 10, memoria_max = 64e6):
+    """
+    Funzione che calcola il chi^2 dell'epoch folding e il theta della PDM della curva di luce per tutti i periodi di prova
+
+    Parametri:
+    -------------
+    tempo (array)       : tempi delle misure [s]
+    flusso (array)      : flusso misurato
+    periodi (array)     : periodi di prova [s] (vedi griglia_periodi())
+    n_bin (int)         : numero di bin di fase
+    memoria_max (float) : memoria massima [byte] degli array intermedi di un blocco di periodi
+
+    Restituisce:
+    -------------
+    risultato (dictionary) : con le chiavi
+                             ["periodi"], ["chi2"], ["theta"] : periodi di prova e statistiche per ogni periodo
+                             ["picco_ef"]  : frequenza e radice del massimo di chi^2, nel formato di picco_periodo() (|picco|^2 = chi^2)
+                             ["picco_pdm"] : frequenza e radice di 1 - theta del minimo di theta (|picco|^2 = 1 - theta)
+
+    """
+    tempo  = np.asarray(tempo, dtype = float)
+    flusso = np.asarray(flusso, dtype = float)
+    N = len(tempo)
+
+    chi2, theta = np.empty(len(periodi)), np.empty(len(periodi))
+    n_blocco = _blocco_periodi(n_bin, N, 1, memoria_max)
+
+    for inizio in range(0, len(periodi), n_blocco):
+        blocco = periodi[inizio:inizio + n_blocco]
+        righe  = _indici_fase(tempo, blocco, n_bin).ravel()
+
+        somme    = np.bincount(righe, weights = np.tile(flusso, len(blocco)), minlength = len(blocco)*n_bin)
+        conteggi = np.bincount(righe, minlength = len(blocco)*n_bin)
+
+        c, t = _statistiche(somme.reshape(-1, n_bin, 1), conteggi.reshape(-1, n_bin), N, np.sum(flusso**2), np.mean(flusso))
+        chi2[inizio:inizio + n_blocco], theta[inizio:inizio + n_blocco] = c[:, 0], t[:, 0]
+
+    i_ef, i_pdm = np.argmax(chi2), np.argmin(theta)
+
+    risultato = {
+        "periodi"   : periodi,
+        "chi2"      : chi2,
+        "theta"     : theta,
+        "picco_ef"  : [1/periodi[i_ef], np.sqrt(chi2[i_ef])],
+        "picco_pdm" : [1/periodi[i_pdm], np.sqrt(max(1 - theta[i_pdm], 0))],
+    }
+
+    return risultato
+
+#------------------------------------------------------------------------------------------------------------
+
+def _inizializza_processo(tempo, flusso, periodi, N, n_bin, seme, memoria_max):
+    # le curve sintetiche vengono generate in ogni processo dallo stesso seme, invece di essere inviate
+    _processo.update({"tempo" : tempo, "periodi" : periodi, "n_bin" : n_bin, "memoria_max" : memoria_max,
+                      "curve" : fbl.curve_sintetiche_blocco(flusso, N, seme)})
+
+
+def _estremi_blocco(compito):
+    # massimo di chi^2 e minimo di theta delle curve sintetiche sui periodi [inizio, fine)
+    inizio, fine = compito
+    p = _processo
+
+    curve, tempo, n_bin = p["curve"], p["tempo"], p["n_bin"]
+    B, N = curve.shape
+
+    somma_quadrati, media = np.sum(curve[0]**2), np.mean(curve[0])   # uguali per tutte le permutazioni
+    chi2_max, theta_min = np.full(B, -np.inf), np.full(B, np.inf)
+
+    n_blocco = _blocco_periodi(n_bin, N, B, p["memoria_max"])
+
+    for i in range(inizio, fine, n_blocco):
+        blocco = p["periodi"][i:min(i + n_blocco, fine)]
+        righe  = _indici_fase(tempo, blocco, n_bin).ravel()
+
+        matrice  = sparse.csr_matrix((np.ones(len(righe)), (righe, np.tile(np.arange(N), len(blocco)))), shape = (len(blocco)*n_bin, N))
+        somme    = (matrice @ curve.T).reshape(len(blocco), n_bin, B)
+        conteggi = np.bincount(righe, minlength = len(blocco)*n_bin).reshape(-1, n_bin)
+
+        chi2, theta = _statistiche(somme, conteggi, N, somma_quadrati, media)
+        chi2_max  = np.maximum(chi2_max, np.max(chi2, axis = 0))
+        theta_min = np.minimum(theta_min, np.min(theta, axis = 0))
+
+    return chi2_max, theta_min
+
+#------------------------------------------------------------------------------------------------------------
+
+@fbl.profila
+def picchi_ripiegamento_sintetici(tempo, flusso, periodi, N, n_bin = 10, seme = None, n_processi = None, memoria_max = 64e6):
+    """
+    Funzione che calcola gli estremi delle statistiche di ripiegamento di N curve sintetiche (permutazioni del flusso
+    sugli stessi tempi), per la significatività dei picchi di ripiegamento()
+
+    Parametri:
+    -------------
+    tempo, flusso (array) : tempi [s] e flussi misurati
+    periodi (array)       : periodi di prova [s]
+    N (int)               : numero di curve sintetiche
+    n_bin (int)           : numero di bin di fase
+    seme                  : seme delle permutazioni (int o None)
+    n_processi (int)      : numero di processi del pool (default: numero di CPU), con n_processi = 1
+                            il calcolo viene eseguito nel processo principale
+    memoria_max (float)   : memoria massima [byte] degli array intermedi di un blocco di periodi
+
+    Restituisce:
+    -------------
+    picchi (dictionary) : {"ef" : radici dei massimi di chi^2, "pdm" : radici di 1 - minimi di theta}, confrontabili
+                          con ripiegamento()["picco_ef"][1] e ["picco_pdm"][1] (vedi istogramma_significatività())
+
+    Note:
+    -------------
+    - ai processi vengono assegnati intervalli di periodi di prova, per tutte le curve; il risultato non dipende
+      dal numero di processi
+
+    """
+    tempo  = np.asarray(tempo, dtype = float)
+    flusso = np.asarray(flusso, dtype = float)
+
+    if n_processi is None:
+        n_processi = os.cpu_count()
+
+    argomenti = (tempo, flusso, periodi, N, n_bin, seme, memoria_max)
+
+    if n_processi == 1:
+        _inizializza_processo(*argomenti)
+        chi2_max, theta_min = _estremi_blocco((0, len(periodi)))
+        _processo.clear()
+    else:
+        limiti = np.linspace(0, len(periodi), min(4*n_processi, len(periodi)) + 1).astype(int)
+        compiti = list(zip(limiti[:-1], limiti[1:]))
+
+        with ProcessPoolExecutor(max_workers = n_processi, initializer = _inizializza_processo, initargs = argomenti) as pool:
+            estremi = list(pool.map(_estremi_blocco, compiti))
+
+        chi2_max  = np.max([e[0] for e in estremi], axis = 0)
+        theta_min = np.min([e[1] for e in estremi], axis = 0)
+
+    return {"ef" : np.sqrt(np.maximum(chi2_max, 0)), "pdm" : np.sqrt(np.maximum(1 - theta_min, 0))}
+
+#------------------------------------------------------------------------------------------------------------
+
+def tabella_ripiegamento(risultati, valori_p = None):
+    """
+    Funzione che restituisce il testo della tabella dei periodi individuati con epoch folding e PDM
+
+    Parametri:
+    -------------
+    risultati (dictionary) : {chiave della fonte : risultato di ripiegamento()}
+    valori_p (dictionary)  : {chiave della fonte : {"ef" : valore-p, "pdm" : valore-p}} (facoltativo)
+
+    """
+    testo = ["\033[95m     Tabella dei periodi individuati per ripiegamento in fase   \033[0m",
+             "",
+             " Fonte | Periodo EF [gg] |   chi^2    | p-value EF | Periodo PDM [gg] |  theta  | p-value PDM"]
+
+    for chiave, r in risultati.items():
+        p = valori_p.get(chiave) if valori_p is not None else None
+        p_ef  = "  -" if p is None else "{:.5f}".format(p["ef"])
+        p_pdm = "  -" if p is None else "{:.5f}".format(p["pdm"])
+
+        testo.append("-------|-----------------|------------|------------|------------------|---------|------------")
+        testo.append(" {:<6}| {:<16.2f}| {:<11.2f}| {:<11}| {:<17.2f}| {:<8.4f}| {}".format(chiave,
+                     1/(r["picco_ef"][0]*86400), r["picco_ef"][1]**2, p_ef,
+                     1/(r["picco_pdm"][0]*86400), 1 - r["picco_pdm"][1]**2, p_pdm))
+
+    return "\n".join(testo)
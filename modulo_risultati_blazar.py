@@ -0,0 +1,355 @@
+"""
+Modulo per la raccolta e l'esportazione dei risultati dell'analisi della periodicità dei Blazar
+
+Autore: Valenti Alessandra
+
+
+I risultati di tutte le fonti (parametri del fit, picco dello spettro, periodo, valore-p e significatività)
+vengono raccolti in un'unica tabella, un dizionario {colonna : lista dei valori} con una riga per fonte.
+Dalla stessa tabella vengono stampate le tabelle del terminale e vengono scritti i file CSV, JSON o Parquet
+con un'unica scrittura. I risultati degli stadi non calcolati vengono lasciati vuoti (nan).
+
+Elenco delle funzioni:
+     - sigma_gaussiana .................... significatività in deviazioni standard corrispondente al valore-p
+     - raccogli_risultati ................. tabella dei risultati degli stadi calcolati per le fonti
+     - esporta_risultati .................. scrive la tabella in un file CSV, JSON o Parquet
+     - come_dataframe ..................... converte la tabella in un DataFrame di pandas
+     - tabella_fit ........................ testo della tabella dei parametri del fit
+     - tabella_periodi .................... testo della tabella delle frequenze e dei periodi
+     - tabella_significatività ............ testo della tabella della significatività
+     - tabella_colonne .................... testo della tabella dei periodi del flusso e delle colonne aggiuntive
+     - tabella_picchi_multipli ............ testo della tabella dei k picchi più alti e della loro significatività
+
+"""
+import modulo_pipeline_blazar as pbl
+import numpy as np
+import csv, json, math, os
+from statistics import NormalDist
+
+
+# colonne della tabella dei risultati, nell'ordine in cui vengono esportate
+
+COLONNE = [
+    "chiave",                # chiave della fonte nel catalogo (es. "1M")
+    "nome",                  # nome della fonte
+    "base",                  # base temporale ("mensile" o "settimanale")
+    "N_fit", "errore_N_fit", "beta_fit", "errore_beta_fit",
+    "frequenza_picco",       # [Hz]
+    "potenza_picco",         # modulo quadro del coefficiente di Fourier del picco [u.a.]
+    "periodo_gg",            # [giorni]
+    "periodo_min_gg",        # estremi dell'intervallo di confidenza del periodo ottenuto ricampionando la curva [giorni]
+    "periodo_max_gg",
+    "seme_periodo",          # seme dei ricampionamenti dell'intervallo del periodo
+    "p_value",
+    "errore_p_value",        # errore binomiale sul valore-p dovuto al numero finito di curve sintetiche
+    "limite_p_value",        # True se nessun picco sintetico supera quello originale: il valore-p è un limite superiore
+    "sigma",                 # significatività in deviazioni standard gaussiane (a una coda), 0 per p-value >= 0.5
+    "n_realizzazioni",       # numero di curve sintetiche
+]
+
+FORMATI = {".csv" : "csv", ".json" : "json", ".parquet" : "parquet"}
+
+
+                                      ###########################################
+                                      #        Raccolta dei risultati           #
+                                      ###########################################
+
+def sigma_gaussiana(p):
+    """
+    Funzione che restituisce il numero di deviazioni standard gaussiane (a una coda) corrispondente al valore-p
+    (nan se il valore-p non è compreso tra 0 e 1). Per p >= 0.5 il picco non è più alto della mediana delle curve
+    sintetiche e la significatività viene posta a 0, invece di diventare negativa
+    """
+    if not 0 < p <= 1:
+        return math.nan
+
+    if p >= 0.5:
+        return 0.0
+
+    return NormalDist().inv_cdf(1 - p)
+
+
+def _riga(stato):
+    # riga della tabella con i risultati degli stadi già calcolati per una fonte
+    stadi = stato["stadi"]
+    nan   = math.nan
+
+    riga = dict.fromkeys(COLONNE, nan)
+    riga["chiave"] = stato["chiave"]
+    riga["nome"]   = pbl.FONTI[stato["chiave"]]["nome"]
+    riga["base"]   = pbl.BASI[pbl.FONTI[stato["chiave"]]["base"]]
+    riga["limite_p_value"] = None
+    riga["n_realizzazioni"] = None
+    riga["seme_periodo"] = None
+
+    if "fit" in stadi:
+        par, cov = stadi["fit"]["params fit"], stadi["fit"]["params covariance fit"]
+        riga["N_fit"], riga["errore_N_fit"]       = float(par[0]), math.sqrt(cov[0,0])
+        riga["beta_fit"], riga["errore_beta_fit"] = float(par[1]), math.sqrt(cov[1,1])
+
+    if "periodo" in stadi:
+        freq, pot = stadi["periodo"]
+        riga["frequenza_picco"] = float(freq)
+        riga["potenza_picco"]   = float(np.abs(pot)**2)
+        riga["periodo_gg"]      = 1/(freq*86400)
+
+    if "incertezza_periodo" in stadi:
+        riga["periodo_min_gg"] = stadi["incertezza_periodo"]["periodo_min"]
+        riga["periodo_max_gg"] = stadi["incertezza_periodo"]["periodo_max"]
+        riga["seme_periodo"]   = stadi["incertezza_periodo"]["seme"]
+
+    if "significatività" in stadi:
+        p = float(stadi["significatività"])
+        n = stadi["istogramma"]["n_realizzazioni"]
+
+        riga["p_value"]         = p
+        riga["n_realizzazioni"] = n
+        riga["limite_p_value"]  = bool(p == 1/np.sqrt(n))
+        riga["errore_p_value"]  = nan if riga["limite_p_value"] else math.sqrt(p*(1 - p)/n)
+        riga["sigma"]           = sigma_gaussiana(p)
+
+    return riga
+
+#------------------------------------------------------------------------------------------------------------
+
+def raccogli_risultati(stati):
+    """
+    Funzione che raccoglie in un'unica tabella i risultati degli stadi calcolati per le fonti
+
+    Parametri:
+    -------------
+    stati (dictionary) : dizionario {chiave : stato} delle fonti (vedi modulo_pipeline_blazar.crea_stato())
+
+    Restituisce:
+    -------------
+    risultati (dictionary) : {colonna : lista dei valori} con le colonne di COLONNE e una riga per fonte
+
+    Note:
+    -----------
+    - vengono utilizzati solo gli stadi già calcolati (fit, periodo, incertezza_periodo, significatività): la raccolta non avvia
+      nessun calcolo e le colonne degli stadi non calcolati contengono nan (None per limite_p_value, n_realizzazioni e seme_periodo)
+    - se il valore-p è un limite superiore (vedi modulo_funzioni_blazar.valore_p_istogramma()) l'errore è nan
+
+    """
+    righe = [_riga(stato) for stato in stati.values()]
+
+    return {colonna : [riga[colonna] for riga in righe] for colonna in COLONNE}
+
+
+def _righe(risultati):
+    # lista delle righe della tabella come dizionari
+    return [{colonna : risultati[colonna][i] for colonna in COLONNE} for i in range(len(risultati["chiave"]))]
+
+#------------------------------------------------------------------------------------------------------------
+
+def come_dataframe(risultati):
+    """
+    Funzione che converte la tabella dei risultati in un DataFrame di pandas (importato solo al primo utilizzo)
+    """
+    import pandas as pd
+
+    return pd.DataFrame(risultati, columns = COLONNE)
+
+#------------------------------------------------------------------------------------------------------------
+
+def esporta_risultati(risultati, nome_file):
+    """
+    Funzione che scrive la tabella dei risultati in un file, con un'unica scrittura
+
+    Parametri:
+    -------------
+    risultati (dictionary) : tabella restituita da raccogli_risultati()
+    nome_file (string)     : nome del file, il formato è dato dall'estensione (.csv, .json, .parquet)
+
+    Note:
+    -----------
+    - il file JSON contiene una lista di record (uno per fonte) con i valori nan scritti come null
+    - il formato Parquet richiede pandas e pyarrow (o fastparquet)
+
+    """
+    estensione = os.path.splitext(nome_file)[1].lower()
+
+    if estensione not in FORMATI:
+        raise ValueError("Formato del file {} non supportato, le estensioni disponibili sono: {}".format(nome_file, ", ".join(FORMATI)))
+
+    formato = FORMATI[estensione]
+
+    if formato == "parquet":
+        come_dataframe(risultati).to_parquet(nome_file, index = False)
+        return
+
+    righe = _righe(risultati)
+
+    if formato == "csv":
+        with open(nome_file, "w", newline = "") as f:
+            scrittore = csv.DictWriter(f, fieldnames = COLONNE)
+            scrittore.writeheader()
+            scrittore.writerows(righe)
+
+    if formato == "json":
+        for riga in righe:
+            for colonna, valore in riga.items():
+                if isinstance(valore, float) and math.isnan(valore):
+                    riga[colonna] = None
+
+        with open(nome_file, "w") as f:
+            json.dump(righe, f, indent = 1, ensure_ascii = False)
+
+
+                                      ###########################################
+                                      #          Tabelle per il terminale       #
+                                      ###########################################
+
+def tabella_fit(risultati):
+    """
+    Funzione che restituisce il testo della tabella dei parametri ricavati dal fit
+    """
+    testo = ["\033[95m     Tabella dei parametri ricavati dal Fit   \033[0m",
+             "",
+             "      Sorgente | Parametro  | Valore Parametro | Errore"]
+
+    for riga in _righe(risultati):
+        testo.append("     ----------|------------|------------------|----------------")
+        testo.append("      {}       |     N      | {:.3f}            |+- {:.3e} ".format(riga["chiave"], riga["N_fit"], riga["errore_N_fit"]))
+        testo.append("      {}       |    Beta    | {:.3f}            |+- {:.3f} ".format(riga["chiave"], riga["beta_fit"], riga["errore_beta_fit"]))
+
+    return "\n".join(testo)
+
+#------------------------------------------------------------------------------------------------------------
+
+def tabella_periodi(risultati):
+    """
+    Funzione che restituisce il testo della tabella delle frequenze e dei periodi individuati,
+    con le righe raggruppate per fonte (prima mensile e poi settimanale) e, se calcolato, l'intervallo di confidenza del periodo
+    con il seme dei ricampionamenti
+    """
+    testo = ["\033[95m     Tabella delle frequenze e periodi individuati nelle fonti   \033[0m",
+             "",
+             " Fonte e base temporale   | frequenza del picco [Hz] | potenza associata [u.a.] |    periodo[gg]  | intervallo [gg]"]
+
+    righe  = {riga["chiave"] : riga for riga in _righe(risultati)}
+
+    for chiave in sorted(righe, key = lambda k: (k[0], k[1] != "M")):
+        riga = righe[chiave]
+        if chiave.endswith("M") or chiave[0] + "M" not in righe:
+            testo.append("--------------------------|--------------------------|--------------------------|-----------------|-----------------")
+        fonte = " Fonte {}, {}".format(chiave[0], riga["base"].capitalize())
+        intervallo = "" if math.isnan(riga["periodo_min_gg"]) else "[{:.1f}, {:.1f}] (seme {})".format(riga["periodo_min_gg"], riga["periodo_max_gg"],
+                                                                                                     riga["seme_periodo"])
+        testo.append("{:<26}|{:.3e}                 |{:.3e}                 |{:<17.2f}|{}".format(fonte, riga["frequenza_picco"],
+                                                                                             riga["potenza_picco"], riga["periodo_gg"],
+                                                                                             intervallo))
+
+    return "\n".join(testo)
+
+#------------------------------------------------------------------------------------------------------------
+
+def tabella_significatività(risultati):
+    """
+    Funzione che restituisce il testo della tabella della significatività dei periodi, raggruppata per base temporale
+
+    Note:
+    -----------
+    - se il valore-p è un limite superiore vengono indicati "<" per il valore-p e ">" per la significatività,
+      altrimenti viene indicato l'errore sulla significatività dovuto al numero finito di curve sintetiche
+
+    """
+    testo = ["\033[95m  \t                     Tabella della Significatività dei periodi delle Fonti  \033[0m",
+             " ",
+             "\033[4m       Nome Fonte       | Base Temporale | Periodo[gg]  |   p-value  | Significatività [%]  |  sigma  \033[0m"]
+
+    righe = _righe(risultati)
+
+    for base in pbl.BASI.values():
+        selezionate = [riga for riga in righe if riga["base"] == base]
+        if base == "settimanale" and len(selezionate) > 0 and len(selezionate) < len(righe):
+            testo.append("---------------------------------------------------------------------------------------------------------------")
+
+        for riga in selezionate:
+            p = riga["p_value"]
+
+            if riga["limite_p_value"]:
+                simb_p, simb_s, errore = "<", ">", "        "
+            else:
+                simb_p, simb_s, errore = " ", " ", "±{:.2f}%".format(riga["errore_p_value"]*100)
+
+            sigma = "{}{:.2f}".format(simb_s, riga["sigma"]) if not math.isnan(riga["sigma"]) else "  -"
+
+            testo.append(" {:<25} {:<15} {:.2f}\t  {}{:.5f}\t    {}{:.2f}%  {}      {}".format(riga["nome"], base.capitalize(),
+                                                                                               riga["periodo_gg"], simb_p, p,
+                                                                                               simb_s, (1 - p)*100, errore, sigma))
+
+    return "\n".join(testo)
+
+#------------------------------------------------------------------------------------------------------------
+
+def tabella_colonne(spettri):
+    """
+    Funzione che restituisce il testo della tabella dei periodi del flusso e delle colonne aggiuntive delle fonti
+
+    Parametri:
+    -------------
+    spettri (dictionary) : {chiave della fonte : risultato di modulo_funzioni_blazar.spettri_colonne()}
+
+    Note:
+    -----------
+    - le colonne costanti (ad esempio l'indice di fotone fissato nell'analisi del Fermi LAT) sono indicate come "costante"
+    - "veto" indica che il picco del flusso coincide (entro un bin) con quello della distanza dal Sole
+
+    """
+    testo = ["\033[95m     Tabella dei periodi del flusso e delle colonne aggiuntive   \033[0m",
+             ""]
+
+    for chiave, sp in spettri.items():
+        intestazione = " Fonte |" + "|".join(" {:<13}".format(colonna) for colonna in sp["colonne"]) + "| Sole"
+        if len(testo) == 2:
+            testo.append(intestazione)
+
+        periodi = ["costante" if costante else "{:.2f} gg".format(1/(f*86400)) for f, costante in zip(sp["picchi"], sp["costanti"])]
+        veto = "-" if sp["veto_sole"] is None else ("veto" if sp["veto_sole"] else "ok")
+
+        testo.append("-"*len(intestazione))
+        testo.append(" {:<6}|".format(chiave) + "|".join(" {:<13}".format(periodo) for periodo in periodi) + "| " + veto)
+
+    return "\n".join(testo)
+
+#------------------------------------------------------------------------------------------------------------
+
+def tabella_picchi_multipli(multipli, valori_p = None):
+    """
+    Funzione che restituisce il testo della tabella dei picchi più alti dello spettro di ogni fonte
+
+    Parametri:
+    -------------
+    multipli (dictionary) : {chiave della fonte : risultato dello stadio picchi_multipli}
+    valori_p (dictionary) : {chiave della fonte : risultato dello stadio significatività_multipli} (facoltativo)
+
+    Note:
+    -----------
+    - "p ordine" confronta il j-esimo picco con il j-esimo picco più alto delle curve sintetiche, "p globale" con il
+      picco più alto (più conservativo); sigma è calcolato dal valore-p della statistica d'ordine
+
+    """
+    testo = ["\033[95m     Tabella dei picchi più alti degli spettri   \033[0m",
+             "",
+             " Fonte | j | periodo [gg] | potenza    | p ordine | p globale | sigma"]
+
+    for chiave, mp in multipli.items():
+        testo.append("-------|---|--------------|------------|----------|-----------|-------")
+
+        for j, (f, picco) in enumerate(zip(mp["frequenze"], mp["picchi"])):
+            if math.isnan(f):
+                continue
+
+            if valori_p is None:
+                p_ordine, p_globale, sigma = "  -", "  -", "  -"
+            else:
+                p = valori_p[chiave]
+                s = sigma_gaussiana(p["ordine"][j])
+                p_ordine, p_globale = "{:.5f}".format(p["ordine"][j]), "{:.5f}".format(p["globale"][j])
+                sigma = "  -" if math.isnan(s) else "{:.2f}".format(s)
+
+            testo.append(" {:<6}| {:<2}| {:<13.2f}| {:<11.3e}| {:<9}| {:<10}| {}".format(chiave if j == 0 else "", j + 1,
+                         1/(f*86400), abs(picco)**2, p_ordine, p_globale, sigma))
+
+    return "\n".join(testo)
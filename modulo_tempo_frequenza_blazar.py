@@ -0,0 +1,423 @@
+"""
+Modulo per l'analisi tempo-frequenza delle curve di luce dei Blazar
+
+Autore: Valenti Alessandra
+
+
+Le quasi-periodicità dei Blazar sono spesso transitorie, mentre fft_diz() e picco_periodo() trattano l'intera curva
+di luce come un unico segmento stazionario. Lo spettro dinamico è l'insieme degli spettri di potenza calcolati
+su finestre scorrevoli della curva interpolata: le finestre sono una vista della curva (np.lib.stride_tricks.sliding_window_view),
+senza copie, e vengono trasformate con un'unica trasformata sulle righe; con passo di un bin le trasformate delle finestre
+possono essere calcolate anche in modo incrementale (DFT scorrevole) a partire dalle somme cumulative della curva.
+
+La Weighted Wavelet Z-transform (WWZ, Foster 1996) viene calcolata direttamente sui tempi e sui flussi misurati, senza interpolazione,
+vettorizzata su traslazioni temporali e frequenze a blocchi di memoria limitata. Pesi e funzioni di base dipendono solo dai tempi,
+per cui la WWZ di molte curve sintetiche (permutazioni del flusso) si riduce ad un prodotto matriciale per blocco; il picco della WWZ
+media e quelli delle curve sintetiche vengono confrontati con istogramma_significatività() e valore_p_istogramma() come per lo spettro.
+
+Elenco delle funzioni:
+     - spettro_dinamico ................... spettro di potenza su finestre scorrevoli e traccia dei picchi
+     - spettri_dinamici ................... spettri dinamici di una fonte per più lunghezze delle finestre
+     - tabella_spettri_dinamici ........... testo della tabella riassuntiva delle tracce dei picchi
+     - griglia_wwz ........................ frequenze e traslazioni temporali della WWZ
+     - wwz ................................ Weighted Wavelet Z-transform di una curva campionata in modo non uniforme
+     - picchi_wwz_sintetici ............... picchi della WWZ media di N curve sintetiche, in parallelo
+     - tabella_wwz ........................ testo della tabella dei picchi e della significatività della WWZ
+
+"""
+import modulo_funzioni_blazar as fbl
+import numpy as np
+import os
+from scipy import fft
+from concurrent.futures import ProcessPoolExecutor
+
+
+# stato dei processi del pool della WWZ: curve sintetiche, tempi, griglia e parametri (impostati una sola volta per processo)
+_processo = {}
+
+
+                                      ###########################################
+                                      #            Spettro dinamico             #
+                                      ###########################################
+
+def _dft_scorrevole(flusso, lunghezza):
+    # trasformate (frequenze positive) di tutte le finestre con passo di un bin, dalle somme cumulative della curva:
+    # X_k(m) = exp(2 pi i k m / L) * sum_{j = m}^{m + L - 1} x_j exp(-2 pi i k j / L)
+    n = len(flusso)
+    k = np.arange(lunghezza//2 + 1)
+
+    ruotati = flusso[:, None]*np.exp(-2j*np.pi*np.outer(np.arange(n) % lunghezza, k)/lunghezza)
+
+    somme = np.zeros((n + 1, len(k)), dtype = complex)
+    np.cumsum(ruotati, axis = 0, out = somme[1:])
+
+    m = np.arange(n - lunghezza + 1)
+
+    return (somme[m + lunghezza] - somme[m])*np.exp(2j*np.pi*np.outer(m % lunghezza, k)/lunghezza)
+
+#------------------------------------------------------------------------------------------------------------
+
+@fbl.profila
+def spettro_dinamico(flusso, tempo, lunghezza, passo = 1, f_taglio = 0, metodo = "fft"):
+    """
+    Funzione che calcola lo spettro di potenza su finestre scorrevoli della curva di luce interpolata
+
+    Parametri:
+    -------------
+    flusso (array)   : flusso interpolato (campionamento regolare)
+    tempo (array)    : tempi della curva interpolata [s]
+    lunghezza (int)  : numero di bin di ogni finestra
+    passo (int)      : numero di bin tra l'inizio di due finestre successive
+    f_taglio (float) : frequenza al di sotto della quale il contributo viene considerato costante (esclusa dalla traccia dei picchi)
+    metodo (string)  : "fft"        => un'unica trasformata sulle righe della vista delle finestre
+                       "scorrevole" => DFT scorrevole dalle somme cumulative (solo con passo = 1)
+
+    Restituisce:
+    -------------
+    spettro (dictionary) : con le chiavi
+                           ["tempi"]       : tempi centrali delle finestre [s]
+                           ["frequenze"]   : frequenze positive delle trasformate delle finestre [Hz]
+                           ["potenza"]     : matrice (finestre, frequenze) delle potenze |C_k|^2
+                           ["freq_picchi"] : frequenza del massimo di potenza di ogni finestra oltre f_taglio (traccia dei picchi)
+                           ["pot_picchi"]  : potenza del massimo di ogni finestra
+                           ["lunghezza"], ["passo"]
+
+    Note:
+    -------------
+    - le potenze hanno la stessa normalizzazione di fft_diz() (trasformata non normalizzata della finestra)
+    - il picco di ogni finestra è il massimo di |C_k|^2, non l'ordinamento dei numeri complessi di picco_periodo()
+    - la DFT scorrevole dà le stesse potenze della trasformata sulle righe (a meno di errori di arrotondamento ~1e-15),
+      ma con le lunghezze delle curve del catalogo la trasformata sulle righe è più veloce
+
+    """
+    dt = fbl.dt_moda(tempo)
+    frequenze = fft.rfftfreq(lunghezza, d = dt)
+
+    if metodo == "scorrevole" and passo == 1:
+        ck = _dft_scorrevole(np.asarray(flusso, dtype = float), lunghezza)
+    elif metodo in ("fft", "scorrevole"):
+        finestre = np.lib.stride_tricks.sliding_window_view(flusso, lunghezza)[::passo]
+        ck = fft.rfft(finestre, axis = 1)
+    else:
+        raise ValueError("Metodo {} non disponibile, i metodi disponibili sono: fft, scorrevole".format(metodo))
+
+    potenza = np.abs(ck)**2
+
+    k = max(np.count_nonzero(frequenze <= f_taglio), 1)
+    i_picchi = k + np.argmax(potenza[:, k:], axis = 1)
+
+    inizi = np.arange(0, len(flusso) - lunghezza + 1, passo)
+
+    spettro = {
+        "tempi"       : tempo[0] + (inizi + (lunghezza - 1)/2)*dt,
+        "frequenze"   : frequenze,
+        "potenza"     : potenza,
+        "freq_picchi" : frequenze[i_picchi],
+        "pot_picchi"  : potenza[np.arange(len(potenza)), i_picchi],
+        "lunghezza"   : lunghezza,
+        "passo"       : passo,
+    }
+
+    return spettro
+
+#------------------------------------------------------------------------------------------------------------
+
+def spettri_dinamici(diz, finestre_gg, passo_gg = None, f_taglio = 0, metodo = "fft"):
+    """
+    Funzione che calcola gli spettri dinamici di una fonte per più lunghezze delle finestre
+
+    Parametri:
+    -------------
+    diz (dictionary)    : dizionario della fonte con le chiavi ["nome"], ["flussi completi"] e ["tempi completi"]
+    finestre_gg (list)  : lunghezze delle finestre [giorni], convertite nel numero di bin più vicino
+    passo_gg (float)    : passo tra le finestre [giorni] (default: un bin)
+    f_taglio (float)    : frequenza di taglio della traccia dei picchi
+    metodo (string)     : "fft" o "scorrevole" (vedi spettro_dinamico())
+
+    Restituisce:
+    -------------
+    spettri (dictionary) : con le chiavi ["nome"] e ["finestre"] = {lunghezza della finestra [giorni] : spettro dinamico};
+                           le finestre più lunghe della curva vengono ignorate
+
+    """
+    flusso, tempo = diz["flussi completi"], diz["tempi completi"]
+    dt_gg = fbl.dt_moda(tempo)/86400
+
+    passo = 1 if passo_gg is None else max(int(round(passo_gg/dt_gg)), 1)
+
+    spettri = {"nome" : diz["nome"], "finestre" : {}}
+
+    for finestra_gg in finestre_gg:
+        lunghezza = int(round(finestra_gg/dt_gg))
+        if 2 <= lunghezza <= len(flusso):
+            spettri["finestre"][finestra_gg] = spettro_dinamico(flusso, tempo, lunghezza, passo, f_taglio, metodo)
+
+    return spettri
+
+#------------------------------------------------------------------------------------------------------------
+
+def tabella_spettri_dinamici(spettri):
+    """
+    Funzione che restituisce il testo della tabella riassuntiva delle tracce dei picchi degli spettri dinamici
+
+    Parametri:
+    -------------
+    spettri (dictionary) : {chiave della fonte : spettri restituiti da spettri_dinamici()}
+
+    """
+    testo = ["\033[95m     Tabella delle tracce dei picchi degli spettri dinamici   \033[0m",
+             "",
+             " Fonte | Finestra [gg] | Finestre | Periodo mediano [gg] | Periodo min-max [gg] "]
+
+    for chiave, sp in spettri.items():
+        testo.append("-------|---------------|----------|----------------------|----------------------")
+
+        for finestra_gg, sd in sp["finestre"].items():
+            periodi = 1/(sd["freq_picchi"]*86400)
+            testo.append(" {:<6}| {:<14g}| {:<9}| {:<21.1f}| {:.1f} - {:.1f}".format(chiave, finestra_gg, len(periodi),
+                                                                                    np.median(periodi), periodi.min(), periodi.max()))
+
+    return "\n".join(testo)
+
+
+                                      ###########################################
+                                      #   Weighted Wavelet Z-transform (WWZ)    #
+                                      ###########################################
+
+def _blocchi_wwz(tempo, flussi, frequenze, tau, c, memoria_max):
+    # WWZ e ampiezza (WWA) di un blocco di curve (righe di flussi) per blocchi di traslazioni temporali:
+    # pesi, funzioni di base (1, cos, sin) e matrici S dipendono solo dai tempi e sono comuni a tutte le curve,
+    # per cui i prodotti scalari pesati di tutte le curve sono un unico prodotto matriciale
+    N, B = len(tempo), len(flussi)
+    omega = 2*np.pi*frequenze
+
+    n_tau = max(int(memoria_max//(8*len(frequenze)*(6*N + 10*B))), 1)
+
+    X, X2 = flussi.T, (flussi**2).T
+
+    for inizio in range(0, len(tau), n_tau):
+        fase = omega[None, :, None]*(tempo[None, None, :] - tau[inizio:inizio + n_tau, None, None])
+
+        w = np.exp(-c*fase**2)
+        somma_w = np.sum(w, axis = 2)
+        n_eff = somma_w**2/np.sum(w**2, axis = 2)
+        w /= somma_w[:, :, None]
+
+        coseno, seno = np.cos(fase), np.sin(fase)
+        basi = np.stack([w, w*coseno, w*seno], axis = 2)
+
+        S = np.empty(basi.shape[:2] + (3, 3))
+        S[:, :, 0, 0] = 1
+        S[:, :, 0, 1] = S[:, :, 1, 0] = np.sum(basi[:, :, 1], axis = 2)
+        S[:, :, 0, 2] = S[:, :, 2, 0] = np.sum(basi[:, :, 2], axis = 2)
+        S[:, :, 1, 1] = np.sum(basi[:, :, 1]*coseno, axis = 2)
+        S[:, :, 1, 2] = S[:, :, 2, 1] = np.sum(basi[:, :, 1]*seno, axis = 2)
+        S[:, :, 2, 2] = np.sum(basi[:, :, 2]*seno, axis = 2)
+
+        # un unico prodotto matriciale (tau*frequenze*3, N) x (N, curve)
+        proiezioni = (basi.reshape(-1, N) @ X).reshape(basi.shape[:3] + (B,))
+        # pseudo-inversa: S è singolare se seno o coseno sono nulli in tutti i punti (ad esempio alla frequenza di Nyquist)
+        y = np.linalg.pinv(S, hermitian = True) @ proiezioni
+
+        media2 = proiezioni[:, :, 0]**2
+        v_y = np.sum(y*proiezioni, axis = 2) - media2
+        v_x = (w.reshape(-1, N) @ X2).reshape(w.shape[:2] + (B,)) - media2
+
+        z = (n_eff[:, :, None] - 3)*v_y/(2*(v_x - v_y))
+        ampiezza = np.sqrt(y[:, :, 1]**2 + y[:, :, 2]**2)
+
+        # (curve, tau, frequenze)
+        yield slice(inizio, inizio + len(fase)), np.moveaxis(z, 2, 0), np.moveaxis(ampiezza, 2, 0)
+
+#------------------------------------------------------------------------------------------------------------
+
+def _massimi_interni(media):
+    # indice e valore del massimo locale interno più alto di ogni riga (WWZ media di una curva): gli estremi della griglia
+    # sono esclusi, perché la WWZ del rumore rosso cresce verso f_min e il massimo globale cadrebbe sul bordo;
+    # il valore è -inf se la riga non ha massimi interni
+    media = np.atleast_2d(media)
+    interni = media[:, 1:-1]
+
+    valori = np.where((interni > media[:, :-2]) & (interni >= media[:, 2:]), interni, -np.inf)
+    i = np.argmax(valori, axis = 1)
+
+    return i + 1, valori[np.arange(len(valori)), i]
+
+#------------------------------------------------------------------------------------------------------------
+
+def griglia_wwz(tempo, n_frequenze = 200, n_tau = 100, f_min = 1e-8, f_max = None):
+    """
+    Funzione che restituisce le frequenze e le traslazioni temporali della WWZ di una curva di luce
+
+    Parametri:
+    -------------
+    tempo (array)      : tempi delle misure [s]
+    n_frequenze (int)  : numero di frequenze, equispaziate in scala logaritmica tra f_min e f_max (risoluzione
+                         uniforme in periodo relativo, più fitta ai periodi lunghi rispetto ad una griglia lineare)
+    n_tau (int)        : numero di traslazioni temporali, equispaziate tra il primo e l'ultimo tempo
+    f_min (float)      : frequenza minima [Hz] (default: la frequenza di taglio dell'analisi)
+    f_max (float)      : frequenza massima [Hz] (default: la frequenza di Nyquist del passo di campionamento più frequente)
+
+    Restituisce:
+    -------------
+    frequenze (array), tau (array)
+
+    """
+    if f_max is None:
+        f_max = 1/(2*fbl.dt_moda(tempo))
+
+    return np.geomspace(f_min, f_max, n_frequenze), np.linspace(tempo[0], tempo[-1], n_tau)
+
+#------------------------------------------------------------------------------------------------------------
+
+@fbl.profila
+def wwz(tempo, flusso, frequenze, tau, c = 1/(8*np.pi**2), memoria_max = 64e6):
+    """
+    Funzione che calcola la Weighted Wavelet Z-transform (Foster 1996) di una curva di luce campionata in modo non uniforme,
+    senza interpolazione, vettorizzata su traslazioni temporali e frequenze
+
+    Parametri:
+    -------------
+    tempo (array)       : tempi delle misure [s] (ad esempio la colonna MET)
+    flusso (array)      : flusso misurato
+    frequenze (array)   : frequenze [Hz]
+    tau (array)         : traslazioni temporali [s]
+    c (float)           : costante di decadimento della wavelet di Morlet (default 1/(8 pi^2))
+    memoria_max (float) : memoria massima [byte] degli array intermedi di un blocco di traslazioni temporali
+
+    Restituisce:
+    -------------
+    trasformata (dictionary) : con le chiavi
+                               ["tau"], ["frequenze"]
+                               ["wwz"]     : matrice (tau, frequenze) della statistica Z
+                               ["wwa"]     : matrice (tau, frequenze) dell'ampiezza della componente periodica
+                               ["media"]   : WWZ media sulle traslazioni temporali (spettro medio)
+                               ["periodo"] : frequenza e radice della WWZ media del picco dello spettro medio,
+                                             nello stesso formato di picco_periodo() (|picco|^2 = WWZ); il picco è
+                                             il massimo locale più alto interno alla griglia (nan e 0 se non ce ne sono)
+
+    Note:
+    -------------
+    - il costo è O(n_tau * n_frequenze * N), calcolato a blocchi di traslazioni temporali in modo che gli array
+      intermedi non superino memoria_max
+    - gli estremi della griglia non sono mai il picco: con il rumore rosso la WWZ media è spesso massima a f_min,
+      che non è un periodo ma il limite della griglia
+
+    """
+    flussi = np.atleast_2d(np.asarray(flusso, dtype = float))
+
+    z = np.empty((len(tau), len(frequenze)))
+    ampiezza = np.empty((len(tau), len(frequenze)))
+
+    for blocco, z_blocco, a_blocco in _blocchi_wwz(np.asarray(tempo, dtype = float), flussi, frequenze, tau, c, memoria_max):
+        z[blocco], ampiezza[blocco] = z_blocco[0], a_blocco[0]
+
+    media = np.mean(z, axis = 0)
+    i, massimo = _massimi_interni(media)
+    periodo = [frequenze[i[0]], np.sqrt(max(massimo[0], 0))] if np.isfinite(massimo[0]) else [np.nan, 0.0]
+
+    trasformata = {
+        "tau"       : tau,
+        "frequenze" : frequenze,
+        "wwz"       : z,
+        "wwa"       : ampiezza,
+        "media"     : media,
+        "periodo"   : periodo,
+    }
+
+    return trasformata
+
+#------------------------------------------------------------------------------------------------------------
+
+def _inizializza_processo(tempo, flusso, frequenze, tau, N, seme, c, memoria_max):
+    # le curve sintetiche vengono generate in ogni processo dallo stesso seme, invece di essere inviate
+    _processo.update({"tempo" : tempo, "frequenze" : frequenze, "tau" : tau, "c" : c, "memoria_max" : memoria_max,
+                      "curve" : fbl.curve_sintetiche_blocco(flusso, N, seme)})
+
+
+def _somma_wwz(compito):
+    # somma sulle traslazioni temporali [inizio, fine) della WWZ di tutte le curve sintetiche
+    inizio, fine = compito
+    p = _processo
+
+    somma = np.zeros((len(p["curve"]), len(p["frequenze"])))
+
+    for _, z, _ in _blocchi_wwz(p["tempo"], p["curve"], p["frequenze"], p["tau"][inizio:fine], p["c"], p["memoria_max"]):
+        somma += np.sum(z, axis = 1)
+
+    return somma
+
+#------------------------------------------------------------------------------------------------------------
+
+@fbl.profila
+def picchi_wwz_sintetici(tempo, flusso, frequenze, tau, N, seme = None, n_processi = None, c = 1/(8*np.pi**2), memoria_max = 64e6):
+    """
+    Funzione che calcola i picchi della WWZ media di N curve sintetiche (permutazioni del flusso sugli stessi tempi)
+
+    Parametri:
+    -------------
+    tempo, flusso (array)    : tempi [s] e flussi misurati
+    frequenze, tau (array)   : griglia della WWZ (vedi griglia_wwz())
+    N (int)                  : numero di curve sintetiche
+    seme                     : seme delle permutazioni (int o None)
+    n_processi (int)         : numero di processi del pool (default: numero di CPU), con n_processi = 1
+                               il calcolo viene eseguito nel processo principale
+    c, memoria_max           : vedi wwz()
+
+    Restituisce:
+    -------------
+    picchi (array) : radice del massimo locale interno più alto della WWZ media di ciascuna curva sintetica (0 se non ce
+                     ne sono), confrontabile con wwz()["periodo"][1] (|picco|^2 = WWZ, come per i picchi di ar_picchi_sintetici())
+
+    Note:
+    -------------
+    - ai processi vengono assegnati intervalli di traslazioni temporali: ogni processo calcola pesi e funzioni di base
+      solo per il proprio intervallo, per tutte le curve, e restituisce la somma della WWZ su quell'intervallo;
+      il risultato non dipende dal numero di processi
+
+    """
+    tempo  = np.asarray(tempo, dtype = float)
+    flusso = np.asarray(flusso, dtype = float)
+
+    if n_processi is None:
+        n_processi = os.cpu_count()
+
+    argomenti = (tempo, flusso, frequenze, tau, N, seme, c, memoria_max)
+
+    if n_processi == 1:
+        _inizializza_processo(*argomenti)
+        somma = _somma_wwz((0, len(tau)))
+        _processo.clear()
+    else:
+        limiti = np.linspace(0, len(tau), min(4*n_processi, len(tau)) + 1).astype(int)
+        compiti = list(zip(limiti[:-1], limiti[1:]))
+
+        with ProcessPoolExecutor(max_workers = n_processi, initializer = _inizializza_processo, initargs = argomenti) as pool:
+            somma = sum(pool.map(_somma_wwz, compiti))
+
+    return np.sqrt(np.maximum(_massimi_interni(somma/len(tau))[1], 0))
+
+#------------------------------------------------------------------------------------------------------------
+
+def tabella_wwz(trasformate, valori_p = None):
+    """
+    Funzione che restituisce il testo della tabella dei picchi della WWZ media delle fonti
+
+    Parametri:
+    -------------
+    trasformate (dictionary) : {chiave della fonte : trasformata restituita da wwz()}
+    valori_p (dictionary)    : {chiave della fonte : valore-p del picco} (facoltativo)
+
+    """
+    testo = ["\033[95m     Tabella dei picchi della Weighted Wavelet Z-transform   \033[0m",
+             "",
+             " Fonte | frequenza del picco [Hz] | periodo [gg] | WWZ media | p-value"]
+
+    for chiave, tr in trasformate.items():
+        freq, picco = tr["periodo"]
+        p = "  -" if valori_p is None or chiave not in valori_p else "{:.5f}".format(valori_p[chiave])
+
+        testo.append("-------|--------------------------|--------------|-----------|---------")
+        testo.append(" {:<6}| {:.3e}                | {:<13.2f}| {:<10.2f}| {}".format(chiave, freq, 1/(freq*86400), picco**2, p))
+
+    return "\n".join(testo)
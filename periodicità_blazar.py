@@ -8,23 +8,12 @@
 #                                                                   #
 #####################################################################
 
-import modulo_funzioni_blazar as fbl
-import modulo_funzioni_plot_blazar  as blplt
+import modulo_pipeline_blazar as pbl
+import modulo_risultati_blazar as rsbl
 import argparse
 import sys, os
-import numpy as np
-import pandas as pd
-import scipy as sc
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
-import colorsys
-import math
-from matplotlib import colors
-from matplotlib.colors import Normalize
-from scipy.stats import mode
-from scipy import integrate
-from scipy import  fft, optimize
-from datetime import datetime, timedelta
+
+# il modulo dei grafici (e quindi matplotlib) viene importato solo se viene richiesto un grafico, vedi carica_plot()
 
 
 #############################################
@@ -37,147 +26,357 @@ def parse_arguments():
     parser.add_argument('-a', '--plotlc', action='store_true', help='Realizza il plot delle curve di luce delle fonti ')
     parser.add_argument('-b', '--pwsp'  , action='store_true', help='Realizza il plot degli spettri di potenza delle fonti')
     parser.add_argument('-c', '--fit'   , action='store_true', help='Realizza il plot del fit delle curve di luce e stampa una tabella con i parametri ottenuti')
-    parser.add_argument('-d', '--period', action='store_true', help='Effettua lo studio della periodicità delle fonti e stampa una tabella con i relativi dati')
+    parser.add_argument('-d', '--period', action='store_true',
+                        help='Effettua lo studio della periodicità delle fonti e stampa una tabella con i relativi dati e l\'intervallo di confidenza del periodo')
+    parser.add_argument('--sovracampionamento', type=int, default=None, metavar='O',
+                        help='Raffina il picco del periodo e i picchi sintetici tra i bin della trasformata con O frequenze per bin')
+    parser.add_argument('--affinamento', choices=['zoom', 'padding', 'parabola'], default='zoom',
+                        help='Metodo di affinamento dei picchi con --sovracampionamento (default: zoom)')
+    parser.add_argument('--bootstrap', choices=['blocchi', 'parametrico'], default='blocchi',
+                        help='Ricampionamento per l\'intervallo del periodo: bootstrap a blocchi dei residui o errori sul flusso (default: blocchi)')
+    parser.add_argument('--log-flusso', action='store_true',
+                        help='Analizza il logaritmo del flusso interpolato (curva originale e curve sintetiche)')
+    parser.add_argument('--sigma-clip', type=float, default=None, metavar='K',
+                        help='Riporta i flare oltre mediana + K sigma (sigma dalla MAD) alla soglia prima della trasformata')
+    parser.add_argument('--detrend' , choices=['media', 'polinomio', 'loess'], default=None,
+                        help='Rimuove dal flusso interpolato la media, un polinomio (--grado) o un trend LOESS (--frazione-loess)')
+    parser.add_argument('--grado'   , type=int, default=1, help='Grado del polinomio con --detrend polinomio (default: 1)')
+    parser.add_argument('--frazione-loess', type=float, default=0.3, metavar='F',
+                        help='Frazione dei bin nell\'intorno di ogni tempo con --detrend loess (default: 0.3)')
+    parser.add_argument('--finestra', choices=['hann', 'tukey'], default=None,
+                        help='Finestra applicata al flusso interpolato prima della trasformata (con --alfa-tukey per la finestra di Tukey)')
+    parser.add_argument('--alfa-tukey', type=float, default=0.5, metavar='A',
+                        help='Frazione con profilo a coseno della finestra di Tukey (default: 0.5)')
     parser.add_argument('-e', '--sint'  , action='store_true',
                         help='Realizza il plot degli istogrammi della distribuzione delle potenze delle curve sintetiche e restituisce la significatività ')
+    parser.add_argument('--picchi'  , nargs='?', type=int, const=5, default=None, metavar='K',
+                        help='Verifica i K picchi più alti dello spettro (default 5, ad esempio le armoniche): stampa periodi e p-value '
+                             'delle statistiche d\'ordine calcolati con le stesse curve sintetiche di -e')
+    parser.add_argument('-f', '--fonte' , nargs='+', choices=list(pbl.FONTI), default=list(pbl.FONTI), metavar='FONTE',
+                        help='Fonti da analizzare (default: tutte). Valori accettati: {}'.format(" ".join(pbl.FONTI)))
+    parser.add_argument('--headless', action='store_true',
+                        help='Utilizza un backend di matplotlib non interattivo, per le macchine senza display')
+    parser.add_argument('--render'  , metavar='CARTELLA',
+                        help='Salva i grafici delle singole fonti nella cartella indicata invece di mostrarli, realizzandoli in parallelo')
+    parser.add_argument('--formato' , choices=['png', 'pdf', 'svg'], default='png', help='Formato dei grafici salvati con --render')
+    parser.add_argument('--mathtext', action='store_true', help='Compone i testi dei grafici con mathtext invece che con LaTeX')
+    parser.add_argument('--max-punti', type=int, default=None,
+                        help='Numero massimo di punti disegnati per curve di luce e spettri (decimazione per curve lunghe o dense)')
+    parser.add_argument('--processi', type=int, default=None,
+                        help='Numero di processi utilizzati per salvare i grafici e per le curve sintetiche con --parallelo (default: numero di CPU)')
+    parser.add_argument('--parallelo', action='store_true',
+                        help='Calcola le curve sintetiche a blocchi in un pool di processi con memoria condivisa')
+    parser.add_argument('--float32' , action='store_true',
+                        help='Curve sintetiche, trasformate e picchi in singola precisione (implica --parallelo)')
+    parser.add_argument('--valida-float32', action='store_true',
+                        help='Confronta i p-value ottenuti in float32 e in float64 (stesso seme) sulle fonti selezionate')
+    parser.add_argument('--seme'    , type=int, default=None, help='Seme delle curve sintetiche con --parallelo e dei ricampionamenti del periodo (risultati riproducibili)')
+    parser.add_argument('--aggiorna', metavar='ARCHIVIO',
+                        help='Aggiorna in modo incrementale l\'archivio delle fonti con i nuovi bin dei file CSV e stampa le tabelle '
+                             'richieste con -c, -d, -e (con -e la significatività viene ricalcolata per le fonti con nuovi dati)')
+    parser.add_argument('--dinamico', nargs='*', type=float, default=None, metavar='GG',
+                        help='Spettri dinamici su finestre scorrevoli delle lunghezze indicate in giorni (default: 730 1460 2920): '
+                             'stampa la tabella delle tracce dei picchi e realizza i grafici tempo-periodo')
+    parser.add_argument('--wwz'     , nargs='?', type=int, const=1000, default=None, metavar='N',
+                        help='Weighted Wavelet Z-transform sui dati non interpolati: stampa il picco della WWZ media e il p-value '
+                             'calcolato con N curve sintetiche (default 1000, 0 per non calcolarlo) e realizza i grafici')
+    parser.add_argument('--ripiegamento', nargs='?', type=int, const=1000, default=None, metavar='N',
+                        help='Ricerca del periodo per ripiegamento in fase (epoch folding e PDM) sui dati non interpolati: stampa '
+                             'i periodi e i p-value calcolati con N curve sintetiche (default 1000, 0 per non calcolarli) e realizza i grafici')
+    parser.add_argument('--colonne' , nargs='*', choices=['indice', 'ts', 'sole'], default=None, metavar='COLONNA',
+                        help='Analizza insieme al flusso le colonne aggiuntive dei file CSV (indice, ts, sole; default tutte) con '
+                             'un\'unica interpolazione e trasformata per fonte: stampa i periodi e il veto dei picchi del flusso '
+                             'che coincidono con quello della distanza dal Sole')
+    parser.add_argument('--gls'     , nargs='?', type=int, const=10000, default=None, metavar='N',
+                        help='Periodogramma di Lomb-Scargle generalizzato pesato con gli errori sul flusso dei dati non interpolati: '
+                             'stampa il picco e il p-value calcolato con N curve sintetiche (default 10000, 0 per non calcolarlo) e realizza i grafici')
+    parser.add_argument('--upper-limit-gls', choices=['escludi', 'metà'], default='escludi',
+                        help='Upper limit nel periodogramma pesato: esclusi (default) o con flusso ed errore pari a metà del limite')
+    parser.add_argument('--thread'  , type=int, default=None,
+                        help='Numero di thread per i blocchi di frequenze del periodogramma pesato (default: uno)')
+    parser.add_argument('--blocchi' , nargs='?', type=float, const=0.05, default=None, metavar='P0',
+                        help='Segmenta le curve di luce misurate in blocchi bayesiani con probabilità di falso positivo P0 '
+                             '(default 0.05), una fonte per processo: stampa i blocchi e il blocco più luminoso e realizza i grafici')
+    parser.add_argument('--upper-limit-blocchi', choices=['escludi', 'metà'], default='escludi',
+                        help='Upper limit nei blocchi bayesiani: esclusi (default) o con flusso ed errore pari a metà del limite')
+    parser.add_argument('--correlazione', nargs='?', choices=['dcf', 'zdcf', 'ccf'], const='dcf', default=None, metavar='METODO',
+                        help='Correlazione incrociata di tutte le coppie delle fonti selezionate, comprese le curve mensile e '
+                             'settimanale della stessa fonte (dcf, zdcf o ccf, default dcf): stampa ritardo, picco e p-value')
+    parser.add_argument('--ritardo-max', type=float, default=730, metavar='GG',
+                        help='Ritardo massimo in giorni della correlazione incrociata (default 730)')
+    parser.add_argument('--cadenza' , nargs='?', type=int, const=4, default=None, metavar='K',
+                        help='Ricava le curve delle fonti mensili selezionate raggruppando K bin delle curve settimanali (default 4, '
+                             'bin di 28 giorni; ad esempio 13 per una cadenza trimestrale), senza leggere i file mensili')
+    parser.add_argument('--limiti'  , choices=['conservativo', 'rilevazioni'], default='conservativo',
+                        help='Upper limit delle curve ricavate con --cadenza: conservativo (un bin con almeno un upper limit è un '
+                             'upper limit) o rilevazioni (upper limit solo i bin senza rilevazioni)')
+    parser.add_argument('--iniezione', metavar='FILE',
+                        help='Campagna di iniezione e recupero di segnali periodici nelle fonti selezionate: salva le mappe di '
+                             'efficienza di rilevazione in un archivio .npz e stampa una tabella riassuntiva')
+    parser.add_argument('--forma'   , choices=['sinusoidale', 'dente_di_sega', 'impulsi'], default='sinusoidale',
+                        help='Forma dei segnali iniettati con --iniezione')
+    parser.add_argument('--griglia' , nargs=3, type=int, default=[30, 20, 8], metavar=('PERIODI', 'AMPIEZZE', 'FASI'),
+                        help='Numero di periodi, ampiezze e fasi della griglia di iniezione (default: 30 20 8)')
+    parser.add_argument('--esporta' , metavar='FILE',
+                        help='Salva i risultati delle fonti (fit, periodo, p-value, sigma) in un file .csv, .json o .parquet')
+    parser.add_argument('--profile' , nargs='?', const='profilo_blazar.json', default=None, metavar='FILE',
+                        help='Registra tempi, CPU, memoria e dimensioni di ogni stadio, stampa una tabella riassuntiva e salva '
+                             'una traccia JSON per chrome://tracing o Perfetto (default: profilo_blazar.json)')
 
     return   parser.parse_args(args=None if sys.argv[1:] else ['--help'])
 
 
-def main():
+#############################################
+# Funzioni di supporto per tabelle e grafici#
+#############################################
 
-    args = parse_arguments()
+def stati_base(stati, base_temp):
+    """
+    Restituisce la lista degli stati delle fonti selezionate con la base temporale indicata (M , W)
+    """
+    return [stato for chiave, stato in stati.items() if pbl.FONTI[chiave]["base"] == base_temp]
 
-                   ##########################################
-                   #    Import dei dati e prima analisi     #
-                   ##########################################
-                   
-    #import dei dati da CSV
 
-    data1M = pd.read_csv('4FGL_J1229.0+0202_monthly_12_23_2024.csv')
-    data2M = pd.read_csv('4FGL_J1555.7+1111_monthly_12_23_2024.csv')
-    data3M = pd.read_csv('4FGL_J2202.7+4216_monthly_12_23_2024.csv')
-    data4M = pd.read_csv('4FGL_J2253.9+1609_monthly_12_23_2024.csv')
+def carica_plot(args):
+    """
+    Importa il modulo dei grafici al primo utilizzo, selezionando il backend non interattivo se richiesto
+    """
+    import modulo_funzioni_plot_blazar as blplt
 
+    if args.headless == True:
+        blplt.modalita_headless()
 
-    data1W = pd.read_csv('4FGL_J1229.0+0202_weekly_12_23_2024.csv')
-    data2W = pd.read_csv('4FGL_J1555.7+1111_weekly_12_23_2024.csv')
-    data3W = pd.read_csv('4FGL_J2202.7+4216_weekly_12_23_2024.csv')
-    data4W = pd.read_csv('4FGL_J2253.9+1609_weekly_12_23_2024.csv')
+    if args.mathtext == True:
+        blplt.imposta_testo(usetex = False)
 
+    return blplt
 
-    #creazione dizionari delle fonti
 
-    data1M_diz = fbl.crea_dizionario_fonte(data1M, "3C 273 (FSRQ)")
-    data2M_diz = fbl.crea_dizionario_fonte(data2M, "PG 1553 + 113 (BL Lac)")
-    data3M_diz = fbl.crea_dizionario_fonte(data3M, "BL Lacertae (BL Lac)")
-    data4M_diz = fbl.crea_dizionario_fonte(data4M, "3C 454.3 (FSRQ)" )
+def grafici(opzioni, stati, tipo, c_grafici, c_secondari):
+    """
+    Realizza i grafici del tipo indicato ("curva", "spettro", "fit", "istogramma") per le fonti selezionate.
+    - con l'opzione --render i grafici delle singole fonti vengono salvati su file in parallelo
+    - altrimenti, per ogni base temporale, viene mostrato il grafico di confronto a 4 pannelli se tutte e 4 le fonti
+      sono state selezionate, oppure i grafici delle singole fonti selezionate
+    """
+    import modulo_render_blazar as rbl
 
-    data1W_diz = fbl.crea_dizionario_fonte(data1W, "3C 273 (FSRQ)")
-    data2W_diz = fbl.crea_dizionario_fonte(data2W, "PG 1553 + 113 (BL Lac)")
-    data3W_diz = fbl.crea_dizionario_fonte(data3W, "BL Lacertae (BL Lac)")
-    data4W_diz = fbl.crea_dizionario_fonte(data4W, "3C 454.3 (FSRQ)")
+    if opzioni.render is not None:
+        salvati = rbl.render_grafici(stati, [tipo], opzioni.render, c_grafici, c_secondari, formato = opzioni.formato,
+                                     usetex = not opzioni.mathtext, n_processi = opzioni.processi,
+                                     max_punti = opzioni.max_punti)
+        print("Salvati {} grafici ({}) nella cartella {}".format(len(salvati), tipo, opzioni.render))
+        return
 
+    blplt = carica_plot(opzioni)
 
-    #estrazione degli upper limit dalle curve di luce
+    for base_temp in pbl.BASI:
+        selezionati = stati_base(stati, base_temp)
 
-    fbl.agg_upper_limit(data1M_diz)
-    fbl.agg_upper_limit(data2M_diz)
-    fbl.agg_upper_limit(data3M_diz)
-    fbl.agg_upper_limit(data4M_diz)
+        if len(selezionati) != 4 or tipo in ("dinamico", "wwz", "ripiegamento", "gls", "blocchi"):
+            for stato in selezionati:
+                rbl.realizza_grafico(tipo, stato["chiave"], rbl.dati_grafico(stato, tipo), c_grafici, c_secondari,
+                                     max_punti = opzioni.max_punti)
+            continue
 
-    fbl.agg_upper_limit(data1W_diz)
-    fbl.agg_upper_limit(data2W_diz)
-    fbl.agg_upper_limit(data3W_diz)
-    fbl.agg_upper_limit(data4W_diz)
+        stadio = rbl.GRAFICI[tipo][0]
+        diz = [pbl.esegui_stadio(stato, stadio) for stato in selezionati]
 
-    #conversione da array di stringhe ad array di float per i flussi e gli errori
+        if tipo == "curva":
+            blplt.plot_all(*diz, base_temp, c_grafici, c_secondari, max_punti = opzioni.max_punti)
 
-    fbl.converti_to_float(data1M_diz)
-    fbl.converti_to_float(data2M_diz)
-    fbl.converti_to_float(data3M_diz)
-    fbl.converti_to_float(data4M_diz)
+        if tipo == "spettro":
+            blplt.plot_all_pwsp(*diz, base_temp, c_grafici, log = True, interp = True, max_punti = opzioni.max_punti)
 
-    fbl.converti_to_float(data1W_diz)
-    fbl.converti_to_float(data2W_diz)
-    fbl.converti_to_float(data3W_diz)
-    fbl.converti_to_float(data4W_diz)
+        if tipo == "fit":
+            blplt.plot_all_pwsp_fit(*diz, base_temp, c_grafici, c_secondari, interp = True)
 
+        if tipo == "istogramma":
+            blplt.plot_all_hist(*diz, base_temp, c_secondari)
 
-    #conversione da MET a data
 
-    fbl.MET_to_data_diz(data1M_diz)
-    fbl.MET_to_data_diz(data2M_diz)
-    fbl.MET_to_data_diz(data3M_diz)
-    fbl.MET_to_data_diz(data4M_diz)
+def aggiorna(args):
+    """
+    Aggiorna l'archivio delle fonti selezionate con i nuovi bin, stampa l'esito e le tabelle richieste
+    e restituisce gli stati delle fonti ricavati dall'archivio
+    """
+    import modulo_aggiornamento_blazar as abl
 
-    fbl.MET_to_data_diz(data1W_diz)
-    fbl.MET_to_data_diz(data2W_diz)
-    fbl.MET_to_data_diz(data3W_diz)
-    fbl.MET_to_data_diz(data4W_diz)
+    esiti = abl.aggiorna_fonti(args.fonte, args.aggiorna, significatività = args.sint)
 
+    print("\033[95m     Aggiornamento dell'archivio {}   \033[0m".format(args.aggiorna))
+    print("")
+    print("  Fonte | Righe nuove | Aggiornamento | tempo [s]")
+    print(" -------|-------------|---------------|----------")
+    for chiave, esito in esiti.items():
+        righe = "-" if esito["righe"] is None else esito["righe"]
+        print("  {:<6}| {:>11} | {:<13} | {:.3f}".format(chiave, righe, esito["esito"], esito["tempo"]))
+    print("")
 
+    stati = abl.stati_archivio(esiti)
+    risultati = rsbl.raccogli_risultati(stati)
 
-                 ###############################################
-                 #    Plots Flusso di Fotoni vs Tempo (data)   #
-                 ###############################################
+    if args.fit == True:
+        print(rsbl.tabella_fit(risultati))
 
-    c_grafici   = ['rebeccapurple', 'firebrick', 'darkorange', 'deeppink' ]
-    c_secondari = ['forestgreen',"lightseagreen", "darkmagenta",  "darkslateblue"]
+    if args.period == True:
+        print(rsbl.tabella_periodi(risultati))
 
+    if args.sint == True:
+        print(rsbl.tabella_significatività(risultati))
 
-    #plot raggruppati per base temporale (M/W)
-    if args.plotlc == True: 
-        blplt.plot_all(data1M_diz, data2M_diz, data3M_diz, data4M_diz, "M", c_grafici, c_secondari)
-        blplt.plot_all(data1W_diz, data2W_diz, data3W_diz, data4W_diz, "W", c_grafici, c_secondari)
-        sys.exit()
+    return stati
+
+
+def valida_float32(args):
+    """
+    Stampa il confronto dei p-value ottenuti in float32 e in float64 sulle fonti selezionate
+    """
+    import modulo_parallelo_blazar as ppbl
+
+    seme = 0 if args.seme is None else args.seme
+    confronto = ppbl.valida_precisione(args.fonte, seme = seme, n_processi = args.processi)
+
+    print("\033[95m     Validazione della singola precisione (float32) rispetto a float64   \033[0m")
+    print("")
+    print("  Fonte | p-value float64 | p-value float32 |   |Δp|    | errore rel. picchi")
+    print(" -------|-----------------|-----------------|----------|-------------------")
+    for chiave, c in confronto.items():
+        print("  {:<6}| {:.5f}         | {:.5f}         | {:.2e} | {:.2e}".format(chiave, c["p_float64"], c["p_float32"], c["differenza"], c["errore_picchi"]))
+    print("")
+    print(" Massima differenza dei p-value: {:.2e}".format(max(c["differenza"] for c in confronto.values())))
+
+
+def iniezione(args, parametri):
+    """
+    Esegue la campagna di iniezione e recupero sulle fonti selezionate, salva le mappe di efficienza e stampa il riepilogo
+    """
+    import modulo_iniezione_blazar as ibl
+
+    mappe = {}
+    for chiave in args.fonte:
+        stato = pbl.crea_stato(chiave, **parametri)
+        mappe[chiave] = ibl.campagna_iniezione(stato, ibl.griglia_predefinita(stato, *args.griglia), forma = args.forma,
+                                               n_processi = args.processi)
 
+    ibl.salva_mappe(mappe, args.iniezione)
 
+    print(ibl.tabella_efficienza(mappe))
+    print("")
+    print(" Mappe di efficienza salvate in {}".format(args.iniezione))
 
 
+def termina(args, stati):
+    """
+    Esporta i risultati e salva la profilazione, se richiesti
+    """
+
+                                    #######################
+                                    #     Esportazione    #
+                                    #######################
+
+    if args.esporta is not None:
+
+        rsbl.esporta_risultati(rsbl.raccogli_risultati(stati), args.esporta)
+        print(" Risultati salvati in {}".format(args.esporta))
+
+
+                                    #######################
+                                    #     Profilazione    #
+                                    #######################
+
+    if args.profile is not None:
+
+        eventi = pbl.fbl.disattiva_profilo()
+        pbl.fbl.salva_trace_chrome(args.profile, eventi)
+
+        print("")
+        print("\033[95m     Profilazione degli stadi e delle funzioni   \033[0m")
+        print("")
+        print(pbl.fbl.tabella_profilo(eventi))
+        print("")
+        print(" Traccia salvata in {} (chrome://tracing, https://ui.perfetto.dev)".format(args.profile))
+
+
+def main():
+
+    args = parse_arguments()
+
+    if args.profile is not None:
+        pbl.fbl.attiva_profilo()
 
-              ###############################################
-              #    Analisi di Fourier delle curve di Luce   #
-              ###############################################
+    if args.valida_float32 == True:
+        valida_float32(args)
 
-    #interpolazione dei dati 
+    #aggiornamento incrementale dell'archivio: le altre analisi non vengono eseguite
 
-    fbl.interpolazione(data1M_diz)
-    fbl.interpolazione(data2M_diz)
-    fbl.interpolazione(data3M_diz)
-    fbl.interpolazione(data4M_diz)
+    if args.aggiorna is not None:
+        termina(args, aggiorna(args))
+        return
 
-    fbl.interpolazione(data1W_diz)
-    fbl.interpolazione(data2W_diz)
-    fbl.interpolazione(data3W_diz)
-    fbl.interpolazione(data4W_diz)
+    #creazione degli stati delle sole fonti selezionate: gli stadi vengono calcolati solo quando richiesti
 
+    parametri = {"bootstrap" : args.bootstrap, "seme" : args.seme, "sovracampionamento" : args.sovracampionamento,
+                 "affinamento" : args.affinamento}
+    if args.parallelo or args.float32:
+        parametri.update({"motore" : "parallelo", "processi" : args.processi,
+                          "precisione" : "float32" if args.float32 else "float64"})
 
-    #calcolo della trasformata di Fourier per dati originali
+    if args.log_flusso or args.sigma_clip is not None or args.detrend is not None or args.finestra is not None:
+        parametri["preelaborazione"] = {"log" : args.log_flusso, "clip" : args.sigma_clip, "detrend" : args.detrend,
+                                        "grado" : args.grado, "frazione" : args.frazione_loess,
+                                        "finestra" : args.finestra, "alfa" : args.alfa_tukey}
 
-    fbl.fft_diz(data1M_diz)
-    fbl.fft_diz(data2M_diz)
-    fbl.fft_diz(data3M_diz)
-    fbl.fft_diz(data4M_diz)
+    if args.dinamico is not None and len(args.dinamico) > 0:
+        parametri["finestre_gg"] = args.dinamico
 
-    fbl.fft_diz(data1W_diz)
-    fbl.fft_diz(data2W_diz)
-    fbl.fft_diz(data3W_diz)
-    fbl.fft_diz(data4W_diz)
+    if args.wwz is not None:
+        parametri.update({"N_wwz" : args.wwz, "processi" : args.processi})
 
+    if args.ripiegamento is not None:
+        parametri.update({"N_ripiegamento" : args.ripiegamento, "processi" : args.processi})
 
-    #calcolo della trasformata di Fourier per flussi e tempi completi
+    if args.colonne is not None and len(args.colonne) > 0:
+        parametri["colonne"] = args.colonne
 
-    fbl.fft_diz(data1M_diz, interp = True)
-    fbl.fft_diz(data2M_diz, interp = True)
-    fbl.fft_diz(data3M_diz, interp = True)
-    fbl.fft_diz(data4M_diz, interp = True)
+    if args.gls is not None:
+        parametri.update({"N_gls" : args.gls, "upper_limit_gls" : args.upper_limit_gls, "thread" : args.thread})
 
-    fbl.fft_diz(data1W_diz, interp = True)
-    fbl.fft_diz(data2W_diz, interp = True)
-    fbl.fft_diz(data3W_diz, interp = True)
-    fbl.fft_diz(data4W_diz, interp = True)
+    if args.picchi is not None:
+        # con --parallelo i picchi multipli delle curve sintetiche vengono calcolati insieme al picco principale
+        parametri.update({"k_picchi" : args.picchi, "multipli_paralleli" : True})
 
+    if args.blocchi is not None:
+        parametri.update({"p0_blocchi" : args.blocchi, "upper_limit_blocchi" : args.upper_limit_blocchi, "processi" : args.processi})
+
+    stati = {chiave : pbl.crea_stato(chiave, **parametri) for chiave in pbl.FONTI if chiave in args.fonte}
+
+    if args.cadenza is not None:
+        parametri["limiti_ribinning"] = args.limiti
+        settimanali = {}
+
+        # le curve mensili vengono ricavate da quelle settimanali della stessa fonte, che vengono lette una sola volta
+        for chiave in [c for c in stati if pbl.FONTI[c]["base"] == "M"]:
+            chiave_w = chiave[:-1] + "W"
+            if chiave_w not in settimanali:
+                settimanali[chiave_w] = stati.get(chiave_w) or pbl.crea_stato(chiave_w, **parametri)
+
+            stati[chiave] = pbl.crea_stato_derivato(settimanali[chiave_w], chiave, args.cadenza, **parametri)
+
+    if args.iniezione is not None:
+        iniezione(args, parametri)
+
+    c_grafici   = ['rebeccapurple', 'firebrick', 'darkorange', 'deeppink' ]
+    c_secondari = ['forestgreen',"lightseagreen", "darkmagenta",  "darkslateblue"]
+
+
+                 ###############################################
+                 #    Plots Flusso di Fotoni vs Tempo (data)   #
+                 ###############################################
+
+    #plot raggruppati per base temporale (M/W)
+    if args.plotlc == True: 
+        grafici(args, stati, "curva", c_grafici, c_secondari)
 
 
                ############################################
@@ -187,218 +386,156 @@ def main():
     #plot degli spettri di potenza su base mensile e settimanale:
 
     if args.pwsp == True:
-        blplt.plot_all_pwsp(data1M_diz, data2M_diz, data3M_diz, data4M_diz, "M", c_grafici, log = True, interp = True)
-        blplt.plot_all_pwsp(data1W_diz, data2W_diz, data3W_diz, data4W_diz, "W", c_grafici, log = True, interp = True)
-        sys.exit()
-
+        grafici(args, stati, "spettro", c_grafici, c_secondari)
 
 
                       ##############################
                       #  Fit con rumore            #
                       ##############################
 
+    if args.fit == True:
+
+        pbl.esegui(stati, "fit")
+
+        print(rsbl.tabella_fit(rsbl.raccogli_risultati(stati)))
+
+        # plot dei dati + fit:
 
-    #initial guesses per i fit:
+        grafici(args, stati, "fit", c_grafici, c_secondari)
 
-    p0_1M = [1e-9, 0.9]
-    p0_2M = [1e-11,1.2]
-    p0_3M = [1e-8, 1.3]
-    p0_4M = [1e-9, 0.7]
 
-    p0_1W = [1e-8, 0.9]
-    p0_2W = [1e-10,1]
-    p0_3W = [1e-7, 1.3]
-    p0_4W = [1e-6, 0.8]
+                         #############################
+                         #   Periodi e Periodicità   # 
+                         #############################
 
-    #fit:
-    fbl.fit_pwsp(data1M_diz, fbl.fit, p0_1M, interp = True)
-    fbl.fit_pwsp(data2M_diz, fbl.fit, p0_1M, interp = True)
-    fbl.fit_pwsp(data3M_diz, fbl.fit, p0_1M, interp = True)
-    fbl.fit_pwsp(data4M_diz, fbl.fit, p0_1M, interp = True)
+    if args.period == True:
 
-    fbl.fit_pwsp(data1W_diz, fbl.fit, p0_1M, interp = True)
-    fbl.fit_pwsp(data2W_diz, fbl.fit, p0_1M, interp = True)
-    fbl.fit_pwsp(data3W_diz, fbl.fit, p0_1M, interp = True)
-    fbl.fit_pwsp(data4W_diz, fbl.fit, p0_1M, interp = True)
+        pbl.esegui(stati, "incertezza_periodo")
 
+        print(rsbl.tabella_periodi(rsbl.raccogli_risultati(stati)))
 
 
-    if args.fit == True:
-        
-        print("\033[95m     Tabella dei parametri ricavati dal Fit   \033[0m")
-        print("")
-        print("      Sorgente | Parametro  | Valore Parametro | Errore")
-        print("     ----------|------------|------------------|----------------")
-        print("      1M       |     N      | {:.3f}            |+- {:.3e} ".format(data1M_diz["params fit"][0], math.sqrt(data1M_diz["params covariance fit"][0,0])))
-        print("      1M       |    Beta    | {:.3f}            |+- {:.3f} ".format(data1M_diz["params fit"][1], math.sqrt(data1M_diz["params covariance fit"][1,1])))
-        print("     ----------|------------|------------------|----------------")
-        print("      2M       |     N      | {:.3f}            |+- {:.3e} ".format(data2M_diz["params fit"][0], math.sqrt(data2M_diz["params covariance fit"][0,0])))
-        print("      2M       |    Beta    | {:.3f}            |+- {:.3f} ".format(data2M_diz["params fit"][1], math.sqrt(data2M_diz["params covariance fit"][1,1])))
-        print("     ----------|------------|------------------|---------------")
-        print("      3M       |     N      | {:.3f}            |+- {:.3e} ".format(data3M_diz["params fit"][0], math.sqrt(data3M_diz["params covariance fit"][0,0])))
-        print("      3M       |    Beta    | {:.3f}            |+- {:.3f} ".format(data3M_diz["params fit"][1], math.sqrt(data3M_diz["params covariance fit"][1,1])))
-        print("     ----------|------------|------------------|-----------------")
-        print("      4M       |     N      | {:.3f}            |+- {:.3e} ".format(data4M_diz["params fit"][0], math.sqrt(data4M_diz["params covariance fit"][0,0])))
-        print("      4M       |    Beta    | {:.3f}            |+- {:.3f} ".format(data4M_diz["params fit"][1], math.sqrt(data4M_diz["params covariance fit"][1,1])))
-        print("     ----------|------------|------------------|----------------")
-        print("      1W       |     N      | {:.3f}            |+- {:.3e} ".format(data1W_diz["params fit"][0], math.sqrt(data1W_diz["params covariance fit"][0,0])))
-        print("      1W       |    Beta    | {:.3f}            |+- {:.3f} ".format(data1W_diz["params fit"][1], math.sqrt(data1W_diz["params covariance fit"][1,1])))
-        print("     ----------|------------|------------------|----------------")
-        print("      2W       |     N      | {:.3f}            |+- {:.3e} ".format(data2W_diz["params fit"][0], math.sqrt(data2W_diz["params covariance fit"][0,0])))
-        print("      2W       |    Beta    | {:.3f}            |+- {:.3f} ".format(data2W_diz["params fit"][1], math.sqrt(data2W_diz["params covariance fit"][1,1])))
-        print("     ----------|------------|------------------|---------------")
-        print("      3W       |     N      | {:.3f}            |+- {:.3e} ".format(data3W_diz["params fit"][0], math.sqrt(data3W_diz["params covariance fit"][0,0])))
-        print("      3W       |    Beta    | {:.3f}            |+- {:.3f} ".format(data3W_diz["params fit"][1], math.sqrt(data3W_diz["params covariance fit"][1,1])))
-        print("     ----------|------------|------------------|-----------------")
-        print("      4W       |     N      | {:.3f}            |+- {:.3e} ".format(data4W_diz["params fit"][0], math.sqrt(data4W_diz["params covariance fit"][0,0])))
-        print("      4W       |    Beta    | {:.3f}            |+- {:.3f} ".format(data4W_diz["params fit"][1], math.sqrt(data4W_diz["params covariance fit"][1,1])))
+                                    #######################
+                                    #   Significatività   #
+                                    #######################
 
+    if args.sint == True:
 
-        # plot dei dati + fit:
+        pbl.esegui(stati, "significatività")
 
-        blplt.plot_all_pwsp_fit(data1M_diz,data2M_diz, data3M_diz, data4M_diz, "M", c_grafici, c_secondari, interp = True)
-        blplt.plot_all_pwsp_fit(data1W_diz,data2W_diz, data3W_diz, data4W_diz, "W", c_grafici, c_secondari, interp = True)
-        sys.exit()
+        print(rsbl.tabella_significatività(rsbl.raccogli_risultati(stati)))
 
+        grafici(args, stati, "istogramma", c_grafici, c_secondari)
 
+    if args.picchi is not None:
 
+        print(rsbl.tabella_picchi_multipli(pbl.esegui(stati, "picchi_multipli"), pbl.esegui(stati, "significatività_multipli")))
 
-                         #############################
-                         #   Periodi e Periodicità   # 
-                         #############################
 
-    #ricerca dei picchi associati al periodo:
+                             ##########################
+                             #    Spettri dinamici    #
+                             ##########################
 
-    frequenza_taglio = 1e-8
+    if args.dinamico is not None:
+        import modulo_tempo_frequenza_blazar as tfbl
 
-    periodo_1M = fbl.picco_periodo(data1M_diz , frequenza_taglio, interp = True)
-    periodo_2M = fbl.picco_periodo(data2M_diz , frequenza_taglio, interp = True)
-    periodo_3M = fbl.picco_periodo(data3M_diz , frequenza_taglio, interp = True)
-    periodo_4M = fbl.picco_periodo(data4M_diz , frequenza_taglio, interp = True)
+        print(tfbl.tabella_spettri_dinamici(pbl.esegui(stati, "spettro_dinamico")))
 
-    periodo_1W = fbl.picco_periodo(data1W_diz , frequenza_taglio, interp = True)
-    periodo_2W = fbl.picco_periodo(data2W_diz , frequenza_taglio, interp = True)
-    periodo_3W = fbl.picco_periodo(data3W_diz , frequenza_taglio, interp = True)
-    periodo_4W = fbl.picco_periodo(data4W_diz , frequenza_taglio, interp = True)
+        grafici(args, stati, "dinamico", c_grafici, c_secondari)
 
 
-    if args.period == True:
-        
-        print("\033[95m     Tabella delle frequenze e periodi individuati nelle fonti   \033[0m")
-        print("")
-        print(" Fonte e base temporale   | frequenza del picco [Hz] | potenza associata [u.a.] |    periodo[gg]  "  )
-        print("--------------------------|--------------------------|--------------------------|-----------------")
-        print(" Fonte 1, Mensile         |{:.3e}                 |{:.3e}                 |{:.2f}  ".format(periodo_1M[0], np.abs(periodo_1M[1])**2, 1/(periodo_1M[0]*86400) ) )
-        print(" Fonte 1, Settimanale     |{:.3e}                 |{:.3e}                 |{:.2f}  ".format(periodo_1W[0], np.abs(periodo_1W[1])**2, 1/(periodo_1W[0]*86400)) )
-        print("--------------------------|--------------------------|--------------------------|-----------------")
-        print(" Fonte 2, Mensile         |{:.3e}                 |{:.3e}                 |{:.2f}  ".format(periodo_2M[0], np.abs(periodo_2M[1])**2, 1/(periodo_2M[0]*86400)) )
-        print(" Fonte 2, Settimanale     |{:.3e}                 |{:.3e}                 |{:.2f}  ".format(periodo_2W[0], np.abs(periodo_2W[1])**2, 1/(periodo_2W[0]*86400)) )
-        print("--------------------------|--------------------------|--------------------------|-----------------")
-        print(" Fonte 3, Mensile         |{:.3e}                 |{:.3e}                 |{:.2f}  ".format(periodo_3M[0], np.abs(periodo_3M[1])**2, 1/(periodo_3M[0]*86400)) )
-        print(" Fonte 3, Settimanale     |{:.3e}                 |{:.3e}                 |{:.2f}  ".format(periodo_3W[0], np.abs(periodo_3W[1])**2, 1/(periodo_3W[0]*86400)) )
-        print("--------------------------|--------------------------|--------------------------|-----------------")
-        print(" Fonte 4, Mensile         |{:.3e}                 |{:.3e}                 |{:.2f}  ".format(periodo_4M[0], np.abs(periodo_4M[1])**2, 1/(periodo_4M[0]*86400)) )
-        print(" Fonte 4, Settimanale     |{:.3e}                 |{:.3e}                 |{:.2f}  ".format(periodo_4W[0], np.abs(periodo_4W[1])**2, 1/(periodo_4W[0]*86400)) )
-        sys.exit()
 
+                         ###################################
+                         #   Weighted Wavelet Z-transform  #
+                         ###################################
 
+    if args.wwz is not None:
+        import modulo_tempo_frequenza_blazar as tfbl
 
+        trasformate = pbl.esegui(stati, "wwz")
+        valori_p = pbl.esegui(stati, "significatività_wwz") if args.wwz > 0 else None
 
-                              ################################
-                              #   Curve di Luce Sintetiche   #
-                              ################################
+        print(tfbl.tabella_wwz(trasformate, valori_p))
 
+        grafici(args, stati, "wwz", c_grafici, c_secondari)
 
-    N = 10000
 
-    #Generazione delle curve sintetiche: 
 
-    curve_sint_1M = fbl.curve_sintetiche_diz(data1M_diz, N)
-    curve_sint_2M = fbl.curve_sintetiche_diz(data2M_diz, N)
-    curve_sint_3M = fbl.curve_sintetiche_diz(data3M_diz, N)
-    curve_sint_4M = fbl.curve_sintetiche_diz(data4M_diz, N)
+                         ###################################
+                         #      Ripiegamento in fase       #
+                         ###################################
 
+    if args.ripiegamento is not None:
+        import modulo_ripiegamento_blazar as rpbl
 
+        risultati = pbl.esegui(stati, "ripiegamento")
+        valori_p = pbl.esegui(stati, "significatività_ripiegamento") if args.ripiegamento > 0 else None
 
-    curve_sint_1W = fbl.curve_sintetiche_diz(data1W_diz, N)
-    curve_sint_2W = fbl.curve_sintetiche_diz(data2W_diz, N)
-    curve_sint_3W = fbl.curve_sintetiche_diz(data3W_diz, N)
-    curve_sint_4W = fbl.curve_sintetiche_diz(data4W_diz, N)
+        print(rpbl.tabella_ripiegamento(risultati, valori_p))
 
+        grafici(args, stati, "ripiegamento", c_grafici, c_secondari)
 
 
-    #Trasformata di Fourier delle curve sintetiche
 
+                         ###################################
+                         #      Colonne aggiuntive         #
+                         ###################################
 
+    if args.colonne is not None:
+        print(rsbl.tabella_colonne(pbl.esegui(stati, "colonne")))
 
-    fft_sint_1M = fbl.fft_curve_sintetiche_diz(curve_sint_1M)
-    fft_sint_2M = fbl.fft_curve_sintetiche_diz(curve_sint_2M)
-    fft_sint_3M = fbl.fft_curve_sintetiche_diz(curve_sint_3M)
-    fft_sint_4M = fbl.fft_curve_sintetiche_diz(curve_sint_4M)
 
 
+                         ###################################
+                         #   Periodogramma pesato (GLS)    #
+                         ###################################
 
-    fft_sint_1W = fbl.fft_curve_sintetiche_diz(curve_sint_1W)
-    fft_sint_2W = fbl.fft_curve_sintetiche_diz(curve_sint_2W)
-    fft_sint_3W = fbl.fft_curve_sintetiche_diz(curve_sint_3W)
-    fft_sint_4W = fbl.fft_curve_sintetiche_diz(curve_sint_4W)
+    if args.gls is not None:
+        import modulo_periodogramma_blazar as pgbl
 
+        periodogrammi = pbl.esegui(stati, "gls")
+        valori_p = pbl.esegui(stati, "significatività_gls") if args.gls > 0 else None
 
+        print(pgbl.tabella_gls(periodogrammi, valori_p))
 
-                                    #######################
-                                    #   Significatività   #
-                                    #######################
+        grafici(args, stati, "gls", c_grafici, c_secondari)
 
-    # Invidivuazione del picco di periodo per curve sintetiche:
 
-    picchi_sint_1M = fbl.ar_picchi_sintetici(fft_sint_1M, frequenza_taglio)
-    picchi_sint_2M = fbl.ar_picchi_sintetici(fft_sint_2M, frequenza_taglio)
-    picchi_sint_3M = fbl.ar_picchi_sintetici(fft_sint_3M, frequenza_taglio)
-    picchi_sint_4M = fbl.ar_picchi_sintetici(fft_sint_4M, frequenza_taglio)
 
-    picchi_sint_1W = fbl.ar_picchi_sintetici(fft_sint_1W, frequenza_taglio)
-    picchi_sint_2W = fbl.ar_picchi_sintetici(fft_sint_2W, frequenza_taglio)
-    picchi_sint_3W = fbl.ar_picchi_sintetici(fft_sint_3W, frequenza_taglio)
-    picchi_sint_4W = fbl.ar_picchi_sintetici(fft_sint_4W, frequenza_taglio)
+                         ###################################
+                         #      Blocchi bayesiani          #
+                         ###################################
 
+    if args.blocchi is not None:
+        import modulo_blocchi_blazar as bbbl
 
-    #realizzazione degli istogrammi della distribuzione dei massimi delle trasformate delle curve sintetiche
+        # tutte le fonti vengono segmentate insieme nel pool di processi, i risultati diventano lo stadio blocchi degli stati
+        par = next(iter(stati.values()))["parametri"]
+        risultati = bbbl.blocchi_catalogo(pbl.esegui(stati, "float"), par["p0_blocchi"], par["upper_limit_blocchi"],
+                                          n_processi = par["processi"])
+        for chiave, blocchi in risultati.items():
+            stati[chiave]["stadi"]["blocchi"] = blocchi
 
-    n_bins = 100
+        print(bbbl.tabella_blocchi(risultati))
 
+        grafici(args, stati, "blocchi", c_grafici, c_secondari)
 
-    #calcolo dell'area (valore-p )
 
-    pval_1M = fbl.significatività_int(picchi_sint_1M, periodo_1M[1], n_bins)
-    pval_2M = fbl.significatività_int(picchi_sint_2M, periodo_2M[1], n_bins)
-    pval_3M = fbl.significatività_int(picchi_sint_3M, periodo_3M[1], n_bins)
-    pval_4M = fbl.significatività_int(picchi_sint_4M, periodo_4M[1], n_bins)
 
-    pval_1W = fbl.significatività_int(picchi_sint_1W, periodo_1W[1], n_bins)
-    pval_2W = fbl.significatività_int(picchi_sint_2W, periodo_2W[1], n_bins)
-    pval_3W = fbl.significatività_int(picchi_sint_3W, periodo_3W[1], n_bins)
-    pval_4W = fbl.significatività_int(picchi_sint_4W, periodo_4W[1], n_bins)
+                         ###################################
+                         #   Correlazione incrociata       #
+                         ###################################
 
-    if args.sint == True:
+    if args.correlazione is not None:
+        import modulo_correlazione_blazar as cbl
 
-        print("\033[95m  \t                     Tabella della Significatività dei periodi delle Fonti  \033[0m")
-        print(" ")
-        print("\033[4m       Nome Fonte       | Base Temporale | Periodo[gg]  |   p-value  | Significatività [%]  \033[0m")
-       
-        print(" {:<25} Mensile         {:.2f}\t   {:.5f}\t     {:.2f}%  \u00B10.01%      ".format(data1M_diz["nome"],1/(periodo_1M[0]*86400),pval_1M,(1-pval_1M)*100))
-        print(" {:<25} Mensile         {:.2f}\t  <{:.5f}\t    >{:.2f}%  \u00B10.01%      ".format(data2M_diz["nome"],1/(periodo_2M[0]*86400),pval_2M,(1-pval_2M)*100))
-        print(" {:<25} Mensile         {:.2f}\t   {:.5f}\t     {:.2f}%  \u00B10.01%      ".format(data3M_diz["nome"],1/(periodo_3M[0]*86400),pval_3M,(1-pval_3M)*100))
-        print(" {:<25} Mensile         {:.2f}\t   {:.5f}\t     {:.2f}%  \u00B10.01%      ".format(data4M_diz["nome"],1/(periodo_4M[0]*86400),pval_4M,(1-pval_4M)*100))
-        print("-----------------------------------------------------------------------------------------------------")
-        print(" {:<25} Settimanale     {:.2f}\t   {:.5f}\t     {:.2f}%  \u00B10.01%      ".format(data1W_diz["nome"],1/(periodo_1W[0]*86400),pval_1W,(1-pval_1W)*100))
-        print(" {:<25} Settimanale     {:.2f}\t  <{:.5f}\t    >{:.2f}%  \u00B10.01%      ".format(data2W_diz["nome"],1/(periodo_2W[0]*86400),pval_2W,(1-pval_2W)*100))
-        print(" {:<25} Settimanale     {:.2f}\t  <{:.5f}\t    >{:.2f}%  \u00B10.11%      ".format(data3W_diz["nome"],1/(periodo_3W[0]*86400),pval_3W,(1-pval_3W)*100))
-        print(" {:<25} Settimanale     {:.2f}\t  <{:.5f}\t    >{:.2f}%  \u00B10.01%      ".format(data4W_diz["nome"],1/(periodo_4W[0]*86400),pval_4W,(1-pval_4W)*100))
+        risultati = cbl.correlazioni(pbl.esegui(stati, "interpolazione"), args.correlazione, args.ritardo_max,
+                                     n_bins = pbl.PARAMETRI["n_bins"], seme = args.seme, n_processi = args.processi)
 
+        print(cbl.tabella_correlazioni(risultati))
 
-        blplt.plot_all_hist(picchi_sint_1M, picchi_sint_2M, picchi_sint_3M, picchi_sint_4M, periodo_1M[1], periodo_2M[1], periodo_3M[1], periodo_4M[1], "M", c_secondari, n_bins)
-        blplt.plot_all_hist(picchi_sint_1W, picchi_sint_2W, picchi_sint_3W, picchi_sint_4W, periodo_1W[1], periodo_2W[1], periodo_3W[1], periodo_4W[1], "W", c_secondari, n_bins)
 
+    termina(args, stati)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,433 @@
+"""
+Servizio locale per l'analisi della periodicità dei Blazar
+
+Autore: Valenti Alessandra
+
+
+Il servizio (asyncio, senza dipendenze esterne) mantiene in memoria gli stati delle fonti (curve interpolate,
+spettri e fit) e le distribuzioni nulle dei picchi delle curve sintetiche, in modo da rispondere alle interrogazioni
+senza rileggere i file CSV e senza rigenerare le curve sintetiche. Per ogni fonte la distribuzione nulla viene
+memorizzata per tutte le frequenze di taglio (vedi modulo_funzioni_blazar.picchi_sintetici_tagli()), per cui il
+valore-p può essere calcolato per una qualsiasi frequenza di taglio in pochi millisecondi.
+La generazione delle curve sintetiche viene eseguita in un pool di processi, senza bloccare le altre interrogazioni;
+gli stadi delle fonti (lettura dei file, interpolazione, spettro e fit) vengono calcolati in un thread separato, uno alla volta,
+per cui anche il primo /fit di una fonte non blocca le risposte alle altre connessioni.
+Stati e distribuzioni nulle vengono scartati quando viene superato il numero massimo indicato, a partire da quelli
+utilizzati meno di recente.
+
+Il servizio risponde a richieste HTTP GET (su TCP o su socket Unix) con risultati in formato JSON:
+     - /fonti ............................................ catalogo delle fonti e fonti in memoria
+     - /periodo?fonte=4W&f_taglio=1e-8 ................... picco e periodo sopra la frequenza di taglio
+     - /fit?fonte=4W ..................................... parametri del fit dello spettro di potenza
+     - /significativita?fonte=4W&f_taglio=1e-8 ........... valore-p e significatività del picco
+                                                           (opzionali: n_bins, attendi=0 per non attendere le curve sintetiche)
+     - /stato ............................................ contenuto della memoria e calcoli in corso
+
+Esempio:
+     python3 servizio_blazar.py --porta 8765 --precarica 1M 4W
+     curl "http://127.0.0.1:8765/significativita?fonte=4W&f_taglio=2e-8"
+
+"""
+import modulo_pipeline_blazar as pbl
+import modulo_funzioni_blazar as fbl
+import modulo_risultati_blazar as rsbl
+import argparse
+import asyncio
+import json, math, time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+
+
+CODICI = {200 : "OK", 202 : "Accepted", 400 : "Bad Request", 404 : "Not Found", 405 : "Method Not Allowed", 500 : "Internal Server Error"}
+
+
+                                      ###########################################
+                                      #     Memoria degli stati e dei nulli     #
+                                      ###########################################
+
+def crea_servizio(max_fonti = 8, max_nulli = 4, n_processi = None, **parametri):
+    """
+    Funzione che crea il dizionario con lo stato del servizio
+
+    Parametri:
+    -------------
+    max_fonti (int)  : numero massimo di stati delle fonti mantenuti in memoria
+    max_nulli (int)  : numero massimo di distribuzioni nulle mantenute in memoria (ognuna occupa
+                       8 * (N + 1) * n_frequenze byte, circa 34 MB per una fonte settimanale con N = 10000)
+    n_processi (int) : numero di processi del pool per le curve sintetiche (default: numero di CPU)
+    **parametri      : parametri dell'analisi che sostituiscono quelli di modulo_pipeline_blazar.PARAMETRI
+
+    Restituisce:
+    -------------
+    servizio (dictionary) : con le chiavi ["stati"] e ["nulli"] (OrderedDict dal meno al più recente),
+                            ["lavori"] (calcoli in corso), ["pool"], ["calcoli"] (thread degli stadi delle fonti),
+                            ["parametri"], ["max_fonti"], ["max_nulli"]
+
+    """
+    par = dict(pbl.PARAMETRI)
+    par.update(parametri)
+
+    servizio = {
+        "stati"     : OrderedDict(),
+        "nulli"     : OrderedDict(),
+        "lavori"    : {},
+        "pool"      : ProcessPoolExecutor(max_workers = n_processi),
+        "calcoli"   : ThreadPoolExecutor(max_workers = 1),
+        "parametri" : par,
+        "max_fonti" : max_fonti,
+        "max_nulli" : max_nulli,
+    }
+
+    return servizio
+
+#------------------------------------------------------------------------------------------------------------
+
+def _recente(memoria, chiave, valore, massimo):
+    # inserisce (o aggiorna) un elemento come il più recente e scarta i meno recenti oltre il massimo
+    memoria[chiave] = valore
+    memoria.move_to_end(chiave)
+
+    while len(memoria) > massimo:
+        memoria.popitem(last = False)
+
+
+def stato_fonte(servizio, chiave):
+    """
+    Funzione che restituisce lo stato di una fonte, creandolo se non è in memoria
+    """
+    if chiave in servizio["stati"]:
+        stato = servizio["stati"][chiave]
+    else:
+        stato = pbl.crea_stato(chiave, **servizio["parametri"])
+
+    _recente(servizio["stati"], chiave, stato, servizio["max_fonti"])
+
+    return stato
+
+
+async def esegui_stadio(servizio, chiave, nome):
+    """
+    Funzione che restituisce uno stadio di una fonte; se non è già stato calcolato viene calcolato nel thread degli stadi,
+    senza bloccare il ciclo degli eventi
+
+    Note:
+    -------------
+    - il thread è unico, per cui due interrogazioni sulla stessa fonte non calcolano mai lo stesso stadio contemporaneamente
+      (la seconda attende la prima e trova lo stadio già memorizzato)
+
+    """
+    stato = stato_fonte(servizio, chiave)
+
+    if nome in stato["stadi"]:
+        return stato["stadi"][nome]
+
+    loop = asyncio.get_running_loop()
+
+    return await loop.run_in_executor(servizio["calcoli"], pbl.esegui_stadio, stato, nome)
+
+#------------------------------------------------------------------------------------------------------------
+
+def _calcola_nullo(chiave, parametri):
+    # eseguita nei processi del pool: genera le curve sintetiche e restituisce solo la tabella dei picchi per ogni taglio
+    stato = pbl.crea_stato(chiave, **parametri)
+
+    return fbl.picchi_sintetici_tagli(pbl.esegui_stadio(stato, "fft_sintetiche"))
+
+
+async def _esegui_nullo(servizio, chiave):
+    loop = asyncio.get_running_loop()
+
+    try:
+        tagli = await loop.run_in_executor(servizio["pool"], _calcola_nullo, chiave, servizio["parametri"])
+        _recente(servizio["nulli"], chiave, tagli, servizio["max_nulli"])
+    finally:
+        del servizio["lavori"][chiave]
+
+    return tagli
+
+
+def avvia_nullo(servizio, chiave):
+    """
+    Funzione che avvia in background il calcolo della distribuzione nulla di una fonte (se non è già in corso)
+    e restituisce il task corrispondente
+    """
+    if chiave not in servizio["lavori"]:
+        servizio["lavori"][chiave] = asyncio.ensure_future(_esegui_nullo(servizio, chiave))
+
+    return servizio["lavori"][chiave]
+
+
+                                      ###########################################
+                                      #              Interrogazioni             #
+                                      ###########################################
+
+def _fonte(query):
+    chiave = query.get("fonte")
+    if chiave not in pbl.FONTI:
+        raise KeyError("Fonte {} non presente nel catalogo, le fonti disponibili sono: {}".format(chiave, ", ".join(pbl.FONTI)))
+
+    return chiave
+
+
+def _numero(query, nome, tipo, predefinito, minimo = None):
+    # valore numerico di un parametro dell'interrogazione, con un messaggio chiaro se non è valido
+    testo = query.get(nome)
+    if testo is None:
+        return predefinito
+
+    descrizione = "un intero" if tipo is int else "un numero"
+    if minimo is not None:
+        descrizione += " maggiore di {}".format(minimo)
+
+    try:
+        valore = tipo(testo)
+    except ValueError:
+        valore = None
+
+    if valore is None or not math.isfinite(valore) or (minimo is not None and valore <= minimo):
+        raise ValueError("Il parametro {} deve essere {} (valore ricevuto: {})".format(nome, descrizione, testo))
+
+    return valore
+
+
+async def _periodo(servizio, chiave, f_taglio):
+    # picco dello spettro interpolato sopra la frequenza di taglio
+    diz  = await esegui_stadio(servizio, chiave, "fft_interp")
+    freq = diz["frequenza interp"]
+
+    if not f_taglio < freq[len(freq)//2 - 1]:
+        raise ValueError("La frequenza di taglio deve essere minore di {:.3e} Hz".format(freq[len(freq)//2 - 1]))
+
+    return fbl.picco_periodo(diz, f_taglio, interp = True)
+
+#------------------------------------------------------------------------------------------------------------
+
+def interroga_fonti(servizio, query):
+    return 200, {
+        "fonti"     : {chiave : {"nome" : fonte["nome"], "base" : pbl.BASI[fonte["base"]]} for chiave, fonte in pbl.FONTI.items()},
+        "in_memoria" : list(servizio["stati"]),
+        "nulli"     : list(servizio["nulli"]),
+    }
+
+
+async def interroga_periodo(servizio, query):
+    chiave   = _fonte(query)
+    f_taglio = _numero(query, "f_taglio", float, servizio["parametri"]["frequenza_taglio"], minimo = 0)
+    freq, ck = await _periodo(servizio, chiave, f_taglio)
+
+    return 200, {
+        "chiave"          : chiave,
+        "f_taglio"        : f_taglio,
+        "frequenza_picco" : float(freq),
+        "potenza_picco"   : float(abs(ck)**2),
+        "periodo_gg"      : 1/(freq*86400),
+    }
+
+
+async def interroga_fit(servizio, query):
+    chiave = _fonte(query)
+    diz    = await esegui_stadio(servizio, chiave, "fit")
+    par, cov = diz["params fit"], diz["params covariance fit"]
+
+    return 200, {
+        "chiave"          : chiave,
+        "N_fit"           : float(par[0]),
+        "errore_N_fit"    : math.sqrt(cov[0,0]),
+        "beta_fit"        : float(par[1]),
+        "errore_beta_fit" : math.sqrt(cov[1,1]),
+    }
+
+
+async def interroga_significatività(servizio, query):
+    chiave   = _fonte(query)
+    f_taglio = _numero(query, "f_taglio", float, servizio["parametri"]["frequenza_taglio"], minimo = 0)
+    n_bins   = _numero(query, "n_bins", int, servizio["parametri"]["n_bins"], minimo = 0)
+    attendi  = query.get("attendi", "1") != "0"
+
+    freq, ck = await _periodo(servizio, chiave, f_taglio)
+
+    if chiave in servizio["nulli"]:
+        tagli = servizio["nulli"][chiave]
+        servizio["nulli"].move_to_end(chiave)
+    else:
+        lavoro = avvia_nullo(servizio, chiave)
+        if not attendi:
+            return 202, {"chiave" : chiave, "stato" : "curve sintetiche in calcolo"}
+        # shield: se il client si disconnette il calcolo prosegue comunque
+        tagli = await asyncio.shield(lavoro)
+
+    ist = fbl.istogramma_significatività(fbl.picchi_sintetici_taglio(tagli, f_taglio), ck, n_bins)
+    p   = float(fbl.valore_p_istogramma(ist))
+    n   = ist["n_realizzazioni"]
+
+    limite = p == 1/math.sqrt(n)
+
+    return 200, {
+        "chiave"          : chiave,
+        "f_taglio"        : f_taglio,
+        "periodo_gg"      : 1/(freq*86400),
+        "p_value"         : p,
+        "errore_p_value"  : None if limite else math.sqrt(p*(1 - p)/n),
+        "limite_p_value"  : limite,
+        "sigma"           : rsbl.sigma_gaussiana(p),
+        "n_realizzazioni" : n,
+    }
+
+
+def interroga_stato(servizio, query):
+    return 200, {
+        "stati"     : {chiave : list(stato["stadi"]) for chiave, stato in servizio["stati"].items()},
+        "nulli"     : {chiave : list(tagli["picchi"].shape) for chiave, tagli in servizio["nulli"].items()},
+        "lavori"    : list(servizio["lavori"]),
+        "parametri" : servizio["parametri"],
+    }
+
+
+# percorso : funzione che risponde all'interrogazione (restituisce codice HTTP e dizionario della risposta)
+
+INTERROGAZIONI = {
+    "/fonti"            : interroga_fonti,
+    "/periodo"          : interroga_periodo,
+    "/fit"              : interroga_fit,
+    "/significativita"  : interroga_significatività,
+    "/stato"            : interroga_stato,
+}
+
+
+                                      ###########################################
+                                      #               Server HTTP               #
+                                      ###########################################
+
+async def rispondi(servizio, metodo, percorso):
+    """
+    Funzione che risponde ad una richiesta, restituendo il codice HTTP e il dizionario della risposta
+    (con la chiave ["latenza_ms"] con il tempo impiegato o la chiave ["errore"] in caso di errore)
+    """
+    t_0 = time.perf_counter()
+
+    url   = urlsplit(percorso)
+    query = {nome : valori[-1] for nome, valori in parse_qs(url.query).items()}
+
+    if metodo != "GET":
+        return 405, {"errore" : "Metodo {} non supportato, utilizzare GET".format(metodo)}
+
+    if url.path not in INTERROGAZIONI:
+        return 404, {"errore" : "Percorso {} non disponibile, i percorsi disponibili sono: {}".format(url.path, ", ".join(INTERROGAZIONI))}
+
+    try:
+        risposta = INTERROGAZIONI[url.path](servizio, query)
+        if asyncio.iscoroutine(risposta):
+            risposta = await risposta
+        codice, corpo = risposta
+    except KeyError as errore:
+        return 404, {"errore" : errore.args[0]}
+    except ValueError as errore:
+        return 400, {"errore" : str(errore)}
+
+    corpo["latenza_ms"] = (time.perf_counter() - t_0)*1e3
+
+    return codice, corpo
+
+#------------------------------------------------------------------------------------------------------------
+
+async def gestisci_connessione(servizio, reader, writer):
+    """
+    Funzione che gestisce una connessione: legge una richiesta HTTP, scrive la risposta JSON e chiude la connessione
+    """
+    try:
+        riga = (await reader.readline()).decode("latin-1").split()
+
+        while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+            pass
+
+        if len(riga) < 2:
+            codice, corpo = 400, {"errore" : "Richiesta non valida"}
+        else:
+            codice, corpo = await rispondi(servizio, riga[0], riga[1])
+
+    except Exception as errore:
+        codice, corpo = 500, {"errore" : "{}: {}".format(type(errore).__name__, errore)}
+
+    dati = json.dumps(corpo, ensure_ascii = False).encode("utf-8")
+    intestazione = "HTTP/1.1 {} {}\r\nContent-Type: application/json; charset=utf-8\r\nContent-Length: {}\r\nConnection: close\r\n\r\n"
+
+    try:
+        writer.write(intestazione.format(codice, CODICI[codice], len(dati)).encode("latin-1") + dati)
+        await writer.drain()
+    finally:
+        writer.close()
+
+#------------------------------------------------------------------------------------------------------------
+
+async def avvia_servizio(servizio, host = "127.0.0.1", porta = 8765, socket = None, precarica = ()):
+    """
+    Funzione che avvia il servizio su TCP (host, porta) o su socket Unix e lo mantiene attivo
+
+    Parametri:
+    -------------
+    servizio (dictionary) : creato con crea_servizio()
+    host, porta           : indirizzo TCP su cui rispondere (di default solo la macchina locale)
+    socket (string)       : se indicato il servizio risponde sul socket Unix invece che su TCP
+    precarica (list)      : fonti per cui calcolare subito in background stati e distribuzioni nulle
+
+    """
+    def connessione(reader, writer):
+        return gestisci_connessione(servizio, reader, writer)
+
+    if socket is not None:
+        server = await asyncio.start_unix_server(connessione, path = socket)
+        indirizzo = socket
+    else:
+        server = await asyncio.start_server(connessione, host = host, port = porta)
+        indirizzo = "http://{}:{}".format(host, porta)
+
+    for chiave in precarica:
+        asyncio.ensure_future(esegui_stadio(servizio, chiave, "fft_interp"))
+        avvia_nullo(servizio, chiave)
+
+    print("Servizio attivo su {} (Ctrl+C per terminare)".format(indirizzo), flush = True)
+
+    async with server:
+        await server.serve_forever()
+
+
+#############################################
+# Funzione per la gestione delle opzioni    #
+#############################################
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description = 'Servizio locale per lo studio della periodicità dei Blazar')
+
+    parser.add_argument('--host'     , default='127.0.0.1', help='Indirizzo su cui rispondere (default: 127.0.0.1)')
+    parser.add_argument('--porta'    , type=int, default=8765, help='Porta TCP (default: 8765)')
+    parser.add_argument('--socket'   , metavar='PERCORSO', help='Risponde sul socket Unix indicato invece che su TCP')
+    parser.add_argument('--max-fonti', type=int, default=8, help='Numero massimo di fonti mantenute in memoria')
+    parser.add_argument('--max-nulli', type=int, default=4, help='Numero massimo di distribuzioni nulle mantenute in memoria')
+    parser.add_argument('--processi' , type=int, default=None, help='Processi per il calcolo delle curve sintetiche (default: numero di CPU)')
+    parser.add_argument('--N'        , type=int, default=pbl.PARAMETRI["N"], help='Numero di curve sintetiche per fonte')
+    parser.add_argument('--precarica', nargs='+', choices=list(pbl.FONTI), default=[], metavar='FONTE',
+                        help='Fonti da caricare all\'avvio, con le distribuzioni nulle calcolate in background')
+
+    return parser.parse_args()
+
+
+def main():
+
+    args = parse_arguments()
+
+    servizio = crea_servizio(args.max_fonti, args.max_nulli, args.processi, N = args.N)
+
+    try:
+        asyncio.run(avvia_servizio(servizio, args.host, args.porta, args.socket, args.precarica))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servizio["pool"].shutdown(cancel_futures = True)
+        servizio["calcoli"].shutdown(cancel_futures = True)
+
+
+
+if __name__ == "__main__":
+
+    main()
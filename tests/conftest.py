@@ -0,0 +1,8 @@
+"""
+Configurazione dei test: i moduli del programma si trovano nella cartella principale del repository
+"""
+import os, sys
+
+CARTELLA = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, CARTELLA)
@@ -0,0 +1,64 @@
+"""
+Test dell'aggiornamento incrementale (modulo_aggiornamento_blazar): l'archivio esteso con le righe nuove deve
+coincidere con l'analisi completa del file intero
+"""
+import modulo_aggiornamento_blazar as abl
+import modulo_pipeline_blazar as pbl
+import numpy as np
+import os, shutil
+import pytest
+
+from conftest import CARTELLA
+
+
+def _tronca(sorgente, destinazione, righe):
+    # copia del file CSV senza le ultime righe
+    with open(sorgente) as f:
+        testo = f.readlines()
+
+    with open(destinazione, "w") as f:
+        f.writelines(testo[:len(testo) - righe])
+
+
+@pytest.mark.parametrize("chiave, righe", [("1M", 4), ("4W", 20)])
+def test_aggiornamento_come_analisi_completa(tmp_path, chiave, righe):
+    nome_file = pbl.FONTI[chiave]["file"]
+    dati, archivio = tmp_path / "dati", tmp_path / "archivio"
+    dati.mkdir()
+
+    _tronca(os.path.join(CARTELLA, nome_file), dati / nome_file, righe)
+    esiti = abl.aggiorna_fonti([chiave], str(archivio), cartella = str(dati))
+    assert esiti[chiave]["esito"] == "completa"
+
+    shutil.copy(os.path.join(CARTELLA, nome_file), dati / nome_file)
+    esiti = abl.aggiorna_fonti([chiave], str(archivio), cartella = str(dati))
+    assert esiti[chiave]["esito"] == "incrementale"
+    assert esiti[chiave]["righe"] == righe
+
+    stato = pbl.crea_stato(chiave, cartella = str(dati))
+    completa = abl.archivio_da_stato({**stato, "stadi" : {"fft_interp" : pbl.esegui_stadio(stato, "fit"),
+                                                          "periodo"    : pbl.esegui_stadio(stato, "periodo")}})
+
+    incrementale = abl.carica_archivio(str(archivio), chiave)
+    assert incrementale["aggiornamenti"] == 1
+
+    for nome in ("tempo", "flusso", "flussi completi", "griglia", "ck_griglia", "periodo"):
+        np.testing.assert_allclose(incrementale[nome], completa[nome], rtol = 1e-12)
+    np.testing.assert_allclose(incrementale["params fit"], completa["params fit"], rtol = 1e-6)
+
+
+def test_aggiornamenti_oltre_il_massimo(tmp_path):
+    chiave = "1M"
+    nome_file = pbl.FONTI[chiave]["file"]
+    dati, archivio = tmp_path / "dati", tmp_path / "archivio"
+    dati.mkdir()
+
+    _tronca(os.path.join(CARTELLA, nome_file), dati / nome_file, 2)
+    abl.aggiorna_fonti([chiave], str(archivio), cartella = str(dati))
+
+    # con max_aggiornamenti = 0 il file viene sempre riletto completamente
+    shutil.copy(os.path.join(CARTELLA, nome_file), dati / nome_file)
+    esiti = abl.aggiorna_fonti([chiave], str(archivio), cartella = str(dati), max_aggiornamenti = 0)
+
+    assert esiti[chiave]["esito"] == "completa"
+    assert esiti[chiave]["archivio"]["aggiornamenti"] == 0
@@ -0,0 +1,62 @@
+"""
+Test dei blocchi bayesiani (modulo_blocchi_blazar): la potatura PELT non deve cambiare la segmentazione ottimale
+"""
+import modulo_blocchi_blazar as bbl
+import numpy as np
+import pytest
+
+
+def _curva_a_gradini(seme, n = 300):
+    # curva a tratti costanti con errori diversi per ogni misura e tempi irregolari
+    rng = np.random.default_rng(seme)
+
+    tempo  = np.sort(rng.uniform(0, 1e8, n))
+    livelli = rng.choice([1.0, 3.0, 6.0], size = 6)
+    flusso = livelli[np.minimum((tempo/1e8*6).astype(int), 5)]
+    errore = rng.uniform(0.3, 1.0, n)
+
+    return tempo, flusso + errore*rng.standard_normal(n), 1/errore**2
+
+
+def _blocchi_riferimento(flusso, pesi, ncp_prior):
+    # programmazione dinamica senza vettorizzazione (Scargle et al. 2013, algoritmo 1)
+    n = len(flusso)
+    best, ultimo = np.zeros(n + 1), np.zeros(n, dtype = int)
+
+    for R in range(n):
+        valori = []
+        for r in range(R + 1):
+            a = np.sum(pesi[r:R + 1])/2
+            b = np.sum(flusso[r:R + 1]*pesi[r:R + 1])
+            valori.append(best[r] + b**2/(4*a) - ncp_prior)
+        ultimo[R] = int(np.argmax(valori))
+        best[R + 1] = valori[ultimo[R]]
+
+    inizi, R = [], n
+    while R > 0:
+        R = ultimo[R - 1]
+        inizi.append(R)
+
+    return np.array(inizi[::-1])
+
+
+@pytest.mark.parametrize("seme", range(5))
+def test_potatura_come_senza_potatura(seme):
+    tempo, flusso, pesi = _curva_a_gradini(seme)
+
+    potati = bbl.blocchi_bayesiani(tempo, flusso, pesi, potatura = True)
+    completi = bbl.blocchi_bayesiani(tempo, flusso, pesi, potatura = False)
+
+    np.testing.assert_array_equal(potati["inizi"], completi["inizi"])
+    np.testing.assert_allclose(potati["flussi"], completi["flussi"])
+    assert completi["valutazioni"] == len(tempo)*(len(tempo) + 1)//2
+    assert potati["valutazioni"] < completi["valutazioni"]
+
+
+def test_riferimento():
+    tempo, flusso, pesi = _curva_a_gradini(7, n = 120)
+
+    blocchi = bbl.blocchi_bayesiani(tempo, flusso, pesi)
+
+    np.testing.assert_array_equal(blocchi["inizi"], _blocchi_riferimento(flusso, pesi, bbl.prior_punti(len(tempo))))
+    assert 2 <= blocchi["n_blocchi"] <= 12
@@ -0,0 +1,67 @@
+"""
+Test della correlazione incrociata (modulo_correlazione_blazar): ritardo di una copia traslata della curva e DCF
+confrontata con la definizione sulle coppie di misure
+"""
+import modulo_correlazione_blazar as cbl
+import modulo_funzioni_blazar as fbl
+import numpy as np
+import pytest
+
+
+GIORNO = 86400
+
+
+def _curva(tempo, seme = 0):
+    # rumore rosso (passeggiata aleatoria) campionato ai tempi indicati
+    rng = np.random.default_rng(seme)
+    flusso = 10 + np.cumsum(rng.normal(0, 1, len(tempo)))
+
+    return {"tempo" : tempo, "flusso" : flusso, "flusso_err" : np.full(len(tempo), 0.1)}
+
+
+def _coppia_traslata(ritardo_gg, n = 500, seme = 0):
+    # curva a con buchi e curva b uguale ad a ritardata di ritardo_gg giorni
+    rng = np.random.default_rng(seme)
+    tempo = np.arange(n)*7*GIORNO
+    tempo = tempo[rng.random(n) > 0.1].astype(float)
+
+    a = _curva(tempo, seme)
+    b = dict(a, tempo = a["tempo"] + ritardo_gg*GIORNO)
+
+    for diz in (a, b):
+        fbl.interpolazione(diz)
+
+    return a, b
+
+
+@pytest.mark.parametrize("metodo", cbl.METODI)
+def test_ritardo_copia_traslata(metodo):
+    ritardo_gg = 70
+    a, b = _coppia_traslata(ritardo_gg)
+
+    risultato = cbl.correlazione_coppia(a, b, metodo = metodo, ritardo_max = 365*GIORNO, n_ritardi = 51, N = 0)
+    passo = np.median(np.diff(risultato["ritardi"]))
+
+    assert risultato["picco"][1] > 0.9
+    assert abs(risultato["picco"][0] - ritardo_gg*GIORNO) <= passo
+
+
+def test_dcf_come_definizione():
+    a, b = _coppia_traslata(35, n = 120)
+    b = dict(b, flusso = b["flusso"] + np.random.default_rng(5).normal(0, 1, len(b["flusso"])))
+    ritardo_max, n_ritardi = 200*GIORNO, 9
+
+    risultato = cbl.correlazione_coppia(a, b, metodo = "dcf", ritardo_max = ritardo_max, n_ritardi = n_ritardi, N = 0, n_min = 1)
+
+    # UDCF di tutte le coppie di misure, mediata nei bin di ritardo
+    ma, mb = np.mean(a["flusso"]), np.mean(b["flusso"])
+    va = np.var(a["flusso"], ddof = 1) - np.mean(a["flusso_err"]**2)
+    vb = np.var(b["flusso"], ddof = 1) - np.mean(b["flusso_err"]**2)
+    udcf = np.outer(a["flusso"] - ma, b["flusso"] - mb)/np.sqrt(va*vb)
+    ritardi = b["tempo"][None, :] - a["tempo"][:, None]
+
+    bordi = np.linspace(-ritardo_max, ritardo_max, n_ritardi + 1)
+    for k in range(n_ritardi):
+        coppie = (ritardi >= bordi[k]) & (ritardi < bordi[k + 1])
+        np.testing.assert_allclose(risultato["correlazione"][k], np.mean(udcf[coppie]), rtol = 1e-9)
+        np.testing.assert_allclose(risultato["ritardi"][k], np.mean(ritardi[coppie]), rtol = 1e-9)
@@ -0,0 +1,48 @@
+"""
+Test della scelta del picco delle curve iniettate (modulo_iniezione_blazar e picco_potenza_blocco)
+"""
+import modulo_funzioni_blazar as fbl
+import modulo_iniezione_blazar as ibl
+import modulo_parallelo_blazar as ppbl
+import numpy as np
+from scipy import fft
+
+
+F_TAGLIO = 1e-8
+
+
+def _curva(n = 520, seme = 0):
+    # rumore rosso settimanale, dieci anni
+    rng = np.random.default_rng(seme)
+    tempo = np.arange(n)*7*86400.0
+
+    return 5 + np.cumsum(rng.normal(0, 0.2, n)), tempo
+
+
+def test_picco_indipendente_dalla_fase():
+    flusso, tempo = _curva()
+    freq = fft.fftfreq(len(flusso), d = 7*86400)
+
+    periodo = 1/freq[30]
+    fasi = 2*np.pi*np.arange(8)/8
+    curve = ibl.inietta_segnali(flusso, tempo, np.full(8, periodo), np.full(8, 0.5), fasi)
+
+    f_picchi, ck_picchi = fbl.picco_potenza_blocco(curve, freq, F_TAGLIO)
+
+    # il segnale viene recuperato per tutte le fasi, ed è il primo dei picchi multipli
+    np.testing.assert_allclose(f_picchi, freq[30])
+    f_multipli, ck_multipli = fbl.picchi_multipli(fft.rfft(curve, axis = 1), freq, F_TAGLIO, 1)
+    np.testing.assert_array_equal(f_picchi, f_multipli[:, 0])
+    np.testing.assert_allclose(np.abs(ck_picchi), np.abs(ck_multipli[:, 0]))
+
+
+def test_distribuzione_nulla_per_potenza():
+    flusso, _ = _curva()
+    freq = fft.fftfreq(len(flusso), d = 7*86400)
+
+    # i picchi sintetici con potenza = True sono i massimi di |C_k|^2 delle stesse curve sintetiche
+    picchi = ppbl.picchi_sintetici_paralleli(flusso, freq, 100, F_TAGLIO, n_processi = 1, seme = 2, potenza = True)
+    curve = fbl.curve_sintetiche_blocco(flusso, 100, np.random.SeedSequence(2).spawn(1)[0])
+
+    np.testing.assert_array_equal(picchi, fbl.picco_potenza_blocco(curve, freq, F_TAGLIO)[1])
+    assert np.all(np.abs(picchi) >= np.abs(ppbl.picchi_sintetici_paralleli(flusso, freq, 100, F_TAGLIO, n_processi = 1, seme = 2)))
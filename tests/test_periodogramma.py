@@ -0,0 +1,70 @@
+"""
+Test del periodogramma di Lomb-Scargle generalizzato pesato (modulo_periodogramma_blazar)
+"""
+import modulo_periodogramma_blazar as pgbl
+import numpy as np
+from scipy import stats
+
+
+GIORNO = 86400
+
+
+def _curva_eteroschedastica(n = 200, seme = 0):
+    # rumore bianco con errori diversi per ogni misura e flusso correlato con l'errore, tempi settimanali con buchi
+    rng = np.random.default_rng(seme)
+
+    tempo  = np.sort(rng.choice(2*n, n, replace = False))*7.0*GIORNO
+    errore = rng.lognormal(0, 0.7, n)
+    flusso = 3*errore + errore*rng.standard_normal(n)
+
+    return tempo, flusso, 1/errore**2
+
+
+def test_minimi_quadrati_pesati():
+    tempo, flusso, pesi = _curva_eteroschedastica()
+    frequenze = pgbl.griglia_frequenze(tempo)
+
+    periodogramma = pgbl.periodogramma_gls(tempo, flusso, pesi, frequenze, memoria_max = 1e5)
+
+    # riduzione del chi^2 pesato del modello a + b cos + c sin rispetto alla sola costante
+    media = np.sum(pesi*flusso)/np.sum(pesi)
+    chi2_costante = np.sum(pesi*(flusso - media)**2)
+
+    # esclusa la frequenza di Nyquist, dove con tempi multipli del passo sin = 0 e il modello è degenere
+    for i in (0, 7, len(frequenze)//2, len(frequenze) - 2):
+        fase = 2*np.pi*frequenze[i]*(tempo - tempo[0])
+        A = np.column_stack([np.ones_like(tempo), np.cos(fase), np.sin(fase)])
+        coeff = np.linalg.lstsq(A*np.sqrt(pesi)[:, None], flusso*np.sqrt(pesi), rcond = None)[0]
+        chi2 = np.sum(pesi*(flusso - A @ coeff)**2)
+
+        np.testing.assert_allclose(periodogramma["potenza"][i], 1 - chi2/chi2_costante, rtol = 1e-8, atol = 1e-12)
+
+
+def test_sintetiche_permutano_le_coppie():
+    tempo, flusso, pesi = _curva_eteroschedastica(n = 80)
+    frequenze = pgbl.griglia_frequenze(tempo)
+
+    picchi = pgbl.picchi_gls_sintetici(tempo, flusso, pesi, frequenze, 5, seme = 3, memoria_max = 1e5)
+
+    # con N <= dimensione_blocco c'è un solo blocco, con il primo seme derivato
+    rng = np.random.default_rng(np.random.SeedSequence(3).spawn(1)[0])
+    indici = rng.permuted(np.broadcast_to(np.arange(len(tempo)), (5, len(tempo))), axis = 1)
+
+    for picco, permutazione in zip(picchi, indici):
+        atteso = pgbl.periodogramma_gls(tempo, flusso[permutazione], pesi[permutazione], frequenze)["picco"][1]
+        np.testing.assert_allclose(picco, atteso, rtol = 1e-9)
+
+
+def test_valori_p_uniformi_rumore_bianco():
+    valori_p = []
+
+    for seme in range(150):
+        tempo, flusso, pesi = _curva_eteroschedastica(n = 120, seme = seme)
+        frequenze = pgbl.griglia_frequenze(tempo)
+
+        picco  = pgbl.periodogramma_gls(tempo, flusso, pesi, frequenze)["picco"][1]
+        picchi = pgbl.picchi_gls_sintetici(tempo, flusso, pesi, frequenze, 200, seme = seme)
+
+        valori_p.append((1 + np.count_nonzero(picchi >= picco))/(1 + len(picchi)))
+
+    assert stats.kstest(valori_p, "uniform").pvalue > 0.01
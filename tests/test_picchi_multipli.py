@@ -0,0 +1,62 @@
+"""
+Test dei picchi multipli delle curve sintetiche (modulo_parallelo_blazar e stadi picchi_multipli della pipeline)
+"""
+import modulo_funzioni_blazar as fbl
+import modulo_parallelo_blazar as ppbl
+import modulo_pipeline_blazar as pbl
+import numpy as np
+from scipy import fft
+
+
+F_TAGLIO = 1e-8
+
+
+def _curva(n = 600, seme = 0):
+    # rumore rosso settimanale con una componente periodica
+    rng = np.random.default_rng(seme)
+    tempo = np.arange(n)*7*86400.0
+
+    return 5 + np.cumsum(rng.normal(0, 0.3, n)) + np.sin(2*np.pi*tempo/(400*86400)), fft.fftfreq(n, d = 7*86400)
+
+
+def test_passaggio_unico():
+    flusso, freq = _curva()
+
+    picchi, multipli = ppbl.picchi_sintetici_paralleli(flusso, freq, 300, F_TAGLIO, n_processi = 2, dimensione_blocco = 64,
+                                                       seme = 4, multipli = 3)
+
+    # il picco principale è quello del calcolo senza multipli e i multipli quelli delle stesse curve sintetiche
+    solo_picchi = ppbl.picchi_sintetici_paralleli(flusso, freq, 300, F_TAGLIO, n_processi = 1, dimensione_blocco = 64, seme = 4)
+    np.testing.assert_array_equal(picchi, solo_picchi)
+
+    semi = np.random.SeedSequence(4).spawn(5)
+    curve = np.vstack([fbl.curve_sintetiche_blocco(flusso, min(64, 300 - 64*i), semi[i]) for i in range(5)])
+    np.testing.assert_allclose(multipli, fbl.picchi_multipli(fft.rfft(curve, axis = 1), freq, F_TAGLIO, 3)[1])
+
+
+def test_primo_picco_come_massimo():
+    flusso, freq = _curva(seme = 1)
+
+    picchi, multipli = ppbl.picchi_sintetici_paralleli(flusso, freq, 200, F_TAGLIO, n_processi = 1, seme = 2, multipli = 1)
+
+    # con k = 1 il picco multiplo è il massimo della potenza, non inferiore a quella del picco principale
+    curve = fbl.curve_sintetiche_blocco(flusso, 200, np.random.SeedSequence(2).spawn(1)[0])
+    n = len(freq)//2
+    potenza = np.abs(fft.rfft(curve, axis = 1)[:, 1:n][:, freq[1:n] > F_TAGLIO])**2
+
+    interni = (np.argmax(potenza, axis = 1) > 0) & (np.argmax(potenza, axis = 1) < potenza.shape[1] - 1)
+    np.testing.assert_allclose(np.abs(multipli[interni, 0])**2, np.max(potenza, axis = 1)[interni])
+    assert np.all(np.abs(multipli[:, 0])**2 >= np.abs(picchi)**2*(1 - 1e-12))
+
+
+def test_pipeline_parallela_stesse_curve():
+    for multipli_paralleli in (True, False):
+        stato = pbl.crea_stato("1M", motore = "parallelo", N = 200, processi = 1, k_picchi = 1,
+                               multipli_paralleli = multipli_paralleli)
+
+        picchi   = pbl.esegui_stadio(stato, "picchi_sintetici")
+        multipli = pbl.esegui_stadio(stato, "picchi_multipli_sintetici")
+
+        # senza seme le due distribuzioni nulle devono comunque provenire dalle stesse curve sintetiche
+        assert np.all(np.abs(multipli[:, 0])**2 >= np.abs(picchi)**2*(1 - 1e-12))
+        assert (stato["stadi"]["picchi_paralleli"]["multipli"] is not None) == multipli_paralleli
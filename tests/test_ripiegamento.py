@@ -0,0 +1,77 @@
+"""
+Test della ricerca del periodo per ripiegamento in fase (modulo_ripiegamento_blazar)
+"""
+import modulo_ripiegamento_blazar as rpbl
+import numpy as np
+
+
+GIORNO = 86400
+
+
+def _curva_periodica(periodo_gg = 400, n = 800, seme = 0):
+    # curva settimanale con buchi: flare brevi ripetuti ogni periodo_gg giorni (segnale non sinusoidale) più rumore
+    rng = np.random.default_rng(seme)
+
+    tempo = np.arange(n)*7*GIORNO
+    tempo = tempo[rng.random(n) > 0.1]
+    fase  = np.mod(tempo/(periodo_gg*GIORNO), 1)
+    flusso = 1 + 4*np.exp(-0.5*((fase - 0.5)/0.04)**2) + rng.normal(0, 0.5, len(tempo))
+
+    return tempo, flusso
+
+
+def _statistiche_dirette(tempo, flusso, periodo, n_bin):
+    # chi^2 e theta calcolati bin per bin con le definizioni
+    fase = np.mod((tempo - tempo[0])/periodo, 1)
+    bins = np.minimum((fase*n_bin).astype(int), n_bin - 1)
+    varianza = np.var(flusso, ddof = 1)
+
+    chi2, dispersione, gradi = 0.0, 0.0, 0
+    for b in range(n_bin):
+        x = flusso[bins == b]
+        if len(x) == 0:
+            continue
+        chi2 += len(x)*(np.mean(x) - np.mean(flusso))**2/varianza
+        dispersione += np.sum((x - np.mean(x))**2)
+        gradi += len(x) - 1
+
+    return chi2, dispersione/gradi/varianza
+
+
+def test_statistiche_come_definizione():
+    tempo, flusso = _curva_periodica()
+    periodi = rpbl.griglia_periodi(tempo, n_periodi = 7)
+
+    risultato = rpbl.ripiegamento(tempo, flusso, periodi, n_bin = 10)
+
+    for i, periodo in enumerate(periodi):
+        chi2, theta = _statistiche_dirette(tempo, flusso, periodo, 10)
+        np.testing.assert_allclose(risultato["chi2"][i], chi2, rtol = 1e-9)
+        np.testing.assert_allclose(risultato["theta"][i], theta, rtol = 1e-9)
+
+
+def test_periodo_iniettato():
+    periodo_gg = 400
+    tempo, flusso = _curva_periodica(periodo_gg)
+    periodi = rpbl.griglia_periodi(tempo, n_periodi = 2000)
+
+    risultato = rpbl.ripiegamento(tempo, flusso, periodi, n_bin = 10)
+    passo = np.diff(1/periodi)[0]
+
+    for picco in ("picco_ef", "picco_pdm"):
+        assert abs(risultato[picco][0] - 1/(periodo_gg*GIORNO)) <= 2*passo
+
+
+def test_sintetici_indipendenti_dai_processi():
+    tempo, flusso = _curva_periodica(n = 300)
+    periodi = rpbl.griglia_periodi(tempo, n_periodi = 50)
+
+    uno  = rpbl.picchi_ripiegamento_sintetici(tempo, flusso, periodi, 20, seme = 1, n_processi = 1)
+    due  = rpbl.picchi_ripiegamento_sintetici(tempo, flusso, periodi, 20, seme = 1, n_processi = 2)
+    originale = rpbl.ripiegamento(tempo, flusso, periodi)
+
+    for nome in ("ef", "pdm"):
+        np.testing.assert_allclose(uno[nome], due[nome])
+
+    # il segnale iniettato supera tutte le permutazioni
+    assert np.all(uno["ef"] < originale["picco_ef"][1])
@@ -0,0 +1,20 @@
+"""
+Test della significatività gaussiana dei valori-p (modulo_risultati_blazar)
+"""
+import modulo_risultati_blazar as rsbl
+import math
+
+
+def test_sigma_gaussiana():
+    # p = 0.0013499 corrisponde a 3 sigma a una coda
+    assert math.isclose(rsbl.sigma_gaussiana(0.0013499), 3, abs_tol = 1e-4)
+    assert rsbl.sigma_gaussiana(0.3) > 0
+
+
+def test_sigma_gaussiana_oltre_la_mediana():
+    # da p = 0.5 a p = 1 la significatività è sempre 0, mai negativa
+    for p in (0.5, 0.53, 0.9, 0.999, 1):
+        assert rsbl.sigma_gaussiana(p) == 0
+
+    for p in (0, -0.1, 1.5, math.nan):
+        assert math.isnan(rsbl.sigma_gaussiana(p))
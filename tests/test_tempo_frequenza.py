@@ -0,0 +1,29 @@
+"""
+Test del picco della Weighted Wavelet Z-transform (modulo_tempo_frequenza_blazar)
+"""
+import modulo_tempo_frequenza_blazar as tfbl
+import numpy as np
+
+
+def test_massimi_interni():
+    media = np.array([[9, 1, 3, 2, 4, 8],
+                      [5, 4, 3, 2, 1, 0]], dtype = float)
+
+    i, valori = tfbl._massimi_interni(media)
+
+    # il bordo più alto viene ignorato, la seconda riga non ha massimi interni
+    assert i[0] == 2 and valori[0] == 3
+    assert valori[1] == -np.inf
+
+
+def test_picco_interno_rumore_rosso():
+    # sinusoide di 200 giorni su un random walk, per cui la WWZ media è massima al bordo f_min della griglia
+    rng = np.random.default_rng(2)
+    tempo = np.sort(rng.uniform(0, 3000, 400))*86400
+    flusso = np.cumsum(rng.normal(0, 0.15, len(tempo))) + 0.5*np.sin(2*np.pi*tempo/(200*86400))
+
+    frequenze, tau = tfbl.griglia_wwz(tempo, n_frequenze = 80, n_tau = 40, f_min = 1/(2000*86400), f_max = 1/(50*86400))
+    trasformata = tfbl.wwz(tempo, flusso, frequenze, tau)
+
+    assert np.argmax(trasformata["media"]) == 0
+    assert abs(1/(trasformata["periodo"][0]*86400) - 200) < 10